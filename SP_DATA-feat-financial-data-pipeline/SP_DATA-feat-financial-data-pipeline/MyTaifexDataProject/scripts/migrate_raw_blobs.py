@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+原始檔案遷移腳本 (Raw Blob Migration Script)
+
+命令行工具，將舊版直接存放在 `raw_files.raw_content` BLOB 欄位中的原始檔案
+搬移到內容定址檔案儲存 (`data/01_raw_lake/blobs/<sha256[:2]>/<sha256>`)，
+並讓 `raw_files.blob_path` 指向新位置。可重複執行。
+"""
+import argparse
+from pathlib import Path
+import sys
+
+# 假設此腳本位於 MyTaifexDataProject/scripts/
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = PROJECT_ROOT / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+try:
+    from taifex_pipeline.database.db_manager import (
+        initialize_databases, migrate_raw_blobs_to_store, close_all_connections
+    )
+    from taifex_pipeline.core.logger_setup import get_logger
+except ImportError as e:
+    print(f"錯誤：無法導入必要的 taifex_pipeline 模組。請確保您從專案根目錄執行此腳本，"
+          f"或者 PYTHONPATH 已正確設定。詳細錯誤: {e}")
+    sys.exit(1)
+
+logger = get_logger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="將 raw_files 中的 BLOB 搬移到內容定址檔案儲存")
+    parser.add_argument("--batch-size", type=int, default=100, help="每個交易搬移的記錄數 (預設: 100)。")
+    args = parser.parse_args()
+
+    try:
+        initialize_databases() # 確保 raw_files 已具備 blob_path 等欄位
+        migrated = migrate_raw_blobs_to_store(batch_size=args.batch_size)
+        logger.info(f"遷移完成，共搬移 {migrated} 個原始檔案。")
+    except Exception as e:
+        logger.error(f"遷移原始檔案時發生錯誤: {e}", exc_info=True)
+        sys.exit(1)
+    finally:
+        close_all_connections()
+
+if __name__ == "__main__":
+    main()
@@ -173,5 +173,3 @@ if __name__ == "__main__":
         #     demo_file_path.unlink()
         #     logger.info(f"\n已刪除範例設定檔: {demo_file_path.relative_to(current_project_root)}")
         pass
-
-[end of MyTaifexDataProject/src/taifex_pipeline/core/config_loader.py]
@@ -224,5 +224,3 @@ if __name__ == "__main__":
     project_root_for_msg = Path(__file__).resolve().parents[3]
     log_dir_for_msg = project_root_for_msg / "logs"
     print(f"請檢查位於 '{log_dir_for_msg}' 資料夾下的 .log.json 檔案。")
-
-[end of MyTaifexDataProject/src/taifex_pipeline/core/logger_setup.py]
@@ -8,12 +8,15 @@
 import hashlib
 import uuid
 from pathlib import Path
-from typing import Union, Optional # 從 typing 導入 Optional
+from typing import BinaryIO, Tuple, Union, Optional # 從 typing 導入 Optional
 
 from .logger_setup import get_logger # 使用相對導入
 
 logger = get_logger(__name__)
 
+HASH_CHUNK_SIZE_BYTES: int = 1024 * 1024
+"""計算雜湊與串流複製時每次讀取的區塊大小 (1 MiB)。"""
+
 def generate_execution_id() -> str:
     """
     產生一個符合 UUID v4 標準的全域唯一執行 ID (Execution ID)。
@@ -51,8 +54,8 @@ def calculate_file_sha256(file_path: Union[str, Path]) -> Optional[str]:
 
         sha256_hash = hashlib.sha256()
         with open(path_obj, "rb") as f:
-            # 分塊讀取 (4KB per chunk) 以處理潛在的大型檔案
-            for byte_block in iter(lambda: f.read(4096), b""):
+            # 分塊讀取 (1 MiB per chunk) 以處理潛在的大型檔案
+            for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE_BYTES), b""):
                 sha256_hash.update(byte_block)
 
         hex_digest = sha256_hash.hexdigest()
@@ -66,6 +69,42 @@ def calculate_file_sha256(file_path: Union[str, Path]) -> Optional[str]:
         logger.error(f"計算檔案 '{file_path}' SHA256 時發生未預期錯誤: {e}", exc_info=True)
         return None
 
+def copy_file_with_sha256(source_path: Union[str, Path],
+                          destination: BinaryIO,
+                          chunk_size: int = HASH_CHUNK_SIZE_BYTES) -> Tuple[str, int]:
+    """
+    單次讀取來源檔案，同時計算 SHA256 雜湊值並寫入目的地 ("hash while copying")。
+
+    汲取流程原本需先讀一次檔案計算雜湊，再讀一次完整內容存入原始數據湖；
+    使用此函式後大型檔案只需從磁碟讀取一次。讀取使用可重複利用的緩衝區，
+    不會為每個區塊配置新的 bytes 物件。
+
+    Args:
+        source_path (Union[str, Path]): 來源檔案路徑。
+        destination (BinaryIO): 以二進位模式開啟的可寫入目的地 (例如暫存檔)。
+        chunk_size (int): 每次讀取的區塊大小，預設 1 MiB。
+
+    Returns:
+        Tuple[str, int]: (SHA256 雜湊值的十六進位字串, 複製的位元組數)。
+
+    Raises:
+        IOError: 讀取來源或寫入目的地失敗時拋出，由呼叫者決定如何處理。
+    """
+    sha256_hash = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    total_bytes = 0
+    with open(source_path, "rb") as src:
+        while True:
+            bytes_read = src.readinto(buffer)
+            if not bytes_read:
+                break
+            chunk = view[:bytes_read]
+            sha256_hash.update(chunk)
+            destination.write(chunk)
+            total_bytes += bytes_read
+    return sha256_hash.hexdigest(), total_bytes
+
 def calculate_bytes_sha256(data_bytes: bytes) -> str:
     """
     計算給定位元組串 (bytes string) 內容的 SHA256 雜湊值。
@@ -151,5 +190,3 @@ if __name__ == "__main__":
     assert bytes_hash_calculated == expected_bytes_hash, "位元組內容雜湊值計算結果與預期不符"
 
     logger.info("\n核心工具函式模組 (utils.py) 範例執行完畢。")
-
-[end of MyTaifexDataProject/src/taifex_pipeline/core/utils.py]
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+內容定址檔案儲存模組 (Content-Addressed Blob Store)
+
+將原始檔案內容以 SHA256 雜湊值為鍵存放在檔案系統中，取代把整個檔案
+以 BLOB 形式塞進 DuckDB 的 `raw_files` 表。目錄佈局為::
+
+    <root>/<sha256[:2]>/<sha256>
+
+主要特性：
+- 寫入採用「暫存檔 → fsync → os.replace → fsync 目錄」，保證檔案要嘛完整存在、要嘛不存在。
+- 相同內容只會存一份（雜湊值相同即代表內容相同），重複寫入直接略過。
+- 讀取使用 `mmap`，避免經由 SQL 搬運大量位元組；大型檔案可用 `open_blob` 以串流方式分塊讀取。
+- 汲取時可先以 `stage_file` 邊複製邊計算雜湊 (來源檔案只讀一次)，
+  確認需要保留後再以 `commit_staged_blob` 原子地移入定址位置。
+"""
+import mmap
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+from taifex_pipeline.core.logger_setup import get_logger
+from taifex_pipeline.core.utils import copy_file_with_sha256
+
+logger = get_logger(__name__)
+
+BLOB_STORE_SUBDIR: str = "blobs"
+"""在原始數據湖目錄 (`data/01_raw_lake`) 下存放內容定址檔案的子目錄名稱。"""
+
+STAGING_SUBDIR: str = ".staging"
+"""blob store 根目錄下存放尚未確認之暫存檔的子目錄 (與正式檔案位於同一檔案系統，確保 rename 為原子操作)。"""
+
+_SHA256_HEX_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def get_blob_store_root() -> Path:
+    """獲取預設的 blob store 根目錄 (`<專案根目錄>/data/01_raw_lake/blobs`)。"""
+    # 延遲導入以避免與 db_manager 的循環依賴
+    from taifex_pipeline.database.db_manager import (
+        DEFAULT_DATA_DIR, RAW_LAKE_SUBDIR, _get_project_root
+    )
+    return _get_project_root() / DEFAULT_DATA_DIR / RAW_LAKE_SUBDIR / BLOB_STORE_SUBDIR
+
+
+def get_blob_relative_path(file_hash: str) -> str:
+    """
+    返回雜湊值對應的相對路徑 (`sha256[:2]/sha256`)，此值會記錄在 `raw_files.blob_path`。
+
+    Raises:
+        ValueError: 如果 `file_hash` 不是 64 位小寫十六進位的 SHA256 字串。
+    """
+    if not _SHA256_HEX_PATTERN.match(file_hash or ""):
+        raise ValueError(f"無效的 SHA256 雜湊值: '{file_hash}'")
+    return f"{file_hash[:2]}/{file_hash}"
+
+
+def get_blob_path(file_hash: str, root: Optional[Path] = None) -> Path:
+    """返回雜湊值對應的絕對檔案路徑。"""
+    return (root or get_blob_store_root()) / get_blob_relative_path(file_hash)
+
+
+def _fsync_directory(directory: Path) -> None:
+    """對目錄執行 fsync，確保 rename 操作本身已持久化 (Windows 不支援，直接略過)。"""
+    if os.name == "nt":
+        return
+    dir_fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def write_blob(file_hash: str, raw_content: bytes, root: Optional[Path] = None) -> str:
+    """
+    以原子方式將內容寫入 blob store。若相同雜湊值的檔案已存在則不重複寫入。
+
+    Args:
+        file_hash (str): 內容的 SHA256 雜湊值。
+        raw_content (bytes): 原始二進位內容。
+        root (Optional[Path]): blob store 根目錄，預設為 `get_blob_store_root()`。
+
+    Returns:
+        str: 相對於根目錄的 blob 路徑 (`sha256[:2]/sha256`)。
+    """
+    relative_path = get_blob_relative_path(file_hash)
+    target_path = (root or get_blob_store_root()) / relative_path
+    if target_path.exists():
+        logger.debug(f"Blob (Hash: {file_hash[:10]}...) 已存在，略過寫入。")
+        return relative_path
+
+    target_dir = target_path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{file_hash[:10]}.", suffix=".tmp", dir=str(target_dir))
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(raw_content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_name, target_path)
+        _fsync_directory(target_dir)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    logger.debug(f"Blob (Hash: {file_hash[:10]}...) 已寫入 {target_path} ({len(raw_content)} bytes)。")
+    return relative_path
+
+
+def stage_file(source_path: Union[str, Path], root: Optional[Path] = None) -> Tuple[str, int, Path]:
+    """
+    將來源檔案以串流方式複製到暫存區，同時計算其 SHA256 雜湊值 (來源只讀取一次)。
+
+    暫存檔已 fsync，之後可用 `commit_staged_blob` 移入定址位置，
+    或用 `discard_staged_blob` 丟棄 (例如 manifest 顯示無需重新汲取時)。
+
+    Args:
+        source_path (Union[str, Path]): 來源檔案路徑。
+        root (Optional[Path]): blob store 根目錄，預設為 `get_blob_store_root()`。
+
+    Returns:
+        Tuple[str, int, Path]: (SHA256 雜湊值, 檔案大小, 暫存檔路徑)。
+    """
+    staging_dir = (root or get_blob_store_root()) / STAGING_SUBDIR
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=str(staging_dir))
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            file_hash, size_bytes = copy_file_with_sha256(source_path, tmp_file)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    return file_hash, size_bytes, Path(tmp_name)
+
+
+def commit_staged_blob(file_hash: str, staged_path: Path, root: Optional[Path] = None) -> str:
+    """
+    將 `stage_file` 產生的暫存檔原子地移到 `sha256[:2]/sha256`。
+    若相同內容的 blob 已存在，則直接刪除暫存檔。
+
+    Returns:
+        str: 相對於根目錄的 blob 路徑 (`sha256[:2]/sha256`)。
+    """
+    relative_path = get_blob_relative_path(file_hash)
+    target_path = (root or get_blob_store_root()) / relative_path
+    if target_path.exists():
+        discard_staged_blob(staged_path)
+        logger.debug(f"Blob (Hash: {file_hash[:10]}...) 已存在，丟棄暫存檔。")
+        return relative_path
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staged_path, target_path)
+    _fsync_directory(target_path.parent)
+    logger.debug(f"暫存檔已移入 blob store: {target_path}")
+    return relative_path
+
+
+def discard_staged_blob(staged_path: Path) -> None:
+    """刪除不再需要的暫存檔 (不存在時忽略)。"""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+
+def read_blob(relative_path: str, root: Optional[Path] = None) -> Optional[bytes]:
+    """
+    透過 mmap 讀取 blob 內容。
+
+    Args:
+        relative_path (str): `raw_files.blob_path` 中記錄的相對路徑。
+        root (Optional[Path]): blob store 根目錄，預設為 `get_blob_store_root()`。
+
+    Returns:
+        Optional[bytes]: 檔案內容；若檔案不存在則返回 `None`。
+    """
+    blob_path = (root or get_blob_store_root()) / relative_path
+    try:
+        with open(blob_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b"" # 空檔案無法建立 mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+    except FileNotFoundError:
+        logger.warning(f"Blob 檔案不存在: {blob_path}")
+        return None
+
+
+def open_blob(relative_path: str, root: Optional[Path] = None) -> Optional[BinaryIO]:
+    """
+    以二進位唯讀模式開啟 blob 檔案，供呼叫者分塊串流讀取 (不會把整個檔案載入記憶體)。
+    呼叫者負責關閉返回的檔案物件。
+
+    Returns:
+        Optional[BinaryIO]: 已開啟的檔案物件；若檔案不存在則返回 `None`。
+    """
+    blob_path = (root or get_blob_store_root()) / relative_path
+    try:
+        return open(blob_path, "rb")
+    except FileNotFoundError:
+        logger.warning(f"Blob 檔案不存在: {blob_path}")
+        return None
@@ -7,7 +7,9 @@
 增、刪、改、查 (CRUD) 操作介面：
 
 1.  **原始數據湖 (`raw_lake_and_manifest.duckdb` 中的 `raw_files` 表)**:
-    儲存從各種來源獲取的原始檔案的二進位內容及其 SHA256 雜湊值。
+    記錄從各種來源獲取的原始檔案的 SHA256 雜湊值，以及其內容在
+    內容定址檔案儲存 (`blob_store`) 中的相對路徑。舊版直接存放於
+    `raw_content` BLOB 欄位的資料仍可讀取，並可透過 `migrate_raw_blobs_to_store` 搬出。
 
 2.  **處理清單/審計日誌 (`raw_lake_and_manifest.duckdb` 中的 `file_processing_log` 表)**:
     即 `manifest.db` 的功能，記錄每個檔案從汲取到最終處理狀態的完整生命週期，
@@ -23,12 +25,15 @@
 - 在首次使用時自動初始化資料庫和必要的資料表結構。
 - 提供清晰、類型安全的函式介面進行資料庫操作。
 """
+import uuid
 import duckdb # type: ignore # DuckDB 可能沒有完全的類型存根，或 MyPy 配置需要調整
 import pandas as pd
+import pyarrow as pa
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple, Union # 添加 Union
 
 from taifex_pipeline.core.logger_setup import get_logger
+from taifex_pipeline.database import blob_store
 
 logger = get_logger(__name__)
 
@@ -86,12 +91,11 @@ def get_db_connection(db_name: str, data_subdir_name: str) -> duckdb.DuckDBPyCon
     if db_path_str in _connections:
         conn_candidate = _connections[db_path_str]
         try:
-            # 檢查快取的連接是否仍然有效
-            if conn_candidate and not conn_candidate.isclosed(): # type: ignore[attr-defined]
-                conn_candidate.execute("SELECT 1") # 簡單查詢以測試活性
-                logger.debug(f"返回已快取的 DuckDB 連接: {db_path_str}")
-                return conn_candidate
-        except (duckdb.ConnectionException, duckdb.InvalidInputException, AttributeError) as e: # AttributeError for isclosed if already closed by other means
+            # 檢查快取的連接是否仍然有效 (DuckDBPyConnection 沒有 isclosed()，已關閉的連接執行查詢會拋出 duckdb.Error)
+            conn_candidate.execute("SELECT 1").fetchall() # 簡單查詢以測試活性
+            logger.debug(f"返回已快取的 DuckDB 連接: {db_path_str}")
+            return conn_candidate
+        except duckdb.Error as e:
             logger.warning(f"快取的 DuckDB 連接 {db_path_str} 已失效或關閉 ({e})，將重新建立。")
             del _connections[db_path_str] # 從快取中移除失效連接
 
@@ -125,12 +129,11 @@ def close_all_connections() -> None:
     closed_count = 0
     for db_path, con in list(_connections.items()): # 使用 list(_connections.items()) 以允許在迭代中刪除
         try:
-            if con and not con.isclosed(): # type: ignore[attr-defined]
-                con.close()
-                logger.info(f"已關閉 DuckDB 連接: {db_path}")
-                closed_count +=1
+            con.close() # 重複關閉已關閉的連接不會出錯
+            logger.info(f"已關閉 DuckDB 連接: {db_path}")
+            closed_count +=1
             del _connections[db_path] # 從快取中移除
-        except (duckdb.ConnectionException, AttributeError) as e: # AttributeError for isclosed if already closed
+        except duckdb.Error as e:
             logger.warning(f"關閉 DuckDB 連接 {db_path} 時發生錯誤或連接已關閉: {e}", exc_info=False) # info=False 避免過多堆疊
             if db_path in _connections: # 確保在迭代中安全刪除
                 del _connections[db_path]
@@ -162,9 +165,15 @@ def _initialize_raw_lake_and_manifest() -> None:
         CREATE TABLE IF NOT EXISTS {RAW_FILES_TABLE} (
             file_hash TEXT PRIMARY KEY,
             raw_content BLOB NOT NULL,
+            blob_path TEXT,
+            size_bytes BIGINT,
             first_seen_timestamp TIMESTAMP WITH TIME ZONE DEFAULT current_timestamp
         );
         """)
+        # 舊版資料庫的 raw_files 只有 raw_content，補上 blob_store 所需欄位
+        # (manifest 的外鍵依賴 raw_files，DuckDB 不允許修改 NOT NULL 約束，故 raw_content 改存空位元組佔位)
+        con.execute(f"ALTER TABLE {RAW_FILES_TABLE} ADD COLUMN IF NOT EXISTS blob_path TEXT;")
+        con.execute(f"ALTER TABLE {RAW_FILES_TABLE} ADD COLUMN IF NOT EXISTS size_bytes BIGINT;")
         logger.info(f"資料表 '{RAW_FILES_TABLE}' 已在 '{RAW_LAKE_DB_NAME}' 中確認/創建。")
 
         # 創建 file_processing_log (manifest) 資料表
@@ -180,10 +189,15 @@ def _initialize_raw_lake_and_manifest() -> None:
             processed_row_count INTEGER,
             error_message TEXT,
             pipeline_execution_id TEXT,
+            source_size_bytes BIGINT,
+            source_mtime_ns BIGINT,
             last_updated TIMESTAMP WITH TIME ZONE DEFAULT current_timestamp,
-            CONSTRAINT fk_raw_file FOREIGN KEY (file_hash) REFERENCES {RAW_FILES_TABLE}(file_hash) ON DELETE CASCADE ON UPDATE CASCADE
+            CONSTRAINT fk_raw_file FOREIGN KEY (file_hash) REFERENCES {RAW_FILES_TABLE}(file_hash)
         );
         """)
+        # 來源檔案汲取時的大小與修改時間，供汲取管線跳過未變更的檔案 (舊版資料庫補上欄位)
+        con.execute(f"ALTER TABLE {MANIFEST_TABLE} ADD COLUMN IF NOT EXISTS source_size_bytes BIGINT;")
+        con.execute(f"ALTER TABLE {MANIFEST_TABLE} ADD COLUMN IF NOT EXISTS source_mtime_ns BIGINT;")
         # 創建索引以加速常用查詢
         con.execute(f"CREATE INDEX IF NOT EXISTS idx_manifest_status ON {MANIFEST_TABLE} (status);")
         con.execute(f"CREATE INDEX IF NOT EXISTS idx_manifest_fingerprint ON {MANIFEST_TABLE} (fingerprint_hash);")
@@ -206,8 +220,8 @@ def _initialize_processed_data() -> None:
 # --- Raw Lake 操作 ---
 def store_raw_file(file_hash: str, raw_content: bytes, conn: Optional[duckdb.DuckDBPyConnection] = None) -> bool:
     """
-    將原始檔案的二進位內容及其 SHA256 雜湊值存儲到 `raw_files` 表中。
-    如果具有相同 `file_hash` 的記錄已存在，則此操作通常會替換現有記錄（取決於DB行為，DuckDB INSERT OR REPLACE）。
+    將原始檔案內容寫入內容定址檔案儲存 (`blob_store`)，並在 `raw_files` 表中記錄其路徑。
+    如果具有相同 `file_hash` 的記錄已存在，則更新其指向的 blob 路徑。
 
     Args:
         file_hash (str): 檔案內容的 SHA256 雜湊值，作為主鍵。
@@ -219,25 +233,54 @@ def store_raw_file(file_hash: str, raw_content: bytes, conn: Optional[duckdb.Duc
     """
     db_conn = conn or get_raw_lake_connection()
     try:
-        # INSERT OR REPLACE 語法在 DuckDB 中是 INSERT ... ON CONFLICT DO UPDATE/NOTHING
-        # 為了簡單和明確替換，可以先 DELETE 再 INSERT，或使用 CREATE OR REPLACE TABLE (如果適用於單行)
-        # DuckDB 的 Python API register + insert 更為方便，或直接SQL
-        # 此處使用 INSERT OR IGNORE 語義，如果存在則不操作，依賴 first_seen_timestamp。
-        # 或者，更符合 "store" 語義的是 REPLACE:
-        db_conn.execute(
-            f"INSERT INTO {RAW_FILES_TABLE} (file_hash, raw_content) VALUES (?, ?) "
-            f"ON CONFLICT(file_hash) DO UPDATE SET raw_content = EXCLUDED.raw_content, first_seen_timestamp = current_timestamp",
-            (file_hash, raw_content)
-        )
-        logger.info(f"原始檔案 (Hash: {file_hash[:10]}...) 已儲存/更新到 '{RAW_FILES_TABLE}'。")
+        # 先完成檔案的原子寫入，再寫入指標，確保 raw_files 不會指向不完整的檔案
+        blob_path = blob_store.write_blob(file_hash, raw_content)
+        _record_raw_blob(db_conn, file_hash, blob_path, len(raw_content))
+        logger.info(f"原始檔案 (Hash: {file_hash[:10]}...) 已儲存到 blob store ({blob_path})，並記錄於 '{RAW_FILES_TABLE}'。")
         return True
     except Exception as e:
-        logger.error(f"儲存原始檔案 (Hash: {file_hash[:10]}...) 到 '{RAW_FILES_TABLE}' 失敗: {e}", exc_info=True)
+        logger.error(f"儲存原始檔案 (Hash: {file_hash[:10]}...) 失敗: {e}", exc_info=True)
         return False
 
+def store_staged_raw_file(file_hash: str, staged_path: Path, size_bytes: int,
+                          conn: Optional[duckdb.DuckDBPyConnection] = None) -> bool:
+    """
+    將 `blob_store.stage_file` 產生的暫存檔移入 blob store，並在 `raw_files` 表中記錄其路徑。
+    與 `store_raw_file` 相比，不需要把整個檔案內容讀進記憶體。
+
+    Args:
+        file_hash (str): 暫存檔內容的 SHA256 雜湊值 (由 `stage_file` 計算)。
+        staged_path (Path): 暫存檔路徑。
+        size_bytes (int): 檔案大小。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        bool: 如果儲存操作成功，返回 `True`；否則記錄錯誤並返回 `False`。
+    """
+    db_conn = conn or get_raw_lake_connection()
+    try:
+        blob_path = blob_store.commit_staged_blob(file_hash, staged_path)
+        _record_raw_blob(db_conn, file_hash, blob_path, size_bytes)
+        logger.info(f"原始檔案 (Hash: {file_hash[:10]}...) 已儲存到 blob store ({blob_path})，並記錄於 '{RAW_FILES_TABLE}'。")
+        return True
+    except Exception as e:
+        logger.error(f"儲存暫存的原始檔案 (Hash: {file_hash[:10]}...) 失敗: {e}", exc_info=True)
+        blob_store.discard_staged_blob(staged_path)
+        return False
+
+def _record_raw_blob(db_conn: duckdb.DuckDBPyConnection, file_hash: str, blob_path: str, size_bytes: int) -> None:
+    """在 `raw_files` 中新增或更新指向 blob store 的記錄。"""
+    db_conn.execute(
+        f"INSERT INTO {RAW_FILES_TABLE} (file_hash, raw_content, blob_path, size_bytes) VALUES (?, ''::BLOB, ?, ?) "
+        f"ON CONFLICT(file_hash) DO UPDATE SET raw_content = ''::BLOB, blob_path = EXCLUDED.blob_path, "
+        f"size_bytes = EXCLUDED.size_bytes, first_seen_timestamp = now()",
+        (file_hash, blob_path, size_bytes)
+    )
+
 def get_raw_file_content(file_hash: str, conn: Optional[duckdb.DuckDBPyConnection] = None) -> Optional[bytes]:
     """
-    根據檔案的 SHA256 雜湊值從 `raw_files` 表中檢索其原始二進位內容。
+    根據檔案的 SHA256 雜湊值檢索其原始二進位內容。
+    優先透過 `raw_files.blob_path` 從 blob store 讀取；尚未遷移的舊記錄則讀取 `raw_content` 欄位。
 
     Args:
         file_hash (str): 要檢索檔案的 SHA256 雜湊值。
@@ -249,17 +292,104 @@ def get_raw_file_content(file_hash: str, conn: Optional[duckdb.DuckDBPyConnectio
     """
     db_conn = conn or get_raw_lake_connection()
     try:
-        result = db_conn.execute(f"SELECT raw_content FROM {RAW_FILES_TABLE} WHERE file_hash = ?", (file_hash,)).fetchone()
-        if result and result[0] is not None:
-            logger.debug(f"從 '{RAW_FILES_TABLE}' 讀取到檔案內容 (Hash: {file_hash[:10]}...) 。")
-            return bytes(result[0]) # 確保返回的是 bytes
-        else:
-            logger.warning(f"在 '{RAW_FILES_TABLE}' 中未找到檔案 (Hash: {file_hash[:10]}...) 或內容為 NULL。")
+        result = db_conn.execute(
+            f"SELECT blob_path, raw_content FROM {RAW_FILES_TABLE} WHERE file_hash = ?", (file_hash,)
+        ).fetchone()
+        if not result:
+            logger.warning(f"在 '{RAW_FILES_TABLE}' 中未找到檔案 (Hash: {file_hash[:10]}...)。")
             return None
+        blob_path, legacy_content = result
+        if blob_path:
+            content = blob_store.read_blob(blob_path)
+            if content is not None:
+                logger.debug(f"從 blob store 讀取到檔案內容 (Hash: {file_hash[:10]}...) 。")
+            return content
+        if legacy_content is not None:
+            logger.debug(f"從 '{RAW_FILES_TABLE}.raw_content' 讀取到尚未遷移的檔案內容 (Hash: {file_hash[:10]}...) 。")
+            return bytes(legacy_content) # 確保返回的是 bytes
+        logger.warning(f"檔案 (Hash: {file_hash[:10]}...) 既無 blob 路徑也無內容。")
+        return None
     except Exception as e:
-        logger.error(f"從 '{RAW_FILES_TABLE}' 讀取檔案 (Hash: {file_hash[:10]}...) 失敗: {e}", exc_info=True)
+        logger.error(f"讀取檔案 (Hash: {file_hash[:10]}...) 失敗: {e}", exc_info=True)
         return None
 
+def get_raw_blob_paths_batch(file_hashes: List[str], conn: Optional[duckdb.DuckDBPyConnection] = None) -> Dict[str, str]:
+    """
+    以單一查詢取得多個原始檔案在 blob store 中的相對路徑。
+
+    尚未遷移 (`blob_path` 為 NULL) 或不存在的雜湊值不會出現在結果中；
+    需要時可先呼叫 `migrate_raw_blobs_to_store`。
+
+    Args:
+        file_hashes (List[str]): 要查詢的檔案 SHA256 雜湊值列表。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        Dict[str, str]: 以 file_hash 為鍵、`raw_files.blob_path` 為值的字典；查詢失敗時返回空字典。
+    """
+    if not file_hashes:
+        return {}
+    db_conn = conn or get_raw_lake_connection()
+    batch_view_name = "blob_path_lookup_batch"
+    try:
+        db_conn.register(batch_view_name, pa.table({"file_hash": pa.array(list(set(file_hashes)), pa.string())}))
+        rows = db_conn.execute(
+            f"SELECT file_hash, blob_path FROM {RAW_FILES_TABLE} "
+            f"WHERE blob_path IS NOT NULL AND file_hash IN (SELECT file_hash FROM {batch_view_name})"
+        ).fetchall()
+    except Exception as e:
+        logger.error(f"批次查詢 {len(file_hashes)} 筆原始檔案路徑失敗: {e}", exc_info=True)
+        return {}
+    finally:
+        db_conn.unregister(batch_view_name)
+    return {file_hash: blob_path for file_hash, blob_path in rows}
+
+def migrate_raw_blobs_to_store(batch_size: int = 100, conn: Optional[duckdb.DuckDBPyConnection] = None) -> int:
+    """
+    將舊版直接存放在 `raw_files.raw_content` 的 BLOB 搬到 blob store。
+
+    每批在單一交易中更新 `blob_path` 並將 `raw_content` 改為空位元組佔位；檔案先寫入再更新指標，
+    因此中途中斷後重新執行是安全的 (已存在的 blob 會被略過)。
+    完成後執行 CHECKPOINT 以回收資料庫空間。
+
+    Args:
+        batch_size (int): 每批搬移的記錄數。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        int: 成功搬移的記錄數。
+    """
+    db_conn = conn or get_raw_lake_connection()
+    migrated = 0
+    while True:
+        rows = db_conn.execute(
+            f"SELECT file_hash, raw_content FROM {RAW_FILES_TABLE} "
+            f"WHERE blob_path IS NULL LIMIT ?",
+            (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for file_hash, raw_content in rows:
+            content = bytes(raw_content)
+            updates.append((blob_store.write_blob(file_hash, content), len(content), file_hash))
+        db_conn.execute("BEGIN TRANSACTION;")
+        try:
+            db_conn.executemany(
+                f"UPDATE {RAW_FILES_TABLE} SET blob_path = ?, size_bytes = ?, raw_content = ''::BLOB WHERE file_hash = ?",
+                updates
+            )
+            db_conn.execute("COMMIT;")
+        except Exception:
+            db_conn.execute("ROLLBACK;")
+            raise
+        migrated += len(updates)
+        logger.info(f"已將 {migrated} 筆原始檔案從 '{RAW_FILES_TABLE}' 搬移到 blob store。")
+    if migrated:
+        db_conn.execute("CHECKPOINT;")
+    logger.info(f"原始檔案遷移完成，共搬移 {migrated} 筆。")
+    return migrated
+
 # --- Manifest 操作 ---
 def update_manifest_record(
     file_hash: str,
@@ -455,6 +585,172 @@ def check_file_hash_exists_in_manifest(file_hash: str, conn: Optional[duckdb.Duc
     record = get_manifest_record(file_hash, conn)
     return record is not None
 
+# --- Manifest 批次操作 ---
+_MANIFEST_BATCH_COLUMN_TYPES: Dict[str, pa.DataType] = {
+    "original_file_path": pa.string(),
+    "status": pa.string(),
+    "fingerprint_hash": pa.string(),
+    "ingestion_timestamp": pa.timestamp("us", tz="UTC"),
+    "transformation_timestamp": pa.timestamp("us", tz="UTC"),
+    "target_table_name": pa.string(),
+    "processed_row_count": pa.int64(),
+    "error_message": pa.string(),
+    "pipeline_execution_id": pa.string(),
+    "source_size_bytes": pa.int64(),
+    "source_mtime_ns": pa.int64(),
+}
+"""批次 upsert 可寫入的 manifest 欄位及其 Arrow 型別 (file_hash 與 last_updated 另行處理)。"""
+
+def _epoch_to_utc_timestamp(epoch: Optional[float]) -> Optional[pd.Timestamp]:
+    return pd.to_datetime(epoch, unit='s', utc=True) if epoch is not None else None
+
+def get_manifest_records_batch(file_hashes: List[str], conn: Optional[duckdb.DuckDBPyConnection] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    以單一查詢取得多個檔案雜湊值的 manifest 記錄。
+
+    雜湊值列表會包成 Arrow 表註冊到連接上，再以
+    `SELECT ... WHERE file_hash IN (SELECT file_hash FROM arrow_batch)` 一次取回，
+    查詢次數不會隨檔案數量增加。
+
+    Args:
+        file_hashes (List[str]): 要查詢的檔案 SHA256 雜湊值列表。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 以 file_hash 為鍵的記錄字典，格式同 `get_manifest_record`。
+                                   不存在於 manifest 中的雜湊值不會出現在結果中；查詢失敗時返回空字典。
+    """
+    if not file_hashes:
+        return {}
+    db_conn = conn or get_raw_lake_connection()
+    batch_view_name = "manifest_lookup_batch"
+    try:
+        db_conn.register(batch_view_name, pa.table({"file_hash": pa.array(list(set(file_hashes)), pa.string())}))
+        records_df = db_conn.execute(
+            f"SELECT * FROM {MANIFEST_TABLE} WHERE file_hash IN (SELECT file_hash FROM {batch_view_name})"
+        ).fetch_arrow_table().to_pandas()
+    except Exception as e:
+        logger.error(f"批次查詢 {len(file_hashes)} 筆 Manifest 記錄失敗: {e}", exc_info=True)
+        return {}
+    finally:
+        db_conn.unregister(batch_view_name)
+
+    for col in records_df.select_dtypes(include=['datetimetz']).columns:
+        records_df[col] = records_df[col].dt.tz_convert(None) # 與 get_manifest_record 一致，轉為 naive
+    records_df = records_df.astype(object).where(pd.notnull(records_df), None)
+    records = {row["file_hash"]: row for row in records_df.to_dict(orient="records")}
+    logger.debug(f"批次查詢 {len(file_hashes)} 個雜湊值，於 '{MANIFEST_TABLE}' 中找到 {len(records)} 筆記錄。")
+    return records
+
+def get_manifest_source_signatures(original_file_paths: List[str],
+                                   conn: Optional[duckdb.DuckDBPyConnection] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    以單一查詢取得多個來源路徑在 manifest 中的記錄摘要，供汲取管線以大小與修改時間判斷檔案是否未變更。
+
+    Args:
+        original_file_paths (List[str]): 要查詢的 `original_file_path` 列表。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: 以 `original_file_path` 為鍵，值為該路徑的記錄列表，
+                                         每筆含 `file_hash`、`status`、`source_size_bytes`、`source_mtime_ns`。
+                                         查詢失敗時返回空字典 (所有檔案都會被重新讀取)。
+    """
+    if not original_file_paths:
+        return {}
+    db_conn = conn or get_raw_lake_connection()
+    batch_view_name = "manifest_path_lookup_batch"
+    try:
+        db_conn.register(batch_view_name, pa.table({"original_file_path": pa.array(list(set(original_file_paths)), pa.string())}))
+        rows = db_conn.execute(
+            f"SELECT original_file_path, file_hash, status, source_size_bytes, source_mtime_ns FROM {MANIFEST_TABLE} "
+            f"WHERE original_file_path IN (SELECT original_file_path FROM {batch_view_name})"
+        ).fetchall()
+    except Exception as e:
+        logger.error(f"批次查詢 {len(original_file_paths)} 個來源路徑的 Manifest 記錄失敗: {e}", exc_info=True)
+        return {}
+    finally:
+        db_conn.unregister(batch_view_name)
+
+    signatures: Dict[str, List[Dict[str, Any]]] = {}
+    for original_file_path, file_hash, status, size_bytes, mtime_ns in rows:
+        signatures.setdefault(original_file_path, []).append({
+            "file_hash": file_hash,
+            "status": status,
+            "source_size_bytes": size_bytes,
+            "source_mtime_ns": mtime_ns,
+        })
+    return signatures
+
+def upsert_manifest_records_batch(records: List[Dict[str, Any]], conn: Optional[duckdb.DuckDBPyConnection] = None) -> bool:
+    """
+    以批次 UPSERT 新增或更新多筆 manifest 記錄。
+
+    每筆記錄使用與 `update_manifest_record` 相同的參數名稱 (例如 `status`、
+    `ingestion_timestamp_epoch`)。與 `update_manifest_record` 不同的是，
+    記錄中**明確給出**的鍵即使值為 `None` 也會寫入 (用於清除舊的轉換欄位)；
+    未給出的鍵則保持原值。具有相同鍵集合的記錄會合併成一條
+    `INSERT ... SELECT ... ON CONFLICT DO UPDATE` 語句，全部在單一交易中完成。
+
+    Args:
+        records (List[Dict[str, Any]]): 要寫入的記錄列表，每筆必須包含 `file_hash`。
+        conn (Optional[duckdb.DuckDBPyConnection]): 可選的資料庫連接。
+
+    Returns:
+        bool: 如果全部記錄寫入成功，返回 `True`；否則回滾並返回 `False`。
+    """
+    if not records:
+        return True
+    db_conn = conn or get_raw_lake_connection()
+
+    # 轉換成資料表欄位名稱；同一雜湊值出現多次時以最後一筆為準 (ON CONFLICT 不允許同一列更新兩次)
+    rows_by_hash: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        row: Dict[str, Any] = {}
+        for key, value in record.items():
+            if key == "ingestion_timestamp_epoch":
+                row["ingestion_timestamp"] = _epoch_to_utc_timestamp(value)
+            elif key == "transformation_timestamp_epoch":
+                row["transformation_timestamp"] = _epoch_to_utc_timestamp(value)
+            elif key in _MANIFEST_BATCH_COLUMN_TYPES or key == "file_hash":
+                row[key] = value
+            else:
+                logger.warning(f"批次 upsert 忽略未知的 manifest 欄位: '{key}'")
+        rows_by_hash[row["file_hash"]] = row
+
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows_by_hash.values():
+        columns = tuple(col for col in _MANIFEST_BATCH_COLUMN_TYPES if col in row)
+        groups.setdefault(columns, []).append(row)
+
+    batch_view_name = "manifest_upsert_batch"
+    now_utc = pd.Timestamp.now(tz='UTC').floor('ms')
+    try:
+        db_conn.execute("BEGIN TRANSACTION;")
+        for columns, group_rows in groups.items():
+            arrays = {"file_hash": pa.array([r["file_hash"] for r in group_rows], pa.string())}
+            for col in columns:
+                arrays[col] = pa.array([r[col] for r in group_rows], _MANIFEST_BATCH_COLUMN_TYPES[col])
+            db_conn.register(batch_view_name, pa.table(arrays))
+            try:
+                all_cols = ["file_hash", *columns]
+                update_set_sql = ", ".join([f"{col} = EXCLUDED.{col}" for col in columns] + ["last_updated = EXCLUDED.last_updated"])
+                db_conn.execute(
+                    f"INSERT INTO {MANIFEST_TABLE} ({', '.join(all_cols)}, last_updated) "
+                    f"SELECT {', '.join(all_cols)}, ? FROM {batch_view_name} "
+                    f"ON CONFLICT(file_hash) DO UPDATE SET {update_set_sql}",
+                    (now_utc,)
+                )
+            finally:
+                db_conn.unregister(batch_view_name)
+        db_conn.execute("COMMIT;")
+        logger.info(f"已批次新增/更新 {len(rows_by_hash)} 筆 Manifest 記錄 ({len(groups)} 條 UPSERT 語句)。")
+        return True
+    except Exception as e:
+        db_conn.execute("ROLLBACK;")
+        logger.error(f"批次更新 {len(rows_by_hash)} 筆 Manifest 記錄失敗: {e}", exc_info=True)
+        return False
+
 # --- Processed Data 操作 ---
 def load_dataframe_to_processed_db(
     df: pd.DataFrame,
@@ -633,5 +929,3 @@ if __name__ == "__main__":
     finally:
         close_all_connections()
         logger.info("db_manager.py 範例執行完畢（含 finally 清理）。")
-
-[end of MyTaifexDataProject/src/taifex_pipeline/database/db_manager.py]
@@ -3,10 +3,12 @@
 格式指紋計算模組 (Format Detector)
 
 實現檔案格式的自動偵測，主要流程：
-1. 多行嗅探，首個匹配策略定位標頭行。
+1. 只讀取檔案開頭一段有界的位元組前綴，截取標頭候選行後以嚴格解碼判斷編碼，
+   在該緩衝區內多行嗅探定位標頭行。
 2. 標頭正規化（清除空白、轉小寫、排序、合併）。
 3. 計算 SHA256 指紋。
 """
+import codecs
 import hashlib
 import io
 import re
@@ -18,6 +20,7 @@ logger = get_logger(__name__)
 
 # --- 常數設定 ---
 MAX_HEADER_CANDIDATE_LINES = 20  # 讀取檔案開頭多少行作為標頭候選
+HEADER_SNIFF_MAX_BYTES = 64 * 1024  # 嗅探標頭時最多讀取的位元組數 (單次讀取)
 MIN_COLUMNS_FOR_HEADER = 2       # 一行至少要有多少欄位才被考慮為可能的標頭
 COMMON_HEADER_KEYWORDS = [ # 一些常見的中文標頭關鍵字，用於輔助判斷 (可擴充)
     "日期", "代號", "契約", "價格", "成交", "時間", "數量",
@@ -109,6 +112,38 @@ def _is_likely_header(fields: List[str]) -> bool:
 
     return False
 
+_LINE_BREAK_BYTES = re.compile(rb'\r\n|\r|\n')
+
+def _header_candidate_zone(prefix: bytes) -> bytes:
+    """只保留前 `MAX_HEADER_CANDIDATE_LINES` 行 (含換行)，編碼判斷與解碼不需處理其後的位元組。"""
+    for line_count, match in enumerate(_LINE_BREAK_BYTES.finditer(prefix), start=1):
+        if line_count == MAX_HEADER_CANDIDATE_LINES:
+            return prefix[:match.end()]
+    return prefix
+
+def _decode_header_zone(zone: bytes) -> Tuple[Optional[str], str]:
+    """
+    以 C 實作的嚴格增量解碼判斷編碼並解碼標頭區 (每種編碼最多一次)：
+    1. UTF-8 BOM -> 'utf-8-sig'
+    2. 可嚴格以 UTF-8 解碼 -> 'utf-8'
+    3. 可嚴格以 MS950 (Big5 的超集，期交所檔案常用) 解碼 -> 'ms950'，
+       少數編碼表差異再以 'big5' 嘗試
+    `final=False` 讓結尾被截斷的多位元組字元直接被捨棄而非視為錯誤。
+
+    Returns:
+        Tuple[Optional[str], str]: (編碼, 解碼後文字)；無法判斷時為 (None, '')。
+    """
+    if zone.startswith(codecs.BOM_UTF8):
+        candidate_encodings: Tuple[str, ...] = ('utf-8-sig',)
+    else:
+        candidate_encodings = ('utf-8', 'ms950', 'big5')
+    for encoding in candidate_encodings:
+        try:
+            return encoding, codecs.getincrementaldecoder(encoding)(errors='strict').decode(zone, final=False)
+        except UnicodeDecodeError:
+            continue
+    return None, ''
+
 def find_header_row(file_stream: io.BytesIO, file_name_for_log: str) -> Tuple[Optional[List[str]], Optional[int]]:
     """
     從檔案串流中定位標頭行並提取正規化後的欄位。
@@ -122,34 +157,31 @@ def find_header_row(file_stream: io.BytesIO, file_name_for_log: str) -> Tuple[Op
             - 正規化後的標頭欄位列表 (已排序)，如果找不到則為 None。
             - 標頭所在的行號 (0-based)，如果找不到則為 None。
     """
-    file_stream.seek(0)
-    # 嘗試用多種編碼讀取前幾行
-    # 順序很重要：utf-8-sig (處理BOM), utf-8, ms950 (繁體中文常用)
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'ms950', 'big5']
-
-    lines: List[str] = []
-    detected_encoding: Optional[str] = None
+    # 只讀取一次有界的位元組前綴，讀完後將串流位置還原，供呼叫者後續解析使用
+    try:
+        file_stream.seek(0)
+        prefix = file_stream.read(HEADER_SNIFF_MAX_BYTES + 1)
+        file_stream.seek(0)
+    except Exception as e: # 例如串流已關閉
+        logger.error(f"檔案 {file_name_for_log}: 讀取標頭時發生非預期錯誤: {e}", exc_info=True)
+        return None, None
 
-    for encoding in encodings_to_try:
-        try:
-            file_stream.seek(0)
-            # TextIOWrapper 將 bytes stream 轉為 text stream
-            # readline() 會讀取直到 '\n'
-            reader = io.TextIOWrapper(file_stream, encoding=encoding, errors='strict')
-            lines = [reader.readline() for _ in range(MAX_HEADER_CANDIDATE_LINES)]
-            detected_encoding = encoding
-            logger.debug(f"檔案 {file_name_for_log}: 成功使用編碼 {encoding} 讀取前 {len(lines)} 行。")
-            break # 找到能成功讀取的編碼
-        except UnicodeDecodeError:
-            logger.debug(f"檔案 {file_name_for_log}: 使用編碼 {encoding} 解碼失敗，嘗試下一個。")
-            continue
-        except Exception as e: # 其他可能的錯誤，例如串流問題
-            logger.error(f"檔案 {file_name_for_log}: 讀取標頭時發生非預期錯誤 ({encoding}): {e}", exc_info=True)
-            return None, None # 不再嘗試其他編碼
+    if len(prefix) > HEADER_SNIFF_MAX_BYTES:
+        # 前綴被截斷：只保留完整的行，避免最後一行的多位元組字元被切斷
+        prefix = prefix[:HEADER_SNIFF_MAX_BYTES]
+        last_newline = max(prefix.rfind(b'\n'), prefix.rfind(b'\r'))
+        if last_newline >= 0:
+            prefix = prefix[:last_newline + 1]
+    prefix = _header_candidate_zone(prefix)
 
-    if not lines or detected_encoding is None:
+    detected_encoding, text = _decode_header_zone(prefix)
+    if not prefix or detected_encoding is None:
         logger.warning(f"檔案 {file_name_for_log}: 無法使用任何常用編碼成功讀取標頭行，或檔案為空。")
         return None, None
+    logger.debug(f"檔案 {file_name_for_log}: 判斷編碼為 {detected_encoding}，嗅探前綴長度 {len(prefix)} bytes。")
+
+    # 與 TextIOWrapper 相同的通用換行處理 (\r\n 與 \r 皆視為換行)，確保行號與 pandas 一致
+    lines: List[str] = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')[:MAX_HEADER_CANDIDATE_LINES]
 
     # 逐行嗅探，找到第一個最像標頭的行
     best_header_fields: Optional[List[str]] = None
@@ -6,17 +6,44 @@
 """
 import pandas as pd
 import io
-from typing import Dict, Any, Optional, Iterator
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
 
 from taifex_pipeline.core.logger_setup import get_logger
 
 logger = get_logger(__name__)
 
+CHUNKED_PARSE_THRESHOLD_BYTES: int = 32 * 1024 * 1024
+"""檔案大小達到此門檻 (32 MiB) 時，轉換流程改為分塊解析、清洗與載入。"""
+
+DEFAULT_CHUNK_ROWS: int = 200_000
+"""分塊解析時每個數據塊的預設行數 (配方未指定 chunksize 時使用)。"""
+
+def resolve_parser_config_for_size(parser_config: Dict[str, Any], file_size_bytes: int) -> Dict[str, Any]:
+    """
+    依檔案大小決定是否分塊解析，返回 (可能) 補上 `chunksize` 的 parser_config 副本。
+
+    - 配方已設定 `chunksize` 時維持不變。
+    - 檔案大小達到 `CHUNKED_PARSE_THRESHOLD_BYTES` 時補上 `DEFAULT_CHUNK_ROWS`，
+      讓大型檔案 (例如選擇權逐筆、三大法人明細) 的 worker 記憶體用量維持平穩。
+    - 小檔案仍一次解析為單一 DataFrame，避免多餘的分塊開銷。
+
+    Args:
+        parser_config (Dict[str, Any]): 配方中的解析參數。
+        file_size_bytes (int): 原始檔案大小 (bytes)。
+
+    Returns:
+        Dict[str, Any]: 傳給 `parse_file_stream_to_dataframe` 的解析參數。
+    """
+    effective_config = dict(parser_config)
+    if effective_config.get('chunksize') is None and file_size_bytes >= CHUNKED_PARSE_THRESHOLD_BYTES:
+        effective_config['chunksize'] = DEFAULT_CHUNK_ROWS
+    return effective_config
+
 def parse_file_stream_to_dataframe(
-    file_stream: io.BytesIO,
+    file_stream: BinaryIO,
     parser_config: Dict[str, Any],
     file_name_for_log: str = "UnknownFile"
-) -> Optional[pd.DataFrame]: # 或者 Union[pd.DataFrame, Iterator[pd.DataFrame]] 如果支持 chunksize
+) -> Optional[Union[pd.DataFrame, Iterator[pd.DataFrame]]]:
     """
     根據提供的 parser_config，將檔案串流解析為 pandas DataFrame。
 
@@ -24,7 +51,7 @@ def parse_file_stream_to_dataframe(
     parser_config 字典中的鍵應對應 pd.read_csv 的參數。
 
     Args:
-        file_stream (io.BytesIO): 檔案內容的位元組串流。應支持 seek(0)。
+        file_stream (BinaryIO): 檔案內容的位元組串流 (`io.BytesIO` 或以 'rb' 開啟的檔案)。應支持 seek(0)。
         parser_config (Dict[str, Any]): 解析參數字典，例如：
             {
                 "sep": ",",
@@ -39,12 +66,9 @@ def parse_file_stream_to_dataframe(
         file_name_for_log (str): 檔名，用於日誌輸出。
 
     Returns:
-        Optional[pd.DataFrame]: 解析後的 DataFrame。如果解析失敗，則返回 None。
-                                 如果啟用了 chunksize，理論上應返回 Iterator[pd.DataFrame]，
-                                 但目前簡化為：如果 chunksize 被設置，則只處理第一個 chunk 或報錯提示。
-                                 實際的流式處理應在調用此函式的轉換管線中完成。
-                                 **更新：** 為了與計畫描述（清洗函式處理分塊）一致，
-                                 如果提供了 chunksize，此函數將返回一個 DataFrame 迭代器。
+        Optional[Union[pd.DataFrame, Iterator[pd.DataFrame]]]: 解析後的 DataFrame。如果解析失敗，則返回 None。
+                                 如果提供了 chunksize，此函數將返回一個 DataFrame 迭代器，
+                                 由轉換管線逐塊清洗並載入 (見 `resolve_parser_config_for_size`)。
     """
     file_stream.seek(0) # 確保從頭讀取
 
@@ -9,16 +9,17 @@ import io
 import time
 import os
 import importlib
+import tempfile
 import pandas as pd
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from typing import List, Dict, Any, Tuple, Optional, Callable
 
 from taifex_pipeline.core.logger_setup import get_logger, EXECUTION_ID
 from taifex_pipeline.core.config_loader import get_format_catalog
 from taifex_pipeline.core.utils import calculate_bytes_sha256 # 雖然原始hash已有，但可備用
-from taifex_pipeline.database import db_manager
+from taifex_pipeline.database import blob_store, db_manager
 from taifex_pipeline.transformation.format_detector import calculate_format_fingerprint
-from taifex_pipeline.transformation.parsers import parse_file_stream_to_dataframe
+from taifex_pipeline.transformation.parsers import parse_file_stream_to_dataframe, resolve_parser_config_for_size
 # 清洗函式將被動態導入
 
 logger = get_logger(__name__)
@@ -26,6 +27,21 @@ logger = get_logger(__name__)
 # --- 清洗函式動態導入輔助 ---
 CLEANER_MODULE_BASE_PATH = "taifex_pipeline.transformation.cleaners"
 
+MAX_IN_FLIGHT_TASKS_PER_WORKER: int = 2
+"""每個 worker 同時最多排隊的任務數；限制尚未被主進程載入的暫存數據塊數量。"""
+
+# 每個進程只解析一次清洗函式：函式名稱 -> 函式 (導入失敗時為 None)
+_cleaner_function_cache: Dict[str, Optional[Callable[[pd.DataFrame], pd.DataFrame]]] = {}
+
+# 由 ProcessPoolExecutor 的 initializer 在每個 worker 進程啟動時設定一次的格式目錄
+_worker_format_catalog: Optional[Dict[str, Any]] = None
+
+
+def _init_transformation_worker(format_catalog: Dict[str, Any]) -> None:
+    """worker 進程初始化：保存主進程已載入的格式目錄，避免每個檔案都重新查詢。"""
+    global _worker_format_catalog
+    _worker_format_catalog = format_catalog
+
 def get_cleaner_function(function_name_str: str) -> Optional[Callable[[pd.DataFrame], pd.DataFrame]]:
     """
     根據函式名稱字串，動態導入並返回清洗函式。
@@ -37,7 +53,16 @@ def get_cleaner_function(function_name_str: str) -> Optional[Callable[[pd.DataFr
 
     為了簡化，我們這裡假設 format_catalog.json 中的 cleaner_function
     格式為 'module_name.function_name'，例如 'example_cleaners.clean_daily_ohlcv_example_v1'
+
+    解析結果 (包括失敗) 會快取在進程內，同一個函式名稱只會經由 importlib 導入一次。
     """
+    if function_name_str not in _cleaner_function_cache:
+        _cleaner_function_cache[function_name_str] = _import_cleaner_function(function_name_str)
+    return _cleaner_function_cache[function_name_str]
+
+
+def _import_cleaner_function(function_name_str: str) -> Optional[Callable[[pd.DataFrame], pd.DataFrame]]:
+    """實際執行清洗函式的動態導入 (不經快取)。"""
     if '.' not in function_name_str:
         logger.error(f"清洗函式名稱 '{function_name_str}' 格式不正確，應為 'module_name.function_name'。")
         return None
@@ -65,18 +90,32 @@ def get_cleaner_function(function_name_str: str) -> Optional[Callable[[pd.DataFr
 
 
 # --- 單一檔案處理函式 (在 ProcessPoolExecutor 的 worker 中執行) ---
+def _discard_spooled_chunks(chunk_paths: List[str]) -> None:
+    """刪除暫存的數據塊檔案 (不存在的檔案直接略過)。"""
+    for chunk_path in chunk_paths:
+        try:
+            os.remove(chunk_path)
+        except FileNotFoundError:
+            pass
+
+
 def process_single_file_worker(
     file_hash: str,
-    # raw_content: bytes, # 直接傳遞內容以減少DB查詢或進程間序列化大型bytes的開銷
-    # 或者讓 worker 自己去讀取，這樣可以避免主進程讀取所有檔案到記憶體
-    # 此處選擇讓 worker 自己讀取
+    blob_file_path: str,
+    spool_dir: str,
     file_name_for_log_hint: str = "UnknownFileFromWorker" # 提示檔名
 ) -> Dict[str, Any]:
     """
     處理單個檔案的轉換邏輯。此函式將在 ProcessPoolExecutor 的一個獨立進程中執行。
 
+    worker 不開啟任何 DuckDB 連接：原始檔案直接從 blob store 以串流讀取，
+    清洗後的每個數據塊寫成 `spool_dir` 下的 Parquet 暫存檔，
+    由主進程 (唯一的寫入者) 在單一交易中載入到 processed_data.duckdb。
+
     Args:
         file_hash (str): 要處理的檔案的 SHA256 雜湊值。
+        blob_file_path (str): 原始檔案在 blob store 中的絕對路徑。
+        spool_dir (str): 存放清洗後數據塊暫存檔的目錄。
         file_name_for_log_hint (str): 檔案的原始名稱提示，用於日誌。
 
     Returns:
@@ -86,6 +125,7 @@ def process_single_file_worker(
             'fingerprint_hash': Optional[str]
             'target_table_name': Optional[str]
             'processed_row_count': Optional[int]
+            'spooled_chunk_paths': List[str] (依順序排列、待主進程載入的 Parquet 暫存檔)
             'error_message': Optional[str]
             'transformation_timestamp_epoch': float
     """
@@ -98,19 +138,21 @@ def process_single_file_worker(
         "fingerprint_hash": None,
         "target_table_name": None,
         "processed_row_count": 0,
+        "spooled_chunk_paths": [],
         "error_message": "Worker process initiated but did not complete.",
         "transformation_timestamp_epoch": time.time()
     }
 
+    file_stream = None
     try:
-        # 1. 從 raw_lake.db 讀取原始檔案內容
-        raw_content = db_manager.get_raw_file_content(file_hash)
-        if raw_content is None:
-            result["error_message"] = f"無法從 Raw Lake 讀取檔案內容 (Hash: {file_hash[:10]}...)"
+        # 1. 以串流方式開啟原始檔案 (大型檔案不會整個讀入 worker 記憶體)
+        try:
+            file_stream = open(blob_file_path, "rb")
+        except OSError as e:
+            result["error_message"] = f"無法從 Raw Lake 讀取檔案內容 (Hash: {file_hash[:10]}...): {e}"
             worker_logger.error(result["error_message"])
             return result
-
-        file_stream = io.BytesIO(raw_content)
+        file_size_bytes = os.fstat(file_stream.fileno()).st_size
 
         # 2. 計算格式指紋
         fingerprint = calculate_format_fingerprint(file_stream, file_name_for_log_hint)
@@ -122,7 +164,8 @@ def process_single_file_worker(
         result["fingerprint_hash"] = fingerprint
 
         # 3. 查詢格式指紋目錄獲取處理配方
-        format_catalog = get_format_catalog() # 每個進程會有自己的 config_loader 快取
+        # 優先使用 worker 初始化時取得的目錄；直接呼叫 (非進程池) 時退回 config_loader 的快取
+        format_catalog = _worker_format_catalog if _worker_format_catalog is not None else get_format_catalog()
         recipe = format_catalog.get(fingerprint)
 
         if recipe is None:
@@ -136,8 +179,11 @@ def process_single_file_worker(
                            f"配方: {recipe.get('description', 'N/A')}")
         result["target_table_name"] = recipe.get("target_table")
 
-        # 4. 解析數據 (Parser)
-        parser_config = recipe.get("parser_config", {})
+        # 4. 解析數據 (Parser)；大型檔案依大小自動改為分塊解析
+        parser_config = resolve_parser_config_for_size(recipe.get("parser_config", {}), file_size_bytes)
+        if parser_config.get("chunksize") is not None:
+            worker_logger.info(f"檔案 (Hash: {file_hash[:10]}..., {file_size_bytes} bytes) 以每塊 "
+                               f"{parser_config['chunksize']} 行分塊解析與清洗。")
         df_or_iterator = parse_file_stream_to_dataframe(file_stream, parser_config, file_name_for_log_hint)
 
         if df_or_iterator is None: # 解析失敗
@@ -145,7 +191,7 @@ def process_single_file_worker(
             worker_logger.error(result["error_message"])
             return result
 
-        # 5. 驗證必要欄位 & 清洗 (Cleaner) & 載入 (Loader)
+        # 5. 驗證必要欄位 & 清洗 (Cleaner) & 寫出暫存數據塊
         cleaner_function_name = recipe.get("cleaner_function")
         if not cleaner_function_name:
             result["error_message"] = f"配方中未指定有效的 cleaner_function (Hash: {file_hash[:10]}...)."
@@ -167,7 +213,7 @@ def process_single_file_worker(
 
         total_rows_processed_for_file = 0
 
-        # 處理分塊或單一 DataFrame
+        # 處理分塊或單一 DataFrame；每塊清洗後立即寫出，worker 記憶體中同時只有一個數據塊
         data_iterator = [df_or_iterator] if isinstance(df_or_iterator, pd.DataFrame) else df_or_iterator
 
         for i, chunk_df in enumerate(data_iterator):
@@ -199,30 +245,18 @@ def process_single_file_worker(
                 worker_logger.info(f"數據塊在清洗後為空 (Hash: {file_hash[:10]}...)，不載入此塊。")
                 continue
 
-            # 5c. 載入到 processed_data.duckdb
-            worker_logger.debug(f"將清洗後的數據塊載入到目標表 '{target_table}'...")
-            # 注意：db_manager.load_dataframe_to_processed_db 在多進程中使用時，
-            # 每個進程會創建自己的 DuckDB 連接。
-            # if_exists 策略應適用於多塊追加。第一塊可能是 'replace' 或 'append' (如果表已存在)，
-            # 後續塊應總是 'append'。這裡簡化，假設 load_dataframe_to_processed_db 內部能處理。
-            # 更穩健的做法是，如果分塊，主流程在所有塊處理完後，一次性寫入，或第一塊 'replace' 後續 'append'。
-            # 此處暫時讓每一塊都嘗試 'append' (假設表已由第一塊創建或已存在)。
-            # 如果是第一個 chunk，且配方建議 replace，則用 replace，否則用 append。
-            # 這需要 worker 知道自己是不是第一個 chunk，或 load_dataframe_to_processed_db 更智能。
-            # 簡化：總是使用 append，建表邏輯在 load_dataframe_to_processed_db 中處理。
-            if not db_manager.load_dataframe_to_processed_db(cleaned_chunk_df, target_table, if_exists="append"):
-                result["error_message"] = (f"將清洗後的數據塊載入到表 '{target_table}' 失敗 "
-                                           f"(Hash: {file_hash[:10]}...).")
-                worker_logger.error(result["error_message"])
-                return result # 中斷此檔案處理
-
+            # 5c. 寫出 Parquet 暫存檔，由主進程載入到 processed_data.duckdb
+            chunk_path = os.path.join(spool_dir, f"{file_hash}_{i:06d}.parquet")
+            cleaned_chunk_df.to_parquet(chunk_path, index=False)
+            result["spooled_chunk_paths"].append(chunk_path)
             total_rows_processed_for_file += len(cleaned_chunk_df)
 
-        # 如果所有塊都成功處理
+        # 所有數據塊都已清洗並寫出
         result["status"] = "TRANSFORMATION_SUCCESS"
         result["processed_row_count"] = total_rows_processed_for_file
         result["error_message"] = None # 清除預設的錯誤訊息
-        worker_logger.info(f"檔案 (Hash: {file_hash[:10]}...) 成功轉換並載入 {total_rows_processed_for_file} 行到 '{target_table}'。")
+        worker_logger.info(f"檔案 (Hash: {file_hash[:10]}...) 已清洗 {total_rows_processed_for_file} 行，"
+                           f"共 {len(result['spooled_chunk_paths'])} 個數據塊待載入到 '{target_table}'。")
 
     except Exception as e:
         # 捕獲所有其他未預期錯誤
@@ -230,6 +264,14 @@ def process_single_file_worker(
         worker_logger.error(error_msg, exc_info=True)
         result["status"] = "TRANSFORMATION_FAILED" # 確保狀態是失敗
         result["error_message"] = error_msg
+    finally:
+        if file_stream is not None:
+            file_stream.close()
+        if result["status"] != "TRANSFORMATION_SUCCESS":
+            # 失敗的檔案不留下任何部分數據
+            _discard_spooled_chunks(result["spooled_chunk_paths"])
+            result["spooled_chunk_paths"] = []
+            result["processed_row_count"] = 0
 
     result["transformation_timestamp_epoch"] = time.time() # 更新為實際完成時間
     return result
@@ -261,6 +303,10 @@ class TransformationPipeline:
         """
         執行完整的轉換管線流程。
 
+        worker 進程只負責解析與清洗 (不開啟 DuckDB 連接)；主進程是 processed_data.duckdb 的唯一寫入者，
+        每個檔案完成後在單一交易中載入其所有數據塊。同時提交的任務數有上限，
+        避免主進程載入速度跟不上時暫存檔無限累積。
+
         Returns:
             Tuple[int, int, int, int]:
                 (待處理檔案總數, 成功轉換檔案數, 轉換失敗檔案數, 被隔離檔案數)
@@ -284,59 +330,106 @@ class TransformationPipeline:
         failed_count = 0
         quarantined_count = 0
 
-        # 使用 ProcessPoolExecutor 進行平行處理
-        # 注意：DuckDB 連接在多進程中的處理。每個進程內的 db_manager 函式會創建自己的連接。
-        # 這對於讀取是安全的。對於寫入 processed_data.duckdb，如果多個進程同時寫入同一個表，
-        # DuckDB 本身支持並行寫入，但要注意事務和鎖的機制。
-        # 另一種策略是 worker 只返回處理好的 DataFrame，由主進程統一寫入，但這會增加主進程負擔和記憶體。
-        # 目前的 db_manager.load_dataframe_to_processed_db 每次都獲取連接，適合多進程。
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            # 為每個 file_hash 提交一個任務，同時傳遞原始檔名作為日誌提示
-            # 我們需要從 manifest 獲取原始檔名提示
+        # worker 直接從 blob store 讀取原始檔案：先把舊版存於 raw_content 的記錄搬出，再一次查出所有路徑
+        db_manager.migrate_raw_blobs_to_store()
+        blob_paths = db_manager.get_raw_blob_paths_batch(files_to_process_hashes) # 單一查詢
+        manifest_records = db_manager.get_manifest_records_batch(files_to_process_hashes) # 單一查詢
+        manifest_updates: List[Dict[str, Any]] = [] # 執行結束時一次批次寫入
+        blob_root = blob_store.get_blob_store_root()
+
+        tasks: List[Tuple[str, str, str]] = [] # (file_hash, blob_file_path, original_path_hint)
+        for file_hash_to_proc in files_to_process_hashes:
+            manifest_record = manifest_records.get(file_hash_to_proc)
+            original_path_hint = manifest_record.get("original_file_path", "N/A") if manifest_record else "N/A"
+            blob_path = blob_paths.get(file_hash_to_proc)
+            if blob_path is None:
+                failed_count += 1
+                error_message = f"無法從 Raw Lake 讀取檔案內容 (Hash: {file_hash_to_proc[:10]}...)"
+                logger.error(error_message)
+                manifest_updates.append({
+                    "file_hash": file_hash_to_proc,
+                    "status": "TRANSFORMATION_FAILED",
+                    "error_message": error_message,
+                    "transformation_timestamp_epoch": time.time(),
+                    "pipeline_execution_id": EXECUTION_ID
+                })
+                continue
+            tasks.append((file_hash_to_proc, str(blob_root / blob_path), original_path_hint))
+
+        # 格式目錄在主進程載入一次，經由 initializer 交給每個 worker 進程
+        format_catalog = get_format_catalog()
+        # 建立 worker 前釋放所有讀寫連線：轉換期間主進程不持有 raw lake 的連線，
+        # fork 出的 worker 也不會繼承任何 DuckDB 狀態；processed_data 連線在第一次載入時才重新開啟
+        db_manager.close_all_connections()
+        max_in_flight = max(1, self.max_workers or 1) * MAX_IN_FLIGHT_TASKS_PER_WORKER
+        completed = 0
+
+        with tempfile.TemporaryDirectory(prefix="transformation_spool_") as spool_dir, \
+                ProcessPoolExecutor(max_workers=self.max_workers,
+                                    initializer=_init_transformation_worker,
+                                    initargs=(format_catalog,)) as executor:
+            pending_tasks = iter(tasks)
             futures_map: Dict[Any, Tuple[str, str]] = {} # Future -> (file_hash, original_path_hint)
 
-            for file_hash_to_proc in files_to_process_hashes:
-                manifest_record = db_manager.get_manifest_record(file_hash_to_proc)
-                original_path_hint = manifest_record.get("original_file_path", "N/A") if manifest_record else "N/A"
-
-                future = executor.submit(process_single_file_worker, file_hash_to_proc, original_path_hint)
-                futures_map[future] = (file_hash_to_proc, original_path_hint)
-
-            for i, future_result in enumerate(as_completed(futures_map)):
-                file_hash_completed, path_hint_completed = futures_map[future_result]
-                logger.info(f"處理進度: {i+1}/{total_files} (檔案 Hash: {file_hash_completed[:10]}..., Path: {path_hint_completed})")
-                try:
-                    worker_output: Dict[str, Any] = future_result.result()
-
-                    # 更新 Manifest
-                    db_manager.update_manifest_record(
-                        file_hash=worker_output["file_hash"],
-                        status=worker_output["status"],
-                        fingerprint_hash=worker_output.get("fingerprint_hash"), # worker 可能未設定
-                        transformation_timestamp_epoch=worker_output["transformation_timestamp_epoch"],
-                        target_table_name=worker_output.get("target_table_name"),
-                        processed_row_count=worker_output.get("processed_row_count"),
-                        error_message=worker_output.get("error_message"),
-                        pipeline_execution_id=EXECUTION_ID # 主流程的 EXECUTION_ID
-                    )
-
-                    if worker_output["status"] == "TRANSFORMATION_SUCCESS":
-                        success_count += 1
-                    elif worker_output["status"] == "QUARANTINED":
-                        quarantined_count += 1
-                    else: # TRANSFORMATION_FAILED
+            def submit_next_task() -> None:
+                next_task = next(pending_tasks, None)
+                if next_task is not None:
+                    task_hash, blob_file_path, path_hint = next_task
+                    future = executor.submit(process_single_file_worker, task_hash, blob_file_path, spool_dir, path_hint)
+                    futures_map[future] = (task_hash, path_hint)
+
+            for _ in range(max_in_flight):
+                submit_next_task()
+
+            while futures_map:
+                done_futures, _ = wait(futures_map, return_when=FIRST_COMPLETED)
+                for future_result in done_futures:
+                    file_hash_completed, path_hint_completed = futures_map.pop(future_result)
+                    submit_next_task() # 維持固定數量的進行中任務
+                    completed += 1
+                    logger.info(f"處理進度: {completed}/{len(tasks)} (檔案 Hash: {file_hash_completed[:10]}..., Path: {path_hint_completed})")
+                    try:
+                        worker_output: Dict[str, Any] = future_result.result()
+
+                        if worker_output["status"] == "TRANSFORMATION_SUCCESS":
+                            load_error = self._load_spooled_chunks(worker_output)
+                            if load_error is not None:
+                                worker_output["status"] = "TRANSFORMATION_FAILED"
+                                worker_output["processed_row_count"] = 0
+                                worker_output["error_message"] = load_error
+
+                        # 收集 Manifest 更新，迴圈結束後批次寫入
+                        manifest_updates.append({
+                            "file_hash": worker_output["file_hash"],
+                            "status": worker_output["status"],
+                            "fingerprint_hash": worker_output.get("fingerprint_hash"), # worker 可能未設定
+                            "transformation_timestamp_epoch": worker_output["transformation_timestamp_epoch"],
+                            "target_table_name": worker_output.get("target_table_name"),
+                            "processed_row_count": worker_output.get("processed_row_count"),
+                            "error_message": worker_output.get("error_message"),
+                            "pipeline_execution_id": EXECUTION_ID # 主流程的 EXECUTION_ID
+                        })
+
+                        if worker_output["status"] == "TRANSFORMATION_SUCCESS":
+                            success_count += 1
+                        elif worker_output["status"] == "QUARANTINED":
+                            quarantined_count += 1
+                        else: # TRANSFORMATION_FAILED
+                            failed_count += 1
+
+                    except Exception as exc:
                         failed_count += 1
-
-                except Exception as exc:
-                    failed_count += 1
-                    logger.error(f"處理檔案 (Hash: {file_hash_completed[:10]}...) 的 worker 引發未捕獲的例外: {exc}", exc_info=True)
-                    db_manager.update_manifest_record(
-                        file_hash=file_hash_completed,
-                        status="TRANSFORMATION_FAILED",
-                        error_message=f"Worker process raised unhandled exception: {str(exc)[:500]}", # 限制錯誤訊息長度
-                        transformation_timestamp_epoch=time.time(),
-                        pipeline_execution_id=EXECUTION_ID
-                    )
+                        logger.error(f"處理檔案 (Hash: {file_hash_completed[:10]}...) 的 worker 引發未捕獲的例外: {exc}", exc_info=True)
+                        manifest_updates.append({
+                            "file_hash": file_hash_completed,
+                            "status": "TRANSFORMATION_FAILED",
+                            "error_message": f"Worker process raised unhandled exception: {str(exc)[:500]}", # 限制錯誤訊息長度
+                            "transformation_timestamp_epoch": time.time(),
+                            "pipeline_execution_id": EXECUTION_ID
+                        })
+
+        if not db_manager.upsert_manifest_records_batch(manifest_updates):
+            logger.error(f"批次更新 {len(manifest_updates)} 筆轉換結果到 Manifest 失敗。")
 
         duration = time.time() - start_time
         logger.info(f"轉換管線執行完畢 (耗時: {duration:.2f} 秒)。")
@@ -347,6 +440,45 @@ class TransformationPipeline:
 
         return total_files, success_count, failed_count, quarantined_count
 
+    @staticmethod
+    def _load_spooled_chunks(worker_output: Dict[str, Any]) -> Optional[str]:
+        """
+        在單一交易中將 worker 寫出的數據塊依序載入目標表，任何一塊失敗時整個檔案都不會留下部分數據。
+        每次只讀入一個數據塊，大型檔案的載入記憶體用量與分塊大小相當。暫存檔無論成功與否都會被刪除。
+
+        Returns:
+            Optional[str]: 成功時為 None；失敗時為錯誤訊息。
+        """
+        file_hash = worker_output["file_hash"]
+        target_table = worker_output["target_table_name"]
+        chunk_paths: List[str] = worker_output.get("spooled_chunk_paths", [])
+        processed_conn = None # 交易成功開始後才設定，finally 只回滾已開始的交易
+        load_committed = False
+        try:
+            conn = db_manager.get_processed_data_connection() # 主進程是唯一的寫入者
+            conn.begin()
+            processed_conn = conn
+            for chunk_path in chunk_paths:
+                chunk_df = pd.read_parquet(chunk_path)
+                if not db_manager.load_dataframe_to_processed_db(chunk_df, target_table,
+                                                                 conn=processed_conn, if_exists="append"):
+                    error_message = (f"將清洗後的數據塊載入到表 '{target_table}' 失敗 "
+                                     f"(Hash: {file_hash[:10]}...).")
+                    logger.error(error_message)
+                    return error_message
+            processed_conn.commit()
+            load_committed = True
+            logger.info(f"檔案 (Hash: {file_hash[:10]}...) 成功載入 {worker_output.get('processed_row_count')} 行到 '{target_table}'。")
+            return None
+        except Exception as e:
+            error_message = f"載入檔案 (Hash: {file_hash[:10]}...) 的數據塊時發生未預期錯誤: {e}"
+            logger.error(error_message, exc_info=True)
+            return error_message
+        finally:
+            if processed_conn is not None and not load_committed:
+                processed_conn.rollback()
+            _discard_spooled_chunks(chunk_paths)
+
 
 # --- 範例使用 ---
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+測試共用 fixtures。
+
+執行方式 (於 MyTaifexDataProject 目錄下)：`PYTHONPATH=src pytest tests`
+"""
+from pathlib import Path
+
+import pytest
+
+from taifex_pipeline.database import db_manager
+
+
+@pytest.fixture
+def isolated_project_root(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    將 db_manager 的專案根目錄指向暫存目錄，讓資料庫與 blob store 都建立在 `tmp_path/data` 下，
+    測試結束後關閉所有快取的連接。
+    """
+    db_manager.close_all_connections()
+    monkeypatch.setattr(db_manager, "_get_project_root", lambda: tmp_path)
+    yield tmp_path
+    db_manager.close_all_connections()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+import pytest
+
+from taifex_pipeline.database import blob_store
+
+
+def _sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_write_then_read_round_trip(tmp_path):
+    content = b"col_a,col_b\n1,2\n"
+    file_hash = _sha256(content)
+
+    relative_path = blob_store.write_blob(file_hash, content, root=tmp_path)
+
+    assert relative_path == f"{file_hash[:2]}/{file_hash}"
+    assert (tmp_path / relative_path).read_bytes() == content
+    assert blob_store.read_blob(relative_path, root=tmp_path) == content
+    with blob_store.open_blob(relative_path, root=tmp_path) as stream:
+        assert stream.read() == content
+
+
+def test_rewrite_is_idempotent(tmp_path):
+    content = b"same content"
+    file_hash = _sha256(content)
+    relative_path = blob_store.write_blob(file_hash, content, root=tmp_path)
+    mtime_ns = (tmp_path / relative_path).stat().st_mtime_ns
+
+    assert blob_store.write_blob(file_hash, content, root=tmp_path) == relative_path
+
+    assert (tmp_path / relative_path).stat().st_mtime_ns == mtime_ns  # 已存在的 blob 不會被重寫
+    assert [p.name for p in (tmp_path / file_hash[:2]).iterdir()] == [file_hash]  # 沒有殘留的暫存檔
+
+
+def test_empty_blob_and_missing_blob(tmp_path):
+    empty_hash = _sha256(b"")
+    relative_path = blob_store.write_blob(empty_hash, b"", root=tmp_path)
+
+    assert blob_store.read_blob(relative_path, root=tmp_path) == b""
+    assert blob_store.read_blob(f"ab/{'ab' * 32}", root=tmp_path) is None
+    assert blob_store.open_blob(f"ab/{'ab' * 32}", root=tmp_path) is None
+
+
+def test_stage_file_then_commit(tmp_path):
+    source = tmp_path / "source.csv"
+    content = b"x,y\n" + b"1,2\n" * 1000
+    source.write_bytes(content)
+    root = tmp_path / "blobs"
+
+    file_hash, size_bytes, staged_path = blob_store.stage_file(source, root=root)
+
+    assert (file_hash, size_bytes) == (_sha256(content), len(content))
+    assert staged_path.parent == root / blob_store.STAGING_SUBDIR
+    relative_path = blob_store.commit_staged_blob(file_hash, staged_path, root=root)
+    assert blob_store.read_blob(relative_path, root=root) == content
+    assert not staged_path.exists()
+
+    # 內容已存在時，再次暫存的檔案直接被丟棄
+    _, _, second_staged_path = blob_store.stage_file(source, root=root)
+    assert blob_store.commit_staged_blob(file_hash, second_staged_path, root=root) == relative_path
+    assert list((root / blob_store.STAGING_SUBDIR).iterdir()) == []
+
+
+def test_invalid_hash_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        blob_store.write_blob("../../etc/passwd", b"x", root=tmp_path)
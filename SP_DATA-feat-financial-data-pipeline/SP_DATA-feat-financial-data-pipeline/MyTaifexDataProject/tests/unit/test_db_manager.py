@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+from taifex_pipeline.database import blob_store, db_manager
+
+
+def _sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_store_raw_file_round_trip(isolated_project_root):
+    db_manager.initialize_databases()
+    content = b"a,b\n1,2\n"
+    file_hash = _sha256(content)
+
+    assert db_manager.store_raw_file(file_hash, content)
+    assert db_manager.store_raw_file(file_hash, content)  # 重複寫入不會出錯
+
+    assert db_manager.get_raw_file_content(file_hash) == content
+    row = db_manager.get_raw_lake_connection().execute(
+        f"SELECT blob_path, size_bytes, octet_length(raw_content) FROM {db_manager.RAW_FILES_TABLE} WHERE file_hash = ?",
+        (file_hash,)
+    ).fetchone()
+    assert row == (f"{file_hash[:2]}/{file_hash}", len(content), 0)
+
+
+def test_migrate_raw_blobs_to_store_leaves_empty_placeholders(isolated_project_root):
+    db_manager.initialize_databases()
+    conn = db_manager.get_raw_lake_connection()
+    legacy_contents = [b"legacy one", b"legacy two", b"legacy three"]
+    for content in legacy_contents:
+        conn.execute(
+            f"INSERT INTO {db_manager.RAW_FILES_TABLE} (file_hash, raw_content) VALUES (?, ?)",
+            (_sha256(content), content)
+        )
+
+    # 舊記錄在遷移前仍可直接從 raw_content 讀取
+    assert db_manager.get_raw_file_content(_sha256(b"legacy one")) == b"legacy one"
+
+    assert db_manager.migrate_raw_blobs_to_store(batch_size=2, conn=conn) == 3
+    assert db_manager.migrate_raw_blobs_to_store(batch_size=2, conn=conn) == 0  # 可安全重複執行
+
+    rows = conn.execute(
+        f"SELECT file_hash, blob_path, size_bytes, octet_length(raw_content) FROM {db_manager.RAW_FILES_TABLE}"
+    ).fetchall()
+    assert sorted(rows) == sorted(
+        (_sha256(content), f"{_sha256(content)[:2]}/{_sha256(content)}", len(content), 0) for content in legacy_contents
+    )
+    for content in legacy_contents:
+        assert blob_store.get_blob_path(_sha256(content)).read_bytes() == content
+        assert db_manager.get_raw_file_content(_sha256(content)) == content
+
+
+def _store_raw_files(*contents: bytes) -> list:
+    hashes = []
+    for content in contents:
+        assert db_manager.store_raw_file(_sha256(content), content)
+        hashes.append(_sha256(content))
+    return hashes
+
+
+def test_manifest_batch_upsert_mixes_new_and_existing_records(isolated_project_root):
+    db_manager.initialize_databases()
+    existing_hash, new_hash, other_hash = _store_raw_files(b"existing", b"new", b"other")
+    assert db_manager.update_manifest_record(
+        existing_hash, original_file_path="in/existing.csv", status="TRANSFORMATION_FAILED",
+        fingerprint_hash="fp-old", error_message="bad header", ingestion_timestamp_epoch=1_700_000_000.0
+    )
+
+    assert db_manager.upsert_manifest_records_batch([
+        # 重新汲取：明確給出的 None 會清除舊的轉換欄位，未給出的欄位保持原值
+        {"file_hash": existing_hash, "status": "RAW_INGESTED", "fingerprint_hash": None, "error_message": None},
+        {"file_hash": new_hash, "original_file_path": "in/new.csv", "status": "RAW_INGESTED",
+         "ingestion_timestamp_epoch": 1_700_000_100.0},
+        {"file_hash": other_hash, "original_file_path": "in/other.csv", "status": "RAW_INGESTED",
+         "ingestion_timestamp_epoch": 1_700_000_200.0},
+        # 同一雜湊值出現多次時以最後一筆為準
+        {"file_hash": other_hash, "original_file_path": "in/other.csv", "status": "QUARANTINED",
+         "ingestion_timestamp_epoch": 1_700_000_300.0},
+    ])
+
+    records = db_manager.get_manifest_records_batch([existing_hash, new_hash, other_hash, _sha256(b"unknown")])
+    assert set(records) == {existing_hash, new_hash, other_hash}
+    existing = records[existing_hash]
+    assert (existing["status"], existing["fingerprint_hash"], existing["error_message"]) == ("RAW_INGESTED", None, None)
+    assert existing["original_file_path"] == "in/existing.csv"
+    assert existing["ingestion_timestamp"] == db_manager.get_manifest_record(existing_hash)["ingestion_timestamp"]
+    assert records[new_hash]["original_file_path"] == "in/new.csv"
+    assert records[other_hash]["status"] == "QUARANTINED"
+    assert {records[h]["status"] for h in records} == {"RAW_INGESTED", "QUARANTINED"}
+
+
+def test_manifest_batch_upsert_groups_transformation_results(isolated_project_root):
+    db_manager.initialize_databases()
+    ok_hash, failed_hash = _store_raw_files(b"ok", b"failed")
+    db_manager.upsert_manifest_records_batch([
+        {"file_hash": h, "original_file_path": f"in/{h[:6]}.csv", "status": "RAW_INGESTED"} for h in (ok_hash, failed_hash)
+    ])
+
+    assert db_manager.upsert_manifest_records_batch([
+        {"file_hash": ok_hash, "status": "TRANSFORMATION_SUCCESS", "fingerprint_hash": "fp",
+         "target_table_name": "daily_ohlc", "processed_row_count": 42, "transformation_timestamp_epoch": 1_700_000_000.0},
+        {"file_hash": failed_hash, "status": "TRANSFORMATION_FAILED", "error_message": "parse error",
+         "transformation_timestamp_epoch": 1_700_000_000.0},
+    ])
+
+    assert db_manager.get_files_by_status("TRANSFORMATION_SUCCESS") == [ok_hash]
+    assert db_manager.get_files_by_status("TRANSFORMATION_FAILED") == [failed_hash]
+    ok_record = db_manager.get_manifest_record(ok_hash)
+    assert (ok_record["target_table_name"], ok_record["processed_row_count"]) == ("daily_ohlc", 42)
+    assert db_manager.get_manifest_record(failed_hash)["original_file_path"] == f"in/{failed_hash[:6]}.csv"
+
+
+def test_manifest_batch_upsert_rolls_back_on_error(isolated_project_root):
+    db_manager.initialize_databases()
+    (known_hash,) = _store_raw_files(b"known")
+    orphan_hash = _sha256(b"not in raw_files")
+
+    # 第二組記錄違反 raw_files 外鍵，整個批次 (含第一組) 都應回滾
+    assert not db_manager.upsert_manifest_records_batch([
+        {"file_hash": known_hash, "status": "RAW_INGESTED"},
+        {"file_hash": orphan_hash, "original_file_path": "in/orphan.csv", "status": "RAW_INGESTED"},
+    ])
+
+    assert db_manager.get_manifest_records_batch([known_hash, orphan_hash]) == {}
+    # 回滾後連接仍可正常使用
+    assert db_manager.upsert_manifest_records_batch([{"file_hash": known_hash, "status": "RAW_INGESTED"}])
+    assert db_manager.get_manifest_record(known_hash)["status"] == "RAW_INGESTED"
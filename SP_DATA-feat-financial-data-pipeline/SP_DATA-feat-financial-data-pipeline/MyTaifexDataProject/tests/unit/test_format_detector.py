@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import codecs
+import io
+
+from taifex_pipeline.transformation import format_detector
+from taifex_pipeline.transformation.format_detector import find_header_row
+
+HEADER_TEXT = "交易日期,契約,成交價格,成交數量\n"
+EXPECTED_FIELDS = sorted(["交易日期", "契約", "成交價格", "成交數量"])
+
+
+def test_utf8_bom_prefix_is_detected_and_stripped():
+    content = codecs.BOM_UTF8 + (HEADER_TEXT + "20230101,TX,14000,10\n").encode("utf-8")
+
+    encoding, text = format_detector._decode_header_zone(content)
+
+    assert encoding == "utf-8-sig"
+    assert text.startswith("交易日期")
+    assert find_header_row(io.BytesIO(content), "bom.csv") == (EXPECTED_FIELDS, 0)
+
+
+def test_plain_utf8_prefix():
+    content = ("說明文字\n" + HEADER_TEXT + "20230101,TX,14000,10\n").encode("utf-8")
+
+    assert format_detector._decode_header_zone(content)[0] == "utf-8"
+    assert find_header_row(io.BytesIO(content), "utf8.csv") == (EXPECTED_FIELDS, 1)
+
+
+def test_big5_prefix_is_decoded_as_ms950():
+    content = (HEADER_TEXT + "20230101,TX,14000,10\n").encode("ms950")
+
+    assert format_detector._decode_header_zone(content)[0] == "ms950"
+    assert find_header_row(io.BytesIO(content), "big5.csv") == (EXPECTED_FIELDS, 0)
+
+
+def test_prefix_cut_inside_multibyte_character(monkeypatch):
+    # 單一長行沒有換行可供截斷，前綴在雙位元組字元中間被切斷
+    content = ("交易日期,契約,成交價格,成交數量" * 50).encode("ms950")
+    cut = len("交易日期,契約,".encode("ms950")) + 1
+    assert content[cut - 1] >= 0x81  # 確認切在前導位元組之後
+    monkeypatch.setattr(format_detector, "HEADER_SNIFF_MAX_BYTES", cut)
+
+    encoding, text = format_detector._decode_header_zone(content[:cut])
+    assert encoding == "ms950"
+    assert text == "交易日期,契約,"
+
+    fields, header_line = find_header_row(io.BytesIO(content), "truncated.csv")
+    assert header_line == 0
+    assert fields == sorted(["交易日期", "契約"])
+
+
+def test_header_zone_stops_after_candidate_lines():
+    content = b"a,b\n" * (format_detector.MAX_HEADER_CANDIDATE_LINES + 5)
+
+    zone = format_detector._header_candidate_zone(content)
+
+    assert zone == b"a,b\n" * format_detector.MAX_HEADER_CANDIDATE_LINES
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+from taifex_pipeline.core import utils
+from taifex_pipeline.database import blob_store, db_manager
+from taifex_pipeline.ingestion.pipeline import IngestionPipeline
+
+
+def _staging_files(project_root):
+    staging_dir = project_root / "data" / "01_raw_lake" / blob_store.BLOB_STORE_SUBDIR / blob_store.STAGING_SUBDIR
+    return list(staging_dir.iterdir()) if staging_dir.exists() else []
+
+
+def _count_source_reads(monkeypatch, source_dir):
+    """記錄 `copy_file_with_sha256` 對來源目錄下檔案的每一次 open()。"""
+    reads = []
+
+    def counting_open(path, *args, **kwargs):
+        if str(path).startswith(str(source_dir)):
+            reads.append(os.path.basename(path))
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(utils, "open", counting_open, raising=False)
+    return reads
+
+
+def test_run_reads_each_new_file_once(isolated_project_root, monkeypatch):
+    source_dir = isolated_project_root / "input"
+    source_dir.mkdir()
+    (source_dir / "a.csv").write_bytes(b"a,b\n1,2\n")
+    (source_dir / "b.csv").write_bytes(b"a,b\n3,4\n")
+    (source_dir / "b_copy.csv").write_bytes(b"a,b\n3,4\n")  # 與 b.csv 內容相同
+    reads = _count_source_reads(monkeypatch, source_dir)
+
+    pipeline = IngestionPipeline(source_directories=[source_dir])
+    assert pipeline.run() == (2, 3)
+    assert sorted(reads) == ["a.csv", "b.csv", "b_copy.csv"]
+
+    b_hash = hashlib.sha256(b"a,b\n3,4\n").hexdigest()
+    assert db_manager.get_manifest_record(b_hash)["status"] == "RAW_INGESTED"
+    assert db_manager.get_raw_file_content(b_hash) == b"a,b\n3,4\n"
+    assert _staging_files(isolated_project_root) == []
+
+    # 第二次執行：大小與修改時間未變的已汲取檔案完全不讀取，只有新檔案被讀取一次
+    ingested_paths = {db_manager.get_manifest_record(b_hash)["original_file_path"]}
+    reads.clear()
+    (source_dir / "c.csv").write_bytes(b"a,b\n5,6\n")
+
+    assert IngestionPipeline(source_directories=[source_dir]).run() == (1, 4)
+    # 重複內容中未被記錄的那個路徑不在 manifest 中，所以仍需重新讀取比對雜湊值
+    unrecorded_duplicate = ({"b.csv", "b_copy.csv"} - {os.path.basename(p) for p in ingested_paths}).pop()
+    assert sorted(reads) == sorted([unrecorded_duplicate, "c.csv"])
+    assert _staging_files(isolated_project_root) == []
+
+
+def test_touched_file_is_read_once_then_skipped(isolated_project_root, monkeypatch):
+    source_dir = isolated_project_root / "input"
+    source_dir.mkdir()
+    data_file = source_dir / "a.csv"
+    data_file.write_bytes(b"a,b\n1,2\n")
+    assert IngestionPipeline(source_directories=[source_dir]).run() == (1, 1)
+    reads = _count_source_reads(monkeypatch, source_dir)
+
+    # 只更新修改時間：讀取一次確認內容未變並補記新的修改時間，之後不再讀取
+    stat_info = data_file.stat()
+    os.utime(data_file, ns=(stat_info.st_atime_ns, stat_info.st_mtime_ns + 10**9))
+    assert IngestionPipeline(source_directories=[source_dir]).run() == (0, 1)
+    assert reads == ["a.csv"]
+    assert _staging_files(isolated_project_root) == []
+
+    reads.clear()
+    assert IngestionPipeline(source_directories=[source_dir]).run() == (0, 1)
+    assert reads == []
+
+
+def test_file_changed_while_copying_is_not_ingested(isolated_project_root, monkeypatch):
+    source_dir = isolated_project_root / "input"
+    source_dir.mkdir()
+    data_file = source_dir / "a.csv"
+    data_file.write_bytes(b"a,b\n1,2\n")
+    original_stage_file = blob_store.stage_file
+
+    def stage_then_modify(path, *args):
+        staged = original_stage_file(path, *args)
+        data_file.write_bytes(b"a,b\n9,9,9\n")  # 在複製期間被修改
+        return staged
+
+    monkeypatch.setattr(blob_store, "stage_file", stage_then_modify)
+
+    assert IngestionPipeline(source_directories=[source_dir]).run() == (0, 1)
+    assert db_manager.get_manifest_record(hashlib.sha256(b"a,b\n1,2\n").hexdigest()) is None
+    assert _staging_files(isolated_project_root) == []
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import io
+
+import pandas as pd
+
+from taifex_pipeline.transformation import parsers
+from taifex_pipeline.transformation.parsers import (
+    CHUNKED_PARSE_THRESHOLD_BYTES, DEFAULT_CHUNK_ROWS, parse_file_stream_to_dataframe,
+    resolve_parser_config_for_size
+)
+
+
+def test_small_file_keeps_parser_config():
+    config = {"sep": ",", "header": 0}
+    assert resolve_parser_config_for_size(config, CHUNKED_PARSE_THRESHOLD_BYTES - 1) == config
+
+
+def test_large_file_gets_default_chunksize_without_mutating_recipe():
+    config = {"sep": ","}
+    resolved = resolve_parser_config_for_size(config, CHUNKED_PARSE_THRESHOLD_BYTES)
+    assert resolved == {"sep": ",", "chunksize": DEFAULT_CHUNK_ROWS}
+    assert "chunksize" not in config  # 配方本身不應被修改
+
+
+def test_recipe_chunksize_is_kept():
+    config = {"sep": ",", "chunksize": 10}
+    assert resolve_parser_config_for_size(config, CHUNKED_PARSE_THRESHOLD_BYTES * 4)["chunksize"] == 10
+    assert resolve_parser_config_for_size(config, 1)["chunksize"] == 10
+
+
+def test_chunked_parse_yields_all_rows(monkeypatch):
+    monkeypatch.setattr(parsers, "CHUNKED_PARSE_THRESHOLD_BYTES", 1)
+    monkeypatch.setattr(parsers, "DEFAULT_CHUNK_ROWS", 2)
+    content = b"col_x,col_y\nA,1\nB,2\nC,3\nD,4\nE,5\n"
+    config = resolve_parser_config_for_size({"sep": ",", "header": 0, "encoding": "utf-8"}, len(content))
+
+    chunks = list(parse_file_stream_to_dataframe(io.BytesIO(content), config, "chunked.csv"))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert pd.concat(chunks)["col_x"].tolist() == ["A", "B", "C", "D", "E"]
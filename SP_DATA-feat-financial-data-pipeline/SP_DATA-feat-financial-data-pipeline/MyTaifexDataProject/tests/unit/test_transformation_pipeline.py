@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import importlib
+import io
+import os
+import time
+
+import pytest
+
+from taifex_pipeline.database import db_manager
+from taifex_pipeline.transformation import parsers
+from taifex_pipeline.transformation import pipeline as transformation_pipeline
+from taifex_pipeline.transformation.cleaners import example_cleaners
+from taifex_pipeline.transformation.format_detector import calculate_format_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def reset_worker_caches(monkeypatch):
+    """每個測試使用空的清洗函式快取與未初始化的 worker 目錄。"""
+    monkeypatch.setattr(transformation_pipeline, "_cleaner_function_cache", {})
+    monkeypatch.setattr(transformation_pipeline, "_worker_format_catalog", None)
+
+
+def test_get_cleaner_function_imports_each_name_once(monkeypatch):
+    import_calls = []
+    original_import_module = importlib.import_module
+
+    def counting_import_module(name, *args, **kwargs):
+        import_calls.append(name)
+        return original_import_module(name, *args, **kwargs)
+
+    monkeypatch.setattr(transformation_pipeline.importlib, "import_module", counting_import_module)
+
+    for _ in range(3):
+        cleaner = transformation_pipeline.get_cleaner_function("example_cleaners.clean_daily_ohlcv_example_v1")
+        assert cleaner is example_cleaners.clean_daily_ohlcv_example_v1
+        assert transformation_pipeline.get_cleaner_function("example_cleaners.no_such_cleaner") is None
+
+    assert import_calls == ["taifex_pipeline.transformation.cleaners.example_cleaners"] * 2
+
+
+def test_worker_uses_catalog_from_initializer(tmp_path, monkeypatch):
+    def fail_if_called():
+        raise AssertionError("worker 不應在每個檔案重新讀取 format_catalog")
+
+    monkeypatch.setattr(transformation_pipeline, "get_format_catalog", fail_if_called)
+    raw_file = tmp_path / "unknown.csv"
+    raw_file.write_bytes(b"col_a,col_b\n1,2\n")
+    transformation_pipeline._init_transformation_worker({})
+
+    result = transformation_pipeline.process_single_file_worker("f" * 64, str(raw_file), str(tmp_path), "unknown.csv")
+    assert result["status"] == "QUARANTINED"
+    assert "找不到指紋" in result["error_message"]
+
+
+def _ingest_raw_file(content: bytes, original_path: str) -> str:
+    file_hash = hashlib.sha256(content).hexdigest()
+    assert db_manager.store_raw_file(file_hash, content)
+    db_manager.update_manifest_record(file_hash, original_path, "RAW_INGESTED", ingestion_timestamp_epoch=time.time())
+    return file_hash
+
+
+def _catalog_for(content: bytes, target_table: str) -> dict:
+    fingerprint = calculate_format_fingerprint(io.BytesIO(content), "catalog.csv")
+    return {fingerprint: {
+        "description": "測試格式",
+        "target_table": target_table,
+        "parser_config": {"sep": ",", "header": 0, "encoding": "utf-8"},
+        "cleaner_function": "example_cleaners.another_cleaner_example",
+        "required_columns": ["col_x", "col_y", "col_z"],
+    }}
+
+
+def test_run_loads_worker_output_through_single_writer(isolated_project_root, monkeypatch):
+    db_manager.initialize_databases()
+    good_content = b"col_x,col_y,col_z\nA,1,2\nB,3,4\n"
+    good_hash = _ingest_raw_file(good_content, "/test/good.csv")
+    unknown_hash = _ingest_raw_file(b"other_a,other_b,other_c\n1,2,3\n", "/test/unknown.csv")
+    monkeypatch.setattr(transformation_pipeline, "get_format_catalog",
+                        lambda: _catalog_for(good_content, "fact_test_rows"))
+
+    parent_pid = os.getpid()
+    original_get_db_connection = db_manager.get_db_connection
+
+    def parent_only_connection(*args, **kwargs):
+        if os.getpid() != parent_pid:
+            raise AssertionError("worker 不應開啟 DuckDB 連接")
+        return original_get_db_connection(*args, **kwargs)
+
+    # worker 由 fork 建立，會繼承這些替換：任何 worker 端的資料庫存取都會讓檔案失敗
+    monkeypatch.setattr(db_manager, "get_db_connection", parent_only_connection)
+    monkeypatch.setattr(db_manager, "load_dataframe_to_processed_db",
+                        _only_in_process(os.getpid(), db_manager.load_dataframe_to_processed_db))
+
+    assert transformation_pipeline.TransformationPipeline(max_workers=1).run() == (2, 1, 0, 1)
+
+    good_record = db_manager.get_manifest_record(good_hash)
+    assert good_record["status"] == "TRANSFORMATION_SUCCESS"
+    assert good_record["processed_row_count"] == 2
+    assert db_manager.get_manifest_record(unknown_hash)["status"] == "QUARANTINED"
+    rows = db_manager.get_processed_data_connection().execute(
+        "SELECT col_x, col_y FROM fact_test_rows ORDER BY col_x").fetchall()
+    assert rows == [("A", 1), ("B", 3)]
+
+
+def test_run_rolls_back_file_when_load_fails(isolated_project_root, monkeypatch):
+    db_manager.initialize_databases()
+    content = b"col_x,col_y,col_z\nA,1,2\n"
+    file_hash = _ingest_raw_file(content, "/test/bad_table.csv")
+    monkeypatch.setattr(transformation_pipeline, "get_format_catalog",
+                        lambda: _catalog_for(content, "fact_incompatible"))
+    # 目標表欄位數不同，載入必定失敗
+    db_manager.get_processed_data_connection().execute("CREATE TABLE fact_incompatible (only_col INTEGER)")
+
+    assert transformation_pipeline.TransformationPipeline(max_workers=1).run() == (1, 0, 1, 0)
+
+    record = db_manager.get_manifest_record(file_hash)
+    assert record["status"] == "TRANSFORMATION_FAILED"
+    assert "fact_incompatible" in record["error_message"]
+    assert db_manager.get_processed_data_connection().execute(
+        "SELECT COUNT(*) FROM fact_incompatible").fetchone()[0] == 0
+
+
+def test_chunked_file_is_spooled_per_chunk_and_loaded_in_one_transaction(isolated_project_root, monkeypatch):
+    monkeypatch.setattr(parsers, "CHUNKED_PARSE_THRESHOLD_BYTES", 1)
+    monkeypatch.setattr(parsers, "DEFAULT_CHUNK_ROWS", 2)
+    content = b"col_x,col_y,col_z\nA,1,2\nB,3,4\nC,5,6\nD,7,8\nE,9,10\n"
+    raw_file = isolated_project_root / "chunked.csv"
+    raw_file.write_bytes(content)
+    spool_dir = isolated_project_root / "spool"
+    spool_dir.mkdir()
+    transformation_pipeline._init_transformation_worker(_catalog_for(content, "fact_chunked"))
+
+    result = transformation_pipeline.process_single_file_worker("c" * 64, str(raw_file), str(spool_dir), "chunked.csv")
+
+    assert result["status"] == "TRANSFORMATION_SUCCESS"
+    assert result["processed_row_count"] == 5
+    assert len(result["spooled_chunk_paths"]) == 3  # 每個數據塊一個暫存檔
+
+    db_manager.initialize_databases()
+    assert transformation_pipeline.TransformationPipeline._load_spooled_chunks(result) is None
+    assert list(spool_dir.iterdir()) == []
+    rows = db_manager.get_processed_data_connection().execute(
+        "SELECT col_x FROM fact_chunked ORDER BY col_x").fetchall()
+    assert [row[0] for row in rows] == ["A", "B", "C", "D", "E"]
+
+
+def test_chunked_file_failing_midway_leaves_no_spooled_chunks(isolated_project_root, monkeypatch):
+    monkeypatch.setattr(parsers, "CHUNKED_PARSE_THRESHOLD_BYTES", 1)
+    monkeypatch.setattr(parsers, "DEFAULT_CHUNK_ROWS", 2)
+    content = b"col_x,col_y,col_z\nA,1,2\nB,3,4\nC,5,6\n"
+    raw_file = isolated_project_root / "chunked.csv"
+    raw_file.write_bytes(content)
+    spool_dir = isolated_project_root / "spool"
+    spool_dir.mkdir()
+    catalog = _catalog_for(content, "fact_chunked")
+    next(iter(catalog.values()))["cleaner_function"] = "example_cleaners.fails_on_second_chunk"
+    transformation_pipeline._init_transformation_worker(catalog)
+
+    calls = []
+
+    def fails_on_second_chunk(df):
+        calls.append(len(df))
+        if len(calls) == 2:
+            raise ValueError("第二個數據塊清洗失敗")
+        return df
+
+    transformation_pipeline._cleaner_function_cache["example_cleaners.fails_on_second_chunk"] = fails_on_second_chunk
+
+    result = transformation_pipeline.process_single_file_worker("d" * 64, str(raw_file), str(spool_dir), "chunked.csv")
+
+    assert result["status"] == "TRANSFORMATION_FAILED"
+    assert result["spooled_chunk_paths"] == []
+    assert result["processed_row_count"] == 0
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_run_releases_connections_before_starting_workers(isolated_project_root, monkeypatch):
+    db_manager.initialize_databases()
+    content = b"col_x,col_y,col_z\nA,1,2\n"
+    _ingest_raw_file(content, "/test/good.csv")
+    monkeypatch.setattr(transformation_pipeline, "get_format_catalog",
+                        lambda: _catalog_for(content, "fact_test_rows"))
+
+    open_connections_at_pool_start = []
+    original_executor = transformation_pipeline.ProcessPoolExecutor
+
+    def recording_executor(*args, **kwargs):
+        open_connections_at_pool_start.append(dict(db_manager._connections))
+        return original_executor(*args, **kwargs)
+
+    monkeypatch.setattr(transformation_pipeline, "ProcessPoolExecutor", recording_executor)
+
+    assert transformation_pipeline.TransformationPipeline(max_workers=1).run() == (1, 1, 0, 0)
+    assert open_connections_at_pool_start == [{}]
+
+
+def _only_in_process(expected_pid, func):
+    def wrapper(*args, **kwargs):
+        if os.getpid() != expected_pid:
+            raise AssertionError("只有主進程可以寫入 processed_data.duckdb")
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+
+from taifex_pipeline.core.utils import calculate_file_sha256, copy_file_with_sha256
+
+
+def test_copy_file_with_sha256_copies_and_hashes_in_one_pass(tmp_path):
+    content = b"0123456789" * 1000 + b"tail"
+    source = tmp_path / "source.bin"
+    source.write_bytes(content)
+    destination = io.BytesIO()
+
+    file_hash, size_bytes = copy_file_with_sha256(source, destination, chunk_size=4096)  # 多個區塊 + 不足一塊的結尾
+
+    assert destination.getvalue() == content
+    assert size_bytes == len(content)
+    assert file_hash == hashlib.sha256(content).hexdigest() == calculate_file_sha256(source)
+
+
+def test_copy_file_with_sha256_handles_empty_file(tmp_path):
+    source = tmp_path / "empty.bin"
+    source.write_bytes(b"")
+    destination = io.BytesIO()
+
+    assert copy_file_with_sha256(source, destination) == (hashlib.sha256(b"").hexdigest(), 0)
+    assert destination.getvalue() == b""
@@ -17,12 +17,20 @@ MANIFEST_DB_PATH = os.path.join(DATABASE_DIR, "manifest.db")
 RAW_LAKE_DB_PATH = os.path.join(DATABASE_DIR, "raw_lake.db")
 CURATED_MART_DB_PATH = os.path.join(DATABASE_DIR, "curated_mart.db")
 
+# --- Raw Blob Store ---
+# Content-addressed file store for raw files, laid out as <sha256[:2]>/<sha256>
+RAW_BLOB_STORE_DIR = os.path.join(DATABASE_DIR, "raw_blobs")
+
 # --- Logging Configuration ---
 LOG_FILE_NAME_FORMAT = "pipeline_run_{timestamp}.log" # timestamp will be dynamically generated
 LOG_LEVEL = "INFO" # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
 
 # --- File Processing ---
-CHUNK_SIZE_BYTES = 8192 # For reading files in chunks for hashing
+CHUNK_SIZE_BYTES = 1024 * 1024 # For reading files in chunks for hashing and copying (1 MiB)
+INGEST_BATCH_SIZE = 500 # Stage 1: files registered in manifest.db per transaction
+CURATION_BATCH_SIZE = 200 # Stage 3: manifest records claimed and finalized per transaction
+CURATION_MAX_WORKERS = max(1, min(8, os.cpu_count() or 1)) # Stage 3: threads running content processors
+TYPE_INFERENCE_SAMPLE_ROWS = 1000 # Stage 3: rows sampled per CSV/Excel column to infer its type
 
 # --- API (Placeholder if needed in future) ---
 # API_ENDPOINT_EXAMPLE = "https://api.example.com/data"
@@ -32,6 +40,7 @@ CHUNK_SIZE_BYTES = 8192 # For reading files in chunks for hashing
 # This is a side effect, but useful for a self-contained config.
 # Alternatively, this can be handled by the main application logic.
 os.makedirs(DATABASE_DIR, exist_ok=True)
+os.makedirs(RAW_BLOB_STORE_DIR, exist_ok=True)
 os.makedirs(INPUT_DATA_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -44,3 +53,4 @@ if __name__ == '__main__':
     print(f"Manifest DB Path: {MANIFEST_DB_PATH}")
     print(f"Raw Lake DB Path: {RAW_LAKE_DB_PATH}")
     print(f"Curated Mart DB Path: {CURATED_MART_DB_PATH}")
+    print(f"Raw Blob Store Directory: {RAW_BLOB_STORE_DIR}")
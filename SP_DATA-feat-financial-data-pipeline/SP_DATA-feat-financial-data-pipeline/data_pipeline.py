@@ -1,13 +1,22 @@
 # data_pipeline.py
 
+import io
 import os
 import hashlib
+import mmap
+import shutil
+import tempfile
+import threading
+import uuid
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import duckdb
 import logging
 import json
 from datetime import datetime
 import magic # python-magic
 import pandas as pd # For CSV/Excel processing and curated mart interaction
+import pyarrow as pa # Typed tables handed from the CSV/Excel processor to DuckDB
 # from PIL import Image # For image processing, if needed later
 
 # Import configuration
@@ -93,12 +102,9 @@ def init_curated_mart_db(conn):
             -- id INTEGER PRIMARY KEY, -- Removed to let DuckDB handle rowid implicitly if needed, and simplify pandas to_sql
             file_hash TEXT,
             original_source_identifier TEXT,
-            processed_timestamp TIMESTAMP,
-            -- Add columns specific to your curated data from CSVs
-            -- For sample1.csv, we expect col_a, col_b, col_c
-            col_a TEXT,
-            col_b TEXT,
-            col_c TEXT
+            processed_timestamp TIMESTAMP
+            -- Data columns (e.g. col_a, col_b, col_c for sample1.csv) are added by the CSV/Excel
+            -- processor with the types inferred from the file; see ensure_table_columns.
             -- Removed FOREIGN KEY (file_hash) REFERENCES files_master(file_hash)
         );
     """)
@@ -154,18 +160,169 @@ def calculate_sha256(filepath):
         logger.error(f"Error calculating SHA256 for {filepath}: {e}")
         return None
 
-def get_file_metadata(filepath):
-    """Extracts basic metadata from a file."""
+# --- Raw Blob Store ---
+# Raw files live in a content-addressed store on disk instead of BLOB columns.
+# files_master.raw_storage_path points at them as "blob:<sha256[:2]>/<sha256>".
+BLOB_STORAGE_PREFIX = "blob:"
+LEGACY_BLOB_TABLE_PREFIX = "table:raw_file_blobs"
+
+def blob_relative_path(file_hash):
+    """Returns the store-relative path of a blob: <sha256[:2]>/<sha256>."""
+    return f"{file_hash[:2]}/{file_hash}"
+
+def _fsync_directory(directory):
+    """Persists a rename inside directory (not supported on Windows)."""
+    if os.name == "nt":
+        return
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def store_raw_blob(file_hash, source):
+    """
+    Atomically stores raw content in the blob store and returns its raw_storage_path.
+    `source` is either bytes or a path to copy from. Content is written to a temp file
+    in the target directory, fsynced, then renamed into place; existing blobs are kept.
+    """
+    relative_path = blob_relative_path(file_hash)
+    target_path = os.path.join(config.RAW_BLOB_STORE_DIR, relative_path)
+    if os.path.exists(target_path):
+        logger.debug(f"Blob {file_hash[:8]}... already in store, skipping write.")
+        return BLOB_STORAGE_PREFIX + relative_path
+
+    target_dir = os.path.dirname(target_path)
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{file_hash[:8]}.", suffix=".tmp", dir=target_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                tmp_file.write(source)
+            else:
+                with open(source, "rb") as src_file:
+                    shutil.copyfileobj(src_file, tmp_file, config.CHUNK_SIZE_BYTES)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, target_path)
+        _fsync_directory(target_dir)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return BLOB_STORAGE_PREFIX + relative_path
+
+def stage_raw_blob(filepath):
+    """
+    Copies a file into the blob store's staging directory while hashing it, so the
+    source is read from disk only once. Returns (file_hash, staged_path); the staged
+    file is fsynced and must be passed to commit_staged_blob or discard_staged_blob.
+    """
+    staging_dir = os.path.join(config.RAW_BLOB_STORE_DIR, ".staging")
+    os.makedirs(staging_dir, exist_ok=True)
+    fd, staged_path = tempfile.mkstemp(suffix=".tmp", dir=staging_dir)
+    sha256_hash = hashlib.sha256()
+    buffer = bytearray(config.CHUNK_SIZE_BYTES)
+    view = memoryview(buffer)
+    try:
+        with os.fdopen(fd, "wb") as tmp_file, open(filepath, "rb") as src_file:
+            while True:
+                bytes_read = src_file.readinto(buffer)
+                if not bytes_read:
+                    break
+                sha256_hash.update(view[:bytes_read])
+                tmp_file.write(view[:bytes_read])
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+    except Exception:
+        discard_staged_blob(staged_path)
+        raise
+    return sha256_hash.hexdigest(), staged_path
+
+def commit_staged_blob(file_hash, staged_path):
+    """Atomically renames a staged file to its content address and returns its raw_storage_path."""
+    relative_path = blob_relative_path(file_hash)
+    target_path = os.path.join(config.RAW_BLOB_STORE_DIR, relative_path)
+    if os.path.exists(target_path):
+        logger.debug(f"Blob {file_hash[:8]}... already in store, discarding staged copy.")
+        discard_staged_blob(staged_path)
+        return BLOB_STORAGE_PREFIX + relative_path
+    target_dir = os.path.dirname(target_path)
+    os.makedirs(target_dir, exist_ok=True)
+    os.replace(staged_path, target_path)
+    _fsync_directory(target_dir)
+    return BLOB_STORAGE_PREFIX + relative_path
+
+def discard_staged_blob(staged_path):
+    """Removes a staged file that is no longer needed (ignores missing files)."""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+def read_raw_blob(raw_storage_path):
+    """Reads a blob referenced by a 'blob:' raw_storage_path via mmap. Returns None if missing."""
+    blob_path = os.path.join(config.RAW_BLOB_STORE_DIR, raw_storage_path[len(BLOB_STORAGE_PREFIX):])
+    try:
+        with open(blob_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b"" # mmap cannot map empty files
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+    except FileNotFoundError:
+        logger.error(f"Blob file not found: {blob_path}")
+        return None
+
+def migrate_raw_file_blobs(batch_size=100):
+    """
+    Moves legacy raw_file_blobs rows out of raw_lake.db into the blob store and
+    repoints files_master.raw_storage_path. Blobs are written before the manifest is
+    updated and rows are deleted only afterwards, so the migration can be re-run safely.
+    Returns the number of migrated blobs.
+    """
+    logger.info("Starting raw_file_blobs migration to blob store")
+    migrated = 0
+    with duckdb.connect(config.MANIFEST_DB_PATH) as manifest_conn, \
+         duckdb.connect(config.RAW_LAKE_DB_PATH) as raw_lake_conn:
+        init_raw_lake_db(raw_lake_conn)
+        while True:
+            rows = raw_lake_conn.execute(
+                "SELECT file_hash, content_blob FROM raw_file_blobs LIMIT ?", [batch_size]
+            ).fetchall()
+            if not rows:
+                break
+            batch = [(store_raw_blob(file_hash, bytes(blob)), file_hash) for file_hash, blob in rows]
+            manifest_conn.begin()
+            manifest_conn.executemany(
+                "UPDATE files_master SET raw_storage_path = ?, updated_at = CURRENT_TIMESTAMP WHERE file_hash = ?",
+                batch
+            )
+            manifest_conn.commit()
+            raw_lake_conn.executemany("DELETE FROM raw_file_blobs WHERE file_hash = ?", [[h] for _, h in batch])
+            raw_lake_conn.commit()
+            migrated += len(batch)
+            logger.info(f"Migrated {migrated} blobs so far.")
+        if migrated:
+            raw_lake_conn.execute("CHECKPOINT")
+    logger.info(f"raw_file_blobs migration finished. Migrated: {migrated}")
+    return migrated
+
+def get_file_metadata(filepath, stat_info=None, content_path=None):
+    """
+    Extracts basic metadata from a file. `stat_info` reuses an os.stat result the caller
+    already has, and `content_path` lets the MIME sniff read a staged copy instead of the source.
+    """
     metadata = {}
     try:
+        # File system timestamps
+        if stat_info is None:
+            stat_info = os.stat(filepath)
         metadata['filename'] = os.path.basename(filepath)
-        metadata['size_bytes'] = os.path.getsize(filepath)
+        metadata['size_bytes'] = stat_info.st_size
         # Use python-magic to guess MIME type
-        mime_type = magic.from_file(filepath, mime=True)
+        mime_type = magic.from_file(content_path or filepath, mime=True)
         metadata['mime_type'] = mime_type if mime_type else 'application/octet-stream'
 
-        # File system timestamps
-        stat_info = os.stat(filepath)
         metadata['modified_time'] = datetime.fromtimestamp(stat_info.st_mtime).isoformat()
         metadata['created_time'] = datetime.fromtimestamp(stat_info.st_ctime).isoformat() # Platform dependent
         metadata['accessed_time'] = datetime.fromtimestamp(stat_info.st_atime).isoformat()
@@ -175,10 +332,161 @@ def get_file_metadata(filepath):
     return metadata
 
 # --- Stage 1: Ingest and Register ---
+MANIFEST_REGISTRATION_COLUMNS = [
+    'file_hash', 'source_identifier', 'entry_timestamp', 'raw_content_type',
+    'raw_storage_path', 'metadata_json', 'status'
+]
+
+def _mark_raw_error(manifest_conn, file_hash, filepath, entry_timestamp, error):
+    """Records a file that could not be registered as 'raw_error' (best effort)."""
+    try:
+        manifest_conn.execute(
+            "INSERT INTO files_master (file_hash, source_identifier, entry_timestamp, status, error_message) "
+            "VALUES (?, ?, ?, 'raw_error', ?) "
+            "ON CONFLICT(file_hash) DO UPDATE SET status='raw_error', error_message=excluded.error_message, updated_at=CURRENT_TIMESTAMP",
+            [file_hash, filepath, entry_timestamp, str(error)[:500]]
+        )
+    except Exception as db_err:
+        logger.error(f"Failed to even mark as raw_error for {file_hash}: {db_err}")
+
+def _file_signature(stat_info):
+    """Returns the (size_bytes, modified_time) pair stage 1 stores in metadata_json for change detection."""
+    return stat_info.st_size, datetime.fromtimestamp(stat_info.st_mtime).isoformat()
+
+def _lookup_batch(manifest_conn, query, column, values):
+    """Runs `query` against a temporary one-column view of `values` named pending_keys."""
+    manifest_conn.register('pending_keys', pd.DataFrame({column: values}))
+    try:
+        return manifest_conn.execute(query).fetchall()
+    finally:
+        manifest_conn.unregister('pending_keys')
+
+def _register_batch(manifest_conn, pending):
+    """
+    Registers a batch of files in manifest.db inside one transaction.
+    `pending` is a list of file paths. Paths already registered with the same size and mtime
+    are skipped without reading them; every other file is copied into the blob store's staging
+    area while it is hashed, so each new file is read exactly once. Staged copies whose hash is
+    already registered are discarded after one lookup for the whole batch, and the new rows are
+    inserted with a single typed INSERT ... SELECT from a DataFrame.
+    Returns (new_files_registered, error_files).
+    """
+    if not pending:
+        return 0, 0
+
+    known_signatures = {}
+    for source_identifier, metadata_json in _lookup_batch(
+        manifest_conn,
+        "SELECT source_identifier, metadata_json FROM files_master "
+        "WHERE status <> 'raw_error' AND source_identifier IN (SELECT source_identifier FROM pending_keys)",
+        'source_identifier', list(pending)
+    ):
+        try:
+            metadata = json.loads(metadata_json) if metadata_json else {}
+        except ValueError:
+            continue
+        known_signatures.setdefault(source_identifier, set()).add(
+            (metadata.get('size_bytes'), metadata.get('modified_time'))
+        )
+
+    error_files = 0
+    staged_files = []
+    for filepath in pending:
+        staged_path = None
+        try:
+            stat_info = os.stat(filepath)
+            if _file_signature(stat_info) in known_signatures.get(filepath, ()):
+                logger.debug(f"File {filepath} unchanged since it was registered, skipping.")
+                continue
+            # Copy into staging while hashing: the only read of the source file
+            file_hash, staged_path = stage_raw_blob(filepath)
+            if _file_signature(os.stat(filepath)) != _file_signature(stat_info):
+                logger.error(f"File {filepath} changed while it was being copied; leaving it for the next run.")
+                discard_staged_blob(staged_path)
+                error_files += 1
+                continue
+        except Exception as e:
+            logger.warning(f"Could not read {filepath}, skipping: {e}")
+            if staged_path:
+                discard_staged_blob(staged_path)
+            error_files += 1
+            continue
+        staged_files.append((file_hash, filepath, stat_info, staged_path))
+
+    registered = {row[0] for row in _lookup_batch(
+        manifest_conn,
+        "SELECT file_hash FROM files_master WHERE file_hash IN (SELECT file_hash FROM pending_keys)",
+        'file_hash', [file_hash for file_hash, _, _, _ in staged_files]
+    )} if staged_files else set()
+
+    rows = []
+    for file_hash, filepath, stat_info, staged_path in staged_files:
+        if file_hash in registered:
+            logger.info(f"File {filepath} (Hash: {file_hash[:8]}...) already registered, discarding staged copy.")
+            discard_staged_blob(staged_path)
+            continue
+        registered.add(file_hash) # Same content twice in one batch: keep the first file
+
+        logger.info(f"New file detected: {filepath} (Hash: {file_hash[:8]}...)")
+        basic_metadata = get_file_metadata(filepath, stat_info=stat_info, content_path=staged_path)
+        entry_timestamp = datetime.now()
+        try:
+            # Move the staged copy into the content-addressed blob store (atomic rename)
+            raw_storage_path = commit_staged_blob(file_hash, staged_path)
+        except Exception as e:
+            logger.error(f"Error processing file {filepath}: {e}", exc_info=True)
+            discard_staged_blob(staged_path)
+            _mark_raw_error(manifest_conn, file_hash, filepath, entry_timestamp, e)
+            error_files += 1
+            continue
+        rows.append((
+            file_hash,
+            filepath, # Using full path as source_identifier
+            entry_timestamp,
+            basic_metadata.get('mime_type', 'application/octet-stream'),
+            raw_storage_path,
+            json.dumps(basic_metadata), # Store all basic metadata as JSON
+            'raw_stored'
+        ))
+
+    if not rows:
+        return 0, error_files
+
+    columns = ", ".join(MANIFEST_REGISTRATION_COLUMNS)
+    batch_df = pd.DataFrame(rows, columns=MANIFEST_REGISTRATION_COLUMNS)
+    manifest_conn.register('registration_batch', batch_df)
+    try:
+        manifest_conn.begin()
+        manifest_conn.execute(f"INSERT INTO files_master ({columns}) SELECT {columns} FROM registration_batch")
+        manifest_conn.commit()
+        for row in rows:
+            logger.info(f"Successfully registered and stored: {row[1]}")
+        return len(rows), error_files
+    except Exception as e:
+        manifest_conn.rollback()
+        logger.error(f"Batch registration of {len(rows)} files failed ({e}); retrying file by file.")
+    finally:
+        manifest_conn.unregister('registration_batch')
+
+    # Fall back to one insert per file so a single bad row only fails itself
+    new_files_registered = 0
+    placeholders = ", ".join("?" for _ in MANIFEST_REGISTRATION_COLUMNS)
+    for row in rows:
+        try:
+            manifest_conn.execute(f"INSERT INTO files_master ({columns}) VALUES ({placeholders})", list(row))
+            new_files_registered += 1
+            logger.info(f"Successfully registered and stored: {row[1]}")
+        except Exception as e:
+            logger.error(f"Error registering file {row[1]}: {e}", exc_info=True)
+            _mark_raw_error(manifest_conn, row[0], row[1], row[2], e)
+            error_files += 1
+    return new_files_registered, error_files
+
 def stage1_ingest_and_register():
     """
-    Scans the input directory, processes new files, stores them in raw_lake.db,
-    and registers them in manifest.db.
+    Scans the input directory, processes new files, stores them in the raw blob store,
+    and registers them in manifest.db in batches of config.INGEST_BATCH_SIZE files
+    (one transaction per batch).
     """
     logger.info("Starting Stage 1: Ingest and Register")
     processed_files = 0
@@ -190,8 +498,8 @@ def stage1_ingest_and_register():
         return
 
     try:
-        with duckdb.connect(config.MANIFEST_DB_PATH) as manifest_conn, \
-             duckdb.connect(config.RAW_LAKE_DB_PATH) as raw_lake_conn:
+        with duckdb.connect(config.MANIFEST_DB_PATH) as manifest_conn:
+            pending = []
 
             for root, _, files in os.walk(config.INPUT_DATA_DIR):
                 for filename in files:
@@ -199,76 +507,17 @@ def stage1_ingest_and_register():
                     logger.debug(f"Processing file: {filepath}")
                     processed_files += 1
 
-                    file_hash = calculate_sha256(filepath)
-                    if not file_hash:
-                        logger.warning(f"Could not calculate hash for {filepath}, skipping.")
-                        error_files +=1
-                        continue
-
-                    # Check if file_hash already exists in manifest
-                    res = manifest_conn.execute("SELECT 1 FROM files_master WHERE file_hash = ?", [file_hash]).fetchone()
-                    if res:
-                        logger.info(f"File {filepath} (Hash: {file_hash[:8]}...) already registered, skipping.")
-                        continue
-
-                    # New file, proceed with ingestion
-                    logger.info(f"New file detected: {filepath} (Hash: {file_hash[:8]}...)")
-                    basic_metadata = get_file_metadata(filepath)
-                    entry_timestamp = datetime.now()
-                    raw_storage_path = f"table:raw_file_blobs/key:{file_hash}" # Define how raw data is identified
-
-                    try:
-                        # Store in raw_lake.db
-                        with open(filepath, "rb") as f_blob:
-                            raw_content_blob = f_blob.read()
-                        raw_lake_conn.execute(
-                            "INSERT INTO raw_file_blobs (file_hash, content_blob) VALUES (?, ?)",
-                            [file_hash, raw_content_blob]
-                        )
-                        raw_lake_conn.commit() # Commit for each file to raw_lake
-
-                        # Register in manifest.db
-                        manifest_conn.execute(
-                            """
-                            INSERT INTO files_master (
-                                file_hash, source_identifier, entry_timestamp, raw_content_type,
-                                raw_storage_path, metadata_json, status
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            [
-                                file_hash,
-                                filepath, # Using full path as source_identifier
-                                entry_timestamp,
-                                basic_metadata.get('mime_type', 'application/octet-stream'),
-                                raw_storage_path,
-                                json.dumps(basic_metadata), # Store all basic metadata as JSON
-                                'raw_stored'
-                            ]
-                        )
-                        manifest_conn.commit() # Commit for each file to manifest
-                        new_files_registered += 1
-                        logger.info(f"Successfully registered and stored: {filepath}")
-
-                    except Exception as e:
-                        logger.error(f"Error processing file {filepath}: {e}", exc_info=True)
-                        error_files += 1
-                        # Rollback manifest insert if raw_lake insert failed or vice-versa might be complex
-                        # For now, if raw_lake fails, manifest won't be inserted.
-                        # If manifest insert fails after raw_lake, we might have an orphan raw blob.
-                        # More robust transaction handling across DBs could be added if critical.
-                        # Simple approach: if error, it's an error_file, and it might not be fully registered.
-                        # Attempt to update status to raw_error if hash was known
-                        try:
-                            manifest_conn.execute(
-                                "INSERT INTO files_master (file_hash, source_identifier, entry_timestamp, status, error_message) "
-                                "VALUES (?, ?, ?, 'raw_error', ?) "
-                                "ON CONFLICT(file_hash) DO UPDATE SET status='raw_error', error_message=excluded.error_message, updated_at=CURRENT_TIMESTAMP",
-                                [file_hash, filepath, entry_timestamp, str(e)[:500]]
-                            )
-                            manifest_conn.commit()
-                        except Exception as db_err:
-                            logger.error(f"Failed to even mark as raw_error for {file_hash}: {db_err}")
+                    # _register_batch skips unchanged files by size/mtime and reads new ones once
+                    pending.append(filepath)
+                    if len(pending) >= config.INGEST_BATCH_SIZE:
+                        registered, errors = _register_batch(manifest_conn, pending)
+                        new_files_registered += registered
+                        error_files += errors
+                        pending = []
 
+            registered, errors = _register_batch(manifest_conn, pending)
+            new_files_registered += registered
+            error_files += errors
 
     except Exception as e:
         logger.critical(f"Critical error during Stage 1: {e}", exc_info=True)
@@ -381,33 +630,194 @@ def stage2_derive_date():
 # --- Stage 3: Curate Data ---
 
 # --- Individual Processors ---
-def process_csv_excel(file_hash, raw_content_bytes, source_identifier, curated_conn):
+# Processors run on worker threads (see stage3_curate_data). Each call gets its own cursor
+# of the curated mart connection and must not commit or open transactions itself; every
+# statement it issues is committed on its own.
+def append_dataframe(conn, table_name, df):
+    """Appends df (a DataFrame or Arrow table) to table_name by column name with one INSERT ... SELECT over it."""
+    view_name = f"_append_{uuid.uuid4().hex}"
+    columns = ", ".join('"' + str(col).replace('"', '""') + '"' for col in (df.column_names if isinstance(df, pa.Table) else df.columns))
+    conn.register(view_name, df)
+    try:
+        conn.execute(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {view_name}")
+    finally:
+        conn.unregister(view_name)
+
+CSV_CONTENT_TYPES = {'text/csv', 'application/csv'}
+EXCEL_CONTENT_TYPES = {
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+DATE_FORMATS = ('ISO8601', '%Y/%m/%d')
+_CURATED_SCHEMA_LOCK = threading.Lock() # Serializes ALTER TABLE + INSERT across curation workers
+
+def _non_empty_text(series):
+    """Returns series as stripped strings with nulls and blanks set to NA."""
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+def _has_leading_zeros(values):
+    """True if any value is a number written with a leading zero (e.g. '007'); such codes stay strings."""
+    return values.str.match(r'[+-]?0\d').any()
+
+def _parse_dates(values):
+    """Parses values with the first DATE_FORMATS entry that accepts all of them; raises ValueError if none does."""
+    for date_format in DATE_FORMATS:
+        try:
+            return pd.to_datetime(values, format=date_format)
+        except (ValueError, TypeError):
+            continue
+    raise ValueError("values do not share a supported date format")
+
+def _infer_text_type(sample):
+    """Returns the narrowest Arrow type every non-empty sampled value parses as (string if none fits)."""
+    values = _non_empty_text(sample).dropna()
+    if values.empty or _has_leading_zeros(values):
+        return pa.string()
+    if values.str.fullmatch(r'[+-]?\d{1,18}').all():
+        return pa.int64()
+    if pd.to_numeric(values, errors='coerce').notna().all():
+        return pa.float64()
+    if values.str.lower().isin(['true', 'false']).all():
+        return pa.bool_()
+    try:
+        parsed = _parse_dates(values)
+    except ValueError:
+        return pa.string()
+    return pa.date32() if (parsed == parsed.dt.normalize()).all() else pa.timestamp('us')
+
+def infer_arrow_schema(df, sample_rows=None):
+    """
+    Infers a typed Arrow schema from the first sample_rows rows of df.
+    Text columns get int64/float64/bool/date32/timestamp when every sampled value parses as one;
+    columns the reader already typed (e.g. Excel numerics and dates) keep their type.
+    """
+    sample = df.head(sample_rows or config.TYPE_INFERENCE_SAMPLE_ROWS)
+    fields = []
+    for col in df.columns:
+        if pd.api.types.is_object_dtype(sample[col]) or pd.api.types.is_string_dtype(sample[col]):
+            fields.append(pa.field(col, _infer_text_type(sample[col])))
+        else:
+            fields.append(pa.field(col, pa.Array.from_pandas(sample[col]).type))
+    return pa.schema(fields)
+
+def _convert_column(series, arrow_type):
+    """Converts one column to arrow_type; raises if any value (sampled or not) does not fit."""
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return pa.Array.from_pandas(series, type=arrow_type)
+    values = _non_empty_text(series)
+    if pa.types.is_string(arrow_type):
+        return pa.Array.from_pandas(values, type=arrow_type)
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        if _has_leading_zeros(values.dropna()):
+            raise ValueError("value with leading zeros outside the inference sample")
+        return pa.Array.from_pandas(pd.to_numeric(values), type=arrow_type)
+    if pa.types.is_boolean(arrow_type):
+        flags = values.str.lower().map({'true': True, 'false': False})
+        if flags.isna().ne(values.isna()).any():
+            raise ValueError("non-boolean value outside the inference sample")
+        return pa.Array.from_pandas(flags.astype('boolean'), type=arrow_type)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[us]')
+    present = values.notna()
+    parsed[present] = _parse_dates(values[present])
+    timestamps = pa.Array.from_pandas(parsed, type=pa.timestamp('us'))
+    return timestamps.cast(arrow_type) if pa.types.is_date(arrow_type) else timestamps
+
+def to_typed_arrow_table(df, schema, source_identifier):
+    """
+    Builds an Arrow table from df with the inferred schema. A column whose unsampled rows do not
+    fit its inferred type is loaded as string instead of failing the whole file.
+    """
+    fields, arrays = [], []
+    for field in schema:
+        try:
+            array = _convert_column(df[field.name], field.type)
+        except (ValueError, TypeError, pa.ArrowInvalid) as e:
+            logger.warning(f"Column '{field.name}' of {source_identifier} does not fit inferred type {field.type} ({e}); loading it as string.")
+            field = pa.field(field.name, pa.string())
+            array = pa.Array.from_pandas(_non_empty_text(df[field.name]), type=pa.string())
+        fields.append(field)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+def _duckdb_type(arrow_type):
+    """Maps an inferred Arrow type to the DuckDB column type used for new curated columns."""
+    if pa.types.is_integer(arrow_type):
+        return 'BIGINT'
+    if pa.types.is_floating(arrow_type):
+        return 'DOUBLE'
+    if pa.types.is_boolean(arrow_type):
+        return 'BOOLEAN'
+    if pa.types.is_date(arrow_type):
+        return 'DATE'
+    if pa.types.is_timestamp(arrow_type):
+        return 'TIMESTAMP'
+    return 'TEXT'
+
+_INTEGER_DUCKDB_TYPES = {'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT'}
+_FLOAT_DUCKDB_TYPES = {'FLOAT', 'REAL', 'DOUBLE'}
+
+def _widened_type(existing_type, incoming_type):
+    """
+    Returns the DuckDB type an existing column must be widened to so it can hold incoming_type
+    values without loss, or None if they already fit. Anything that is not a numeric or date
+    widening falls back to VARCHAR.
+    """
+    existing_type = existing_type.upper()
+    if existing_type in ('VARCHAR', 'TEXT') or existing_type == incoming_type:
+        return None
+    if existing_type in _INTEGER_DUCKDB_TYPES and incoming_type == 'BIGINT':
+        return None if existing_type in ('BIGINT', 'HUGEINT') else 'BIGINT'
+    if existing_type in _INTEGER_DUCKDB_TYPES | _FLOAT_DUCKDB_TYPES and incoming_type in ('BIGINT', 'DOUBLE'):
+        return None if existing_type == 'DOUBLE' else 'DOUBLE'
+    if existing_type.startswith('TIMESTAMP') and incoming_type == 'DATE':
+        return None
+    if existing_type == 'DATE' and incoming_type == 'TIMESTAMP':
+        return 'TIMESTAMP'
+    return 'VARCHAR'
+
+def ensure_table_columns(conn, table_name, schema):
+    """
+    Adds the columns of schema that table_name lacks, typed from the Arrow schema. An existing column
+    whose type cannot hold the incoming values (e.g. BIGINT receiving 'X1') is widened, to VARCHAR
+    if nothing narrower fits, so a later file with different contents does not fail the insert.
+    """
+    existing = {row[0]: row[1] for row in conn.execute(f"DESCRIBE {table_name}").fetchall()}
+    for field in schema:
+        quoted_name = '"' + field.name.replace('"', '""') + '"'
+        incoming_type = _duckdb_type(field.type)
+        if field.name not in existing:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {quoted_name} {incoming_type}")
+            logger.info(f"Added column {quoted_name} {incoming_type} to {table_name}.")
+            continue
+        widened_type = _widened_type(existing[field.name], 'VARCHAR' if incoming_type == 'TEXT' else incoming_type)
+        if widened_type is not None:
+            conn.execute(f"ALTER TABLE {table_name} ALTER COLUMN {quoted_name} TYPE {widened_type}")
+            logger.warning(f"Widened column {quoted_name} of {table_name} from {existing[field.name]} to {widened_type} for incoming {field.type} values.")
+
+def read_tabular(raw_content_bytes, raw_content_type):
+    """Reads CSV or Excel bytes with the reader chosen from the manifest's MIME type. CSV cells are read as text for inference."""
+    file_io = io.BytesIO(raw_content_bytes)
+    if raw_content_type in EXCEL_CONTENT_TYPES:
+        return pd.read_excel(file_io, engine=None) # engine=None lets pandas pick
+    return pd.read_csv(file_io, dtype=str)
+
+def process_csv_excel(file_hash, raw_content_bytes, source_identifier, curated_conn, raw_content_type='text/csv'):
     """
     Processor for CSV or Excel files.
-    Attempts to read with Pandas, performs very basic cleaning, and loads to curated_mart.
+    Reads the file with the reader matching raw_content_type, infers column types from a sample
+    of rows, and loads a typed Arrow table to curated_mart (numerics and dates stay native).
     Inspired by v8.0's need to handle tabular data, but simplified.
     """
     logger.info(f"Attempting to process CSV/Excel: {source_identifier} (Hash: {file_hash[:8]})")
     try:
-        df = None
-        # Try reading as CSV, then Excel if CSV fails or based on initial MIME type (from manifest)
-        # For simplicity, we'll try CSV first. A more robust way would be to use the
-        # raw_content_type from manifest to guide this.
+        reader_name = 'Excel' if raw_content_type in EXCEL_CONTENT_TYPES else 'CSV'
         try:
-            # Convert bytes to a file-like object for Pandas
-            import io
-            file_io = io.BytesIO(raw_content_bytes)
-            df = pd.read_csv(file_io)
-            logger.info(f"Successfully read {source_identifier} as CSV.")
-        except Exception as e_csv:
-            logger.warning(f"Failed to read {source_identifier} as CSV ({e_csv}), trying Excel...")
-            try:
-                file_io.seek(0) # Reset BytesIO position
-                df = pd.read_excel(file_io, engine=None) # engine=None lets pandas pick
-                logger.info(f"Successfully read {source_identifier} as Excel.")
-            except Exception as e_excel:
-                logger.error(f"Failed to read {source_identifier} as CSV or Excel: {e_excel}")
-                return False, f"Pandas read failed: {e_csv}; {e_excel}"
+            df = read_tabular(raw_content_bytes, raw_content_type)
+            logger.info(f"Successfully read {source_identifier} as {reader_name}.")
+        except Exception as e_read:
+            logger.error(f"Failed to read {source_identifier} as {reader_name}: {e_read}")
+            return False, f"Pandas read failed ({reader_name}): {e_read}"
 
         if df is None or df.empty:
             logger.warning(f"No data or empty DataFrame from {source_identifier}.")
@@ -418,29 +828,26 @@ def process_csv_excel(file_hash, raw_content_bytes, source_identifier, curated_c
         # Basic Cleaning (example: lowercase column names)
         df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
 
+        schema = infer_arrow_schema(df)
+        table = to_typed_arrow_table(df, schema, source_identifier)
+        logger.info(f"Inferred schema for {source_identifier}: " + ", ".join(f"{f.name}:{f.type}" for f in table.schema))
+
         # Add metadata
-        df['file_hash'] = file_hash
-        df['original_source_identifier'] = source_identifier
-        df['processed_timestamp'] = datetime.now()
+        num_rows = table.num_rows
+        table = table.append_column(pa.field('file_hash', pa.string()), pa.array([file_hash] * num_rows, type=pa.string()))
+        table = table.append_column(pa.field('original_source_identifier', pa.string()), pa.array([source_identifier] * num_rows, type=pa.string()))
+        table = table.append_column(pa.field('processed_timestamp', pa.timestamp('us')), pa.array([datetime.now()] * num_rows, type=pa.timestamp('us')))
 
         # Define target table name (can be dynamic based on source_identifier or content)
         # For now, a generic table.
-        # IMPORTANT: This table 'example_curated_data' MUST match a schema defined in init_curated_mart_db
-        # And its columns must accommodate what's in the DataFrame.
-        # This is a common point of failure if schemas don't align.
+        # Data columns missing from 'example_curated_data' are added with their inferred types;
+        # existing columns are widened when this file's values do not fit them, then DuckDB casts on insert.
         target_table_name = "example_curated_data"
 
         try:
-            # Ensure DataFrame columns match the target table structure or subset of it.
-            # This is a simplified load. For production, you'd want more robust schema matching.
-            # For example, get columns from DB: db_cols = [desc[0] for desc in curated_conn.execute(f"DESCRIBE {target_table_name}").fetchall()]
-            # df_to_load = df[[col for col in df.columns if col in db_cols]]
-
-            # Convert all columns to string to avoid type issues with DuckDB auto-casting during to_sql
-            # This is a simplification. Ideally, you'd map pandas dtypes to SQL types.
-            df_for_sql = df.astype(str)
-
-            df_for_sql.to_sql(target_table_name, curated_conn, if_exists='append', index=False)
+            with _CURATED_SCHEMA_LOCK:
+                ensure_table_columns(curated_conn, target_table_name, table.schema)
+                append_dataframe(curated_conn, target_table_name, table)
             logger.info(f"Successfully loaded data from {source_identifier} to {target_table_name}.")
             return True, None
         except Exception as e_sql:
@@ -473,7 +880,6 @@ def process_image(file_hash, raw_content_bytes, source_identifier, curated_conn)
             """,
             [file_hash, width, height, img_format, source_identifier, datetime.now()]
         )
-        curated_conn.commit()
         logger.info(f"Successfully processed image {source_identifier} - Size: {width}x{height}, Format: {img_format}")
         return True, None
     except ImportError:
@@ -487,19 +893,90 @@ def process_image(file_hash, raw_content_bytes, source_identifier, curated_conn)
 
 CONTENT_PROCESSORS = {
     # MIME types are examples, adjust based on what python-magic detects for your files
-    'text/csv': process_csv_excel,
-    'application/csv': process_csv_excel,
-    'application/vnd.ms-excel': process_csv_excel, # .xls
-    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': process_csv_excel, # .xlsx
+    # Tabular processors are bound to their MIME type so the right reader is picked up front
+    'text/csv': partial(process_csv_excel, raw_content_type='text/csv'),
+    'application/csv': partial(process_csv_excel, raw_content_type='application/csv'),
+    'application/vnd.ms-excel': partial(process_csv_excel, raw_content_type='application/vnd.ms-excel'), # .xls
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': partial(process_csv_excel, raw_content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'), # .xlsx
     'image/jpeg': process_image,
     'image/png': process_image,
     # 'audio/mpeg': process_audio,
     # 'application/pdf': process_pdf,
 }
 
+def _set_statuses(manifest_conn, outcomes):
+    """Applies (file_hash, status, error_message) transitions in one transaction."""
+    if not outcomes:
+        return
+    outcomes_df = pd.DataFrame(outcomes, columns=['file_hash', 'status', 'error_message'])
+    manifest_conn.register('status_updates', outcomes_df)
+    try:
+        manifest_conn.begin()
+        manifest_conn.execute(
+            """UPDATE files_master
+               SET status = u.status, error_message = u.error_message, updated_at = CURRENT_TIMESTAMP
+               FROM status_updates u
+               WHERE files_master.file_hash = u.file_hash"""
+        )
+        manifest_conn.commit()
+    except Exception:
+        manifest_conn.rollback()
+        raise
+    finally:
+        manifest_conn.unregister('status_updates')
+
+def _curate_record(record, raw_lake_conn, curated_mart_conn):
+    """
+    Curates one manifest record on a worker thread.
+    Returns (file_hash, new_status, error_message, outcome) where outcome is
+    'success', 'error' or 'unsupported'.
+    """
+    file_hash, source_identifier, raw_content_type, raw_storage_path = record
+    logger.info(f"Curating: {source_identifier} (Type: {raw_content_type}, Hash: {file_hash[:8]})")
+
+    raw_content = None
+    try:
+        if raw_storage_path and raw_storage_path.startswith(BLOB_STORAGE_PREFIX):
+            raw_content = read_raw_blob(raw_storage_path)
+        elif raw_storage_path and raw_storage_path.startswith(LEGACY_BLOB_TABLE_PREFIX):
+             # Not yet migrated by migrate_raw_file_blobs()
+             with raw_lake_conn.cursor() as raw_lake_cursor:
+                 content_tuple = raw_lake_cursor.execute("SELECT content_blob FROM raw_file_blobs WHERE file_hash = ?", [file_hash]).fetchone()
+             if content_tuple:
+                 raw_content = content_tuple[0]
+        else: # Add logic for other raw_storage_path types if any
+            logger.warning(f"Unknown raw_storage_path format for {file_hash}: {raw_storage_path}")
+
+        if raw_content is None:
+            logger.error(f"Could not retrieve raw content for {file_hash} from raw_lake.")
+            return file_hash, 'curation_error', "Raw content not found", 'error'
+    except Exception as e_raw_read:
+        logger.error(f"Error reading raw content for {file_hash}: {e_raw_read}", exc_info=True)
+        return file_hash, 'curation_error', f"Raw read error: {str(e_raw_read)[:100]}", 'error'
+
+    processor_func = CONTENT_PROCESSORS.get(raw_content_type)
+    if not processor_func:
+        logger.warning(f"No processor found for content type '{raw_content_type}' for file {source_identifier}.")
+        return file_hash, 'unsupported_type', f"No processor for {raw_content_type}", 'unsupported'
+
+    try:
+        with curated_mart_conn.cursor() as curated_cursor:
+            success, msg = processor_func(file_hash, raw_content, source_identifier, curated_cursor)
+        if success:
+            logger.info(f"Successfully curated {source_identifier}. Message: {msg if msg else 'OK'}")
+            return file_hash, 'curated', None, 'success'
+        error_message = msg if msg else "Processor function returned False"
+        logger.error(f"Curation error for {source_identifier}. Reason: {error_message}")
+        return file_hash, 'curation_error', error_message, 'error'
+    except Exception as e_proc:
+        logger.critical(f"Unhandled exception in processor for {raw_content_type} on {source_identifier}: {e_proc}", exc_info=True)
+        return file_hash, 'curation_error', f"Unhandled Processor Exception: {str(e_proc)[:200]}", 'error'
+
 def stage3_curate_data():
     """
     Processes files from raw_lake based on their type and stores curated data in curated_mart.
+    Records are claimed and finalized in batches of config.CURATION_BATCH_SIZE (one manifest
+    transaction each); within a batch the processors run on config.CURATION_MAX_WORKERS threads.
     """
     logger.info("Starting Stage 3: Curate Data")
     processed_count = 0
@@ -510,98 +987,39 @@ def stage3_curate_data():
     try:
         with duckdb.connect(config.MANIFEST_DB_PATH) as manifest_conn, \
              duckdb.connect(config.RAW_LAKE_DB_PATH, read_only=True) as raw_lake_conn, \
-             duckdb.connect(config.CURATED_MART_DB_PATH) as curated_mart_conn:
-
-            # Get records that are 'date_derived' or 'raw_stored' (if date derivation is optional for some types)
-            # Or 'curation_retry' for files that previously failed.
-            # For simplicity, let's fetch 'date_derived' or 'raw_stored' (if no date could be derived but still processable)
-            # And also 'curation_error' or 'unsupported_type' if we want to retry them (add a retry_count later)
-            records_to_process = manifest_conn.execute(
-                """SELECT file_hash, source_identifier, raw_content_type, raw_storage_path
-                   FROM files_master
-                   WHERE status IN ('date_derived', 'raw_stored', 'curation_retry', 'unsupported_retry')
-                   ORDER BY derived_date, entry_timestamp LIMIT 100""" # Process in batches
-            ).fetchall()
-
-            if not records_to_process:
-                logger.info("No records found needing curation in Stage 3.")
-                return
-
-            logger.info(f"Found {len(records_to_process)} records for curation.")
-
-            for file_hash, source_identifier, raw_content_type, raw_storage_path in records_to_process:
-                processed_count += 1
-                logger.info(f"Curating: {source_identifier} (Type: {raw_content_type}, Hash: {file_hash[:8]})")
-
-                manifest_conn.execute(
-                    "UPDATE files_master SET status = 'curation_inprogress', updated_at = CURRENT_TIMESTAMP WHERE file_hash = ?",
-                    [file_hash]
-                )
-                manifest_conn.commit()
-
-                raw_content = None
-                try:
-                    # Simplified raw content retrieval (assumes raw_file_blobs for now)
-                    if raw_storage_path and raw_storage_path.startswith("table:raw_file_blobs"):
-                         content_tuple = raw_lake_conn.execute("SELECT content_blob FROM raw_file_blobs WHERE file_hash = ?", [file_hash]).fetchone()
-                         if content_tuple:
-                             raw_content = content_tuple[0]
-                    else: # Add logic for other raw_storage_path types if any
-                        logger.warning(f"Unknown raw_storage_path format for {file_hash}: {raw_storage_path}")
-
-
-                    if raw_content is None:
-                        logger.error(f"Could not retrieve raw content for {file_hash} from raw_lake.")
-                        manifest_conn.execute(
-                            "UPDATE files_master SET status = 'curation_error', error_message = ?, updated_at = CURRENT_TIMESTAMP WHERE file_hash = ?",
-                            ["Raw content not found", file_hash]
-                        )
-                        manifest_conn.commit()
-                        error_count += 1
-                        continue
-                except Exception as e_raw_read:
-                    logger.error(f"Error reading raw content for {file_hash}: {e_raw_read}", exc_info=True)
-                    manifest_conn.execute(
-                        "UPDATE files_master SET status = 'curation_error', error_message = ?, updated_at = CURRENT_TIMESTAMP WHERE file_hash = ?",
-                        [f"Raw read error: {str(e_raw_read)[:100]}", file_hash]
-                    )
-                    manifest_conn.commit()
-                    error_count +=1
-                    continue
-
-
-                processor_func = CONTENT_PROCESSORS.get(raw_content_type)
-                new_status = None
-                error_message = None
-
-                if processor_func:
-                    try:
-                        success, msg = processor_func(file_hash, raw_content, source_identifier, curated_mart_conn)
-                        if success:
-                            new_status = 'curated'
-                            success_count += 1
-                            logger.info(f"Successfully curated {source_identifier}. Message: {msg if msg else 'OK'}")
-                        else:
-                            new_status = 'curation_error'
-                            error_message = msg if msg else "Processor function returned False"
-                            error_count += 1
-                            logger.error(f"Curation error for {source_identifier}. Reason: {error_message}")
-                    except Exception as e_proc:
-                        logger.critical(f"Unhandled exception in processor for {raw_content_type} on {source_identifier}: {e_proc}", exc_info=True)
-                        new_status = 'curation_error'
-                        error_message = f"Unhandled Processor Exception: {str(e_proc)[:200]}"
-                        error_count += 1
-                else:
-                    logger.warning(f"No processor found for content type '{raw_content_type}' for file {source_identifier}.")
-                    new_status = 'unsupported_type'
-                    error_message = f"No processor for {raw_content_type}"
-                    unsupported_count += 1
-
-                manifest_conn.execute(
-                    "UPDATE files_master SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP WHERE file_hash = ?",
-                    [new_status, error_message, file_hash]
-                )
-                manifest_conn.commit()
+             duckdb.connect(config.CURATED_MART_DB_PATH) as curated_mart_conn, \
+             ThreadPoolExecutor(max_workers=config.CURATION_MAX_WORKERS) as executor:
+
+            while True:
+                # Get records that are 'date_derived' or 'raw_stored' (if date derivation is optional for some types)
+                # Or 'curation_retry' for files that previously failed.
+                # Every fetched record leaves this status set, so the loop drains the backlog.
+                records_to_process = manifest_conn.execute(
+                    """SELECT file_hash, source_identifier, raw_content_type, raw_storage_path
+                       FROM files_master
+                       WHERE status IN ('date_derived', 'raw_stored', 'curation_retry', 'unsupported_retry')
+                       ORDER BY derived_date, entry_timestamp LIMIT ?""",
+                    [config.CURATION_BATCH_SIZE]
+                ).fetchall()
+
+                if not records_to_process:
+                    if processed_count == 0:
+                        logger.info("No records found needing curation in Stage 3.")
+                    break
+
+                logger.info(f"Found {len(records_to_process)} records for curation.")
+                _set_statuses(manifest_conn, [(record[0], 'curation_inprogress', None) for record in records_to_process])
+
+                outcomes = list(executor.map(
+                    lambda record: _curate_record(record, raw_lake_conn, curated_mart_conn),
+                    records_to_process
+                ))
+                _set_statuses(manifest_conn, [(file_hash, status, message) for file_hash, status, message, _ in outcomes])
+
+                processed_count += len(outcomes)
+                success_count += sum(1 for *_, outcome in outcomes if outcome == 'success')
+                error_count += sum(1 for *_, outcome in outcomes if outcome == 'error')
+                unsupported_count += sum(1 for *_, outcome in outcomes if outcome == 'unsupported')
 
     except Exception as e:
         logger.critical(f"Critical error during Stage 3: {e}", exc_info=True)
@@ -643,7 +1061,9 @@ if __name__ == "__main__":
     # --- Test Setup ---
     logger.info("--- Preparing for Test Run ---")
 
-    # Clean up previous database files for a fresh test run
+    # Clean up previous database files and raw blobs for a fresh test run
+    shutil.rmtree(config.RAW_BLOB_STORE_DIR, ignore_errors=True)
+    os.makedirs(config.RAW_BLOB_STORE_DIR, exist_ok=True)
     for db_path in [config.MANIFEST_DB_PATH, config.RAW_LAKE_DB_PATH, config.CURATED_MART_DB_PATH]:
         if os.path.exists(db_path):
             try:
@@ -746,12 +1166,11 @@ if __name__ == "__main__":
                 if "archive.zip" in str(row[1]) and str(row[2]) != 'unsupported_type': all_tests_passed = False; logger.error(f"Test FAIL: archive.zip not unsupported. Status: {row[2]}")
 
 
-        with duckdb.connect(config.RAW_LAKE_DB_PATH, read_only=True) as raw_lake_conn:
-            logger.info("Raw Lake DB - raw_file_blobs count:")
-            count = raw_lake_conn.execute("SELECT COUNT(*) FROM raw_file_blobs").fetchone()[0]
-            logger.info(f"Total blobs: {count}")
-            # Expected count: sample1.csv, sample2.csv, image1.jpg, image2.png, document.txt, archive.zip = 6
-            if count < 6 : all_tests_passed = False; logger.error(f"Test FAIL: Expected at least 6 blobs, got {count}")
+        logger.info("Raw Blob Store - blob count:")
+        count = sum(len(blob_files) for _, _, blob_files in os.walk(config.RAW_BLOB_STORE_DIR))
+        logger.info(f"Total blobs: {count}")
+        # Expected count: sample1.csv, sample2.csv, image1.jpg, image2.png, document.txt, archive.zip = 6
+        if count < 6 : all_tests_passed = False; logger.error(f"Test FAIL: Expected at least 6 blobs, got {count}")
 
 
         with duckdb.connect(config.CURATED_MART_DB_PATH, read_only=True) as curated_mart_conn:
@@ -1,3 +1,4 @@
+import bisect
 import pandas as pd
 from typing import Dict, Any, Optional
 import numpy as np
@@ -10,6 +11,30 @@ if not logger.handlers and not logging.getLogger().hasHandlers():
     logger.debug(f"Logger for {__name__} configured with NullHandler.")
 
 
+def rolling_percentile_rank(series: pd.Series, window: int, min_periods: int) -> pd.Series:
+    """
+    滾動百分位排名：每個時點的值在其往前 window 期 (含當期) 非 NaN 值中的百分位 (同值取平均排名)。
+    結果等同 series.rolling(window, min_periods).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])，
+    但以 bisect 維護排序後的視窗，每期只做一次插入/刪除與兩次二分搜尋，不必為每個視窗重新建立 Series 並排序。
+    """
+    values = series.to_numpy(dtype=float)
+    result = np.full(len(values), np.nan)
+    sorted_window = []
+    for i, value in enumerate(values):
+        if not np.isnan(value):
+            bisect.insort(sorted_window, value)
+        if i >= window:
+            expired = values[i - window]
+            if not np.isnan(expired):
+                del sorted_window[bisect.bisect_left(sorted_window, expired)]
+        count = len(sorted_window)
+        if count >= min_periods and not np.isnan(value):
+            lower = bisect.bisect_left(sorted_window, value)
+            upper = bisect.bisect_right(sorted_window, value)
+            result[i] = (lower + (upper - lower + 1) / 2.0) / count
+    return pd.Series(result, index=series.index, name=series.name)
+
+
 class IndicatorEngine:
     """
     封裝計算衍生指標，特別是「債券壓力指標」的邏輯。
@@ -149,9 +174,7 @@ class IndicatorEngine:
                 series = df[col_name]
                 min_roll_periods = max(2, int(window * 0.5))
                 if series.notna().sum() >= min_roll_periods:
-                    rank = series.rolling(window=window, min_periods=min_roll_periods).apply(
-                        lambda x: pd.Series(x).rank(pct=True).iloc[-1] if pd.Series(x).notna().any() else np.nan, raw=False
-                    )
+                    rank = rolling_percentile_rank(series, window, min_roll_periods)
                     percentiles_df[f"{key}_pct"] = 1.0 - rank if key == 'spread_10y2y' else rank
                     active_weights[key] = weights_config[key]
                     self.logger.debug(f"IndicatorEngine: Ranked {key} ({col_name}).")
@@ -0,0 +1,30 @@
+"""
+Moves raw files stored as BLOBs in raw_lake.db (table raw_file_blobs) into the
+content-addressed raw blob store used by data_pipeline.py, and repoints
+files_master.raw_storage_path to the new "blob:" locations. Safe to re-run.
+
+Usage (from the project root):
+    python scripts/migrate_raw_lake_blobs.py [--batch-size 100]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import data_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate raw_file_blobs into the raw blob store.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows moved per batch (default: 100).")
+    args = parser.parse_args()
+
+    migrated = data_pipeline.migrate_raw_file_blobs(batch_size=args.batch_size)
+    data_pipeline.logger.info(f"Migration complete: {migrated} blobs moved to {data_pipeline.config.RAW_BLOB_STORE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,10 @@ KEY_PATH = "path"
 KEY_RESULTS = "results"
 KEY_DATAFRAME = "dataframe" # For passing DataFrame object
 KEY_MATCHED_SCHEMA_NAME = "matched_schema_name" # For schema name used by FileParser
+KEY_VALID_PATH = "valid_parquet_path" # 工作程序寫出的有效資料 Parquet 分片
+KEY_VALID_COUNT = "valid_count"
+KEY_INVALID_PATH = "invalid_parquet_path" # 工作程序寫出的隔離資料 Parquet 分片
+KEY_INVALID_COUNT = "invalid_count"
 
 # 狀態值 (Status values)
 STATUS_SUCCESS = "success"
@@ -1,11 +1,63 @@
+import os
+from typing import Optional
+
+import duckdb
 import pandas as pd
+import pyarrow as pa
 import logging # Or use the logger passed from Orchestrator
 
+
+def _quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
 class Validator:
+    """
+    依 rules_config 驗證解析後的資料。
+
+    規則會被編譯成 DuckDB 的 SQL 運算式：每一列得到一個 `_errors` 清單欄位 (違反的規則說明)，
+    清單為空即為有效列。validate() 回傳 pandas DataFrame；validate_to_parquet() 則直接在
+    DuckDB 中以兩個 `COPY ... TO` 寫出有效/無效 Parquet，不經過中間的 pandas 複本。
+    """
+
+    ERRORS_COLUMN = "_errors"
+    VALID_COLUMN = "_valid"
+
     def __init__(self, rules_config: dict, logger: logging.Logger):
         self.rules_config = rules_config # e.g., {"table_name_or_schema_name": {"column_name": {"non_null": True, "min_value": 0}}}
         self.logger = logger
 
+    def _compile_errors_expression(self, table_rules: dict, columns, table_or_schema_name: str) -> Optional[str]:
+        """把單一 schema 的規則編譯成產生 `_errors` 清單的 SQL 運算式；沒有可套用的規則時回傳 None。"""
+        checks = []
+        for col_name, rules in table_rules.items():
+            if col_name not in columns:
+                self.logger.warning(f"Rule defined for column '{col_name}' in '{table_or_schema_name}', but column not in DataFrame. Skipping rule.")
+                continue
+
+            column = _quote_identifier(col_name)
+            reason_prefix = f"Column '{col_name}': "
+
+            if rules.get("non_null"):
+                checks.append((f"{column} IS NULL", reason_prefix + "is null"))
+
+            if "min_value" in rules:
+                # 與 pd.to_numeric(errors='coerce') 相同：無法轉成數值者視為轉換失敗
+                numeric = f"TRY_CAST({column} AS DOUBLE)"
+                checks.append((f"{numeric} < {float(rules['min_value'])!r}", reason_prefix + f"is less than {rules['min_value']}"))
+                checks.append((f"{numeric} IS NULL AND {column} IS NOT NULL", reason_prefix + "failed numeric conversion for range check"))
+
+            # Add more rule types here (e.g., max_value, pattern_match, allowed_values)
+
+        if not checks:
+            return None
+        cases = ", ".join(f"CASE WHEN {condition} THEN {_quote_literal(reason)} END" for condition, reason in checks)
+        return f"list_filter([{cases}], x -> x IS NOT NULL)"
+
     def validate(self, df: pd.DataFrame, source_file: str, table_or_schema_name: str) -> tuple[pd.DataFrame, pd.DataFrame]:
         if not isinstance(df, pd.DataFrame) or df.empty:
             # Ensure columns for invalid_df are consistent even if input df is empty
@@ -28,42 +80,18 @@ class Validator:
         # However, the Validator should primarily work on columns defined in rules or existing in df.
         # The 'source' column from FileParser will be part of original_columns if present.
 
-        invalid_rows_mask = pd.Series([False] * len(df), index=df.index)
-        # Initialize quarantine_reasons as a Series of lists or accumulative strings
-        quarantine_reasons_series = pd.Series([[] for _ in range(len(df))], index=df.index)
-
-
-        for col_name, rules in table_rules.items():
-            if col_name not in df.columns:
-                self.logger.warning(f"Rule defined for column '{col_name}' in '{table_or_schema_name}', but column not in DataFrame. Skipping rule.")
-                continue
-
-            current_col_invalid_mask = pd.Series([False] * len(df), index=df.index)
-            reason_prefix = f"Column '{col_name}': "
-
-            if rules.get("non_null"):
-                is_null = df[col_name].isnull()
-                current_col_invalid_mask |= is_null
-                for idx in df.index[is_null]:
-                    quarantine_reasons_series.loc[idx].append(reason_prefix + "is null")
-
-            if "min_value" in rules:
-                # Attempt to convert to numeric, coercing errors to NaN
-                numeric_series = pd.to_numeric(df[col_name], errors='coerce')
-
-                is_lt_min = numeric_series < rules["min_value"]
-                current_col_invalid_mask |= is_lt_min
-                for idx in df.index[is_lt_min]:
-                    quarantine_reasons_series.loc[idx].append(reason_prefix + f"is less than {rules['min_value']}")
-
-                conversion_failed_mask = numeric_series.isnull() & df[col_name].notnull()
-                current_col_invalid_mask |= conversion_failed_mask
-                for idx in df.index[conversion_failed_mask]:
-                    quarantine_reasons_series.loc[idx].append(reason_prefix + "failed numeric conversion for range check")
-
-            # Add more rule types here (e.g., max_value, pattern_match, allowed_values)
-
-            invalid_rows_mask |= current_col_invalid_mask
+        errors_expression = self._compile_errors_expression(table_rules, original_columns, table_or_schema_name)
+        if errors_expression is None:
+            invalid_rows_mask = pd.Series(False, index=df.index)
+            quarantine_reasons_series = pd.Series("", index=df.index)
+        else:
+            # 只把有規則的欄位交給 DuckDB；列順序與 df 相同
+            rule_columns = [c for c in table_rules if c in original_columns]
+            with duckdb.connect() as con:
+                con.register("parsed", df[rule_columns].reset_index(drop=True))
+                reasons = con.execute(f"SELECT array_to_string({errors_expression}, '; ') FROM parsed").fetchall()
+            quarantine_reasons_series = pd.Series([r[0] for r in reasons], index=df.index)
+            invalid_rows_mask = quarantine_reasons_series != ""
 
         valid_df = df[~invalid_rows_mask].copy()
         # Prepare invalid_df. It should contain all original columns plus new ones.
@@ -71,8 +99,7 @@ class Validator:
 
         if invalid_rows_mask.any():
             invalid_df_temp = df[invalid_rows_mask].copy()
-            # Join lists of reasons into a single string per row
-            invalid_df_temp["quarantine_reason"] = quarantine_reasons_series[invalid_rows_mask].apply(lambda reasons: "; ".join(reasons) if reasons else "")
+            invalid_df_temp["quarantine_reason"] = quarantine_reasons_series[invalid_rows_mask]
             invalid_df_temp["source_file"] = source_file
 
             # Reindex to ensure all original columns are present, plus the new ones
@@ -84,3 +111,49 @@ class Validator:
 
         self.logger.info(f"Validation for '{source_file}' (schema: {table_or_schema_name}): {len(valid_df)} valid rows, {len(invalid_df)} invalid rows.")
         return valid_df, invalid_df
+
+    def validate_to_parquet(self, df: pd.DataFrame, source_file: str, table_or_schema_name: str,
+                            valid_path: str, invalid_path: str) -> tuple[int, int]:
+        """
+        在 DuckDB 中驗證並直接寫出 Parquet：有效列寫到 valid_path，無效列 (附 quarantine_reason、
+        source_file 欄位，與 validate() 的 invalid_df 相同) 寫到 invalid_path。
+
+        某一邊沒有資料時不會留下檔案。回傳 (有效列數, 無效列數)。
+        """
+        if not isinstance(df, pd.DataFrame) or df.empty:
+            return 0, 0
+
+        original_columns = list(df.columns)
+        table_rules = self.rules_config.get(table_or_schema_name, {})
+        if not table_rules:
+            self.logger.info(f"No validation rules found for '{table_or_schema_name}'. Skipping validation.")
+        errors_expression = self._compile_errors_expression(table_rules, original_columns, table_or_schema_name) or "CAST([] AS VARCHAR[])"
+
+        try:
+            parsed = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            parsed = df.reset_index(drop=True) # 混合型別的 object 欄位交給 DuckDB 自行轉為 VARCHAR
+
+        select_columns = ", ".join(_quote_identifier(c) for c in original_columns)
+        with duckdb.connect() as con:
+            con.register("parsed", parsed)
+            con.execute(
+                f"CREATE TEMP VIEW checked AS SELECT *, len({self.ERRORS_COLUMN}) = 0 AS {self.VALID_COLUMN} "
+                f"FROM (SELECT {select_columns}, {errors_expression} AS {self.ERRORS_COLUMN} FROM parsed)"
+            )
+            valid_count = con.execute(
+                f"COPY (SELECT {select_columns} FROM checked WHERE {self.VALID_COLUMN}) "
+                f"TO {_quote_literal(valid_path)} (FORMAT PARQUET)"
+            ).fetchone()[0]
+            invalid_count = con.execute(
+                f"COPY (SELECT {select_columns}, array_to_string({self.ERRORS_COLUMN}, '; ') AS quarantine_reason, "
+                f"{_quote_literal(source_file)} AS source_file FROM checked WHERE NOT {self.VALID_COLUMN}) "
+                f"TO {_quote_literal(invalid_path)} (FORMAT PARQUET)"
+            ).fetchone()[0]
+
+        for path, count in ((valid_path, valid_count), (invalid_path, invalid_count)):
+            if not count and os.path.exists(path):
+                os.remove(path)
+
+        self.logger.info(f"Validation for '{source_file}' (schema: {table_or_schema_name}): {valid_count} valid rows, {invalid_count} invalid rows.")
+        return valid_count, invalid_count
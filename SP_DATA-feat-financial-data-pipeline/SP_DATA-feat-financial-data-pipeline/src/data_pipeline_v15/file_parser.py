@@ -5,6 +5,7 @@ import zipfile
 import hashlib
 from io import BytesIO
 import io # Added
+from typing import Iterator
 import pandas as pd
 from .core import constants # 修改：導入常數
 
@@ -15,52 +16,31 @@ class FileParser:
         self.logger = logger
         self.schemas_config = schemas_config # Store schemas_config
 
-    def parse_file(self, file_path: str, staging_dir: str) -> dict: # Removed schemas_config
+    def parse_file(self, file_path: str, staging_dir: str, stream_members: bool = False) -> dict: # Removed schemas_config
         """處理單一來源檔案（CSV 或 ZIP），將其解析並轉換為 Parquet 格式。
         (docstring 已省略)
+
+        stream_members=True 時，ZIP 的 KEY_RESULTS 為 iter_zip_members() 產生器：每個成員在被取用時
+        才讀取與解析，呼叫端處理完一個成員再取下一個，記憶體中同時只有一個成員的資料。
         """
         original_filename = os.path.basename(file_path)
 
         if zipfile.is_zipfile(file_path):
             try:
                 with zipfile.ZipFile(file_path, "r") as z:
-                    csv_files = [
-                        f
-                        for f in z.namelist()
-                        if f.lower().endswith(".csv") and not f.startswith("__MACOSX")
-                    ]
-                    if not csv_files:
-                        return {
-                            constants.KEY_STATUS: constants.STATUS_ERROR,
-                            constants.KEY_FILE: original_filename,
-                            constants.KEY_REASON: "ZIP 檔中未找到任何 CSV 檔案",
-                        }
-                    all_results = []
-                    for csv_name in csv_files:
-                        display_name_in_zip = f"{original_filename}/{csv_name}"
-                        try:
-                            with z.open(csv_name) as csv_file_in_zip:
-                                csv_content = BytesIO(csv_file_in_zip.read())
-                                result = self._parse_content( # Renamed
-                                    csv_content,
-                                    staging_dir,
-                                    # schemas_config removed, will use self.schemas_config
-                                    display_name_in_zip,
-                                )
-                                all_results.append(result)
-                        except Exception as e_zip_read:
-                            all_results.append(
-                                {
-                                    constants.KEY_STATUS: constants.STATUS_ERROR,
-                                    constants.KEY_FILE: display_name_in_zip,
-                                    constants.KEY_REASON: f"讀取 ZIP 中 CSV 時發生錯誤: {e_zip_read}",
-                                }
-                            )
+                    csv_files = self._zip_csv_members(z)
+                if not csv_files:
                     return {
-                        constants.KEY_STATUS: constants.STATUS_GROUP_RESULT,
-                        constants.KEY_RESULTS: all_results,
+                        constants.KEY_STATUS: constants.STATUS_ERROR,
                         constants.KEY_FILE: original_filename,
+                        constants.KEY_REASON: "ZIP 檔中未找到任何 CSV 檔案",
                     }
+                member_results = self.iter_zip_members(file_path, staging_dir, csv_files)
+                return {
+                    constants.KEY_STATUS: constants.STATUS_GROUP_RESULT,
+                    constants.KEY_RESULTS: member_results if stream_members else list(member_results),
+                    constants.KEY_FILE: original_filename,
+                }
             except zipfile.BadZipFile:
                 return {
                     constants.KEY_STATUS: constants.STATUS_ERROR,
@@ -77,6 +57,40 @@ class FileParser:
             # schemas_config removed, will use self.schemas_config
             return self._parse_content(file_path, staging_dir, original_filename) # Renamed
 
+    @staticmethod
+    def _zip_csv_members(z: zipfile.ZipFile) -> list:
+        return [
+            f
+            for f in z.namelist()
+            if f.lower().endswith(".csv") and not f.startswith("__MACOSX")
+        ]
+
+    def iter_zip_members(self, file_path: str, staging_dir: str, csv_names: list = None) -> Iterator[dict]:
+        """逐一產生 ZIP 中每個 CSV 成員的解析結果 (與 _parse_content 的結果格式相同)。
+
+        成員在被取用時才讀入記憶體；單一成員讀取失敗只會產生該成員的錯誤結果，不影響其他成員。
+        """
+        original_filename = os.path.basename(file_path)
+        with zipfile.ZipFile(file_path, "r") as z:
+            if csv_names is None:
+                csv_names = self._zip_csv_members(z)
+            for csv_name in csv_names:
+                display_name_in_zip = f"{original_filename}/{csv_name}"
+                try:
+                    with z.open(csv_name) as csv_file_in_zip:
+                        csv_content = BytesIO(csv_file_in_zip.read())
+                except Exception as e_zip_read:
+                    yield {
+                        constants.KEY_STATUS: constants.STATUS_ERROR,
+                        constants.KEY_FILE: display_name_in_zip,
+                        constants.KEY_REASON: f"讀取 ZIP 中 CSV 時發生錯誤: {e_zip_read}",
+                    }
+                    continue
+                # 產生結果前先釋放成員的原始位元組，避免與下一個成員同時佔用記憶體
+                result = self._parse_content(csv_content, staging_dir, display_name_in_zip)
+                del csv_content
+                yield result
+
     def _parse_content( # Renamed
         self, file_input, staging_dir: str, display_name: str # Renamed file_or_buffer to file_input and removed schemas_config
     ) -> dict:
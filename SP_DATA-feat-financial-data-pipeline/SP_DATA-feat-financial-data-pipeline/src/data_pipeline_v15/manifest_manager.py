@@ -1,8 +1,9 @@
 import hashlib
 import json
 import os
+import tempfile
 from datetime import datetime # Moved here
-from typing import TYPE_CHECKING, Set, Union, Iterable # 為類型提示而添加
+from typing import TYPE_CHECKING, IO, Optional, Set, Union, Iterable # 為類型提示而添加
 
 if TYPE_CHECKING:
     from .utils.logger import Logger # 用於 Logger 的類型提示
@@ -15,6 +16,10 @@ class ManifestManager:
     已處理檔案雜湊值 (hashes) 的 JSON 清單檔案來實現此功能。
     這樣可以避免重複處理相同的檔案，除非明確指示要重新處理。
 
+    每次更新只會在旁邊的只增日誌 (`<manifest>.log`, 每行一筆 JSON) 追加一行，
+    寫入量與清單大小無關；`close()` 時才把日誌壓縮回 JSON 快照並刪除日誌。
+    若程序在壓縮前中斷，下次載入時會先讀快照再重播日誌，不會遺失紀錄。
+
     主要功能包括：
     - 從 JSON 檔案載入已處理的檔案雜湊值集合。
     - 將新的已處理檔案雜湊值儲存回 JSON 檔案。
@@ -29,7 +34,7 @@ class ManifestManager:
     :vartype processed_hashes: set[str]
     """
 
-    def __init__(self, manifest_path: str, logger: 'Logger'):
+    def __init__(self, manifest_path: str, logger: 'Logger', use_stat_fast_path: bool = False):
         """初始化 FileManifest 物件。
 
         在初始化時，會嘗試從指定的 `manifest_path` 載入已處理的雜湊值。
@@ -38,11 +43,29 @@ class ManifestManager:
         :type manifest_path: str
         :param logger: 用於記錄日誌訊息的 Logger 物件執行個體。
         :type logger: data_pipeline_v15.utils.logger.Logger
+        :param use_stat_fast_path: 啟用後，(大小, mtime, inode) 與成功紀錄完全相同的檔案
+                                   直接視為未變更，不再計算雜湊值。預設關閉。
+        :type use_stat_fast_path: bool
         """
         self.path = manifest_path
+        self.log_path = f"{manifest_path}.log"
         self.logger = logger
+        self.use_stat_fast_path = use_stat_fast_path
+        self._log_file: Optional[IO[str]] = None
+        self._stat_index: Optional[dict] = None # (size, mtime_ns, inode) -> 成功紀錄的雜湊鍵，延遲建立
         self.manifest_data = self._load() # Will store {"files": {identifier: {status, message, original_filename}}}
 
+    def __getstate__(self) -> dict:
+        # 協調器會把整個物件 pickle 給工作程序；開啟中的日誌檔案控制代碼不可也不需傳遞
+        state = self.__dict__.copy()
+        state["_log_file"] = None
+        return state
+
+    @staticmethod
+    def _is_success(status: str) -> bool:
+        # 協調器使用 constants.STATUS_SUCCESS ("success")，舊紀錄則為 "SUCCESS"
+        return isinstance(status, str) and status.lower() == "success"
+
     def load_or_create_manifest(self) -> None:
         """
         Ensures the manifest file exists and is loaded.
@@ -50,18 +73,21 @@ class ManifestManager:
         """
         if not os.path.exists(self.path):
             self.logger.info(f"Manifest file '{self.path}' not found. Creating a new empty manifest.")
-            self.manifest_data = {"files": {}}
+            self.manifest_data = self._load() # 仍會重播殘留的更新日誌 (若有)
+            self._stat_index = None
             self._save()
         else:
             # File exists, load it. This is already done by __init__ if path existed then.
             self.manifest_data = self._load() # Ensure it's loaded if it existed.
+            self._stat_index = None
             if not isinstance(self.manifest_data.get("files"), dict): # Ensure "files" key exists and is a dict
                 self.logger.warning(f"Manifest file '{self.path}' is missing 'files' dictionary or it's malformed. Initializing with empty 'files'.")
                 self.manifest_data = {"files": {}}
                 self._save() # Save corrected structure
             self.logger.info(f"Manifest file '{self.path}' loaded.")
 
-    def update_manifest(self, file_identifier_for_hash: str, status: str, message: str, original_filename: str = None) -> None:
+    def update_manifest(self, file_identifier_for_hash: str, status: str, message: str, original_filename: str = None,
+                        file_hash: str = None, file_stat: dict = None) -> None:
         """
         Updates the manifest with the processing status of a file.
         Uses file hash as key for successful records, otherwise uses original_filename.
@@ -72,6 +98,8 @@ class ManifestManager:
             status (str): The status of the processing (e.g., "SUCCESS", "ERROR", "SKIPPED").
             message (str): A message describing the outcome.
             original_filename (str, optional): The original basename of the file. If None, derived from file_identifier_for_hash.
+            file_hash (str, optional): 探索階段已計算的雜湊值；提供時直接使用，不再重新讀檔計算。
+            file_stat (dict, optional): 探索階段的 get_file_stat() 結果，會存入成功紀錄供 stat 快速路徑使用。
         """
         if original_filename is None:
             original_filename = os.path.basename(file_identifier_for_hash)
@@ -83,11 +111,11 @@ class ManifestManager:
         # This means PipelineOrchestrator should pass the *full path* as `file_identifier_for_hash`
         # if it wants hashing to be attempted.
 
-        if status == "SUCCESS": # Replace with constants.STATUS_SUCCESS
+        if self._is_success(status):
             # For successful files, the key should ideally be the hash of the file *content*.
-            # PipelineOrchestrator calls update_manifest with the *original input file path* (or just filename).
-            # We should use the hash of this input file path.
-            file_hash = self.get_file_hash(file_identifier_for_hash) # file_identifier_for_hash should be full path
+            # The orchestrator passes the hash computed during discovery; only hash here when it is missing.
+            if not file_hash:
+                file_hash = self.get_file_hash(file_identifier_for_hash) # file_identifier_for_hash should be full path
             if file_hash:
                 key_to_use = file_hash
                 self.logger.debug(f"File '{original_filename}' (hash: {file_hash}) will be updated in manifest.")
@@ -97,49 +125,118 @@ class ManifestManager:
         else: # For ERROR, SKIPPED, etc.
             key_to_use = original_filename # Use the original filename as the key
 
-        self.manifest_data["files"][key_to_use] = {
+        entry = {
             "status": status,
             "message": message,
             "original_filename": original_filename, # Store original filename for easier debugging
             "timestamp": datetime.now().isoformat() # Add timestamp
         }
+        if file_stat and key_to_use == file_hash:
+            entry.update(file_stat)
+            if self._stat_index is not None:
+                self._stat_index[self._stat_key(file_stat)] = key_to_use
+        self.manifest_data["files"][key_to_use] = entry
         self.logger.info(f"Manifest update for '{original_filename}' (key: {key_to_use}): Status - {status}, Message - {message}")
-        self._save()
+        self._append_log(key_to_use, entry)
 
     def _load(self) -> dict:
-        """從指定的路徑載入 manifest data。
+        """從指定的路徑載入 manifest data，並重播尚未壓縮的更新日誌。
 
         如果檔案不存在，則返回 {"files": {}}。
         如果在讀取或解析現有檔案時發生任何錯誤，則會記錄錯誤並回傳 {"files": {}}。
         """
-        if not os.path.exists(self.path):
-            return {"files": {}}
-        try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        data = {"files": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if not isinstance(loaded, dict) or not isinstance(loaded.get("files"), dict):
                     self.logger.warning(f"Manifest file '{self.path}' is malformed. Initializing with empty 'files'.")
-                    return {"files": {}}
-                return data
+                else:
+                    data = loaded
+            except Exception as e:
+                self.logger.error(f"載入 Manifest 檔案 '{self.path}' 時發生錯誤: {e}")
+
+        replayed = self._replay_log(data["files"])
+        if replayed:
+            self.logger.info(f"已從 Manifest 更新日誌 '{self.log_path}' 重播 {replayed} 筆未壓縮的紀錄。")
+        return data
+
+    def _replay_log(self, files: dict) -> int:
+        """將更新日誌中的紀錄依序套用到 `files`，返回套用的筆數 (最後一行若寫到一半則略過)。"""
+        if not os.path.exists(self.log_path):
+            return 0
+        replayed = 0
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        key = record.pop("key")
+                    except (json.JSONDecodeError, KeyError, AttributeError):
+                        self.logger.warning(f"略過 Manifest 更新日誌中無法解析的一行: {line[:200]!r}")
+                        continue
+                    files[key] = record
+                    replayed += 1
+        except OSError as e:
+            self.logger.error(f"讀取 Manifest 更新日誌 '{self.log_path}' 時發生錯誤: {e}")
+        return replayed
+
+    def _append_log(self, key: str, entry: dict) -> None:
+        """在更新日誌追加一行 (只寫這一筆，與清單大小無關)。"""
+        try:
+            if self._log_file is None:
+                manifest_dir = os.path.dirname(self.path) or "."
+                os.makedirs(manifest_dir, exist_ok=True)
+                self._log_file = open(self.log_path, "a", encoding="utf-8")
+            self._log_file.write(json.dumps({"key": key, **entry}, ensure_ascii=False) + "\n")
+            self._log_file.flush()
         except Exception as e:
-            self.logger.error(f"載入 Manifest 檔案 '{self.path}' 時發生錯誤: {e}")
-            return {"files": {}} # Return empty structure on error
+            self.logger.error(f"寫入 Manifest 更新日誌 '{self.log_path}' 時發生錯誤: {e}")
+
+    def _save(self) -> bool:
+        """將目前的 manifest_data 以原子方式 (暫存檔 + os.replace) 儲存到清單檔案中。
 
-    def _save(self) -> None:
-        """將目前的 manifest_data 儲存到清單檔案中。
+        :return: 快照是否已成功以 os.replace 取代清單檔案；失敗時已記錄錯誤並回傳 False。
+        :rtype: bool
         """
         try:
-            print(f"DEBUG_MANIFEST: Saving manifest to: {self.path}") # DEBUG line
-            print(f"DEBUG_MANIFEST: Data being saved: {self.manifest_data}") # DEBUG line
             manifest_dir = os.path.dirname(self.path)
             if not manifest_dir:
                 manifest_dir = "."
             os.makedirs(manifest_dir, exist_ok=True)
 
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.manifest_data, f, indent=2, ensure_ascii=False)
+            fd, tmp_path = tempfile.mkstemp(prefix=".manifest.", suffix=".tmp", dir=manifest_dir)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.manifest_data, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
         except Exception as e:
             self.logger.error(f"儲存 Manifest 檔案 '{self.path}' 時發生錯誤: {e}")
+            return False
+        return True
+
+    def compact(self) -> None:
+        """把更新日誌壓縮進 JSON 快照：先寫入完整快照，成功後才刪除日誌。"""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        if not os.path.exists(self.log_path):
+            return
+        if not self._save():
+            # 快照未成功寫入：保留日誌，下次載入時仍可重播，不會遺失紀錄
+            self.logger.warning(f"Manifest 快照寫入失敗，保留更新日誌 '{self.log_path}'。")
+            return
+        os.remove(self.log_path)
+        self.logger.info(f"Manifest 更新日誌已壓縮至 '{self.path}'。")
+
+    def close(self) -> None:
+        """結束使用前呼叫：壓縮更新日誌，讓清單檔案本身即為完整紀錄 (例如同步至遠端前)。"""
+        self.compact()
 
     @staticmethod
     def get_file_hash(file_path: str) -> Union[str, None]:
@@ -169,6 +266,34 @@ class ManifestManager:
             return None
 
 
+    @staticmethod
+    def get_file_stat(file_path: str) -> Optional[dict]:
+        """取得檔案的 (大小, mtime, inode)，供 stat 快速路徑比對；檔案不存在時回傳 None。"""
+        try:
+            st = os.stat(file_path)
+        except (OSError, TypeError, ValueError):
+            return None
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+    @staticmethod
+    def _stat_key(file_stat: dict) -> tuple:
+        return (file_stat.get("size"), file_stat.get("mtime_ns"), file_stat.get("inode"))
+
+    def find_unchanged_hash(self, file_stat: Optional[dict]) -> Optional[str]:
+        """stat 快速路徑：若 file_stat 與某筆成功紀錄的 (大小, mtime, inode) 完全相同，回傳該紀錄的雜湊值。
+
+        未啟用 use_stat_fast_path、沒有 stat 或找不到相符紀錄時回傳 None，呼叫端應改為計算雜湊值。
+        """
+        if not self.use_stat_fast_path or not file_stat:
+            return None
+        if self._stat_index is None:
+            self._stat_index = {
+                self._stat_key(entry): key
+                for key, entry in self.manifest_data.get("files", {}).items()
+                if self._is_success(entry.get("status")) and "inode" in entry
+            }
+        return self._stat_index.get(self._stat_key(file_stat))
+
     def has_been_processed(self, file_hash_or_name: str) -> bool:
         """
         Checks if a file (identified by hash for successes, or name for errors/skips)
@@ -180,7 +305,7 @@ class ManifestManager:
             bool: True if the file has a "SUCCESS" status in the manifest, False otherwise.
         """
         entry = self.manifest_data.get("files", {}).get(file_hash_or_name)
-        if entry and entry.get("status") == "SUCCESS": # Replace with constants.STATUS_SUCCESS
+        if entry and self._is_success(entry.get("status")):
             return True
         return False
 
@@ -31,6 +31,7 @@ from .database_loader import DatabaseLoader
 from .file_parser import FileParser
 from .manifest_manager import ManifestManager
 from .data_validator import Validator # Import Validator
+from .utils.file_sync import FileSynchronizer
 from .utils.logger import setup_logger
 from .utils.monitor import get_hardware_usage
 
@@ -132,6 +133,9 @@ class PipelineOrchestrator:
                 self.logger.warning(f"設定檔中的 max_workers ('{config_max_workers}') 無法轉換為整數，將預設為 4。")
                 self.max_workers = 4
 
+        # 遠端 <-> 本地同步：掛載的網路磁碟每個檔案延遲高，以執行緒池並行複製有變更的檔案
+        self.file_sync = FileSynchronizer(self.logger, max_workers=self.config.get("sync_max_workers") or 4)
+
         # _setup_directories will now primarily ensure local structure. Remote structure is assumed or handled by sync.
         # os.makedirs(self.local_db_path, exist_ok=True) # Done in _setup_local_directories
 
@@ -209,7 +213,11 @@ class PipelineOrchestrator:
         # --- 模組初始化 ---
         # ManifestManager and DatabaseLoader now operate on local paths
         # Local directories including DB path are now created by _setup_local_directories() above.
-        self.manifest_manager = ManifestManager(manifest_path=self.local_manifest_file, logger=self.logger)
+        self.manifest_manager = ManifestManager(
+            manifest_path=self.local_manifest_file,
+            logger=self.logger,
+            use_stat_fast_path=bool(self.config.get("manifest_stat_fast_path", False)),
+        )
         self.file_parser = FileParser(self.manifest_manager, self.logger, self.schemas_config)
         self.db_loader = DatabaseLoader(self.local_database_file, self.logger) # Operates on local DB file
 
@@ -311,29 +319,14 @@ class PipelineOrchestrator:
 
     def _sync_file(self, source_file: Path, dest_file: Path, direction: str):
         """同步單個檔案，如果來源存在。 direction 是 'to_local' 或 'to_remote'."""
-        if source_file.exists():
-            try:
-                # Ensure destination directory exists
-                dest_file.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(source_file, dest_file)
-                self.logger.info(f"同步 ({direction}): '{source_file}' -> '{dest_file}'")
-            except Exception as e:
-                self.logger.error(f"同步 ({direction}) 檔案 '{source_file}' 至 '{dest_file}' 失敗: {e}")
-        else:
-            self.logger.info(f"同步 ({direction}): 來源檔案 '{source_file}' 不存在，跳過。")
+        self.file_sync.sync_file(source_file, dest_file, direction)
 
     def _sync_directory_content(self, source_dir: Path, dest_dir: Path, direction: str):
-        """同步目錄內容 (非遞迴，僅檔案)。 direction 是 'to_local' 或 'to_remote'."""
-        if not source_dir.exists():
-            self.logger.warning(f"同步 ({direction}): 來源目錄 '{source_dir}' 不存在，跳過。")
-            return
+        """同步目錄內容 (非遞迴，僅檔案)。 direction 是 'to_local' 或 'to_remote'.
 
-        dest_dir.mkdir(parents=True, exist_ok=True) # Ensure destination directory exists
-
-        for item in source_dir.iterdir():
-            if item.is_file():
-                self._sync_file(item, dest_dir / item.name, direction)
-            # Optionally handle subdirectories if recursive sync is needed for some folders
+        只複製大小/mtime (必要時雜湊值) 不同的檔案，並以執行緒池並行處理。
+        """
+        self.file_sync.sync_directory(source_dir, dest_dir, direction)
 
     def _process_single_file(self, filename: str) -> dict:
         """
@@ -343,7 +336,13 @@ class PipelineOrchestrator:
         local_file_path = self.local_input_path / filename
         self.logger.info(f"並行處理中 - 開始檢查檔案: {filename} (路徑: {local_file_path})")
 
-        file_hash = ManifestManager.get_file_hash(str(local_file_path))
+        # (大小, mtime, inode) 與成功紀錄相同時可直接取得雜湊值，不必讀取整個檔案
+        file_stat = ManifestManager.get_file_stat(str(local_file_path))
+        file_hash = self.manifest_manager.find_unchanged_hash(file_stat)
+        if file_hash:
+            self.logger.info(f"並行處理中 - 檔案 '{filename}' 的 stat 與既有成功紀錄相同，略過雜湊計算。")
+        else:
+            file_hash = ManifestManager.get_file_hash(str(local_file_path))
         if not file_hash:
             self.logger.error(f"並行處理中 - 無法計算檔案雜湊值: {local_file_path}。將標記為錯誤。")
             # manifest_manager is not directly updatable from here in a process-safe way for the main manifest
@@ -372,6 +371,7 @@ class PipelineOrchestrator:
                 "filename": filename,
                 "original_file_path": str(local_file_path),
                 "file_hash": file_hash,
+                "file_stat": file_stat,
                 "status": constants.STATUS_SKIPPED, # Mark as skipped
                 "message": f"檔案 '{filename}' (雜湊: {file_hash}) 已被處理過。",
                 "parquet_path": None,
@@ -386,13 +386,24 @@ class PipelineOrchestrator:
             # This should ideally be a unique temp location per process or use unique filenames if processes share it.
             # For now, assuming self.local_processed_path is okay if filenames are unique (which they are).
             # Or, parse_file itself handles unique temp file creation within that dir.
-            parse_result = self.file_parser.parse_file(str(local_file_path), str(self.local_processed_path))
+            parse_result = self.file_parser.parse_file(str(local_file_path), str(self.local_processed_path), stream_members=True)
+            # 驗證與寫出 Parquet 分片也在工作程序內完成，只把路徑與筆數傳回主程序
+            if parse_result.get(constants.KEY_STATUS) == constants.STATUS_GROUP_RESULT:
+                # ZIP 成員逐一解析、驗證並寫出分片，處理完一個才解析下一個
+                staged_sub_results = []
+                for sub_result in parse_result.get(constants.KEY_RESULTS) or []:
+                    self._stage_validated_shards(sub_result, filename, sub_result.get(constants.KEY_FILE, "unknown_subfile"))
+                    staged_sub_results.append(sub_result)
+                parse_result[constants.KEY_RESULTS] = staged_sub_results
+            else:
+                self._stage_validated_shards(parse_result, filename, filename)
         except Exception as e:
             self.logger.error(f"並行處理中 - 檔案 '{filename}' 解析時發生未預期錯誤: {e}", exc_info=True)
             return {
                 "filename": filename,
                 "original_file_path": str(local_file_path),
                 "file_hash": file_hash, # Hash was successful
+                "file_stat": file_stat,
                 "status": constants.STATUS_ERROR,
                 "message": f"檔案 '{filename}' 解析時發生未預期錯誤: {e}",
                 "parquet_path": None, "table_name": None, "data_count": 0
@@ -403,9 +414,13 @@ class PipelineOrchestrator:
             "filename": filename,
             "original_file_path": str(local_file_path),
             "file_hash": file_hash,
+            "file_stat": file_stat,
             "status": parse_result.get(constants.KEY_STATUS, constants.STATUS_ERROR),
             "message": parse_result.get(constants.KEY_REASON, f"檔案 '{filename}' 處理時遇到未知狀況。"),
-            constants.KEY_DATAFRAME: parse_result.get(constants.KEY_DATAFRAME), # Pass DataFrame
+            constants.KEY_VALID_PATH: parse_result.get(constants.KEY_VALID_PATH),
+            constants.KEY_VALID_COUNT: parse_result.get(constants.KEY_VALID_COUNT, 0),
+            constants.KEY_INVALID_PATH: parse_result.get(constants.KEY_INVALID_PATH),
+            constants.KEY_INVALID_COUNT: parse_result.get(constants.KEY_INVALID_COUNT, 0),
             constants.KEY_MATCHED_SCHEMA_NAME: parse_result.get(constants.KEY_MATCHED_SCHEMA_NAME), # Pass schema name
             # KEY_PATH is no longer provided by FileParser directly for the final valid parquet
             "table_name": parse_result.get(constants.KEY_TABLE), # DB target table name
@@ -413,8 +428,36 @@ class PipelineOrchestrator:
             "sub_results": parse_result.get(constants.KEY_RESULTS)
         }
 
-    def _dataframe_to_temp_parquet(self, df, temp_identifier: str, original_filename_for_hash: str) -> Path:
-        """Helper to save a DataFrame to a uniquely named Parquet file in a temporary local staging area."""
+    def _stage_validated_shards(self, parse_item: dict, filename: str, source_name: str) -> None:
+        """
+        在工作程序內驗證單一解析結果，並把有效/無效資料各自寫成 Parquet 分片。
+        DataFrame 會從 parse_item 中移除，改填入分片路徑與筆數 (KEY_VALID_* / KEY_INVALID_*)，
+        避免把整個 DataFrame pickle 回主程序。
+        """
+        df = parse_item.pop(constants.KEY_DATAFRAME, None)
+        parse_item[constants.KEY_VALID_PATH] = None
+        parse_item[constants.KEY_VALID_COUNT] = 0
+        parse_item[constants.KEY_INVALID_PATH] = None
+        parse_item[constants.KEY_INVALID_COUNT] = 0
+        if parse_item.get(constants.KEY_STATUS) != constants.STATUS_SUCCESS or df is None or df.empty:
+            return
+
+        schema_name = parse_item.get(constants.KEY_MATCHED_SCHEMA_NAME, "unknown_schema")
+        self.logger.info(f"並行處理中 - 對 '{source_name}' (schema: {schema_name}) 執行資料驗證...")
+        valid_path = self._temp_parquet_path(f"valid_{source_name}", filename)
+        invalid_path = self._temp_parquet_path(f"quarantine_{source_name}", filename)
+        # 規則在 DuckDB 內向量化執行，有效/無效列直接 COPY 成 Parquet
+        valid_count, invalid_count = self.validator.validate_to_parquet(df, source_name, schema_name, str(valid_path), str(invalid_path))
+
+        if invalid_count:
+            parse_item[constants.KEY_INVALID_PATH] = str(invalid_path)
+            parse_item[constants.KEY_INVALID_COUNT] = invalid_count
+        if valid_count:
+            parse_item[constants.KEY_VALID_PATH] = str(valid_path)
+            parse_item[constants.KEY_VALID_COUNT] = valid_count
+
+    def _temp_parquet_path(self, temp_identifier: str, original_filename_for_hash: str) -> Path:
+        """Helper to build a uniquely named Parquet path in a temporary local staging area."""
         # Use a consistent staging area for these intermediate parquets
         temp_parquet_staging_dir = self.local_project_path / "temp_intermediate_parquets"
         temp_parquet_staging_dir.mkdir(parents=True, exist_ok=True)
@@ -422,13 +465,9 @@ class PipelineOrchestrator:
         # Create a unique filename to avoid clashes if multiple DFs from same original file (e.g. valid/invalid splits)
         # Using time might lead to issues if called too quickly for the same file, hash of content might be better
         # but for simplicity, a hash of original filename + identifier + time should be reasonably unique.
-        unique_hash_input = f"{original_filename_for_hash}_{temp_identifier}_{time.time_ns()}"
+        unique_hash_input = f"{original_filename_for_hash}_{temp_identifier}_{os.getpid()}_{time.time_ns()}"
         file_hash = hashlib.sha256(unique_hash_input.encode()).hexdigest()
-        parquet_path = temp_parquet_staging_dir / f"{file_hash}.parquet"
-
-        df.to_parquet(parquet_path, engine="pyarrow", index=False)
-        self.logger.info(f"DataFrame ({temp_identifier} for {original_filename_for_hash}) saved to temporary Parquet: {parquet_path}")
-        return parquet_path
+        return temp_parquet_staging_dir / f"{file_hash}.parquet"
 
     def run(self):
         """執行完整數據管線，採用本地優先工作流程並行處理檔案解析。"""
@@ -515,7 +554,10 @@ class PipelineOrchestrator:
                 file_hash = result_item["file_hash"]
                 current_status = result_item["status"]
                 current_message = result_item["message"]
-                parsed_df = result_item.get(constants.KEY_DATAFRAME)
+                valid_parquet_path = result_item.get(constants.KEY_VALID_PATH)
+                valid_count = result_item.get(constants.KEY_VALID_COUNT, 0)
+                invalid_parquet_path = result_item.get(constants.KEY_INVALID_PATH)
+                invalid_count = result_item.get(constants.KEY_INVALID_COUNT, 0)
                 db_target_table = result_item.get("table_name")
                 matched_schema_name_for_rules = result_item.get(constants.KEY_MATCHED_SCHEMA_NAME, "unknown_schema")
 
@@ -544,32 +586,32 @@ class PipelineOrchestrator:
                             sub_filename = sub_result.get(constants.KEY_FILE, "unknown_subfile")
                             sub_status = sub_result.get(constants.KEY_STATUS)
                             sub_message = sub_result.get(constants.KEY_REASON, "無子項目訊息。")
-                            sub_df = sub_result.get(constants.KEY_DATAFRAME)
+                            sub_valid_path = sub_result.get(constants.KEY_VALID_PATH)
+                            sub_valid_count = sub_result.get(constants.KEY_VALID_COUNT, 0)
+                            sub_invalid_path = sub_result.get(constants.KEY_INVALID_PATH)
+                            sub_invalid_count = sub_result.get(constants.KEY_INVALID_COUNT, 0)
                             sub_db_target_table = sub_result.get(constants.KEY_TABLE)
                             sub_matched_schema = sub_result.get(constants.KEY_MATCHED_SCHEMA_NAME, "unknown_schema")
 
                             sub_file_messages.append(f"  - 子檔案 '{sub_filename}': {sub_status} ({sub_message})")
 
-                            if sub_status == constants.STATUS_SUCCESS and sub_df is not None and not sub_df.empty:
-                                self.report_stats["rows_source_total_from_parsed_files"] += len(sub_df)
-                                self.logger.info(f"  對子檔案 '{sub_filename}' (schema: {sub_matched_schema}) 執行資料驗證...")
-                                valid_sub_df, invalid_sub_df = self.validator.validate(sub_df, sub_filename, sub_matched_schema)
+                            if sub_status == constants.STATUS_SUCCESS and (sub_valid_count + sub_invalid_count) > 0:
+                                self.report_stats["rows_source_total_from_parsed_files"] += sub_valid_count + sub_invalid_count
+                                self.logger.info(f"  子檔案 '{sub_filename}' (schema: {sub_matched_schema}) 驗證結果: {sub_valid_count} 行有效, {sub_invalid_count} 行無效。")
 
-                                if not invalid_sub_df.empty:
-                                    self.report_stats["rows_added_to_quarantine_table"] += len(invalid_sub_df)
-                                    quarantined_sub_rows_count += len(invalid_sub_df)
+                                if sub_invalid_count:
+                                    self.report_stats["rows_added_to_quarantine_table"] += sub_invalid_count
+                                    quarantined_sub_rows_count += sub_invalid_count
                                     file_had_quarantined_rows = True # Mark parent zip if any subfile has quarantined rows
                                     try:
-                                        invalid_parquet_path = self._dataframe_to_temp_parquet(invalid_sub_df, f"quarantine_{sub_filename}", filename)
-                                        self.db_loader.load_parquet("quarantine_data", str(invalid_parquet_path))
+                                        self.db_loader.load_parquet("quarantine_data", sub_invalid_path)
                                     except Exception as e_q_sub:
                                         self.logger.error(f"    將子檔案 '{sub_filename}' 的無效數據載入至隔離區時失敗: {e_q_sub}")
                                         # This sub-file's valid part might still load.
 
-                                if not valid_sub_df.empty:
+                                if sub_valid_count:
                                     try:
-                                        valid_parquet_path = self._dataframe_to_temp_parquet(valid_sub_df, f"valid_{sub_filename}", filename)
-                                        load_stats = self.db_loader.load_parquet(sub_db_target_table, str(valid_parquet_path))
+                                        load_stats = self.db_loader.load_parquet(sub_db_target_table, sub_valid_path)
                                         self.report_stats["rows_added_to_main_tables"] += load_stats["rows_inserted"]
                                         self.report_stats["rows_skipped_on_load_due_to_conflict"] += (load_stats["rows_in_source"] - load_stats["rows_inserted"])
                                         loaded_sub_rows_count += load_stats["rows_inserted"]
@@ -578,12 +620,8 @@ class PipelineOrchestrator:
                                     except Exception as e_l_sub:
                                         self.logger.error(f"    載入子檔案 '{sub_filename}' 的有效數據至主表 '{sub_db_target_table}' 時失敗: {e_l_sub}")
                                         # This sub-file counts as failed.
-                                elif invalid_sub_df.empty : # valid_sub_df is empty AND invalid_sub_df is also empty (e.g. parse ok, but df was empty)
-                                    self.logger.warning(f"  子檔案 '{sub_filename}' 解析後無數據可載入。")
-                                    # This sub-file is not an error, but also not a success in terms of data loaded.
-                                    # It doesn't change all_sub_failed_or_skipped if others succeed.
 
-                            elif sub_status == constants.STATUS_SUCCESS and (sub_df is None or sub_df.empty): # Parsed OK, but no data
+                            elif sub_status == constants.STATUS_SUCCESS: # Parsed OK, but no data
                                 self.logger.warning(f"  子檔案 '{sub_filename}' 解析成功但無數據，將跳過載入。")
                                 # This is not a failure that makes the whole ZIP fail if other files are fine.
                                 # It doesn't change all_sub_failed_or_skipped if others succeed.
@@ -619,35 +657,32 @@ class PipelineOrchestrator:
                 elif current_status == constants.STATUS_ERROR: # Error during parsing in _process_single_file
                     self.report_stats["files_failed_parsing_or_other_error"] += 1
                     # No further processing, status and message already set
-                elif parsed_df is not None and not parsed_df.empty: # This is for non-ZIP files or successfully parsed single files
-                    self.report_stats["rows_source_total_from_parsed_files"] += len(parsed_df)
-                    self.logger.info(f"對檔案 '{filename}' (schema: {matched_schema_name_for_rules}) 執行資料驗證...")
-                    valid_df, invalid_df = self.validator.validate(parsed_df, filename, matched_schema_name_for_rules)
+                elif valid_count + invalid_count > 0: # This is for non-ZIP files or successfully parsed single files
+                    self.report_stats["rows_source_total_from_parsed_files"] += valid_count + invalid_count
+                    self.logger.info(f"檔案 '{filename}' (schema: {matched_schema_name_for_rules}) 驗證結果: {valid_count} 行有效, {invalid_count} 行無效。")
 
-                    if not invalid_df.empty:
-                        self.report_stats["rows_added_to_quarantine_table"] += len(invalid_df)
+                    if invalid_count:
+                        self.report_stats["rows_added_to_quarantine_table"] += invalid_count
                         file_had_quarantined_rows = True
-                        self.logger.warning(f"檔案 '{filename}' 中有 {len(invalid_df)} 行數據未通過驗證，將移至隔離資料庫表。")
+                        self.logger.warning(f"檔案 '{filename}' 中有 {invalid_count} 行數據未通過驗證，將移至隔離資料庫表。")
                         try:
-                            invalid_parquet_path = self._dataframe_to_temp_parquet(invalid_df, "quarantine", filename)
                             # For quarantine_data, we don't need to track skipped rows due to conflict, assume all load.
-                            self.db_loader.load_parquet("quarantine_data", str(invalid_parquet_path))
-                            self.logger.info(f"已將 {len(invalid_df)} 行無效數據從 '{filename}' 載入至 'quarantine_data' 表。")
+                            self.db_loader.load_parquet("quarantine_data", invalid_parquet_path)
+                            self.logger.info(f"已將 {invalid_count} 行無效數據從 '{filename}' 載入至 'quarantine_data' 表。")
                         except Exception as e_quarantine:
                             self.logger.error(f"將 '{filename}' 的無效數據載入至隔離區時失敗: {e_quarantine}")
                             final_overall_status_for_file = constants.STATUS_ERROR # Mark file as error if quarantine load fails
                             final_overall_message_for_file += f"; 隔離區載入失敗: {e_quarantine}"
 
-                    if valid_df.empty and not file_had_quarantined_rows: # No valid data and nothing was quarantined (e.g. all rows failed validation but invalid_df was empty due to other reasons)
+                    if not valid_count and not file_had_quarantined_rows: # No valid data and nothing was quarantined (e.g. all rows failed validation but invalid_df was empty due to other reasons)
                         self.logger.warning(f"檔案 '{filename}' 經過解析和驗證後，沒有有效的數據可載入主表。")
                         if final_overall_status_for_file != constants.STATUS_ERROR: # Don't override if already error
                             final_overall_status_for_file = constants.STATUS_ERROR
                         final_overall_message_for_file = f"所有數據行均未通過驗證或解析後為空 (原始訊息: {current_message})"
-                    elif not valid_df.empty : # There is valid data to load
-                        self.logger.info(f"檔案 '{filename}' 有 {len(valid_df)} 行有效數據準備載入主表 '{db_target_table}'。")
+                    elif valid_count: # There is valid data to load
+                        self.logger.info(f"檔案 '{filename}' 有 {valid_count} 行有效數據準備載入主表 '{db_target_table}'。")
                         try:
-                            valid_parquet_path = self._dataframe_to_temp_parquet(valid_df, "valid", filename)
-                            load_stats = self.db_loader.load_parquet(db_target_table, str(valid_parquet_path))
+                            load_stats = self.db_loader.load_parquet(db_target_table, valid_parquet_path)
 
                             self.report_stats["rows_added_to_main_tables"] += load_stats["rows_inserted"]
                             self.report_stats["rows_skipped_on_load_due_to_conflict"] += (load_stats["rows_in_source"] - load_stats["rows_inserted"])
@@ -657,7 +692,7 @@ class PipelineOrchestrator:
                             final_overall_status_for_file = constants.STATUS_SUCCESS
                             final_overall_message_for_file = f"成功處理並載入 {load_stats['rows_inserted']} 行有效數據。"
                             if file_had_quarantined_rows:
-                                final_overall_message_for_file += f" {len(invalid_df)} 行數據被隔離。"
+                                final_overall_message_for_file += f" {invalid_count} 行數據被隔離。"
                             if load_stats["rows_in_source"] - load_stats["rows_inserted"] > 0:
                                 final_overall_message_for_file += f" {load_stats['rows_in_source'] - load_stats['rows_inserted']} 行因主鍵衝突被跳過。"
                         except Exception as e_load_valid:
@@ -672,7 +707,7 @@ class PipelineOrchestrator:
                          self.report_stats["files_with_quarantined_rows"] +=1
 
 
-                elif current_status == constants.STATUS_SUCCESS and (parsed_df is None or parsed_df.empty): # Parsed OK, but no data
+                elif current_status == constants.STATUS_SUCCESS: # Parsed OK, but no data
                     self.logger.warning(f"檔案 '{filename}' 解析成功但無數據，將跳過載入。")
                     final_overall_status_for_file = constants.STATUS_SKIPPED
                     final_overall_message_for_file = "解析成功但無數據可載入。"
@@ -710,8 +745,9 @@ class PipelineOrchestrator:
                     str(original_file_path), # Path for hashing or identification
                     final_overall_status_for_file,
                     final_overall_message_for_file,
-                    original_filename=filename # This is display_name
-                    # file_hash_override was removed as it's not an accepted argument
+                    original_filename=filename, # This is display_name
+                    file_hash=file_hash, # 探索階段已算好的雜湊值 (原始檔案此時可能已被移走)
+                    file_stat=result_item.get("file_stat"),
                 )
                 self.logger.info(f"--- 檔案 '{filename}' 處理完畢。最終狀態: {final_overall_status_for_file} ---")
             self.logger.info("所有檔案解析結果處理完成。")
@@ -766,6 +802,10 @@ class PipelineOrchestrator:
             else:
                 self.logger.warning("DB Loader 未定義或不存在，無法在同步前關閉連接。")
 
+            # 同理，先把 Manifest 的更新日誌壓縮回清單檔案，同步出去的才是完整紀錄。
+            if hasattr(self, 'manifest_manager') and self.manifest_manager:
+                self.manifest_manager.close()
+
             self.logger.info("--- 開始結束時同步 (本地 DB/Manifest -> 遠端) ---")
             if hasattr(self, 'local_database_file') and self.local_database_file.exists():
                 self._sync_file(self.local_database_file, self.remote_database_file, "to_remote")
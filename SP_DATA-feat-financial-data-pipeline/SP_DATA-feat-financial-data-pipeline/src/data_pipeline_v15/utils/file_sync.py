@@ -0,0 +1,126 @@
+import concurrent.futures
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Union
+
+if TYPE_CHECKING:
+    from .logger import Logger # 用於 Logger 的類型提示
+
+
+class FileSynchronizer:
+    """遠端 (例如掛載的雲端硬碟) 與本地目錄之間的檔案同步器。
+
+    - 先比較大小與 mtime (秒級)：大小不同即複製；大小與 mtime 皆相同即視為未變更。
+    - 大小相同但 mtime 不同時，才計算兩邊的 SHA256 判斷內容是否真的不同。
+    - 需要複製的檔案以有上限的執行緒池並行處理；掛載的網路磁碟每個檔案的延遲都很高，
+      並行可以把這些等待重疊起來。
+    - 寫入一律先複製到目的目錄中的暫存檔，再以 os.replace 原子性地改名，
+      中斷時不會留下寫到一半的目的檔案。
+
+    :ivar logger: 用於記錄日誌的 Logger 物件執行個體。
+    :vartype logger: data_pipeline_v15.utils.logger.Logger
+    :ivar max_workers: 同步目錄時並行複製的最大執行緒數。
+    :vartype max_workers: int
+    """
+
+    def __init__(self, logger: 'Logger', max_workers: int = 4):
+        """
+        :param logger: 用於記錄日誌訊息的 Logger 物件執行個體。
+        :type logger: data_pipeline_v15.utils.logger.Logger
+        :param max_workers: 同步目錄時並行複製的最大執行緒數，至少為 1。
+        :type max_workers: int
+        """
+        self.logger = logger
+        self.max_workers = max(1, int(max_workers))
+
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        sha256_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                sha256_hash.update(chunk)
+        return sha256_hash.hexdigest()
+
+    def needs_copy(self, source_file: Path, dest_file: Path) -> bool:
+        """判斷 source_file 是否需要複製到 dest_file。
+
+        :return: 目的檔案不存在或內容可能不同時為 True。
+        :rtype: bool
+        """
+        try:
+            dest_stat = dest_file.stat()
+        except FileNotFoundError:
+            return True
+        source_stat = source_file.stat()
+
+        if source_stat.st_size != dest_stat.st_size:
+            return True
+        if int(source_stat.st_mtime) == int(dest_stat.st_mtime):
+            return False
+
+        # 大小相同但 mtime 不同：以雜湊值判斷，內容相同時順便對齊 mtime，下次即可直接略過
+        if self._file_hash(source_file) != self._file_hash(dest_file):
+            return True
+        shutil.copystat(source_file, dest_file)
+        return False
+
+    def _atomic_copy(self, source_file: Path, dest_file: Path) -> None:
+        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = dest_file.parent / f".{dest_file.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copy2(source_file, tmp_file)
+            os.replace(tmp_file, dest_file)
+        except BaseException:
+            if tmp_file.exists():
+                tmp_file.unlink()
+            raise
+
+    def sync_file(self, source_file: Union[str, Path], dest_file: Union[str, Path], direction: str) -> str:
+        """同步單個檔案。 direction 是 'to_local' 或 'to_remote'，僅用於日誌。
+
+        :return: 'copied'、'unchanged'、'missing' (來源不存在) 或 'failed'。
+        :rtype: str
+        """
+        source_file, dest_file = Path(source_file), Path(dest_file)
+        if not source_file.exists():
+            self.logger.info(f"同步 ({direction}): 來源檔案 '{source_file}' 不存在，跳過。")
+            return "missing"
+        try:
+            if not self.needs_copy(source_file, dest_file):
+                self.logger.debug(f"同步 ({direction}): '{dest_file}' 已是最新，跳過。")
+                return "unchanged"
+            self._atomic_copy(source_file, dest_file)
+            self.logger.info(f"同步 ({direction}): '{source_file}' -> '{dest_file}'")
+            return "copied"
+        except Exception as e:
+            self.logger.error(f"同步 ({direction}) 檔案 '{source_file}' 至 '{dest_file}' 失敗: {e}")
+            return "failed"
+
+    def sync_directory(self, source_dir: Union[str, Path], dest_dir: Union[str, Path], direction: str) -> Dict[str, int]:
+        """並行同步目錄內容 (非遞迴，僅檔案)。
+
+        :return: 各結果 ('copied'、'unchanged'、'failed' ...) 的檔案數。
+        :rtype: dict[str, int]
+        """
+        source_dir, dest_dir = Path(source_dir), Path(dest_dir)
+        counts: Dict[str, int] = {}
+        if not source_dir.exists():
+            self.logger.warning(f"同步 ({direction}): 來源目錄 '{source_dir}' 不存在，跳過。")
+            return counts
+
+        dest_dir.mkdir(parents=True, exist_ok=True) # Ensure destination directory exists
+        source_files = [item for item in source_dir.iterdir() if item.is_file()]
+        if not source_files:
+            return counts
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(source_files))) as executor:
+            futures = [executor.submit(self.sync_file, item, dest_dir / item.name, direction) for item in source_files]
+            for future in concurrent.futures.as_completed(futures):
+                outcome = future.result()
+                counts[outcome] = counts.get(outcome, 0) + 1
+
+        self.logger.info(f"同步 ({direction}) 目錄 '{source_dir}' -> '{dest_dir}' 完成: {counts}")
+        return counts
@@ -1,3 +1,7 @@
+import bisect
+import json
+import os
+from collections import deque
 import pandas as pd
 from typing import Dict, Any, Optional # Ensure Optional is imported
 import numpy as np
@@ -11,10 +15,81 @@ if not logger.handlers and not logging.getLogger().hasHandlers(): # Check root l
     logger.addHandler(logging.NullHandler())
     logger.debug(f"Logger for {__name__} (IndicatorEngine module) configured with NullHandler for atomic script.")
 
+class RollingPercentileRank:
+    """
+    可逐期推進的滾動百分位排名視窗：保存最近 window 期的原始值 (含 NaN) 與排序後的非 NaN 值。
+    push() 回傳當期值在視窗中的百分位 (同值取平均排名)，與 pandas rank(pct=True) 相同；
+    每期只做一次插入/刪除與兩次二分搜尋。
+    """
+    def __init__(self, window: int, min_periods: int):
+        self.window = window
+        self.min_periods = min_periods
+        self.values = deque()
+        self.sorted_values = []
+
+    def push(self, value: float) -> float:
+        value = float(value)
+        if len(self.values) == self.window:
+            expired = self.values.popleft()
+            if not np.isnan(expired):
+                del self.sorted_values[bisect.bisect_left(self.sorted_values, expired)]
+        self.values.append(value)
+        if np.isnan(value):
+            return np.nan
+        bisect.insort(self.sorted_values, value)
+        count = len(self.sorted_values)
+        if count < self.min_periods:
+            return np.nan
+        lower = bisect.bisect_left(self.sorted_values, value)
+        upper = bisect.bisect_right(self.sorted_values, value)
+        return (lower + (upper - lower + 1) / 2.0) / count
+
+    def to_state(self) -> Dict[str, Any]:
+        return {'window': self.window, 'min_periods': self.min_periods, 'values': list(self.values)}
+
+    @classmethod
+    def from_values(cls, window: int, min_periods: int, values) -> 'RollingPercentileRank':
+        ranker = cls(window, min_periods)
+        for value in list(values)[-window:]:
+            ranker.push(value)
+        return ranker
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'RollingPercentileRank':
+        return cls.from_values(state['window'], state['min_periods'], state['values'])
+
+
+def rolling_percentile_rank(series: pd.Series, window: int, min_periods: int) -> pd.Series:
+    """
+    滾動百分位排名：每個時點的值在其往前 window 期 (含當期) 非 NaN 值中的百分位 (同值取平均排名)。
+    結果等同 series.rolling(window, min_periods).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])，
+    但以 RollingPercentileRank 維護排序後的視窗，不必為每個視窗重新建立 Series 並排序。
+    """
+    ranker = RollingPercentileRank(window, min_periods)
+    result = [ranker.push(value) for value in series.to_numpy(dtype=float)]
+    return pd.Series(result, index=series.index, name=series.name, dtype=float)
+
+
 class IndicatorEngine:
     """
     封裝計算衍生指標，特別是「債券壓力指標」的邏輯。
+    calculate_dealer_stress_index() 全量計算並保留增量狀態；update() 以新到的資料逐日延伸指數，
+    save_state()/load_state() 讓狀態可跨執行保存。
     """
+    # Components and their expected column names in the prepared DataFrame
+    COMPONENT_MAP = {
+        'sofr_deviation': 'FRED/SOFR_Dev',
+        'spread_10y2y': 'spread_10y2y',
+        'primary_dealer_position': 'NYFED/PRIMARY_DEALER_NET_POSITION', # This comes from NYFed data
+        'move_index': '^MOVE',             # This comes from yfinance data
+        'vix_index': 'FRED/VIXCLS',        # This comes from FRED data
+        'pos_res_ratio': 'pos_res_ratio'   # Derived from FRED/WRESBAL and NYFED positions
+    }
+    FILL_LIMIT = 7 # ffill/bfill limit used when preparing data
+    SOFR_MA_WINDOW = 20
+    SOFR_MA_MIN_PERIODS = 15
+    STATE_VERSION = 1
+
     def __init__(self, data_frames: Dict[str, pd.DataFrame], params: Optional[Dict[str, Any]] = None, logger_instance: Optional[logging.Logger] = None):
         if logger_instance:
             self.logger = logger_instance
@@ -29,21 +104,29 @@ class IndicatorEngine:
         self.raw_move_df = data_frames.get('move', pd.DataFrame())   # Default to empty DF
         self.params = params if params is not None else {}
         self.df_prepared: Optional[pd.DataFrame] = None
+        self.stress_index_df: Optional[pd.DataFrame] = None
+        self._fill_state: Optional[Dict[str, list]] = None # Per column [last valid value, rows since it], before filling
+        self._stream_state: Optional[Dict[str, Any]] = None # State needed by update(); set by a full calculation
+        self._state_has_raw_history = False # False when the state came from load_state(): raw frames lack the history behind it
 
         if self.raw_macro_df.empty:
             self.logger.warning("IndicatorEngine initialized: 'macro' data is missing or empty.")
         if self.raw_move_df.empty:
             self.logger.warning("IndicatorEngine initialized: 'move' data (for ^MOVE) is missing or empty.")
 
-    def _prepare_data(self) -> Optional[pd.DataFrame]:
+    def _prepare_data(self, macro_df: Optional[pd.DataFrame] = None, move_df: Optional[pd.DataFrame] = None, fill: bool = True) -> Optional[pd.DataFrame]:
+        # Defaults to the engine's raw inputs; update() passes only the new rows with fill=False
+        # and forward-fills them from the saved fill state instead.
+        macro_df = self.raw_macro_df if macro_df is None else macro_df
+        move_df = self.raw_move_df if move_df is None else move_df
         self.logger.info("IndicatorEngine: Preparing data for stress index calculation...")
 
-        if self.raw_macro_df.empty:
+        if macro_df.empty:
             self.logger.warning("IndicatorEngine: Macro data (raw_macro_df) is empty. Proceeding without macro indicators for pivot.")
             # Create an empty DataFrame with a DatetimeIndex if MOVE data might exist, to allow merging
             # However, if MOVE is also empty, this won't help much.
             # Consider the case where only MOVE data is present.
-            if self.raw_move_df.empty:
+            if move_df.empty:
                 self.logger.error("IndicatorEngine: Both macro and MOVE data are empty. Cannot prepare data.")
                 return None
             # If only MOVE data is present, macro_wide_df will be effectively empty or non-existent
@@ -51,7 +134,7 @@ class IndicatorEngine:
             macro_wide_df = pd.DataFrame()
         else:
             try:
-                current_macro_df = self.raw_macro_df.copy()
+                current_macro_df = macro_df.copy()
                 if 'metric_date' not in current_macro_df.columns:
                     self.logger.error("IndicatorEngine: 'metric_date' column missing in macro data.")
                     return None
@@ -77,9 +160,9 @@ class IndicatorEngine:
 
         # Prepare MOVE data
         move_wide_df = pd.DataFrame() # Initialize as empty
-        if not self.raw_move_df.empty:
-            if all(col in self.raw_move_df.columns for col in ['price_date', 'close_price', 'security_id']):
-                move_df_filtered = self.raw_move_df[self.raw_move_df['security_id'] == '^MOVE'].copy()
+        if not move_df.empty:
+            if all(col in move_df.columns for col in ['price_date', 'close_price', 'security_id']):
+                move_df_filtered = move_df[move_df['security_id'] == '^MOVE'].copy()
                 if not move_df_filtered.empty:
                     move_df_filtered['price_date'] = pd.to_datetime(move_df_filtered['price_date'], errors='coerce')
                     move_df_filtered.dropna(subset=['price_date'], inplace=True)
@@ -118,9 +201,12 @@ class IndicatorEngine:
                 combined_df['^MOVE'] = np.nan
 
         combined_df.sort_index(inplace=True)
+        if not fill:
+            return combined_df
+        self._fill_state = self._compute_fill_state(combined_df)
         # Forward fill, then backward fill to handle NaNs robustly
         # Limit ffill/bfill to avoid excessive propagation if data is very sparse, e.g. 7 days
-        combined_df = combined_df.ffill(limit=7).bfill(limit=7)
+        combined_df = combined_df.ffill(limit=self.FILL_LIMIT).bfill(limit=self.FILL_LIMIT)
         combined_df.dropna(how='all', inplace=True) # Drop rows where all values are NaN after filling
 
         if combined_df.empty:
@@ -130,6 +216,19 @@ class IndicatorEngine:
         self.logger.info(f"IndicatorEngine: Data preparation complete. Final shape: {combined_df.shape}")
         return combined_df
 
+    @staticmethod
+    def _compute_fill_state(combined_df: pd.DataFrame) -> Dict[str, list]:
+        """每欄最後一個有效值及其後的列數 (填補前)，供 update() 延續 ffill(limit) 的行為。"""
+        fill_state = {}
+        for col in combined_df.columns:
+            values = combined_df[col].to_numpy(dtype=float)
+            valid_positions = np.flatnonzero(~np.isnan(values))
+            if len(valid_positions):
+                fill_state[col] = [float(values[valid_positions[-1]]), int(len(values) - 1 - valid_positions[-1])]
+            else:
+                fill_state[col] = [np.nan, len(values)]
+        return fill_state
+
     def calculate_dealer_stress_index(self) -> Optional[pd.DataFrame]:
         self.logger.info("IndicatorEngine: Calculating Dealer Stress Index...")
         # Always call _prepare_data to get the latest state based on inputs
@@ -150,15 +249,7 @@ class IndicatorEngine:
         weights_config = self.params.get('stress_index_weights', {})
         min_periods_ratio = self.params.get('min_periods_ratio_for_rolling', 0.5) # Ratio of window for min_periods
 
-        # Define components and their expected column names in the prepared DataFrame
-        component_map = {
-            'sofr_deviation': 'FRED/SOFR_Dev',
-            'spread_10y2y': 'spread_10y2y',
-            'primary_dealer_position': 'NYFED/PRIMARY_DEALER_NET_POSITION', # This comes from NYFed data
-            'move_index': '^MOVE',             # This comes from yfinance data
-            'vix_index': 'FRED/VIXCLS',        # This comes from FRED data
-            'pos_res_ratio': 'pos_res_ratio'   # Derived from FRED/WRESBAL and NYFED positions
-        }
+        component_map = self.COMPONENT_MAP
         self.logger.debug(f"IndicatorEngine: Stress Index Params: Window={window}, Weights={weights_config}, MinPeriodsRatio={min_periods_ratio}")
 
         # Calculate derived components first
@@ -170,8 +261,9 @@ class IndicatorEngine:
             self.logger.warning("IndicatorEngine: FRED/DGS10 or FRED/DGS2 missing. 'spread_10y2y' will be NaN.")
 
         # 2. SOFR Deviation from its 20-day MA
-        if 'FRED/SOFR' in df.columns and df['FRED/SOFR'].notna().sum() >= 20: # Need enough data for MA
-             df['FRED/SOFR_MA20'] = df['FRED/SOFR'].rolling(window=20, min_periods=15).mean()
+        sofr_dev_enabled = 'FRED/SOFR' in df.columns and df['FRED/SOFR'].notna().sum() >= self.SOFR_MA_WINDOW # Need enough data for MA
+        if sofr_dev_enabled:
+             df['FRED/SOFR_MA20'] = df['FRED/SOFR'].rolling(window=self.SOFR_MA_WINDOW, min_periods=self.SOFR_MA_MIN_PERIODS).mean()
              df['FRED/SOFR_Dev'] = df['FRED/SOFR'] - df['FRED/SOFR_MA20']
         else:
             df['FRED/SOFR_Dev'] = np.nan
@@ -206,12 +298,8 @@ class IndicatorEngine:
             if col_name in df.columns and df[col_name].notna().any():
                 series_to_rank = df[col_name]
                 if series_to_rank.notna().sum() >= min_rolling_periods:
-                    # Calculate rolling rank (percentile)
-                    # rank(pct=True) gives percentile from 0 to 1. iloc[-1] takes the last value in the window.
-                    rolling_percentile = series_to_rank.rolling(window=window, min_periods=min_rolling_periods).apply(
-                        lambda x_window: pd.Series(x_window).rank(pct=True).iloc[-1] if pd.Series(x_window).notna().any() else np.nan,
-                        raw=False # raw=False needed for DataFrames/Series with datetime index
-                    )
+                    # Calculate rolling rank (percentile) of the last value in each window, 0 to 1
+                    rolling_percentile = rolling_percentile_rank(series_to_rank, window, min_rolling_periods)
                     # For 'spread_10y2y', lower is more stress (inverted yield curve), so invert percentile
                     percentiles_df[f"{key}_pct_rank"] = (1.0 - rolling_percentile) if key == 'spread_10y2y' else rolling_percentile
                     active_component_weights[key] = weights_config[key]
@@ -240,6 +328,7 @@ class IndicatorEngine:
         # Initialize series for sum of weighted percentiles and sum of effective weights
         final_stress_index_series = pd.Series(0.0, index=df.index)
         sum_of_effective_weights = pd.Series(0.0, index=df.index)
+        contributing_weights = {} # Components that actually entered the index, reused by update()
 
         for component_key, weight in normalized_weights.items():
             percentile_col_name = f"{component_key}_pct_rank"
@@ -250,6 +339,7 @@ class IndicatorEngine:
                 final_stress_index_series = final_stress_index_series.add(component_contribution, fill_value=0)
                 # Track sum of weights for rows where percentile rank was available (not NaN before fillna(0.5))
                 sum_of_effective_weights = sum_of_effective_weights.add(percentiles_df[percentile_col_name].notna() * weight, fill_value=0)
+                contributing_weights[component_key] = weight
             else:
                 self.logger.warning(f"IndicatorEngine: Percentile rank column {percentile_col_name} for component {component_key} is missing or all NaN. This component will not contribute to the index.")
 
@@ -272,9 +362,214 @@ class IndicatorEngine:
             self.logger.warning("IndicatorEngine: Dealer Stress Index is all NaN after calculation and processing.")
             return None # Or an empty DataFrame with the columns?
 
+        self.stress_index_df = final_result_df
+        self._stream_state = {
+            'params_fingerprint': self._params_fingerprint(),
+            'last_date': df.index[-1],
+            'fill_state': self._fill_state,
+            'sofr_window': deque(df['FRED/SOFR'].to_numpy(dtype=float)[-self.SOFR_MA_WINDOW:], maxlen=self.SOFR_MA_WINDOW) if sofr_dev_enabled else None,
+            'rankers': {key: RollingPercentileRank.from_values(window, min_rolling_periods, df[component_map[key]].to_numpy(dtype=float))
+                        for key in contributing_weights},
+            'weights': contributing_weights,
+            'last_output': self._output_row_to_dict(final_result_df.index[-1], final_result_df.iloc[-1]),
+        }
+        self._state_has_raw_history = True
+
         self.logger.info(f"IndicatorEngine: Dealer Stress Index calculated successfully. Final shape: {final_result_df.shape}")
         return final_result_df
 
+    def _params_fingerprint(self) -> str:
+        return json.dumps(self.params, sort_keys=True, default=str)
+
+    @staticmethod
+    def _output_row_to_dict(date, row: pd.Series) -> Dict[str, Any]:
+        return {'date': pd.Timestamp(date).isoformat(), **{col: float(value) for col, value in row.items()}}
+
+    def _full_recompute_reason(self, new_wide: Optional[pd.DataFrame]) -> Optional[str]:
+        if self._stream_state is None:
+            return "no incremental state"
+        if self._stream_state['params_fingerprint'] != self._params_fingerprint():
+            return "parameters changed"
+        if new_wide is None or new_wide.empty:
+            return "new rows could not be prepared on their own"
+        if new_wide.index.min() <= self._stream_state['last_date']:
+            return "new rows are not after the last computed date"
+        unknown_columns = set(new_wide.columns) - set(self._stream_state['fill_state'])
+        if unknown_columns:
+            return f"new columns {sorted(unknown_columns)}"
+        return None
+
+    def _drop_rows_through(self, frame: pd.DataFrame, date_column: str, last_date: pd.Timestamp) -> pd.DataFrame:
+        """丟棄不晚於 last_date 的列 (已計入保存的狀態)，用於只有狀態、沒有原始歷史資料時。"""
+        if frame.empty or date_column not in frame.columns:
+            return frame
+        keep = ~(pd.to_datetime(frame[date_column], errors='coerce') <= last_date)
+        if not keep.all():
+            self.logger.warning(f"IndicatorEngine: Dropping {int((~keep).sum())} '{date_column}' rows at or before the saved state's last date {last_date.date()}.")
+        return frame[keep]
+
+    def _advance_row(self, raw_row: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """以一個新日期的原始值推進狀態：ffill(limit)、衍生欄位。整列皆為 NaN 時回傳 None (全量計算同樣會丟棄該列)。"""
+        state = self._stream_state
+        row = {}
+        for col, value in raw_row.items():
+            last_value, gap = state['fill_state'][col]
+            if pd.notna(value):
+                state['fill_state'][col] = [float(value), 0]
+                row[col] = float(value)
+            else:
+                state['fill_state'][col] = [last_value, gap + 1]
+                row[col] = last_value if gap + 1 <= self.FILL_LIMIT else np.nan
+        if all(np.isnan(value) for value in row.values()):
+            return None
+
+        row['spread_10y2y'] = row['FRED/DGS10'] - row['FRED/DGS2'] if 'FRED/DGS10' in row and 'FRED/DGS2' in row else np.nan
+        if state['sofr_window'] is not None:
+            state['sofr_window'].append(row.get('FRED/SOFR', np.nan))
+            recent_sofr = [value for value in state['sofr_window'] if not np.isnan(value)]
+            row['FRED/SOFR_MA20'] = float(np.mean(recent_sofr)) if len(recent_sofr) >= self.SOFR_MA_MIN_PERIODS else np.nan
+            row['FRED/SOFR_Dev'] = row.get('FRED/SOFR', np.nan) - row['FRED/SOFR_MA20']
+        else:
+            row['FRED/SOFR_Dev'] = np.nan
+        if 'NYFED/PRIMARY_DEALER_NET_POSITION' in row and 'FRED/WRESBAL' in row:
+            reserves = row['FRED/WRESBAL']
+            ratio = row['NYFED/PRIMARY_DEALER_NET_POSITION'] / reserves if reserves != 0 else np.nan
+            row['pos_res_ratio'] = ratio if np.isfinite(ratio) else np.nan
+        else:
+            row['pos_res_ratio'] = np.nan
+        return row
+
+    def _stress_index_row(self, row: Dict[str, float]) -> Dict[str, float]:
+        """以保存的排名視窗與權重計算一個日期的指數，規則與 calculate_dealer_stress_index 相同。"""
+        state = self._stream_state
+        output = {f"{key}_pct_rank": np.nan for key in self.COMPONENT_MAP}
+        weighted_sum = effective_weight = 0.0
+        for key, weight in state['weights'].items():
+            percentile = state['rankers'][key].push(row.get(self.COMPONENT_MAP[key], np.nan))
+            if key == 'spread_10y2y':
+                percentile = 1.0 - percentile
+            output[f"{key}_pct_rank"] = percentile
+            weighted_sum += (0.5 if np.isnan(percentile) else percentile) * weight
+            effective_weight += 0.0 if np.isnan(percentile) else weight
+        stress_index = min(max(weighted_sum / effective_weight * 100, 0.0), 100.0) if effective_weight > 0 else np.nan
+        return {'DealerStressIndex': stress_index, **output}
+
+    def update(self, new_rows: Dict[str, pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """
+        以新到的原始資料 (格式同建構子的 data_frames) 延伸壓力指數，每個新日期只推進各成分的滾動視窗 (O(w))。
+        以下情況改為全量重算：尚無狀態、參數 (權重/視窗) 已變更、新資料不晚於最後計算日期、或出現新的指標欄位。
+        新資料一律併入原始資料；完整結果保存在 self.stress_index_df。
+
+        狀態來自 load_state() 時原始資料不含歷史，無法全量重算：不晚於最後計算日期的列會被丟棄，
+        其餘仍以增量方式推進；若因新欄位或參數變更而需要重算，則拋出 ValueError。
+
+        :return: 新資料日期的壓力指數列 (欄位同 calculate_dealer_stress_index)；無法計算時為 None。
+        :raises ValueError: 只有保存的狀態、沒有原始歷史資料，卻需要全量重算時。
+        """
+        new_macro = new_rows.get('macro')
+        new_move = new_rows.get('move')
+        new_macro = new_macro if new_macro is not None else pd.DataFrame()
+        new_move = new_move if new_move is not None else pd.DataFrame()
+        state_only = self._stream_state is not None and not self._state_has_raw_history
+        if state_only:
+            new_macro = self._drop_rows_through(new_macro, 'metric_date', self._stream_state['last_date'])
+            new_move = self._drop_rows_through(new_move, 'price_date', self._stream_state['last_date'])
+        if new_macro.empty and new_move.empty:
+            self.logger.info("IndicatorEngine: update() called without new rows.")
+            return self.stress_index_df.iloc[0:0] if self.stress_index_df is not None else None
+
+        if not new_macro.empty:
+            self.raw_macro_df = pd.concat([self.raw_macro_df, new_macro], ignore_index=True)
+        if not new_move.empty:
+            self.raw_move_df = pd.concat([self.raw_move_df, new_move], ignore_index=True)
+
+        new_wide = self._prepare_data(new_macro, new_move, fill=False)
+        reason = self._full_recompute_reason(new_wide)
+        if reason is not None and state_only:
+            raise ValueError(f"IndicatorEngine: Cannot extend the loaded state ({reason}); "
+                             "construct the engine with the full raw history and call calculate_dealer_stress_index().")
+        if reason is not None:
+            self.logger.info(f"IndicatorEngine: Full recompute of Dealer Stress Index ({reason}).")
+            result = self.calculate_dealer_stress_index()
+            if result is None or new_wide is None:
+                return result.iloc[0:0] if result is not None else None
+            return result[result.index.isin(new_wide.index)]
+
+        new_wide = new_wide.reindex(columns=list(self._stream_state['fill_state']))
+        prepared_rows, output_rows = {}, {}
+        for date, raw_row in zip(new_wide.index, new_wide.to_dict('records')):
+            self._stream_state['last_date'] = date
+            row = self._advance_row(raw_row)
+            if row is None:
+                continue
+            prepared_rows[date] = row
+            output = self._stress_index_row(row)
+            if not np.isnan(output['DealerStressIndex']):
+                output_rows[date] = output
+                self._stream_state['last_output'] = self._output_row_to_dict(date, pd.Series(output))
+
+        if prepared_rows:
+            new_prepared = pd.DataFrame.from_dict(prepared_rows, orient='index')
+            self.df_prepared = new_prepared if self.df_prepared is None else pd.concat([self.df_prepared, new_prepared])
+        columns = ['DealerStressIndex'] + [f"{key}_pct_rank" for key in self.COMPONENT_MAP]
+        new_result = pd.DataFrame.from_dict(output_rows, orient='index', columns=columns) if output_rows else pd.DataFrame(columns=columns, dtype=float)
+        if output_rows:
+            self.stress_index_df = new_result if self.stress_index_df is None else pd.concat([self.stress_index_df, new_result])
+        self.logger.info(f"IndicatorEngine: Incremental update appended {len(output_rows)} stress index rows.")
+        return new_result
+
+    def save_state(self, path: str) -> bool:
+        """將增量狀態 (填補狀態、各成分視窗內容、權重、最後一列輸出) 原子性地寫成 JSON。"""
+        if self._stream_state is None:
+            self.logger.warning("IndicatorEngine: No incremental state to save; run calculate_dealer_stress_index() first.")
+            return False
+        state = self._stream_state
+        payload = {
+            'version': self.STATE_VERSION,
+            'params_fingerprint': state['params_fingerprint'],
+            'last_date': pd.Timestamp(state['last_date']).isoformat(),
+            'fill_state': state['fill_state'],
+            'sofr_window': list(state['sofr_window']) if state['sofr_window'] is not None else None,
+            'rank_windows': {key: ranker.to_state() for key, ranker in state['rankers'].items()},
+            'weights': state['weights'],
+            'last_output': state['last_output'],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        self.logger.info(f"IndicatorEngine: Saved incremental state to {path} (last date {payload['last_date']}).")
+        return True
+
+    def load_state(self, path: str) -> bool:
+        """
+        讀回 save_state() 的狀態。檔案不存在、版本不符或參數已變更時回傳 False，
+        之後的 update() 會改為全量重算。
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"IndicatorEngine: Could not read incremental state {path}: {e}")
+            return False
+        if payload.get('version') != self.STATE_VERSION or payload.get('params_fingerprint') != self._params_fingerprint():
+            self.logger.info(f"IndicatorEngine: Incremental state {path} does not match the current version/parameters; a full recompute will run.")
+            return False
+        self._stream_state = {
+            'params_fingerprint': payload['params_fingerprint'],
+            'last_date': pd.Timestamp(payload['last_date']),
+            'fill_state': payload['fill_state'],
+            'sofr_window': deque(payload['sofr_window'], maxlen=self.SOFR_MA_WINDOW) if payload['sofr_window'] is not None else None,
+            'rankers': {key: RollingPercentileRank.from_state(ranker_state) for key, ranker_state in payload['rank_windows'].items()},
+            'weights': payload['weights'],
+            'last_output': payload['last_output'],
+        }
+        self._state_has_raw_history = False
+        self.logger.info(f"IndicatorEngine: Loaded incremental state from {path} (last date {payload['last_date']}).")
+        return True
+
 
 # Test block for direct execution
 if __name__ == '__main__':
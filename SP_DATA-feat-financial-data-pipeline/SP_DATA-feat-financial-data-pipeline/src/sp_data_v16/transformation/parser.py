@@ -16,6 +16,9 @@ class DataParser:
             schema (dict): A dictionary defining parsing parameters like
                            'encoding', 'delimiter', and 'columns'.
                            Example: {'encoding': 'utf-8', 'delimiter': ',', 'columns': ['col1', 'col2']}
+                           Optional: 'csv_skip_rows' (preamble lines skipped by the reader) and
+                           'source_columns' (all columns of the file, in order; only those
+                           listed in 'columns' are read).
 
         Returns:
             pd.DataFrame | None: A pandas DataFrame if parsing is successful, otherwise None.
@@ -28,9 +31,13 @@ class DataParser:
         delimiter = schema.get('delimiter', ',')
         columns_definition = schema.get('columns')
         column_names = None
+        read_dtypes = None
 
         if isinstance(columns_definition, dict):
             column_names = list(columns_definition.keys())
+            # 型別轉換 (與轉換失敗的逐列回報) 由 DataValidator 負責；讀取時一律以字串讀入，
+            # 讓 pandas 省去逐欄型別推斷，格式錯誤的數值也不會讓整個檔案解析失敗。
+            read_dtypes = {name: 'str' for name in column_names}
         elif isinstance(columns_definition, list):
             # Could be a list of strings (names) or list of dicts (more complex, not currently supported by this parser directly for names)
             # For now, assume if it's a list, it's a list of names, or the validator will handle richer structures.
@@ -42,35 +49,32 @@ class DataParser:
             print("Error: Schema must define a non-empty list of 'columns' (or a dictionary of column definitions).")
             return None
 
-        try:
-            # Decode the byte string to a text string
-            decoded_content = raw_content.decode(encoding)
-
-            # Use StringIO to treat the string as a file
-            content_io = io.StringIO(decoded_content)
+        # 'source_columns' (選用) 依序列出檔案中的所有欄位；只有 'columns' 中的欄位會被讀出 (usecols)，
+        # 其餘欄位在讀取時即被略過，不會建立成 DataFrame 欄位。
+        source_columns = schema.get('source_columns') or column_names
+        use_columns = column_names if source_columns is not column_names else None
+        # Preamble rows (e.g. keyword lines) are skipped by the reader itself instead of being tokenized first.
+        rows_to_skip = schema.get('csv_skip_rows', 0) or 0
 
-            # Read into pandas DataFrame
+        try:
             df = pd.read_csv(
-                content_io,
+                io.BytesIO(raw_content), # Let pandas decode the bytes; no intermediate decoded copy
+                encoding=encoding,
                 delimiter=delimiter,
-                names=column_names, # Use the extracted/validated list of names
+                names=source_columns,
+                usecols=use_columns,
+                dtype=read_dtypes,
                 header=None,  # We are providing column names via 'names'
+                skiprows=rows_to_skip,
                 skipinitialspace=True, # Handles spaces after delimiter
                 index_col=False # Explicitly prevent first column from becoming index
             )
-            # Handle potential skipping of rows (e.g., for keywords or headers in the data file itself)
-            # This should ideally be driven by the schema.
-            rows_to_skip = schema.get('csv_skip_rows', 0)
-            if rows_to_skip > 0 and not df.empty and len(df) > rows_to_skip :
-                df = df.iloc[rows_to_skip:].reset_index(drop=True)
-            elif rows_to_skip > 0 : # df might be empty or have fewer rows than skip_rows
-                # If we skip more rows than exist, return an empty DataFrame with correct columns
-                df = pd.DataFrame(columns=column_names)
 
             # 結構化補完 (Structural Completion)
             # 從 schema_definition 中，獲取所有目標欄位的列表。
             # 注意：我們已經在前面從 schema 中獲取了 column_names
             # 使用 parsed_df = parsed_df.reindex(columns=target_columns, fill_value=None) 來強制補完 DataFrame 的欄位。
+            # (usecols 不保證欄位順序，reindex 同時把欄位排回 schema 定義的順序)
             if column_names: # 確保 column_names 存在且不為空
                 df = df.reindex(columns=column_names, fill_value=None)
 
@@ -1,7 +1,11 @@
 import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import duckdb
 import pathlib
 import pandas as pd
+import pyarrow as pa
 from .schema_manager import SchemaManager
 from .raw_lake_reader import RawLakeReader
 from .parser import DataParser
@@ -10,6 +14,110 @@ from .processed_loader import ProcessedDBLoader
 from src.sp_data_v16.ingestion.manifest import ManifestManager # Assuming ManifestManager handles its own connection
 from src.sp_data_v16.core.config import load_config
 
+logger = logging.getLogger(__name__)
+
+_STATUS_VALIDATED = 'validated' # 內部狀態：已通過驗證、等待單一寫入者載入
+
+# 每個 worker process 各自持有的元件 (由 _init_worker 建立)
+_worker_components: tuple | None = None
+
+
+def _error_result(file_hash: str, file_path: str, error: Exception, timings_ms: dict) -> dict:
+    """依例外類型決定 manifest 狀態，並組成失敗結果。"""
+    if isinstance(error, (pd.errors.ParserError, UnicodeDecodeError, ValueError)):
+        # 解析或轉換階段錯誤 (結構或解碼問題)
+        status, reason = 'transformation_failed', f"解析或轉換階段錯誤: {error}"
+    elif isinstance(error, (TypeError, KeyError)):
+        # 解析成功後的資料型別/值問題
+        status, reason = 'validation_error', f"資料處理錯誤 (非解析): {error}"
+    else:
+        status, reason = 'transformation_failed', f"未預期錯誤: {error}"
+    logger.error(f"[錯誤] 處理檔案 {file_path} (Hash: {file_hash[:8]}) 時發生錯誤: {reason}")
+    return {'file_hash': file_hash, 'file_path': file_path, 'status': status, 'reason': reason, 'timings_ms': timings_ms}
+
+
+def _transform_file(raw_lake_reader, schema_manager, parser, validator, file_hash: str, file_path: str) -> dict:
+    """
+    Reads, identifies, parses and validates one file without touching the
+    manifest or the processed DB.
+
+    Returns:
+        dict: ``status`` is ``_STATUS_VALIDATED`` (with ``data``, ``table_name``
+        and ``schema_definition``) or the manifest status the file should get.
+        ``timings_ms`` holds the elapsed milliseconds of each finished stage.
+    """
+    timings_ms: dict[str, float] = {}
+    result = {'file_hash': file_hash, 'file_path': file_path, 'timings_ms': timings_ms}
+
+    def failed(status: str, reason: str) -> dict:
+        result.update(status=status, reason=reason)
+        return result
+
+    try:
+        started = time.perf_counter()
+        raw_content = raw_lake_reader.get_raw_content(file_hash)
+        timings_ms['read'] = (time.perf_counter() - started) * 1000
+        if raw_content is None:
+            return failed('parse_error_no_content', "raw content not found in Raw Lake")
+
+        started = time.perf_counter()
+        schema_name = schema_manager.identify_schema_from_content(raw_content)
+        timings_ms['identify'] = (time.perf_counter() - started) * 1000
+        if schema_name is None:
+            return failed('parse_error_schema_not_identified', "no schema matched the content")
+        result['schema_name'] = schema_name
+
+        schema_definition = schema_manager.schemas.get(schema_name)
+        if schema_definition is None:
+            return failed('parse_error_schema_missing', f"schema definition '{schema_name}' not found")
+
+        started = time.perf_counter()
+        dataframe = parser.parse(raw_content, schema_definition)
+        timings_ms['parse'] = (time.perf_counter() - started) * 1000
+        if dataframe is None:
+            # parser.py 內部已輸出詳細錯誤並回傳 None
+            return failed('parse_error_parser_failed', "parser returned no data")
+
+        started = time.perf_counter()
+        validated_df = validator.validate(dataframe, schema_definition)
+        timings_ms['validate'] = (time.perf_counter() - started) * 1000
+        if validated_df is None or validated_df.empty:
+            logger.warning(f"檔案 {file_path} (Hash: {file_hash[:8]}) 因數據驗證失敗或無有效數據，已中止後續載入流程。")
+            return failed('validation_error', "validation failed or no valid rows")
+    except Exception as e:
+        result.update(_error_result(file_hash, file_path, e, timings_ms))
+        return result
+
+    result.update(
+        status=_STATUS_VALIDATED,
+        data=validated_df,
+        rows=len(validated_df),
+        # Use 'table_name' from schema if defined, otherwise fallback to schema_name
+        table_name=schema_definition.get('table_name', schema_name),
+        schema_definition=schema_definition,
+    )
+    return result
+
+
+def _init_worker(raw_lake_db_path: str, schema_config_path: str) -> None:
+    """Process-pool initializer: each worker opens its own read-only Raw Lake connection."""
+    global _worker_components
+    _worker_components = (
+        RawLakeReader(db_path=raw_lake_db_path),
+        SchemaManager(schema_path=schema_config_path),
+        DataParser(),
+        DataValidator(),
+    )
+
+
+def _transform_file_in_worker(file_hash: str, file_path: str) -> dict:
+    """Worker entry point; validated DataFrames are returned as Arrow tables."""
+    result = _transform_file(*_worker_components, file_hash, file_path)
+    if result['status'] == _STATUS_VALIDATED:
+        result['data'] = pa.Table.from_pandas(result['data'], preserve_index=False)
+    return result
+
+
 class TransformationPipeline:
     def __init__(self, config_path: str = "config_v16.yaml"):
         self.config = load_config(config_path)
@@ -22,6 +130,13 @@ class TransformationPipeline:
         self.processed_db_path = db_config.get("processed_db_path")
         self.schema_config_path = paths_config.get("schema_config_path")
 
+        # transformation.max_workers > 1 時改以 process pool 平行解析與驗證
+        transformation_config = self.config.get("transformation") or {}
+        self.max_workers = max(1, int(transformation_config.get("max_workers", 1)))
+        self.max_in_flight = max(1, int(transformation_config.get("max_in_flight", 2 * self.max_workers)))
+        # 每批最多累積多少個同結構檔案後才寫入 processed DB (1 = 逐檔寫入)
+        self.load_batch_files = max(1, int(transformation_config.get("load_batch_files", 1)))
+
         if not all([self.manifest_db_path, self.raw_lake_db_path, self.processed_db_path, self.schema_config_path]):
             missing = [
                 path_name for path_name, path_val in {
@@ -111,125 +226,149 @@ class TransformationPipeline:
             return []
 
     def run(self):
-        logging.info("Transformation pipeline run method started.")
+        """
+        Transforms every pending file and loads it into the processed DB.
+
+        With ``transformation.max_workers`` <= 1 (the default) files are handled
+        one by one in this process. Otherwise read/identify/parse/validate runs
+        in a process pool; workers hand back Arrow tables and this process stays
+        the single writer for both the processed DB and the manifest. At most
+        ``transformation.max_in_flight`` files are outstanding at any time.
+        Validated files that share a target table are loaded in batches of up to
+        ``transformation.load_batch_files`` files, one transaction per batch.
+        """
+        run_started = time.perf_counter()
+        status_counts: dict[str, int] = {}
+        logger.info(f"transformation_run_started workers={self.max_workers}")
         try:
             pending_files_data = self.find_pending_files()
-            logging.info(f"Found {len(pending_files_data)} tasks to process.")
+            logger.info(f"Found {len(pending_files_data)} tasks to process.")
 
             if not pending_files_data:
-                print("目前沒有待處理的檔案。")
+                logger.info("目前沒有待處理的檔案。")
                 return
 
-            for file_data in pending_files_data:
-                file_hash = file_data['file_hash']
-                file_path = file_data['file_path']
-                print(f"\nProcessing file: {file_path} (Hash: {file_hash[:8]})")
-
-                try:
-                    # 1. Get Raw Content
-                    raw_content = self.raw_lake_reader.get_raw_content(file_hash)
-                    print(f"[進度] 成功從 Raw Lake 讀取檔案 {file_hash}")
-                    if raw_content is None:
-                        print(f"Error: Raw content not found for {file_hash} in Raw Lake. Skipping.")
-                        self.manifest_manager.update_status(file_hash, 'parse_error_no_content')
-                        continue
-
-                    # 2. Identify Schema
-                    schema_name = self.schema_manager.identify_schema_from_content(raw_content)
-                    print(f"[進度] 成功識別綱要為 {schema_name}")
-                    if schema_name is None:
-                        print(f"Warning: Could not identify schema for {file_path} (Hash: {file_hash[:8]}). Skipping.")
-                        self.manifest_manager.update_status(file_hash, 'parse_error_schema_not_identified')
-                        continue
-
-                    schema_definition = self.schema_manager.schemas.get(schema_name)
-                    if schema_definition is None: # Should be rare if identify_schema_from_content works
-                        print(f"Error: Schema definition not found for identified schema '{schema_name}'. Skipping.")
-                        self.manifest_manager.update_status(file_hash, 'parse_error_schema_missing')
+            if self.max_workers > 1:
+                results = self._iter_results_from_pool(pending_files_data)
+            else:
+                results = (
+                    _transform_file(
+                        self.raw_lake_reader, self.schema_manager, self.parser, self.validator,
+                        file_data['file_hash'], file_data['file_path'],
+                    )
+                    for file_data in pending_files_data
+                )
+
+            # 共用同一結構 (資料表) 的已驗證檔案累積成批，一次交易寫入
+            pending_loads: dict[tuple, list[dict]] = {}
+            for result in results:
+                if result['status'] != _STATUS_VALIDATED:
+                    final_statuses = [self._finish_file(result, result['status'])]
+                else:
+                    batch_key = (result['table_name'], result.get('schema_name'))
+                    batch = pending_loads.setdefault(batch_key, [])
+                    batch.append(result)
+                    if len(batch) < self.load_batch_files:
                         continue
-                    print(f"Identified schema '{schema_name}' for {file_path}")
-
-                    # 3. Parse Data
-                    dataframe = self.parser.parse(raw_content, schema_definition)
-                    # parser.py 內部會印出詳細錯誤並回傳 None
-                    if dataframe is None:
-                        print(f"[進度] 解析資料失敗 {file_path} (Hash: {file_hash[:8]})")
-                        # parser.py 內部已經 print 詳細錯誤
-                        # 根據 parser 的錯誤類型 (例如解碼、Pandas內部錯誤)來設定狀態
-                        # 這裡假設 parser 失敗主要是 parse_error_parser_failed
-                        # 如果 parser.py 能拋出更具體的錯誤，這裡可以捕捉
-                        self.manifest_manager.update_status(file_hash, 'parse_error_parser_failed')
-                        continue # 處理下一個檔案
-                    print(f"[進度] 成功解析資料為 DataFrame for {file_path}")
-
-
-                    # 4. Validate Data
-                    validated_df = self.validator.validate(dataframe, schema_definition)
-                    # validator.py 內部會印出詳細錯誤並回傳 None
-
-                    # 核心 Bug 修復：檢查 validated_df 是否為 None 或 empty
-                    if validated_df is None or validated_df.empty:
-                        # 雖然原始程式碼多處使用 print，但此處關鍵日誌應使用 logging
-                        logging.warning(f"檔案 {file_path} (Hash: {file_hash[:8]}) 因數據驗證失敗或無有效數據，已中止後續載入流程。")
-                        # validator.py 內部已經 print 詳細錯誤，這裡的 print 主要是流程提示
-                        print(f"[進度] 資料驗證失敗或無有效數據 {file_path} (Hash: {file_hash[:8]})")
-                        self.manifest_manager.update_status(file_hash, 'validation_error')
-                        continue # 處理下一個檔案
-
-                    # 原有的檢查條件 (dataframe.shape[0] > 0 and validated_df.empty) 其實已經被 validated_df.empty 涵蓋
-                    # 如果 validated_df.empty 為 True，那麼 validated_df 就是空的，無論原始 dataframe 是否有數據。
-                    # 如果 validated_df 不是 None 且不是 empty，才代表驗證成功且有數據。
-                    print(f"[進度] 成功驗證 DataFrame for {file_path}")
-
-                    # print("Validated DataFrame head:")
-                    # print(validated_df.head())
-
-                    # 5. Load Data
-                    # Use 'table_name' from schema if defined, otherwise fallback to schema_name
-                    table_name = schema_definition.get('table_name', schema_name)
-
-                    # 將 schema_definition 傳遞給 load_dataframe
-                    self.processed_loader.load_dataframe(validated_df, table_name, schema_definition)
-                    print(f"[進度] 成功載入資料至 Processed DB")
-                    self.manifest_manager.update_status(file_hash, 'processed')
-                    print(f"[成功] 檔案 {file_hash} 已成功處理完畢！")
-
-                # Errors during parsing stage (structural or decoding issues)
-                except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as parse_related_err:
-                    # Check if the ValueError originates from the parser or is a more general one.
-                    # For now, grouping them as transformation_failed if they occur before validation.
-                    # If ValueError needs to be split based on origin (parser vs validator), more context in DataParser/DataValidator would be needed.
-                    # Based on user feedback, parser-related ValueErrors should lead to 'transformation_failed'.
-                    error_msg = f"解析或轉換階段錯誤: {parse_related_err}"
-                    logging.error(f"[錯誤] 處理檔案 {file_path} (Hash: {file_hash[:8]}) 時發生解析或轉換階段錯誤: {error_msg}")
-                    print(f"[錯誤] 處理檔案 {file_hash} 時發生解析或轉換階段錯誤: {error_msg}")
-                    if file_hash:
-                        self.manifest_manager.update_status(file_hash, 'transformation_failed')
-
-                # Errors related to data type/value issues after successful parsing, but typically caught by DataValidator.
-                # This block might catch other KeyErrors or TypeErrors not from parsing.
-                # If DataValidator catches and returns None/empty, it's handled before this.
-                # This block is more for unexpected errors after parsing but before/during loading, if not IO or DB related.
-                except (TypeError, KeyError) as data_err: # Data-related errors not caught by explicit parsing exceptions
-                    error_msg = f"資料處理錯誤 (非解析): {data_err}"
-                    logging.error(f"[錯誤] 處理檔案 {file_path} (Hash: {file_hash[:8]}) 時發生資料處理錯誤: {error_msg}")
-                    print(f"[錯誤] 處理檔案 {file_hash} 時發生資料處理錯誤: {error_msg}")
-                    if file_hash:
-                        # Deciding status: 'validation_error' if it implies bad data content,
-                        # or 'transformation_failed' if it's a more structural issue missed by parser exceptions.
-                        # Given the context, 'validation_error' seems appropriate if it's about data values/types
-                        # not fitting subsequent processing steps after parsing.
-                        self.manifest_manager.update_status(file_hash, 'validation_error')
-
-                except Exception as e: # Catch-all for other unexpected errors (e.g., IO, DB issues not caught by specific handlers)
-                    error_msg = f"未預期錯誤: {e}"
-                    logging.error(f"[錯誤] 處理檔案 {file_path} (Hash: {file_hash[:8]}) 時發生嚴重未預期錯誤: {error_msg}")
-                    print(f"[錯誤] 處理檔案 {file_hash} 時發生嚴重未預期錯誤: {error_msg}")
-                    if file_hash: # Ensure file_hash is available
-                        self.manifest_manager.update_status(file_hash, 'transformation_failed')
+                    final_statuses = self._load_batch(pending_loads.pop(batch_key))
+                for final_status in final_statuses:
+                    status_counts[final_status] = status_counts.get(final_status, 0) + 1
+            for batch in pending_loads.values():
+                for final_status in self._load_batch(batch):
+                    status_counts[final_status] = status_counts.get(final_status, 0) + 1
         finally:
+            elapsed_ms = (time.perf_counter() - run_started) * 1000
+            summary = " ".join(f"{status}={count}" for status, count in sorted(status_counts.items()))
+            logger.info(
+                f"transformation_run_finished files={sum(status_counts.values())} "
+                f"workers={self.max_workers} elapsed_ms={elapsed_ms:.1f} {summary}".rstrip()
+            )
             self.close()
 
+    def _iter_results_from_pool(self, pending_files_data: list[dict]):
+        """
+        Yields per-file results from a process pool, keeping the number of
+        submitted-but-unconsumed files bounded by ``self.max_in_flight``.
+        """
+        pending_iter = iter(pending_files_data)
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.raw_lake_db_path), str(self.schema_config_path)),
+        ) as executor:
+            in_flight = {}
+
+            def submit_next() -> bool:
+                file_data = next(pending_iter, None)
+                if file_data is None:
+                    return False
+                future = executor.submit(_transform_file_in_worker, file_data['file_hash'], file_data['file_path'])
+                in_flight[future] = file_data
+                return True
+
+            while len(in_flight) < self.max_in_flight and submit_next():
+                pass
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_data = in_flight.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        # 例外若無法在 worker 內轉成結果 (例如 worker 異常終止)，在此依相同規則對應狀態
+                        yield _error_result(file_data['file_hash'], file_data['file_path'], e, {})
+                    submit_next()
+
+    def _load_batch(self, batch: list[dict]) -> list[str]:
+        """
+        Loads validated results that share a target table (single writer) in one
+        transaction and finishes each file. If the load fails every file in the
+        batch gets the status mapped from the exception.
+        """
+        first = batch[0]
+        load_started = time.perf_counter()
+        try:
+            dataframes = [
+                result['data'].to_pandas() if isinstance(result['data'], pa.Table) else result['data']
+                for result in batch
+            ]
+            if len(dataframes) == 1:
+                self.processed_loader.load_dataframe(dataframes[0], first['table_name'], first['schema_definition'])
+            else:
+                self.processed_loader.load_dataframes(dataframes, first['table_name'], first['schema_definition'])
+        except Exception as e:
+            statuses = []
+            for result in batch:
+                result.update(_error_result(result['file_hash'], result['file_path'], e, result['timings_ms']))
+                statuses.append(self._finish_file(result, result['status']))
+            return statuses
+
+        load_ms = (time.perf_counter() - load_started) * 1000
+        statuses = []
+        for result in batch:
+            result['timings_ms']['load'] = load_ms
+            statuses.append(self._finish_file(result, 'processed', batch_files=len(batch)))
+        return statuses
+
+    def _finish_file(self, result: dict, status: str, batch_files: int = 1) -> str:
+        """Updates the manifest for one file and logs its per-stage timings."""
+        file_hash = result['file_hash']
+        file_path = result['file_path']
+        self.manifest_manager.update_status(file_hash, status)
+
+        timing_fields = " ".join(f"{stage}_ms={ms:.1f}" for stage, ms in result['timings_ms'].items())
+        message = (
+            f"file_transformed hash={file_hash[:8]} path={file_path} status={status} "
+            f"schema={result.get('schema_name')} rows={result.get('rows', 0)} {timing_fields}"
+        ).rstrip()
+        if status == 'processed':
+            logger.info(f"{message} batch_files={batch_files}")
+        else:
+            logger.warning(f"{message} reason={result.get('reason')}")
+        return status
+
     def close(self):
         # Close connections in a controlled manner
         if hasattr(self, 'manifest_con') and self.manifest_con:
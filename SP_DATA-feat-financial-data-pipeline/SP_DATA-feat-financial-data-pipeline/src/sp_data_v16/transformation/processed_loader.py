@@ -1,3 +1,5 @@
+import hashlib
+import json
 import pandas as pd
 import duckdb
 import os
@@ -17,6 +19,8 @@ class ProcessedDBLoader:
         """
         self.db_path = db_path
         self.con = None
+        # 資料表名稱 -> 已套用 DDL 的結構版本 (避免每次載入都查詢目錄與執行 ALTER)
+        self._table_versions: dict[str, str] = {}
 
         try:
             # Ensure the parent directory for the database file exists
@@ -44,18 +48,41 @@ class ProcessedDBLoader:
             table_name: 資料庫中目標資料表的名稱。
             schema_definition: 包含唯一鍵 (`unique_key`) 等資訊的結構定義。
         """
+        self.load_dataframes([dataframe], table_name, schema_definition)
+
+    def load_dataframes(self, dataframes: list[pd.DataFrame], table_name: str, schema_definition: dict):
+        """
+        將多個共用同一結構定義的 DataFrame 在單一交易中以一條 INSERT ... ON CONFLICT 寫入。
+
+        資料表的 DDL (建表、主鍵、補欄位) 只在該資料表的結構版本改變時執行；
+        同一批次內唯一鍵重複的列以最後一筆為準 (與逐檔依序 upsert 的結果相同)。
+
+        Args:
+            dataframes: 要載入的 DataFrame 列表 (通常來自多個檔案)。
+            table_name: 資料庫中目標資料表的名稱。
+            schema_definition: 包含唯一鍵 (`unique_key`) 等資訊的結構定義。
+        """
         if not self.con:
             print("錯誤：未建立資料庫連線。無法載入 DataFrame。")
             return
 
-        if dataframe.empty:
+        frames = [df for df in dataframes if not df.empty]
+        if not frames:
             print(f"資訊：傳入的 DataFrame 為空，無需載入至資料表 '{table_name}'。")
             return
 
+        # 從 schema_definition 獲取唯一鍵
+        unique_key = schema_definition.get('unique_key')
+        if len(frames) == 1:
+            dataframe = frames[0]
+        else:
+            dataframe = pd.concat(frames, ignore_index=True)
+            if unique_key:
+                # 同一條 INSERT 中不可重複更新同一列，先保留每個鍵的最後一筆
+                dataframe = dataframe.drop_duplicates(subset=unique_key, keep='last')
+
         temp_view_name = None # 初始化 temp_view_name
         try:
-            # 從 schema_definition 獲取唯一鍵
-            unique_key = schema_definition.get('unique_key')
             if not unique_key:
                 # 如果沒有唯一鍵，退回使用 append 模式 (或拋出錯誤，視乎需求)
                 print(f"警告：資料表 '{table_name}' 的結構定義中未指定 'unique_key'。將使用 append 模式載入。")
@@ -71,146 +98,32 @@ class ProcessedDBLoader:
             # 例如 unique_key = ['col1', 'col2'] -> ON CONFLICT (col1, col2)
             conflict_target = ", ".join(unique_key)
 
-            # 動態建立 DO UPDATE SET 子句
-            # 排除唯一鍵欄位，更新其他所有欄位
-            # df_columns = [col for col in dataframe.columns if col not in unique_key] # 這樣會排除 unique_key 被更新，通常這是期望的
             df_columns = dataframe.columns # 更新所有欄位，包括 unique_key (雖然它們不會變)
             if not df_columns.tolist(): # 檢查是否有可更新的欄位
                 print(f"錯誤：DataFrame 中沒有欄位可用於更新資料表 '{table_name}'。")
                 self.con.unregister(temp_view_name)
                 return
 
-            set_clauses = []
-            for col in df_columns:
-                # 使用 excluded.{col} 來引用插入衝突列中的值
-                set_clauses.append(f'"{col}" = excluded."{col}"')
-            update_set_statement = ", ".join(set_clauses)
-
-            # 組合完整的 Upsert SQL 語句
-            # 注意：欄位名稱和資料表名稱可能需要加上引號，以處理特殊字元或保留字
-            # DuckDB 通常對大小寫不敏感，但為求明確，可以使用引號
-
-            # 首先，確保資料表存在
-            # 從 DataFrame 推斷欄位類型以建立資料表，DuckDB 通常能很好地處理這個
-            # 我們也可以從 schema_definition 獲取更精確的 DB 類型，但這會更複雜
-            # 為了簡化，我們先讓 DuckDB 從 DataFrame 推斷
-            # 更理想的做法是使用 schema_definition 中的 db_type 來定義欄位
-
-            # 檢查資料表是否已存在
-            table_exists_query = self.con.execute(f"SELECT 1 FROM sqlite_master WHERE type='table' AND name='{table_name}';").fetchone()
-
-            if not table_exists_query:
-                # 動態產生 CREATE TABLE 語句，包含 UNIQUE 約束
-                # 這裡我們需要知道欄位的類型。為了簡化，我們讓 DuckDB 從 DataFrame 推斷類型，然後再添加約束。
-                # 一個更穩健的方法是從 schema_definition 獲取欄位類型。
-                # 暫時先用 DataFrame 的欄位直接建立，然後嘗試 ALTER TABLE (如果 DuckDB 支援這樣添加約束)
-                # 或者，在 CREATE TABLE 時就定義好。
-
-                # 從 DataFrame 獲取欄位名稱和類型 (DuckDB SQL 類型)
-                # DuckDB 的 from_df 會自動推斷類型
-                self.con.execute(f"CREATE TABLE \"{table_name}\" AS SELECT * FROM {temp_view_name} WHERE 1=0;") # 先用 DataFrame 結構建立空表
-
-                # 如果有 unique_key，則添加 UNIQUE 約束
-                # 注意：DuckDB 對於 ALTER TABLE ADD CONSTRAINT 的支援可能有限或語法特定
-                # 一個更安全的做法是在 CREATE TABLE 時就包含約束，但這需要明確的欄位類型定義
-                # 這裡我們假設 unique_key 中的欄位都存在於 DataFrame 中
-                if unique_key:
-                    unique_key_str = ", ".join([f'"{col}"' for col in unique_key])
-                    # 嘗試為已建立的空表添加 UNIQUE 約束
-                    # DuckDB 可能不支援直接 ALTER TABLE ADD CONSTRAINT UNIQUE(...) 這樣的方式
-                    # 另一種方法是建立帶有約束的新表，然後如果舊表有資料則轉移 (但這裡表是新建的)
-                    # 或者，在 CREATE TABLE 語句中直接定義欄位和約束，這需要知道類型
-                    # 例如: CREATE TABLE my_table (id INTEGER PRIMARY KEY, name VARCHAR, value DOUBLE UNIQUE)
-                    # 由於我們是從 DataFrame 動態建立，這比較棘手。
-                    # DuckDB 的 `CREATE TABLE ... AS SELECT ...` 不直接支援添加約束。
-                    # 我們需要先建立帶約束的表，然後 INSERT。
-
-                    # 退而求其次，如果直接 ALTER 不方便，我們可以在 INSERT ... ON CONFLICT 時依賴它。
-                    # 但錯誤訊息指出需要約束。
-                    # 因此，我們必須在 CREATE TABLE 時定義它。
-                    # 這需要我們從 schema_definition 中獲取欄位的 DB 類型。
-
-                    # 讓我們嘗試一種更明確的 CREATE TABLE 語句
-                    # 這需要 `schema_definition` 包含每個欄位的 `db_type`
-
-                    columns_with_types = []
-                    if 'columns' in schema_definition and isinstance(schema_definition['columns'], dict):
-                        for col_name, col_def in schema_definition['columns'].items():
-                            if col_name in dataframe.columns: # 只處理 DataFrame 中實際存在的欄位
-                                db_type = col_def.get('db_type', 'VARCHAR') # 預設為 VARCHAR
-                                columns_with_types.append(f'"{col_name}" {db_type}')
-
-                    if not columns_with_types: # 如果 schema_definition 中沒有欄位類型資訊，退回之前的方法
-                         self.con.execute(f"CREATE TABLE IF NOT EXISTS \"{table_name}\" AS SELECT * FROM {temp_view_name} WHERE 1=0;")
-                    else:
-                        # 修改 CREATE TABLE 語句，將 PRIMARY KEY 直接附加到欄位定義
-                        column_definitions_for_create = []
-                        for col_name, col_def in schema_definition['columns'].items():
-                            if col_name in dataframe.columns:
-                                db_type = col_def.get('db_type', 'VARCHAR')
-                                col_def_str = f'"{col_name}" {db_type}'
-                                # 如果此欄位是 unique_key (假設 unique_key 只有一個欄位，或我們只取第一個作為 PK)
-                                # 為了 ON CONFLICT，我們需要一個 PRIMARY KEY 或 UNIQUE 約束
-                                # 假設 unique_key (現在被視為 primary key) 列表的第一個元素是主鍵
-                                if unique_key and col_name == unique_key[0]: # 假設 unique_key 只有一個欄位或第一個是主鍵
-                                    col_def_str += " PRIMARY KEY"
-                                elif unique_key and col_name in unique_key: # 其他 unique_key 欄位可以設為 NOT NULL (如果需要)
-                                     # 如果 schema 中有 nullable: False，可以加上 NOT NULL
-                                     if col_def.get("nullable") is False:
-                                         col_def_str += " NOT NULL"
-                                column_definitions_for_create.append(col_def_str)
-
-                        create_table_sql = f"CREATE TABLE IF NOT EXISTS \"{table_name}\" ({', '.join(column_definitions_for_create)});"
-                        # 如果 unique_key 包含多個欄位，則上述 PRIMARY KEY(unique_key[0]) 的方法不完整
-                        # 需要一個表級的 PRIMARY KEY (col1, col2, ...) 約束
-                        # 因此，恢復之前的表級約束方式，但要確保語法正確
-
-                        # 重新使用之前的表級約束方式，因為它更能處理複合主鍵
-                        create_table_sql_parts = []
-                        for col_name, col_def in schema_definition['columns'].items():
-                            if col_name in dataframe.columns:
-                                db_type = col_def.get('db_type', 'VARCHAR')
-                                nullable = col_def.get('nullable', True)
-                                part = f'"{col_name}" {db_type}'
-                                if not nullable:
-                                    part += " NOT NULL"
-                                create_table_sql_parts.append(part)
-
-                        if unique_key: # unique_key 被用作 PRIMARY KEY
-                             # primary_key_constraint_str = ", ".join([f'"{col}"' for col in unique_key]) # 在 ALTER TABLE 中使用
-                             # create_table_sql_parts.append(f"PRIMARY KEY ({primary_key_constraint_str})") # 不在 CREATE TABLE 時直接加
-                             pass
-
-                        create_table_sql = f"CREATE TABLE IF NOT EXISTS \"{table_name}\" ({', '.join(create_table_sql_parts)});"
-                        print(f"準備執行 CREATE TABLE SQL (無內建約束): {create_table_sql}")
-                        self.con.execute(create_table_sql)
-
-                        # 如果有 unique_key，則在建表後嘗試用 ALTER TABLE 添加 PRIMARY KEY 約束
-                        if unique_key:
-                            try:
-                                pk_columns_str = ", ".join([f'"{col}"' for col in unique_key])
-                                alter_sql = f"ALTER TABLE \"{table_name}\" ADD PRIMARY KEY ({pk_columns_str});"
-                                print(f"準備執行 ALTER TABLE ADD PRIMARY KEY SQL: {alter_sql}")
-                                self.con.execute(alter_sql)
-                                print(f"已為資料表 '{table_name}' 添加 PRIMARY KEY 約束於欄位: {pk_columns_str}")
-                            except duckdb.Error as alter_err:
-                                print(f"警告：為資料表 '{table_name}' 添加 PRIMARY KEY 約束失敗: {alter_err}。 Upsert 可能會失敗。")
-                                # 即使 ALTER 失敗，也繼續嘗試 Upsert，看看會發生什麼
-
-                        # 在 CREATE/ALTER TABLE 之後，執行一個簡單的查詢以確保表格結構被資料庫完全識別
-                        self.con.execute(f"SELECT * FROM \"{table_name}\" WHERE 1=0;")
-                print(f"已確保資料表 '{table_name}' 存在，並嘗試設定 PRIMARY KEY 約束。")
-            else:
-                print(f"資料表 '{table_name}' 已存在。")
+            # 使用 excluded.{col} 來引用插入衝突列中的值
+            update_set_statement = ", ".join(f'"{col}" = excluded."{col}"' for col in df_columns)
+            column_list = ", ".join(f'"{col}"' for col in df_columns)
 
+            self._ensure_table(table_name, temp_view_name, dataframe, schema_definition, unique_key)
 
             upsert_sql = f"""
-            INSERT INTO "{table_name}" SELECT * FROM {temp_view_name}
+            INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM {temp_view_name}
             ON CONFLICT ({conflict_target}) DO UPDATE SET {update_set_statement};
             """
 
-            print(f"準備執行 Upsert SQL 至資料表 '{table_name}':\n{upsert_sql}")
-            self.con.execute(upsert_sql)
+            print(f"準備執行 Upsert SQL 至資料表 '{table_name}' ({len(frames)} 個 DataFrame，共 {len(dataframe)} 列)")
+            # DDL 已在交易外完成；資料寫入為單一交易，失敗時整批回滾
+            self.con.begin()
+            try:
+                self.con.execute(upsert_sql)
+                self.con.commit()
+            except Exception:
+                self.con.rollback()
+                raise
 
             # 清理暫存視圖
             self.con.unregister(temp_view_name)
@@ -237,6 +150,97 @@ class ProcessedDBLoader:
                 except duckdb.Error:
                     pass
             raise # 重新拋出
+
+    @staticmethod
+    def _schema_version(schema_definition: dict, columns) -> str:
+        """
+        結構版本：優先使用 schema 中的 `version`，否則以欄位定義、唯一鍵與
+        實際載入的欄位計算指紋。指紋不變時不需重跑任何 DDL。
+        """
+        fingerprint = json.dumps(
+            {
+                "version": schema_definition.get("version"),
+                "columns": schema_definition.get("columns"),
+                "unique_key": schema_definition.get("unique_key"),
+                "loaded_columns": [str(col) for col in columns],
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _ensure_table(self, table_name: str, temp_view_name: str, dataframe: pd.DataFrame,
+                      schema_definition: dict, unique_key: list):
+        """確保資料表存在且具備主鍵；結果依結構版本快取，版本未變時不查詢目錄也不執行 DDL。"""
+        version = self._schema_version(schema_definition, dataframe.columns)
+        if self._table_versions.get(table_name) == version:
+            return
+
+        # 檢查資料表是否已存在
+        table_exists_query = self.con.execute(f"SELECT 1 FROM sqlite_master WHERE type='table' AND name='{table_name}';").fetchone()
+
+        if not table_exists_query:
+            self._create_table(table_name, temp_view_name, dataframe, schema_definition, unique_key)
+            print(f"已確保資料表 '{table_name}' 存在，並嘗試設定 PRIMARY KEY 約束。")
+        else:
+            print(f"資料表 '{table_name}' 已存在。")
+            self._add_missing_columns(table_name, dataframe, schema_definition)
+
+        self._table_versions[table_name] = version
+
+    def _create_table(self, table_name: str, temp_view_name: str, dataframe: pd.DataFrame,
+                      schema_definition: dict, unique_key: list):
+        """建立資料表，並以 ALTER TABLE 為唯一鍵加上 PRIMARY KEY (ON CONFLICT 需要此約束)。"""
+        # 先用 DataFrame 結構建立空表 (DuckDB 從 DataFrame 推斷欄位類型)
+        self.con.execute(f"CREATE TABLE \"{table_name}\" AS SELECT * FROM {temp_view_name} WHERE 1=0;")
+
+        # 從 schema_definition 取得欄位的 DB 類型 (只處理 DataFrame 中實際存在的欄位)
+        create_table_sql_parts = []
+        if 'columns' in schema_definition and isinstance(schema_definition['columns'], dict):
+            for col_name, col_def in schema_definition['columns'].items():
+                if col_name in dataframe.columns:
+                    db_type = col_def.get('db_type', 'VARCHAR') # 預設為 VARCHAR
+                    part = f'"{col_name}" {db_type}'
+                    if not col_def.get('nullable', True):
+                        part += " NOT NULL"
+                    create_table_sql_parts.append(part)
+
+        if not create_table_sql_parts: # 如果 schema_definition 中沒有欄位類型資訊，退回之前的方法
+            self.con.execute(f"CREATE TABLE IF NOT EXISTS \"{table_name}\" AS SELECT * FROM {temp_view_name} WHERE 1=0;")
+            return
+
+        create_table_sql = f"CREATE TABLE IF NOT EXISTS \"{table_name}\" ({', '.join(create_table_sql_parts)});"
+        print(f"準備執行 CREATE TABLE SQL (無內建約束): {create_table_sql}")
+        self.con.execute(create_table_sql)
+
+        # 建表後以 ALTER TABLE 添加 PRIMARY KEY 約束 (可處理複合主鍵)
+        try:
+            pk_columns_str = ", ".join([f'"{col}"' for col in unique_key])
+            alter_sql = f"ALTER TABLE \"{table_name}\" ADD PRIMARY KEY ({pk_columns_str});"
+            print(f"準備執行 ALTER TABLE ADD PRIMARY KEY SQL: {alter_sql}")
+            self.con.execute(alter_sql)
+            print(f"已為資料表 '{table_name}' 添加 PRIMARY KEY 約束於欄位: {pk_columns_str}")
+        except duckdb.Error as alter_err:
+            print(f"警告：為資料表 '{table_name}' 添加 PRIMARY KEY 約束失敗: {alter_err}。 Upsert 可能會失敗。")
+            # 即使 ALTER 失敗，也繼續嘗試 Upsert，看看會發生什麼
+
+    def _add_missing_columns(self, table_name: str, dataframe: pd.DataFrame, schema_definition: dict):
+        """結構版本改變時，為既有資料表補上 DataFrame 中新增的欄位。"""
+        existing = {
+            row[0] for row in self.con.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [table_name]
+            ).fetchall()
+        }
+        columns_definition = schema_definition.get('columns')
+        if not isinstance(columns_definition, dict):
+            columns_definition = {}
+        for col_name in dataframe.columns:
+            if col_name in existing:
+                continue
+            db_type = columns_definition.get(col_name, {}).get('db_type', 'VARCHAR')
+            print(f"為資料表 '{table_name}' 新增欄位 '{col_name}' ({db_type})。")
+            self.con.execute(f"ALTER TABLE \"{table_name}\" ADD COLUMN IF NOT EXISTS \"{col_name}\" {db_type};")
+
     def close(self):
         """
         Closes the connection to the DuckDB database.
@@ -1,16 +1,31 @@
+import codecs
 import json
 import pathlib
+import re
+
+# 綱要關鍵字通常出現在檔頭區，只解碼並掃描這麼多位元組
+DEFAULT_IDENTIFICATION_PREFIX_BYTES = 64 * 1024
+
 
 class SchemaManager:
-    def __init__(self, schema_path: str):
+    def __init__(self, schema_path: str, prefix_bytes: int = DEFAULT_IDENTIFICATION_PREFIX_BYTES):
         """
         Initializes the SchemaManager by loading schema definitions from a JSON file.
 
         Args:
             schema_path: Path to the JSON file containing schema definitions.
+            prefix_bytes: Number of leading bytes of a file that are decoded and
+                scanned for schema keywords.
         """
         self.schema_path = pathlib.Path(schema_path)
+        self.prefix_bytes = prefix_bytes
         self.schemas = {}  # Initialize to empty dict
+        # 關鍵字比對器 (依 self.schemas 延遲建立；schemas 被替換時會重建)
+        self._matcher_source = None
+        self._keyword_pattern = None
+        self._keyword_schemas: dict[str, list[int]] = {}
+        self._implied_keywords: dict[str, list[str]] = {}
+        self._schema_names: list[str] = []
 
         try:
             with open(self.schema_path, 'r', encoding='utf-8') as f:
@@ -24,9 +39,62 @@ class SchemaManager:
             print(f"Warning: Error decoding JSON from {self.schema_path}: {e}")
             # self.schemas will remain an empty dict or could be reset
 
+    def _build_keyword_matcher(self) -> None:
+        """
+        Compiles every schema keyword into one regex alternation.
+
+        Alternatives are ordered longest first, so at each position the regex
+        reports the longest keyword; shorter keywords contained in it are
+        credited through ``_implied_keywords``, which keeps the scores exact.
+        """
+        self._schema_names = []
+        keyword_schemas: dict[str, list[int]] = {}
+        for schema_name, schema_definition in self.schemas.items():
+            schema_index = len(self._schema_names)
+            self._schema_names.append(schema_name)
+            for kw in schema_definition.get("keywords", []) or []:
+                lower_kw = kw.lower()
+                if not lower_kw:
+                    continue
+                owners = keyword_schemas.setdefault(lower_kw, [])
+                if schema_index not in owners:
+                    owners.append(schema_index)
+
+        self._keyword_schemas = keyword_schemas
+        self._implied_keywords = {
+            kw: [other for other in keyword_schemas if other in kw] for kw in keyword_schemas
+        }
+        if keyword_schemas:
+            alternation = "|".join(re.escape(kw) for kw in sorted(keyword_schemas, key=len, reverse=True))
+            # 以 lookahead 在每個位置比對，重疊出現的關鍵字也不會漏掉
+            self._keyword_pattern = re.compile(f"(?=({alternation}))")
+        else:
+            self._keyword_pattern = None
+        self._matcher_source = self.schemas
+
+    def _decode_prefix(self, raw_content: bytes) -> str | None:
+        """
+        Decodes the leading ``prefix_bytes`` of the content (utf-8, falling back
+        to big5). A multi-byte character cut off at the prefix boundary is
+        dropped rather than treated as a decoding error.
+        """
+        is_truncated = len(raw_content) > self.prefix_bytes
+        prefix = raw_content[:self.prefix_bytes] if is_truncated else raw_content
+        for encoding in ('utf-8', 'big5'):
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                return decoder.decode(prefix, final=not is_truncated)
+            except UnicodeDecodeError:
+                continue
+        return None
+
     def identify_schema_from_content(self, raw_content: bytes) -> str | None:
         """
-        Identifies a schema based on keywords found in the raw content.
+        Identifies a schema based on keywords found in the leading part of the content.
+
+        Every schema is scored by the number of its distinct keywords found in a
+        single regex pass over the decoded prefix. The highest score wins; ties
+        go to the schema defined first.
 
         Args:
             raw_content: The raw byte content of a file.
@@ -34,27 +102,32 @@ class SchemaManager:
         Returns:
             The name of the identified schema, or None if no schema matches.
         """
-        decoded_content: str | None = None
-        try:
-            decoded_content = raw_content.decode('utf-8').lower()
-        except UnicodeDecodeError:
-            try:
-                decoded_content = raw_content.decode('big5').lower()  # Fallback to BIG5
-            except UnicodeDecodeError:
-                # print(f"Warning: Could not decode content with utf-8 or big5.")
-                return None
+        decoded_content = self._decode_prefix(raw_content)
+        if decoded_content is None:
+            # print(f"Warning: Could not decode content with utf-8 or big5.")
+            return None
 
         if not self.schemas or not decoded_content:
             return None
 
-        for schema_name, schema_definition in self.schemas.items():
-            keywords = schema_definition.get("keywords", [])
-            if not keywords:
-                continue
+        if self._matcher_source is not self.schemas:
+            self._build_keyword_matcher()
+        if self._keyword_pattern is None:
+            return None
 
-            lower_keywords = [kw.lower() for kw in keywords]
+        found_keywords: set[str] = set()
+        for match in self._keyword_pattern.finditer(decoded_content.lower()):
+            longest = match.group(1)
+            if longest not in found_keywords:
+                found_keywords.update(self._implied_keywords[longest])
 
-            if any(kw in decoded_content for kw in lower_keywords):
-                return schema_name  # Match found
+        if not found_keywords:
+            return None  # No schema matched
 
-        return None  # No schema matched
+        scores = [0] * len(self._schema_names)
+        for kw in found_keywords:
+            for schema_index in self._keyword_schemas[kw]:
+                scores[schema_index] += 1
+        # max() 在同分時保留第一個，即較早定義的綱要
+        best_index = max(range(len(scores)), key=scores.__getitem__)
+        return self._schema_names[best_index]
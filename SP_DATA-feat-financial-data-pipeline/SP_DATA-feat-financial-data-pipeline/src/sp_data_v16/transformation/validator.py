@@ -1,5 +1,17 @@
+import numpy as np
 import pandas as pd
 
+# 驗證失敗列的原因代碼欄位 (split() 的 invalid 輸出)
+ERRORS_COLUMN = '_errors'
+
+# 規則類型 -> schema 欄位設定中對應的鍵
+RULE_KEYS = {
+    'range': ('min', 'max'),
+    'enum': ('enum',),
+    'pattern': ('pattern',),
+}
+
+
 class DataValidator:
     def validate(self, dataframe: pd.DataFrame, schema: dict) -> pd.DataFrame:
         """
@@ -10,19 +22,63 @@ class DataValidator:
             schema: A dictionary defining the schema with 'columns' information.
 
         Returns:
-            A pandas DataFrame with data types converted and nullability checked.
+            A pandas DataFrame with data types converted and nullability checked,
+            or None if any row violates a rule (not-null, range, enum or pattern).
+        """
+        processed_df, failures, labels, warnings = self._evaluate(dataframe, schema)
+
+        # Print all warnings
+        for warning in warnings:
+            print(warning)
+
+        if failures.any():
+            print("Critical validation errors found. Returning None.")
+            return None
+
+        return processed_df
+
+    def split(self, dataframe: pd.DataFrame, schema: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Validates the DataFrame and splits it into valid and invalid rows in one pass.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: (valid rows, invalid rows). Both carry
+            the converted dtypes; the invalid rows get an extra ``_errors`` column of
+            ';'-separated reason codes such as ``not_null:id`` or ``range:price``.
+        """
+        processed_df, failures, labels, warnings = self._evaluate(dataframe, schema)
+        for warning in warnings:
+            print(warning)
+
+        invalid_mask = failures.any(axis=1)
+        invalid_df = processed_df[invalid_mask].copy()
+        # 依檢查項目 (而非逐列) 組合原因代碼：每個檢查只做一次向量化字串串接
+        reasons = pd.Series('', index=processed_df.index, dtype=object)
+        for check_index, label in enumerate(labels):
+            failed = failures[:, check_index]
+            if failed.any():
+                reasons[failed] = reasons[failed] + (label + ';')
+        invalid_df[ERRORS_COLUMN] = reasons[invalid_mask].str.rstrip(';')
+        return processed_df[~invalid_mask].copy(), invalid_df
+
+    def _evaluate(self, dataframe: pd.DataFrame, schema: dict):
+        """
+        Converts column types and evaluates every compiled rule.
+
+        Returns:
+            (processed_df, failures, labels, warnings): ``failures`` is a boolean
+            matrix (rows x checks) and ``labels[j]`` is the reason code of check j.
         """
         processed_df = dataframe.copy()
         warnings = []
-        has_critical_error = False # Flag for critical validation errors
+        columns_schema = schema.get('columns', {}) or {}
 
-        for column_name, col_schema in schema.get('columns', {}).items():
+        for column_name, col_schema in columns_schema.items():
             if column_name not in processed_df.columns:
                 warnings.append(f"Warning: Column '{column_name}' defined in schema but not found in DataFrame.")
                 continue
 
             target_dtype = col_schema.get('dtype')
-            nullable = col_schema.get('nullable', True)
 
             if target_dtype == 'integer':
                 processed_df[column_name] = pd.to_numeric(processed_df[column_name], errors='coerce').astype('Int64') # Use Int64 to support NaN
@@ -43,25 +99,79 @@ class DataValidator:
                         f"Indices: {error_indices}. Original values: {original_values}. These were set to NaN."
                     )
 
-            # Nullability check
-            if not nullable:
-                if processed_df[column_name].isna().any():
-                    nan_indices = processed_df[column_name][processed_df[column_name].isna()].index.tolist()
+        rules = self._compile_rules(columns_schema, processed_df.columns)
+        masks, labels = [], []
+
+        # not_null：所有非空欄位一次以 2D isna 計算
+        not_null_columns = rules['not_null']
+        if not_null_columns:
+            null_matrix = processed_df[not_null_columns].isna().to_numpy()
+            for column_index, column_name in enumerate(not_null_columns):
+                if null_matrix[:, column_index].any():
+                    nan_indices = processed_df.index[null_matrix[:, column_index]].tolist()
                     warnings.append(
                         f"Critical: Column '{column_name}' is defined as non-nullable but contains NaN values at indices: {nan_indices}."
                         " These NaN values might be due to original data or conversion errors."
                     )
-                    has_critical_error = True # Set critical error flag
+            masks.append(null_matrix)
+            labels.extend(f"not_null:{column_name}" for column_name in not_null_columns)
 
-        # Print all warnings
-        for warning in warnings:
-            print(warning)
+        for rule_type in RULE_KEYS:
+            rule_columns = rules[rule_type]
+            if not rule_columns:
+                continue
+            matrix = np.column_stack([
+                self._rule_violations(rule_type, processed_df[column_name], params)
+                for column_name, params in rule_columns
+            ])
+            for column_index, (column_name, params) in enumerate(rule_columns):
+                if matrix[:, column_index].any():
+                    bad_indices = processed_df.index[matrix[:, column_index]].tolist()
+                    warnings.append(
+                        f"Critical: Column '{column_name}' violates {rule_type} rule {params} at indices: {bad_indices}."
+                    )
+            masks.append(matrix)
+            labels.extend(f"{rule_type}:{column_name}" for column_name, _ in rule_columns)
 
-        if has_critical_error:
-            print("Critical validation errors found. Returning None.")
-            return None
+        if masks:
+            failures = np.hstack(masks)
+        else:
+            failures = np.zeros((len(processed_df), 0), dtype=bool)
+        return processed_df, failures, labels, warnings
 
-        return processed_df
+    @staticmethod
+    def _compile_rules(columns_schema: dict, available_columns) -> dict:
+        """將 schema 的欄位設定依規則類型分組 (只包含存在於 DataFrame 中的欄位)。"""
+        rules = {'not_null': [], **{rule_type: [] for rule_type in RULE_KEYS}}
+        for column_name, col_schema in columns_schema.items():
+            if column_name not in available_columns:
+                continue
+            if not col_schema.get('nullable', True):
+                rules['not_null'].append(column_name)
+            for rule_type, keys in RULE_KEYS.items():
+                params = {key: col_schema[key] for key in keys if col_schema.get(key) is not None}
+                if params:
+                    rules[rule_type].append((column_name, params))
+        return rules
+
+    @staticmethod
+    def _rule_violations(rule_type: str, series: pd.Series, params: dict) -> np.ndarray:
+        """返回違反規則的布林陣列；空值不視為違反 (由 not_null 規則負責)。"""
+        present = series.notna().to_numpy()
+        if rule_type == 'range':
+            convert = pd.Timestamp if pd.api.types.is_datetime64_any_dtype(series) else float
+            violated = np.zeros(len(series), dtype=bool)
+            if 'min' in params:
+                violated |= (series < convert(params['min'])).fillna(False).to_numpy(dtype=bool)
+            if 'max' in params:
+                violated |= (series > convert(params['max'])).fillna(False).to_numpy(dtype=bool)
+            return violated & present
+        if rule_type == 'enum':
+            return ~series.isin(params['enum']).to_numpy() & present
+        if rule_type == 'pattern':
+            matched = series.astype('string').str.fullmatch(params['pattern']).fillna(False)
+            return ~matched.to_numpy(dtype=bool) & present
+        raise ValueError(f"Unknown rule type: {rule_type}")
 
     def _validate_enum(self, value: any, valid_enums: list[str]) -> None:
         """
@@ -3,8 +3,10 @@
 
 from .db_manager import DBManager
 from .constants import FileStatus
+from .writer_service import DBWriterService
 
 __all__ = [
     "DBManager",
     "FileStatus",
+    "DBWriterService",
 ]
@@ -10,6 +10,7 @@ class FileStatus(Enum):
     TRANSFORMING = "TRANSFORMING"              # 正在轉換中
     TRANSFORMED_SUCCESS = "TRANSFORMED_SUCCESS"    # 轉換成功
     TRANSFORMATION_FAILED = "TRANSFORMATION_FAILED"  # 轉換失敗
+    QUARANTINED = "QUARANTINED"                # 找不到匹配配方，檔案被隔離待人工檢查
 
     LOAD_PENDING = "LOAD_PENDING"              # (如果還有載入到最終目標表的階段) 等待載入
     LOADING = "LOADING"                        # 正在載入
@@ -406,6 +406,52 @@ class DBManager:
             logger.error(f"將 DataFrame 載入到表格 '{table_name}' 時發生錯誤: {e}", exc_info=True)
             raise # 重新拋出異常，讓呼叫者處理
 
+    def load_arrow_table_to_table(self, table: Any, table_name: str, if_exists: str = 'append') -> None:
+        """
+        將 pyarrow.Table 載入到指定的資料庫表格中 (供單一寫入者服務使用)。
+
+        Args:
+            table (pa.Table): 要載入的 Arrow 表格。
+            table_name (str): 目標資料庫表格的名稱。
+            if_exists (str): 如果表格已存在時的操作。支援 'append', 'replace'。
+        """
+        if not self.conn:
+            logger.error(f"資料庫未連線，無法將 Arrow 表格載入到表格 '{table_name}'。")
+            raise ConnectionError("資料庫未連線。")
+
+        if table is None or table.num_rows == 0:
+            logger.info(f"傳入的 Arrow 表格為空，不執行載入操作到表格 '{table_name}'。")
+            return
+
+        if if_exists not in ('append', 'replace'):
+            logger.error(f"不支援的 if_exists 模式: '{if_exists}'。請使用 'append' 或 'replace'。")
+            raise ValueError(f"不支援的 if_exists 模式: '{if_exists}'")
+
+        view_name = "__arrow_batch_to_load"
+        try:
+            self.conn.register(view_name, table)
+            if if_exists == 'replace':
+                self.conn.execute(f"DROP TABLE IF EXISTS {table_name};")
+                self.conn.execute(f"CREATE TABLE {table_name} AS SELECT * FROM {view_name};")
+                logger.info(f"已成功取代/建立表格 '{table_name}' 並載入 {table.num_rows} 行數據。")
+            else:
+                table_exists_result = self.conn.execute(
+                    "SELECT 1 FROM information_schema.tables WHERE table_name = ? AND table_schema = 'main'",
+                    [table_name]
+                ).fetchone()
+                if table_exists_result is None:
+                    self.conn.execute(f"CREATE TABLE {table_name} AS SELECT * FROM {view_name};")
+                    logger.info(f"表格 '{table_name}' 不存在，已建立並載入 {table.num_rows} 行數據。")
+                else:
+                    # 依欄位名稱插入，避免欄位順序不同造成錯位
+                    self.conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM {view_name};")
+                    logger.info(f"已將 {table.num_rows} 行數據追加到現有表格 '{table_name}'。")
+        except Exception as e:
+            logger.error(f"將 Arrow 表格載入到表格 '{table_name}' 時發生錯誤: {e}", exc_info=True)
+            raise
+        finally:
+            self.conn.unregister(view_name)
+
     def update_manifest_transformation_status(
         self,
         file_hash: str,
@@ -505,8 +551,8 @@ class DBManager:
             """
             params.append(file_hash) # WHERE 子句的參數
 
-            with self.conn.cursor() as cursor:
-                cursor.execute(sql, tuple(params))
+            # 使用同一個連線執行，呼叫者開啟的交易才能涵蓋此更新 (cursor 在 DuckDB 中是獨立連線)
+            self.conn.execute(sql, tuple(params))
 
             logger.info(f"成功更新 manifest 紀錄 (雜湊值: {file_hash})。")
 
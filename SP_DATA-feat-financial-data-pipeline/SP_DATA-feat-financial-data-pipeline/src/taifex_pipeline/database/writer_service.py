@@ -0,0 +1,247 @@
+import logging
+import multiprocessing
+import queue
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .db_manager import DBManager
+
+logger = logging.getLogger("taifex_pipeline.database.writer_service")
+
+# 寫入者程序可接受的訊息類型
+MSG_LOAD_TABLE = "LOAD_TABLE"
+MSG_UPDATE_MANIFEST = "UPDATE_MANIFEST"
+MSG_FLUSH = "FLUSH"
+MSG_READ_RAW = "READ_RAW"
+MSG_STOP = "STOP"
+
+DEFAULT_MAX_PENDING_MESSAGES = 32 # 佇列上限，同時限制在途 Arrow 批次佔用的記憶體
+DEFAULT_RESPONSE_TIMEOUT_SECONDS = 300
+
+
+def dataframe_to_ipc_bytes(df: pd.DataFrame) -> bytes:
+    """將 DataFrame 序列化為 Arrow IPC stream 格式的位元組。"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_bytes_to_table(payload: bytes) -> pa.Table:
+    """將 Arrow IPC stream 位元組還原為 pyarrow.Table。"""
+    with pa.ipc.open_stream(payload) as reader:
+        return reader.read_all()
+
+
+def submit_dataframe(request_queue: Any,
+                     file_hash: str,
+                     df: pd.DataFrame,
+                     table_name: str,
+                     if_exists: str = 'append') -> None:
+    """
+    供 worker 使用：將清洗後的 DataFrame 以 Arrow IPC 批次送交寫入者程序。
+
+    佇列有容量上限，寫入者忙碌時此呼叫會阻塞，藉此形成背壓 (backpressure)。
+    """
+    request_queue.put({
+        'type': MSG_LOAD_TABLE,
+        'file_hash': file_hash,
+        'table_name': table_name,
+        'if_exists': if_exists,
+        'payload': dataframe_to_ipc_bytes(df),
+    })
+
+
+def _writer_loop(db_path: str, request_queue: Any, response_queue: Any) -> None:
+    """
+    寫入者程序的主迴圈。此程序持有資料庫唯一的讀寫連線，
+    依序處理佇列中的載入與 manifest 更新請求。
+    """
+    load_errors: Dict[str, str] = {}
+    manifest_errors: Dict[str, str] = {}
+    loaded_rows: Dict[str, int] = {}
+
+    db_manager = DBManager(db_path)
+    try:
+        while True:
+            message = request_queue.get()
+            message_type = message.get('type')
+
+            if message_type == MSG_STOP:
+                logger.info("寫入者程序收到停止訊號。")
+                break
+
+            if message_type == MSG_FLUSH:
+                # 佇列是 FIFO，收到 FLUSH 時先前所有請求都已處理完畢
+                response_queue.put({
+                    'load_errors': load_errors,
+                    'manifest_errors': manifest_errors,
+                    'loaded_rows': loaded_rows,
+                })
+                load_errors, manifest_errors, loaded_rows = {}, {}, {}
+                continue
+
+            if message_type == MSG_READ_RAW:
+                # 寫入者持有唯一連線，其他程序需要的原始內容也由它讀出後回傳
+                file_hash = message.get('file_hash', 'UNKNOWN_HASH')
+                try:
+                    raw_content = db_manager.get_raw_file_content(file_hash)
+                except Exception as e:
+                    logger.error(f"寫入者程序讀取檔案 {file_hash} 的原始內容失敗: {e}", exc_info=True)
+                    raw_content = None
+                response_queue.put({'file_hash': file_hash, 'raw_content': raw_content})
+                continue
+
+            if message_type == MSG_LOAD_TABLE:
+                file_hash = message.get('file_hash', 'UNKNOWN_HASH')
+                try:
+                    table = ipc_bytes_to_table(message['payload'])
+                    db_manager.load_arrow_table_to_table(
+                        table, message['table_name'], message.get('if_exists', 'append')
+                    )
+                    loaded_rows[file_hash] = loaded_rows.get(file_hash, 0) + table.num_rows
+                except Exception as e:
+                    logger.error(f"寫入者程序載入檔案 {file_hash} 的數據到 '{message.get('table_name')}' 失敗: {e}", exc_info=True)
+                    load_errors[file_hash] = str(e)
+                continue
+
+            if message_type == MSG_UPDATE_MANIFEST:
+                records: List[Dict[str, Any]] = message.get('records', [])
+                try:
+                    db_manager.conn.execute("BEGIN TRANSACTION;")
+                    for params in records:
+                        db_manager.update_manifest_transformation_status(**params)
+                    db_manager.conn.execute("COMMIT;")
+                    logger.info(f"寫入者程序已在單一交易中更新 {len(records)} 筆 manifest 紀錄。")
+                except Exception as e:
+                    # 交易內任一語句失敗後整批回滾，改為逐筆更新以找出有問題的紀錄
+                    logger.warning(f"批次更新 manifest 失敗，改為逐筆更新: {e}")
+                    db_manager.conn.execute("ROLLBACK;")
+                    for params in records:
+                        try:
+                            db_manager.update_manifest_transformation_status(**params)
+                        except Exception as record_error:
+                            manifest_errors[params.get('file_hash', 'UNKNOWN_HASH')] = str(record_error)
+                continue
+
+            logger.error(f"寫入者程序收到未知的訊息類型: {message_type}")
+    finally:
+        db_manager.close()
+
+
+class DBWriterService:
+    """
+    單一寫入者服務：啟動一個獨立程序持有 DuckDB 的唯一讀寫連線。
+
+    DuckDB 同一個資料庫檔案同時只允許一個程序以讀寫模式開啟。
+    轉換 worker 不再各自開啟 DBManager，而是把 Arrow IPC 批次送進有上限的佇列，
+    由本服務依序寫入；manifest 更新也經由同一個佇列完成。
+
+    使用方式::
+
+        with DBWriterService(db_path) as writer:
+            executor.submit(worker, ..., writer.request_queue)
+            outcome = writer.flush()
+            writer.update_manifest(records)
+    """
+
+    def __init__(self,
+                 db_path: str,
+                 max_pending_messages: int = DEFAULT_MAX_PENDING_MESSAGES,
+                 response_timeout: float = DEFAULT_RESPONSE_TIMEOUT_SECONDS):
+        if not db_path or db_path == ":memory:":
+            raise ValueError("DBWriterService 需要檔案型資料庫路徑，記憶體資料庫無法跨程序共享。")
+        self.db_path = db_path
+        self.max_pending_messages = max_pending_messages
+        self.response_timeout = response_timeout
+        self._manager: Optional[Any] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self.request_queue: Optional[Any] = None
+        self._response_queue: Optional[Any] = None
+
+    def start(self) -> 'DBWriterService':
+        """啟動寫入者程序。呼叫前，本程序不得持有同一資料庫檔案的連線。"""
+        if self._process is not None:
+            raise RuntimeError("DBWriterService 已經啟動。")
+        # Manager 佇列的代理物件可以被 pickle，因此能作為參數傳給 ProcessPoolExecutor 的任務
+        self._manager = multiprocessing.Manager()
+        self.request_queue = self._manager.Queue(maxsize=self.max_pending_messages)
+        self._response_queue = self._manager.Queue()
+        self._process = multiprocessing.Process(
+            target=_writer_loop,
+            args=(self.db_path, self.request_queue, self._response_queue),
+            name="taifex-db-writer",
+            daemon=True,
+        )
+        self._process.start()
+        logger.info(f"DBWriterService 已啟動 (PID: {self._process.pid})，資料庫: {self.db_path}")
+        return self
+
+    def _ensure_running(self) -> None:
+        if self._process is None or not self._process.is_alive():
+            raise RuntimeError("DBWriterService 的寫入者程序未在執行。")
+
+    def flush(self) -> Dict[str, Dict[str, Any]]:
+        """
+        等待佇列中所有先前的請求處理完畢，並取回期間的處理結果。
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 包含 'load_errors'、'manifest_errors'
+            (以 file_hash 為鍵的錯誤訊息) 與 'loaded_rows' (以 file_hash 為鍵的載入行數)。
+        """
+        self._ensure_running()
+        self.request_queue.put({'type': MSG_FLUSH})
+        try:
+            return self._response_queue.get(timeout=self.response_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待寫入者程序回應逾時 ({self.response_timeout} 秒)。")
+
+    def read_raw_file_content(self, file_hash: str) -> Optional[bytes]:
+        """
+        經由寫入者程序讀取一個檔案的原始內容 (寫入者執行期間其他程序無法開啟資料庫)。
+
+        請求與先前的寫入共用同一個 FIFO 佇列，因此回應一定在先前的請求處理完畢之後。
+        呼叫者一次只應有一個未完成的 read_raw_file_content 或 flush。
+        """
+        self._ensure_running()
+        self.request_queue.put({'type': MSG_READ_RAW, 'file_hash': file_hash})
+        try:
+            response = self._response_queue.get(timeout=self.response_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待寫入者程序回應逾時 ({self.response_timeout} 秒)。")
+        return response.get('raw_content')
+
+    def update_manifest(self, records: List[Dict[str, Any]]) -> None:
+        """將一批 manifest 更新送交寫入者程序，於單一交易中套用。"""
+        if not records:
+            return
+        self._ensure_running()
+        self.request_queue.put({'type': MSG_UPDATE_MANIFEST, 'records': records})
+
+    def stop(self) -> None:
+        """送出停止訊號並等待寫入者程序結束。"""
+        if self._process is None:
+            return
+        try:
+            if self._process.is_alive():
+                self.request_queue.put({'type': MSG_STOP})
+            self._process.join(timeout=self.response_timeout)
+            if self._process.is_alive():
+                logger.error("寫入者程序未在時限內結束，將強制終止。")
+                self._process.terminate()
+                self._process.join()
+            logger.info("DBWriterService 已停止。")
+        finally:
+            self._process = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+    def __enter__(self) -> 'DBWriterService':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
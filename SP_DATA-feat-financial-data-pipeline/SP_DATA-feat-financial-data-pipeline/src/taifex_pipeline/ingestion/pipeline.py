@@ -1,14 +1,71 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
 import zipfile
-import collections
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("taifex_pipeline.ingestion.pipeline")
+
+COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DEFAULT_MAX_DECOMPRESSED_BYTES = 16 * 1024 ** 3  # 16 GiB per top-level archive (including nested archives)
+DEFAULT_MAX_NESTING_DEPTH = 8
+TEMP_SUBDIR = ".tmp"
+
+
+class ExtractionLimitExceeded(Exception):
+    """Raised when an archive tree exceeds the configured decompressed-size limit."""
+
+
+class _DecompressedBudget:
+    """Thread-safe byte budget shared by all archives expanded from one top-level zip."""
+
+    def __init__(self, root_name: str, limit_bytes: int):
+        self.root_name = root_name
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes: int):
+        with self._lock:
+            self.used_bytes += n_bytes
+            if self.used_bytes > self.limit_bytes:
+                raise ExtractionLimitExceeded(
+                    f"{self.root_name} exceeds the decompressed-size limit of {self.limit_bytes} bytes"
+                )
+
+
+class _HashingWriter:
+    """File-like wrapper for shutil.copyfileobj that hashes and meters every chunk it writes."""
+
+    def __init__(self, target, budget: _DecompressedBudget):
+        self._target = target
+        self._budget = budget
+        self.sha256 = hashlib.sha256()
+        self.size_bytes = 0
+
+    def write(self, chunk) -> int:
+        self._budget.consume(len(chunk))
+        self.sha256.update(chunk)
+        self.size_bytes += len(chunk)
+        return self._target.write(chunk)
 
-from ..core.logger_setup import get_logger
 
 class IngestionPipeline:
     """
     Handles the ingestion of data from a source directory, processing
     zip files, and extracting their contents. This version supports
     nested zip files.
+
+    Members are streamed (never fully loaded into memory) to content-addressed
+    paths of the form ``<output_dir>/<sha256[:2]>/<sha256>/<member name>``, so
+    members that share a name across archives no longer overwrite each other.
+    Independent archives are expanded concurrently by a thread pool; a
+    decompressed-size limit and a nesting-depth limit guard against zip bombs.
     """
 
     def __init__(self, config: dict):
@@ -16,35 +73,91 @@ class IngestionPipeline:
         Initializes the IngestionPipeline.
 
         Args:
-            config: A dictionary containing pipeline configurations.
+            config: A dictionary containing pipeline configurations. Optional
+                ``ingestion`` keys: ``max_workers``, ``max_decompressed_bytes``
+                (per top-level archive, nested archives included) and
+                ``max_nesting_depth``.
         """
         ingestion_config = config.get("ingestion", {})
         self.source_dir = Path(ingestion_config.get("source_dir", "data/00_source"))
         self.output_dir = Path(ingestion_config.get("output_dir", "data/01_raw"))
-        self.logger = get_logger(self.__class__.__name__)
+        self.max_workers = ingestion_config.get("max_workers")
+        self.max_decompressed_bytes = int(ingestion_config.get("max_decompressed_bytes", DEFAULT_MAX_DECOMPRESSED_BYTES))
+        self.max_nesting_depth = int(ingestion_config.get("max_nesting_depth", DEFAULT_MAX_NESTING_DEPTH))
+        self.logger = logger
 
-        # 1. 初始化動態工作佇列和已處理路徑集合
-        self.work_queue = collections.deque()
+        # 已處理路徑集合 (巢狀壓縮檔位於內容定址路徑，內容相同者路徑亦相同)
         self.processed_paths = set()
+        self.extracted_files: list[dict] = []
+        self._results_lock = threading.Lock()
 
-    def _scan_initial_zips(self):
+    def _scan_initial_zips(self) -> list[Path]:
         """Scans the source directory for top-level zip files to seed the queue."""
         self.logger.info(f"Scanning for initial zip files in {self.source_dir}...")
-        initial_files = [p for p in self.source_dir.glob("*.zip")]
-        self.work_queue.extend(initial_files)
+        initial_files = sorted(self.source_dir.glob("*.zip"))
         self.logger.info(f"Found {len(initial_files)} initial zip files to process.")
+        return initial_files
+
+    def _content_addressed_path(self, sha256_hex: str, member_name: str) -> Path:
+        return self.output_dir / sha256_hex[:2] / sha256_hex / member_name
 
-    def _process_single_zip(self, zip_path: Path) -> list[Path]:
+    def _extract_member(self, zf: zipfile.ZipFile, member_info: zipfile.ZipInfo,
+                        budget: _DecompressedBudget) -> Path:
+        """
+        Streams one archive member to a temp file while hashing it, then renames
+        it to its content-addressed path. Returns the final path.
+        """
+        # 只保留檔名，忽略壓縮檔內的目錄結構 (也避免 "../" 之類的路徑穿越)
+        member_name = Path(member_info.filename).name
+        # 宣告的解壓大小已超出剩餘額度時，不必開始解壓
+        if budget.used_bytes + member_info.file_size > budget.limit_bytes:
+            raise ExtractionLimitExceeded(
+                f"{member_info.filename} ({member_info.file_size} bytes) would exceed the decompressed-size "
+                f"limit of {budget.limit_bytes} bytes for {budget.root_name}"
+            )
+
+        fd, tmp_name = tempfile.mkstemp(suffix=".part", dir=str(self.output_dir / TEMP_SUBDIR))
+        try:
+            with zf.open(member_info) as source, os.fdopen(fd, "wb") as target:
+                writer = _HashingWriter(target, budget)
+                shutil.copyfileobj(source, writer, COPY_CHUNK_SIZE)
+            sha256_hex = writer.sha256.hexdigest()
+            final_path = self._content_addressed_path(sha256_hex, member_name)
+            if final_path.exists():
+                os.remove(tmp_name)
+            else:
+                final_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, final_path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        with self._results_lock:
+            self.extracted_files.append({
+                "member_name": member_info.filename,
+                "path": final_path,
+                "sha256": sha256_hex,
+                "size_bytes": writer.size_bytes,
+            })
+        return final_path
+
+    def _process_single_zip(self, zip_path: Path, depth: int = 0,
+                            budget: Optional[_DecompressedBudget] = None) -> list[Path]:
         """
         Processes a single zip file, extracts its contents, and identifies
         any nested zip files.
 
         Args:
             zip_path: The path to the zip file to process.
+            depth: Nesting depth of this archive (0 for archives in source_dir).
+            budget: Decompressed-size budget of the top-level archive this one came from.
 
         Returns:
             A list of paths to any newly found nested zip files.
         """
+        if budget is None:
+            budget = _DecompressedBudget(zip_path.name, self.max_decompressed_bytes)
         nested_zips_found = []
         self.logger.info(f"Processing archive: {zip_path.name}")
 
@@ -54,71 +167,73 @@ class IngestionPipeline:
                     if member_info.is_dir():
                         continue
 
-                    member_path = Path(member_info.filename) # Relative path within zip
-                    # Ensure output_path is relative to self.output_dir for consistent structure
-                    # If member_path can contain ".." or absolute paths, sanitization might be needed.
-                    # For now, assume member_path.name is sufficient if flat structure in output is OK.
-                    # If preserving internal zip structure: output_file_path = self.output_dir / member_info.filename
-                    # Current implementation extracts all members to the root of self.output_dir using member_path.name
-                    output_file_path = self.output_dir / member_path.name
-
-                    if member_path.name.lower().endswith('.zip'):
-                        # This is a nested zip file. Extract it and add to queue.
-                        self.logger.info(f"  Found nested archive: {member_path.name}. Extracting to {output_file_path}...")
-                        # Extract the nested zip into the raw output directory
-                        # Ensure parent directory for output_file_path exists if preserving structure
-                        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with zf.open(member_info) as source, open(output_file_path, 'wb') as target:
-                            target.write(source.read())
+                    member_name = Path(member_info.filename).name
+                    if member_name.lower().endswith('.zip'):
+                        self.logger.info(f"Found nested archive: {member_name}. Extracting...")
+                        output_file_path = self._extract_member(zf, member_info, budget)
+                        if depth + 1 > self.max_nesting_depth:
+                            self.logger.warning(
+                                f"Nested archive {member_name} exceeds the nesting-depth limit "
+                                f"({self.max_nesting_depth}); stored but not expanded."
+                            )
+                            continue
                         nested_zips_found.append(output_file_path)
                     else:
-                        # This is a regular data file.
-                        self.logger.debug(f"  Extracting data file: {member_path.name} to {output_file_path}")
-                        # Ensure parent directory for output_file_path exists
-                        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with zf.open(member_info) as source, open(output_file_path, 'wb') as target:
-                            target.write(source.read())
+                        self.logger.debug(f"  Extracting data file: {member_name}")
+                        self._extract_member(zf, member_info, budget)
 
         except zipfile.BadZipFile:
             self.logger.error(f"Failed to process {zip_path.name}: Corrupted zip file.")
+        except ExtractionLimitExceeded as e:
+            self.logger.error(f"Stopped extracting {zip_path.name}: {e}")
         except Exception as e:
             self.logger.error(f"An unexpected error occurred while processing {zip_path.name}: {e}", exc_info=True)
 
         return nested_zips_found
 
-    def run(self):
+    def run(self) -> list[dict]:
         """
-        Executes the ingestion pipeline using a dynamic work queue to handle
-        nested zip files.
+        Executes the ingestion pipeline. Archives are expanded in a thread pool;
+        nested archives are scheduled as soon as their parent has been extracted.
+
+        Returns:
+            One record per extracted member with ``member_name``, ``path``,
+            ``sha256`` and ``size_bytes``.
         """
         # 確保輸出目錄存在
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.output_dir / TEMP_SUBDIR
+        tmp_dir.mkdir(exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            def submit(path: Path, depth: int, budget: Optional[_DecompressedBudget]):
+                resolved_file_path = path.resolve()
+                # 防範無限迴圈 (巢狀壓縮檔為內容定址路徑，相同內容只展開一次)
+                if resolved_file_path in self.processed_paths:
+                    self.logger.warning(f"Skipping already processed file to prevent infinite loop: {resolved_file_path.name} (Path: {resolved_file_path})")
+                    return
+                self.processed_paths.add(resolved_file_path)
+                future = executor.submit(self._process_single_zip, resolved_file_path, depth, budget)
+                pending[future] = (depth, budget)
+
+            for zip_path in self._scan_initial_zips():
+                submit(zip_path, 0, _DecompressedBudget(zip_path.name, self.max_decompressed_bytes))
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth, budget = pending.pop(future)
+                    newly_found_zips = future.result()
+                    if newly_found_zips:
+                        self.logger.info(f"Added {len(newly_found_zips)} new nested archives to the processing queue.")
+                        for nested_zip in newly_found_zips:
+                            submit(nested_zip, depth + 1, budget)
 
-        # 2. 掃描頂層目錄，初始化佇列
-        self._scan_initial_zips()
-
-        # 3. 只要佇列不為空，就持續處理
-        while self.work_queue:
-            file_path = self.work_queue.popleft()
-
-            # Resolve path to ensure consistency in processed_paths set
-            resolved_file_path = file_path.resolve()
-
-            # 4. 防範無限迴圈
-            if resolved_file_path in self.processed_paths:
-                self.logger.warning(f"Skipping already processed file to prevent infinite loop: {resolved_file_path.name} (Path: {resolved_file_path})")
-                continue
-
-            self.processed_paths.add(resolved_file_path)
-
-            # 5. 處理單一壓縮檔，並獲取新發現的巢狀壓縮檔列表
-            newly_found_zips = self._process_single_zip(resolved_file_path) # Pass resolved_file_path
-
-            # 6. 將新任務加入佇列
-            if newly_found_zips:
-                # Resolve paths before adding to queue as well for consistency
-                resolved_newly_found_zips = [p.resolve() for p in newly_found_zips]
-                self.work_queue.extend(resolved_newly_found_zips)
-                self.logger.info(f"Added {len(resolved_newly_found_zips)} new nested archives to the processing queue.")
-
-        self.logger.info("Ingestion pipeline finished. All archives processed.")
+        try:
+            tmp_dir.rmdir()
+        except OSError:
+            pass
+        self.logger.info(f"Ingestion pipeline finished. All archives processed. Extracted {len(self.extracted_files)} members.")
+        return self.extracted_files
@@ -1,9 +1,117 @@
+import datetime
 import pandas as pd
 import numpy as np
 import logging
 
 logger = logging.getLogger("taifex_pipeline.transformation.cleaners")
 
+# 民國年起算偏移量 (民國元年 = 西元 1912 年)
+ROC_YEAR_OFFSET = 1911
+
+# 以分隔符號區分年月日的日期 (YYYY/MM/DD, YYY/MM/DD, YYYY-MM-DD；'年'/'月' 會先被正規化為 '/')
+_DELIMITED_DATE_PATTERN = r'^(?P<year>\d{2,4})[/-](?P<month>\d{1,2})[/-](?P<day>\d{1,2})$'
+# 無分隔符號的日期 (YYYYMMDD 或民國年 YYYMMDD)
+_COMPACT_DATE_PATTERN = r'^(?P<year>\d{3,4}?)(?P<month>\d{2})(?P<day>\d{2})$'
+
+# 身份別標準化對照表 (完全匹配)；未列出的值依 INSTITUTION_TYPE_KEYWORDS 以子字串判斷
+INSTITUTION_TYPE_MAP = {
+    '自營商': 'Dealer',
+    '自營商(自行買賣)': 'Dealer',
+    '自營商(避險)': 'Dealer',
+    '投信': 'InvestmentTrust',
+    '外資及陸資': 'ForeignAndMainlandInvestors', # 確保與DB定義一致
+    '外資及陸資(不含自營商)': 'ForeignAndMainlandInvestors',
+    '外資': 'ForeignAndMainlandInvestors', # 有時可能簡寫
+    '全部': 'AllInvestors', # 有些報告可能會有 "全部" 代表所有法人加總
+}
+# 子字串匹配順序：較長的關鍵字優先 (例如 "外資及陸資" 先於 "外資")
+INSTITUTION_TYPE_KEYWORDS = (
+    ('外資及陸資', 'ForeignAndMainlandInvestors'),
+    ('外資', 'ForeignAndMainlandInvestors'),
+    ('自營商', 'Dealer'),
+    ('投信', 'InvestmentTrust'),
+)
+
+
+def parse_roc_dates(values: pd.Series) -> pd.Series:
+    """
+    向量化地將日期字串欄位轉換為 datetime64[ns]，支援民國年。
+
+    支援的格式：
+    - 'YYY/MM/DD'、'YYYY/MM/DD'、'YYYY-MM-DD' (年份小於 1911 視為民國年並加上 1911)
+    - 'YYY年MM月DD日' (先正規化為 'YYY/MM/DD')
+    - 'YYYYMMDD'、民國年 'YYYMMDD'
+    - 日期區間 'A~B' 取結束日期 B
+    其他格式 (例如 '2024-01-05 00:00:00') 交由 pd.to_datetime 推斷，無法解析的值為 NaT。
+    已是 datetime/Timestamp 的值原樣保留。只去除前後空白及分隔符號兩側的空白，值中間的空白 (日期與時間之間) 不會被移除。
+
+    Args:
+        values (pd.Series): 原始日期欄位。
+
+    Returns:
+        pd.Series: 與輸入相同索引的 datetime64[ns] Series。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('datetime64[ns]')
+    is_datetime = None
+    if values.dtype == object:
+        # 例如 Excel 讀入的欄位可能混有 Timestamp 與字串；datetime 值不經字串解析
+        is_datetime = values.map(lambda value: isinstance(value, (datetime.date, np.datetime64)))
+        if is_datetime.any():
+            datetime_values = pd.to_datetime(values[is_datetime].astype(object)).astype('datetime64[ns]')
+            values = values.mask(is_datetime)
+        else:
+            is_datetime = None
+
+    date_strings = values.astype('string').str.strip()
+    date_strings = date_strings.str.replace(r'\s*([~/\-年月日])\s*', r'\1', regex=True) # 分隔符號兩側的空白
+    date_strings = date_strings.str.split('~').str[-1] # 日期區間取結束日期
+    date_strings = (date_strings.str.replace('年', '/', regex=False)
+                                .str.replace('月', '/', regex=False)
+                                .str.replace('日', '', regex=False))
+
+    parts = date_strings.str.extract(_DELIMITED_DATE_PATTERN)
+    compact_parts = date_strings.str.extract(_COMPACT_DATE_PATTERN)
+    parts = parts.fillna(compact_parts)
+
+    components = parts.apply(pd.to_numeric, errors='coerce')
+    components['year'] = components['year'].mask(components['year'] < ROC_YEAR_OFFSET,
+                                                 components['year'] + ROC_YEAR_OFFSET)
+    parsed = pd.to_datetime(components[['year', 'month', 'day']], errors='coerce')
+
+    # 不符合上述樣式的少數值，才交由 pd.to_datetime 逐一推斷格式
+    unmatched = parts['year'].isna() & date_strings.notna() & (date_strings != '') & (date_strings != '-')
+    if unmatched.any():
+        parsed[unmatched] = pd.to_datetime(date_strings[unmatched].astype(object), errors='coerce', format='mixed')
+    parsed = parsed.astype('datetime64[ns]')
+    if is_datetime is not None:
+        parsed[is_datetime] = datetime_values.to_numpy()
+    return parsed
+
+
+def _institution_type_label(raw_value: str) -> str:
+    """單一身份別字串的標準化規則：完全匹配優先，其次子字串匹配，皆無則保留原值。"""
+    if raw_value in INSTITUTION_TYPE_MAP:
+        return INSTITUTION_TYPE_MAP[raw_value]
+    for keyword, label in INSTITUTION_TYPE_KEYWORDS:
+        if keyword in raw_value:
+            return label
+    return raw_value
+
+
+def map_institution_types(values: pd.Series) -> pd.Series:
+    """
+    向量化地標準化身份別欄位。
+
+    身份別只有少數幾種取值，因此先以 pd.factorize 取得類別代碼，
+    只對每個不重複的值套用一次對照規則，再以代碼展開回整欄。
+    """
+    codes, categories = pd.factorize(values)
+    category_labels = np.array([_institution_type_label(str(category)) for category in categories] + [np.nan],
+                               dtype=object)
+    # 代碼 -1 (缺失值) 對應到最後一個元素 NaN
+    return pd.Series(category_labels[codes], index=values.index, name=values.name)
+
 def clean_daily_ohlc(df: pd.DataFrame) -> pd.DataFrame:
     """
     清洗並標準化每日行情數據 (Daily OHLCV) 的 DataFrame。
@@ -123,49 +231,15 @@ def clean_daily_ohlc(df: pd.DataFrame) -> pd.DataFrame:
     # 日期欄位轉換
     if 'trading_date' in cleaned_df.columns:
         logger.debug("嘗試轉換欄位 'trading_date' 為日期型...")
-        # 先處理可能的 'YYYY年MM月DD日' 或 'YYY/MM/DD' (民國年轉西元)
-        def convert_roc_date(date_str):
-            if isinstance(date_str, str):
-                if '年' in date_str and '月' in date_str and '日' in date_str:
-                    parts = date_str.replace('年', '-').replace('月', '-').replace('日', '').split('-')
-                    if len(parts) == 3:
-                        try:
-                            # 假設是民國年
-                            year = int(parts[0])
-                            if year < 1911: # 避免過小的年份被錯誤轉換
-                                year += 1911
-                            return f"{year}-{parts[1].zfill(2)}-{parts[2].zfill(2)}"
-                        except ValueError:
-                            return date_str # 轉換失敗返回原值
-                elif '/' in date_str: # 處理 YYY/MM/DD
-                    parts = date_str.split('/')
-                    if len(parts) == 3:
-                        try:
-                            year = int(parts[0])
-                            if year < 1911: # 民國年
-                                year += 1911
-                            return f"{year}-{parts[1].zfill(2)}-{parts[2].zfill(2)}"
-                        except ValueError:
-                            return date_str
-            return date_str
-
-        # cleaned_df['trading_date'] = cleaned_df['trading_date'].astype(str).apply(convert_roc_date)
-        # pd.to_datetime 能夠處理多種格式，但指定 format 更安全
-        # 嘗試幾種常見格式，或者讓 pandas 自動推斷
-        # 常見格式: YYYYMMDD, YYYY/MM/DD, YYYY-MM-DD
-        # 先將其轉為字串以防萬一
-        cleaned_df['trading_date'] = cleaned_df['trading_date'].astype(str).str.strip()
-        cleaned_df['trading_date'] = cleaned_df['trading_date'].str.replace(' ', '') # 移除所有空白
-        cleaned_df['trading_date'] = cleaned_df['trading_date'].replace({'-':pd.NaT, '':pd.NaT})
-
-        # 嘗試轉換，讓 errors='coerce' 處理無法解析的日期
-        original_dates = cleaned_df['trading_date'].copy()
-        converted_dates = pd.to_datetime(cleaned_df['trading_date'], errors='coerce')
+        # 民國年 (YYY/MM/DD、YYY年MM月DD日) 與西元年格式皆以向量化方式解析
+        original_dates = cleaned_df['trading_date'].astype('string').str.replace(' ', '', regex=False)
+        original_dates = original_dates.mask(original_dates.isin(['-', '']))
+        converted_dates = parse_roc_dates(original_dates)
 
         # 檢查是否有轉換失敗的 (NaT) 但原值並非 NaN 或空
-        failed_conversion_mask = converted_dates.isna() & original_dates.notna() & (original_dates != '')
+        failed_conversion_mask = converted_dates.isna() & original_dates.notna()
         if failed_conversion_mask.any():
-            logger.warning(f"欄位 'trading_date' 中有 {failed_conversion_mask.sum()} 個值無法被 pd.to_datetime 自動轉換。 "
+            logger.warning(f"欄位 'trading_date' 中有 {failed_conversion_mask.sum()} 個值無法轉換為日期。 "
                            f"範例無法轉換值: {original_dates[failed_conversion_mask].unique()[:5]}")
             # 這裡可以加入更複雜的日期解析邏輯，或保留 NaT
 
@@ -459,56 +533,13 @@ def clean_institutional_investors(df: pd.DataFrame) -> pd.DataFrame:
     if 'data_date' in cleaned_df.columns:
         logger.debug("開始處理 'data_date' 欄位...")
 
-        def parse_date_value(date_val):
-            if pd.isna(date_val):
-                return pd.NaT
-
-            date_str = str(date_val).strip()
-
-            # 檢查是否為日期區間 (例如 YYYY/MM/DD~YYYY/MM/DD 或 YYYYMMDD~YYYYMMDD)
-            if '~' in date_str:
-                date_str = date_str.split('~')[-1].strip() # 取結束日期
-
-            # 移除 "年", "月", "日" 並替換為 "-"
-            if '年' in date_str or '月' in date_str or '日' in date_str:
-                date_str = date_str.replace('年', '-').replace('月', '-').replace('日', '')
-
-            # 嘗試轉換為 datetime 物件
-            # pd.to_datetime 會嘗試多種格式，但如果格式非常固定，可以指定 format
-            # 考慮格式如: YYYY-MM-DD, YYYY/MM/DD, YYYYMMDD
-            # 移除所有非數字和非 '-' '/' 的字元，以簡化後續轉換
-            # date_str = ''.join(filter(lambda x: x.isdigit() or x in ['-', '/'], date_str))
-
-            try:
-                # 先嘗試標準格式
-                dt_obj = pd.to_datetime(date_str, errors='raise')
-                return dt_obj
-            except (ValueError, TypeError):
-                # 如果標準轉換失敗，嘗試去除分隔符的 YYYYMMDD 格式
-                try:
-                    cleaned_date_str = ''.join(filter(str.isdigit, date_str))
-                    if len(cleaned_date_str) == 8: # YYYYMMDD
-                        dt_obj = pd.to_datetime(cleaned_date_str, format='%Y%m%d', errors='raise')
-                        return dt_obj
-                    elif len(cleaned_date_str) == 7 and cleaned_date_str.startswith('1'): #可能是民國年 YYYMMDD
-                        roc_year = int(cleaned_date_str[:3])
-                        # 檢查是否真的是民國年 (例如，100-120 之間的可能是)
-                        # 簡單假設小於 150 的三位數年份是民國年
-                        if 90 < roc_year < 150 : # 假設民國90年到149年
-                             gregorian_year = roc_year + 1911
-                             dt_obj = pd.to_datetime(f"{gregorian_year}{cleaned_date_str[3:]}", format='%Y%m%d', errors='raise')
-                             return dt_obj
-                except (ValueError, TypeError):
-                    logger.warning(f"無法將日期字串 '{date_val}' (處理後為 '{date_str}') 轉換為日期。將設為 NaT。")
-                    return pd.NaT
-            logger.warning(f"無法將日期字串 '{date_val}' (處理後為 '{date_str}') 轉換為日期。將設為 NaT。")
-            return pd.NaT
-
-        cleaned_df['data_date'] = cleaned_df['data_date'].apply(parse_date_value)
-
-        # 再次確保是 datetime64[ns] 類型，以防 apply 返回的是 object 類型 (如果都是 NaT)
-        if not pd.api.types.is_datetime64_any_dtype(cleaned_df['data_date']):
-             cleaned_df['data_date'] = pd.to_datetime(cleaned_df['data_date'], errors='coerce')
+        # 日期區間取結束日期；民國年與 YYYYMMDD 等格式皆以向量化方式解析
+        original_dates = cleaned_df['data_date']
+        cleaned_df['data_date'] = parse_roc_dates(original_dates)
+        failed_mask = cleaned_df['data_date'].isna() & original_dates.notna()
+        if failed_mask.any():
+            logger.warning(f"'data_date' 中有 {failed_mask.sum()} 個值無法轉換為日期，將設為 NaT。"
+                           f"範例值: {original_dates[failed_mask].unique()[:5]}")
 
         logger.info(f"'data_date' 欄位處理完成。NaT 數量: {cleaned_df['data_date'].isna().sum()}")
     else:
@@ -567,49 +598,11 @@ def clean_institutional_investors(df: pd.DataFrame) -> pd.DataFrame:
         # 這些行可能在解析時就應該被過濾，但這裡再做一次保險
         cleaned_df = cleaned_df[~cleaned_df['institution_type'].astype(str).str.contains('合計|總計', na=False)]
 
-        institution_map = {
-            '自營商': 'Dealer',
-            '投信': 'InvestmentTrust',
-            '外資及陸資': 'ForeignAndMainlandInvestors', # 確保與DB定義一致
-            '外資': 'ForeignAndMainlandInvestors', # 有時可能簡寫
-            '全部': 'AllInvestors', # 有些報告可能會有 "全部" 或 "合計" 代表所有法人加總
-                                  # 但這通常與個別機構類型數據的目標表結構不同
-                                  # 我們可能需要決定是否保留這類匯總行，或如何處理
-                                  # 目前假設如果 institution_type 是 '全部'，我們會保留並映射
-        }
-        # 先轉為字串，去空白，然後用 map
-        cleaned_df['institution_type'] = cleaned_df['institution_type'].astype(str).str.strip()
-
-        # 為了處理 "外資及陸資" vs "外資" 的情況，可以先替換長的，再替換短的，或者使用更精確的匹配
-        # 或者，在原始欄位名重命名時就處理這種多樣性
-        # 這裡我們用 replace，它會按順序替換
-        # cleaned_df['institution_type'] = cleaned_df['institution_type'].replace(institution_map)
-        # 使用 map 可能更好，對於不在 map 中的值設為 None/NaN 或保留原樣，取決於需求
-
-        # 為了更穩健，對 institution_map 的 key 也做標準化 (例如移除括號)
-        # 但這裡假設 map 的 key 已經是比較乾淨的
-
-        # 使用 apply 來處理更複雜的匹配，例如部分匹配或大小寫不敏感
-        def map_institution(val):
-            val_str = str(val).strip()
-            # 完全匹配優先
-            if val_str in institution_map:
-                return institution_map[val_str]
-            # 針對 "外資及陸資" vs "外資"
-            if "外資及陸資" in val_str: # 處理 "外資及陸資(不含自營商)" 等情況
-                return institution_map.get("外資及陸資", val_str) # 如果 "外資及陸資" 在map中
-            if "外資" in val_str:
-                 return institution_map.get("外資", val_str) # 如果 "外資" 在map中
-            if "自營商" in val_str: # 處理 "自營商(自行買賣)" vs "自營商(避險)"
-                return institution_map.get("自營商", val_str)
-            if "投信" in val_str:
-                return institution_map.get("投信", val_str)
-            return val_str # 如果沒有匹配，返回原值 (或設為 None/NaN)
-
-        cleaned_df['institution_type'] = cleaned_df['institution_type'].apply(map_institution)
+        # 先轉為字串並去空白，再依預先建立的對照表 (INSTITUTION_TYPE_MAP) 標準化
+        cleaned_df['institution_type'] = map_institution_types(cleaned_df['institution_type'].astype(str).str.strip())
 
         # 檢查是否有未被 map 的值 (除了已知的 'AllInvestors' 等)
-        known_mapped_values = list(institution_map.values())
+        known_mapped_values = list(INSTITUTION_TYPE_MAP.values())
         unmapped_inst_types = cleaned_df[~cleaned_df['institution_type'].isin(known_mapped_values)]['institution_type'].unique()
         if len(unmapped_inst_types) > 0:
             logger.warning(f"'institution_type' 中發現未成功映射的值: {unmapped_inst_types}")
@@ -645,9 +638,9 @@ def clean_institutional_investors(df: pd.DataFrame) -> pd.DataFrame:
     if 'institution_type' in cleaned_df.columns:
         # 檢查 institution_type 是否都是有效映射後的值，或者允許部分原值通過
         # 如果 institution_type 映射後可能產生 NaN 或空字串，dropna 會處理
-        # 如果我們只接受 institution_map.values() 中的值：
-        # cleaned_df = cleaned_df[cleaned_df['institution_type'].isin(list(institution_map.values()))]
-        # 但這樣太嚴格，因為 institution_map 可能不完整。
+        # 如果我們只接受 INSTITUTION_TYPE_MAP.values() 中的值：
+        # cleaned_df = cleaned_df[cleaned_df['institution_type'].isin(list(INSTITUTION_TYPE_MAP.values()))]
+        # 但這樣太嚴格，因為 INSTITUTION_TYPE_MAP 可能不完整。
         # dropna 會處理 institution_type 欄位本身是 NaN 的情況。
         critical_cols_inst.append('institution_type')
 
@@ -1,11 +1,15 @@
 import hashlib
+import importlib
 import logging
 import re # 新增 re 模組導入
-from typing import Optional, List, Dict, Any, Tuple # 新增 Tuple 模組導入
+from typing import Optional, List, Dict, Any, Tuple, Callable # 新增 Tuple 模組導入
 
 # 取得 logger
 logger = logging.getLogger("taifex_pipeline.transformation.format_detector")
 
+CLEANERS_MODULE = 'taifex_pipeline.transformation.cleaners'
+
+
 class FormatDetector:
     """
     根據檔案標頭識別其格式，並從目錄中查找對應處理配方的類別。
@@ -40,10 +44,35 @@ class FormatDetector:
         self.header_read_bytes = header_read_bytes if header_read_bytes is not None else self.DEFAULT_HEADER_READ_BYTES
         self.max_header_lines = max_header_lines if max_header_lines is not None else self.DEFAULT_MAX_HEADER_LINES
 
+        # 預先編譯目錄：以指紋為鍵，清洗函式在此一次性解析，避免每個檔案都經由 importlib 載入
+        self._cleaners: Dict[str, Optional[Callable]] = {}
+        self._compiled_catalog: Dict[str, Dict[str, Any]] = {}
+        for fingerprint, recipe in format_catalog.items():
+            compiled_recipe = dict(recipe)
+            if isinstance(compiled_recipe.get('required_columns'), list):
+                compiled_recipe['required_columns'] = tuple(compiled_recipe['required_columns'])
+            cleaner_name = compiled_recipe.get('cleaner_function')
+            if cleaner_name:
+                self.get_cleaner(cleaner_name)
+            self._compiled_catalog[fingerprint] = compiled_recipe
+
         logger.info(f"FormatDetector 初始化。嘗試編碼: {self.try_encodings}, "
                     f"標頭讀取位元組: {self.header_read_bytes}, 最大標頭行數: {self.max_header_lines}, "
                     f"目錄中配方數量: {len(self.format_catalog)}")
 
+    def get_cleaner(self, cleaner_function_name: str) -> Optional[Callable]:
+        """
+        返回配方指定的清洗函式 (解析結果會被快取)；找不到時返回 None。
+        """
+        if cleaner_function_name not in self._cleaners:
+            try:
+                cleaners_module = importlib.import_module(CLEANERS_MODULE)
+                self._cleaners[cleaner_function_name] = getattr(cleaners_module, cleaner_function_name)
+            except (ImportError, AttributeError) as e:
+                logger.warning(f"無法載入清洗函式 '{cleaner_function_name}': {e}")
+                self._cleaners[cleaner_function_name] = None
+        return self._cleaners[cleaner_function_name]
+
     def _find_header_row(self, content_lines: List[str]) -> Tuple[Optional[str], int]:
         """
         從檔案的前幾行中，透過啟發式規則找出最可能的標頭行。
@@ -141,6 +170,7 @@ class FormatDetector:
             return None
 
         header_data_blob = file_content[:self.header_read_bytes]
+
         decoded_lines: List[str] = []
         active_encoding: Optional[str] = None
 
@@ -181,7 +211,12 @@ class FormatDetector:
 
         logger.info(f"計算出的格式指紋為: {fingerprint}")
 
-        recipe = self.format_catalog.get(fingerprint)
+        return self._build_recipe(fingerprint, header_line, header_index, active_encoding)
+
+    def _build_recipe(self, fingerprint: str, header_line: str, header_index: int,
+                      active_encoding: str) -> Optional[Dict[str, Any]]:
+        """從預先編譯的目錄取出配方，並附加除錯元數據。"""
+        recipe = self._compiled_catalog.get(fingerprint)
 
         if recipe:
             logger.info(f"成功！在目錄中找到配方: '{recipe.get('description', 'N/A')}' (指紋: {fingerprint[:16]}...)")
@@ -1,8 +1,8 @@
 import logging
-import importlib
 import pandas as pd
-from io import BytesIO, StringIO
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from datetime import datetime, timezone # 確保導入 timezone
 
@@ -11,6 +11,7 @@ if TYPE_CHECKING:
     # from taifex_pipeline.database.constants import FileStatus
 
 from taifex_pipeline.database.db_manager import DBManager
+from taifex_pipeline.database.writer_service import DBWriterService, submit_dataframe
 
 logger = logging.getLogger("taifex_pipeline.transformation.pipeline")
 
@@ -19,12 +20,15 @@ DEFAULT_STATUS_TRANSFORMED_SUCCESS = "TRANSFORMED_SUCCESS"
 DEFAULT_STATUS_QUARANTINED = "QUARANTINED"
 DEFAULT_STATUS_TRANSFORMATION_FAILED = "TRANSFORMATION_FAILED"
 
+MAX_IN_FLIGHT_TASKS_PER_WORKER = 2 # 單一寫入者模式下每個 worker 最多排隊的任務數，限制記憶體中的原始內容份數
+
 class TransformationPipeline:
     def __init__(self,
                  db_path: str,
                  format_detector: 'FormatDetector',
                  format_catalog: Dict[str, Any],
-                 max_workers: Optional[int] = None):
+                 max_workers: Optional[int] = None,
+                 use_writer_service: Optional[bool] = None):
         if not db_path: raise ValueError("資料庫路徑 (db_path) 不能為空。")
         if format_detector is None: raise ValueError("FormatDetector 實例不能為 None。")
         if format_catalog is None: raise ValueError("Format Catalog 不能為 None。")
@@ -33,6 +37,8 @@ class TransformationPipeline:
         self.format_detector = format_detector
         self.format_catalog = format_catalog
         self.max_workers = max_workers
+        # 檔案型資料庫預設使用單一寫入者服務；記憶體資料庫無法跨程序共享，維持舊流程
+        self.use_writer_service = (db_path != ":memory:") if use_writer_service is None else use_writer_service
 
         try:
             from taifex_pipeline.database.constants import FileStatus
@@ -47,9 +53,14 @@ class TransformationPipeline:
         logger.info(f"TransformationPipeline 初始化完成。DB Path: {self.db_path}, "
                     f"FormatDetector: {type(format_detector).__name__}, "
                     f"Catalog entries: {len(self.format_catalog)}, "
-                    f"Max Workers: {self.max_workers or 'Default'}")
+                    f"Max Workers: {self.max_workers or 'Default'}, "
+                    f"Single Writer: {self.use_writer_service}")
 
     def run(self):
+        if self.use_writer_service:
+            self._run_with_writer_service()
+            return
+
         logger.info("開始執行轉換管線...")
         db_manager_main = None
         try:
@@ -120,11 +131,110 @@ class TransformationPipeline:
                 logger.info("主進程 DBManager 連線已關閉。")
         logger.info("轉換管線執行完畢。")
 
-    def _update_manifest_with_results(self, db_manager_instance: DBManager, results: List[Dict[str, Any]]):
+    def _worker_statuses(self) -> Dict[str, str]:
+        return {
+            'STATUS_QUARANTINED': self.STATUS_QUARANTINED,
+            'STATUS_TRANSFORMATION_FAILED': self.STATUS_TRANSFORMATION_FAILED,
+            'STATUS_TRANSFORMED_SUCCESS': self.STATUS_TRANSFORMED_SUCCESS
+        }
+
+    def _run_with_writer_service(self):
+        """
+        單一寫入者模式：
+        1. 主進程以一次連線讀出待處理清單後立即關閉連線。
+        2. 啟動 DBWriterService，worker 只做解析與清洗，將 Arrow IPC 批次送進寫入佇列。
+        3. 原始內容在提交任務前才經由寫入者讀出，同時進行中的任務數有上限，
+           記憶體中只會有少數幾個檔案的原始內容。
+        4. 等待寫入完成 (flush)，載入失敗的檔案改標記為 TRANSFORMATION_FAILED。
+        5. manifest 更新同樣經由寫入者在單一交易中完成。
+        整個過程中只有寫入者程序持有資料庫的讀寫連線，避免 DuckDB 的跨程序檔案鎖衝突。
+        """
+        logger.info("開始執行轉換管線 (單一寫入者模式)...")
+        try:
+            with DBManager(self.db_path) as db_manager_snapshot:
+                files_to_process = db_manager_snapshot.get_manifest_records_by_status(self.STATUS_RAW_INGESTED)
+            if not files_to_process:
+                logger.info("在 manifest 中沒有找到狀態為 RAW_INGESTED 的檔案，轉換管線提前結束。")
+                return
+            logger.info(f"找到 {len(files_to_process)} 個狀態為 RAW_INGESTED 的檔案待處理。")
+
+            results = []
+            max_in_flight = (self.max_workers or os.cpu_count() or 1) * MAX_IN_FLIGHT_TASKS_PER_WORKER
+            with DBWriterService(self.db_path) as writer:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                    pending_files = iter(files_to_process)
+                    future_to_file_info = {}
+
+                    def submit_next_file() -> None:
+                        file_info = next(pending_files, None)
+                        if file_info is None:
+                            return
+                        # 原始內容只放在提交給 worker 的副本中，任務送出後即可釋放
+                        task_info = dict(file_info, raw_content=writer.read_raw_file_content(file_info['file_hash']))
+                        future = executor.submit(TransformationPipeline._process_file_worker,
+                                                 task_info, self.db_path, self.format_detector,
+                                                 self.format_catalog, self._worker_statuses(),
+                                                 writer.request_queue)
+                        future_to_file_info[future] = file_info
+
+                    for _ in range(max_in_flight):
+                        submit_next_file()
+
+                    while future_to_file_info:
+                        done_futures, _ = wait(future_to_file_info, return_when=FIRST_COMPLETED)
+                        for future in done_futures:
+                            original_file_info = future_to_file_info.pop(future)
+                            file_hash_completed = original_file_info.get('file_hash', 'UNKNOWN_HASH')
+                            try:
+                                result = future.result()
+                                results.append(result)
+                                logger.info(f"檔案 {file_hash_completed} (原始路徑: {original_file_info.get('original_path')}) 處理完成。狀態: {result.get('status', 'UNKNOWN')}")
+                            except Exception as exc:
+                                logger.error(f"檔案 {file_hash_completed} (原始路徑: {original_file_info.get('original_path')}) 在平行處理中產生未捕獲異常: {exc}", exc_info=True)
+                                now_iso = datetime.now(timezone.utc).isoformat()
+                                results.append({
+                                    'file_hash': file_hash_completed,
+                                    'status': self.STATUS_TRANSFORMATION_FAILED,
+                                    'error_message': f"Critical error in worker or task submission: {exc}",
+                                    'processed_rows': 0,
+                                    'transformation_start_timestamp': now_iso,
+                                    'transformation_end_timestamp': now_iso
+                                })
+                            submit_next_file()
+
+                # 所有 worker 已結束，等待寫入者清空佇列並取回載入錯誤
+                load_errors = writer.flush().get('load_errors', {})
+                for result in results:
+                    load_error = load_errors.get(result.get('file_hash'))
+                    if load_error and result.get('status') == self.STATUS_TRANSFORMED_SUCCESS:
+                        result['status'] = self.STATUS_TRANSFORMATION_FAILED
+                        result['error_message'] = f"LoadError: {load_error}"
+                        result['processed_rows'] = 0
+                logger.info(f"所有 {len(files_to_process)} 個檔案的平行處理與寫入已完成。載入失敗: {len(load_errors)} 個。")
+
+                self._update_manifest_with_results(writer, results)
+                manifest_errors = writer.flush().get('manifest_errors', {})
+                for file_hash, error in manifest_errors.items():
+                    logger.error(f"更新檔案 {file_hash} 在 manifest 中的狀態時發生錯誤: {error}")
+        except Exception as e:
+            logger.error(f"TransformationPipeline run 方法執行期間發生未預期錯誤: {e}", exc_info=True)
+        logger.info("轉換管線執行完畢。")
+
+    def _update_manifest_with_results(self, db_manager_instance: Any, results: List[Dict[str, Any]]):
         if not results:
             logger.info("沒有處理結果需要更新到 manifest。")
             return
         logger.info(f"開始將 {len(results)} 個處理結果更新到 manifest...")
+        if isinstance(db_manager_instance, DBWriterService):
+            # 交由寫入者在單一交易中批次套用
+            updates = []
+            for result in results:
+                if not result.get('file_hash') or not result.get('status'):
+                    logger.error(f"結果缺少 file_hash 或 status，無法更新 manifest: {result}")
+                    continue
+                updates.append(self._build_manifest_update_params(result))
+            db_manager_instance.update_manifest(updates)
+            return
         s_count, q_count, f_count = 0, 0, 0
         for result in results:
             file_hash = result.get('file_hash')
@@ -134,19 +244,7 @@ class TransformationPipeline:
                 f_count +=1 # 將此視為一種失敗
                 continue
 
-            # 從 result 中提取 DBManager.update_manifest_transformation_status 所需的參數
-            params_for_update = {
-                'file_hash': file_hash,
-                'status': status_val,
-                'error_message': result.get('error_message'),
-                'processed_rows': result.get('processed_rows'),
-                'transformation_start_timestamp': result.get('transformation_start_timestamp'),
-                'transformation_end_timestamp': result.get('transformation_end_timestamp'),
-                'target_table': result.get('target_table'), # 額外信息，DBM 可能會用到
-                'recipe_id': result.get('recipe_id')      # 額外信息
-            }
-            # 過濾掉值為 None 的參數，除非 DBManager 的方法明確可以處理它們
-            params_for_update = {k: v for k, v in params_for_update.items() if v is not None}
+            params_for_update = self._build_manifest_update_params(result)
 
             try:
                 db_manager_instance.update_manifest_transformation_status(**params_for_update)
@@ -159,10 +257,28 @@ class TransformationPipeline:
                 f_count +=1
         logger.info(f"--- 轉換結果摘要 ---\n成功: {s_count}, 隔離: {q_count}, 失敗(含更新失敗): {f_count}\n----------------------")
 
+    @staticmethod
+    def _build_manifest_update_params(result: Dict[str, Any]) -> Dict[str, Any]:
+        # 從 result 中提取 DBManager.update_manifest_transformation_status 所需的參數
+        params_for_update = {
+            'file_hash': result.get('file_hash'),
+            'status': result.get('status'),
+            'error_message': result.get('error_message'),
+            'processed_rows': result.get('processed_rows'),
+            'transformation_start_timestamp': result.get('transformation_start_timestamp'),
+            'transformation_end_timestamp': result.get('transformation_end_timestamp'),
+            'target_table': result.get('target_table'), # 額外信息，DBM 可能會用到
+            'recipe_id': result.get('recipe_id')      # 額外信息
+        }
+        # 過濾掉值為 None 的參數，除非 DBManager 的方法明確可以處理它們
+        return {k: v for k, v in params_for_update.items() if v is not None}
+
     @staticmethod
     def _static_parse_raw_content(raw_content: bytes, recipe: Dict[str, Any], default_encodings: List[str]) -> pd.DataFrame:
         parser_type = recipe.get('parser_type', 'csv').lower()
         parser_config = recipe.get('parser_config', {}).copy()
+        # BytesIO 直接共用 raw_content 的緩衝區 (不複製)；文字格式交由 pandas 依 encoding 逐塊解碼，
+        # 不再先把整個檔案解碼成 str 再包成 StringIO (那會同時持有三份檔案內容)
         data_io = BytesIO(raw_content)
         worker_logger_prefix = f"[ParserWorker FT:{parser_type}]" # 簡化前綴
         logger.debug(f"{worker_logger_prefix} Config: {parser_config}")
@@ -172,15 +288,11 @@ class TransformationPipeline:
 
         try:
             if parser_type == 'csv':
-                decoded_content = raw_content.decode(encoding_to_try)
-                data_io = StringIO(decoded_content)
-                df = pd.read_csv(data_io, **parser_config)
+                df = pd.read_csv(data_io, encoding=encoding_to_try, **parser_config)
             elif parser_type == 'excel':
                 df = pd.read_excel(data_io, **parser_config)
             elif parser_type == 'fixed_width':
-                decoded_content = raw_content.decode(encoding_to_try)
-                data_io = StringIO(decoded_content)
-                df = pd.read_fwf(data_io, **parser_config)
+                df = pd.read_fwf(data_io, encoding=encoding_to_try, **parser_config)
             else:
                 raise ValueError(f"不支援的 parser_type: {parser_type}")
             logger.info(f"{worker_logger_prefix} 解析完成，DataFrame shape: {df.shape}, 使用編碼: {encoding_to_try if parser_type != 'excel' else 'N/A for Excel'}")
@@ -197,8 +309,16 @@ class TransformationPipeline:
                              db_path: str,
                              format_detector_instance: 'FormatDetector',
                              format_catalog_instance: Dict[str, Any], # 雖然 detector 內部有，但依賴 run 的傳遞
-                             statuses: Dict[str,str]
+                             statuses: Dict[str,str],
+                             writer_queue: Optional[Any] = None
                             ) -> Dict[str, Any]:
+        """
+        處理單一檔案：偵測格式、解析、清洗並載入。
+
+        若提供 writer_queue (單一寫入者模式)，原始內容取自 file_info['raw_content']，
+        清洗後的數據以 Arrow IPC 批次送交寫入者程序，worker 本身不開啟任何資料庫連線；
+        實際載入結果由主進程在 flush 後回填。
+        """
         file_hash = file_info.get('file_hash', 'UNKNOWN_HASH') # 提供預設值
         original_path = file_info.get('original_path', 'N/A')
         worker_logger_prefix = f"[Worker H:{file_hash[:8]} P:{original_path}]"
@@ -225,11 +345,14 @@ class TransformationPipeline:
         local_db_manager = None
         try:
             logger.info(f"{worker_logger_prefix} 開始處理。")
-            local_db_manager = DBManager(db_path)
+            if writer_queue is not None:
+                raw_content = file_info.get('raw_content')
+            else:
+                local_db_manager = DBManager(db_path)
 
-            if not hasattr(local_db_manager, 'get_raw_file_content'):
-                raise NotImplementedError("DBManager 必須實作 get_raw_file_content 方法。")
-            raw_content = local_db_manager.get_raw_file_content(file_hash)
+                if not hasattr(local_db_manager, 'get_raw_file_content'):
+                    raise NotImplementedError("DBManager 必須實作 get_raw_file_content 方法。")
+                raw_content = local_db_manager.get_raw_file_content(file_hash)
 
             if raw_content is None:
                 result_payload['error_message'] = "Raw content not found in database"
@@ -258,12 +381,10 @@ class TransformationPipeline:
             cleaner_function_name = recipe.get('cleaner_function')
             if not cleaner_function_name: raise ValueError("配方中未指定 cleaner_function。")
 
-            logger.debug(f"{worker_logger_prefix} 嘗試載入清洗函式: {cleaner_function_name}")
-            try:
-                cleaners_module = importlib.import_module('taifex_pipeline.transformation.cleaners')
-                cleaner_function = getattr(cleaners_module, cleaner_function_name)
-            except (ImportError, AttributeError) as import_err:
-                raise ValueError(f"無法載入清洗函式: {cleaner_function_name}") from import_err
+            # 清洗函式已在 FormatDetector 初始化時預先解析，此處只是一次字典查詢
+            cleaner_function = format_detector_instance.get_cleaner(cleaner_function_name)
+            if cleaner_function is None:
+                raise ValueError(f"無法載入清洗函式: {cleaner_function_name}")
 
             logger.info(f"{worker_logger_prefix} 開始使用 '{cleaner_function_name}' 清洗數據...")
             cleaned_df = cleaner_function(df)
@@ -275,13 +396,19 @@ class TransformationPipeline:
             if not target_table: raise ValueError("配方中未指定 target_table。")
             result_payload['target_table'] = target_table
 
-            if not hasattr(local_db_manager, 'load_dataframe_to_table'):
-                raise NotImplementedError("DBManager 必須實作 load_dataframe_to_table 方法。")
-
             load_options = recipe.get('load_options', {'if_exists': 'append'})
-            logger.info(f"{worker_logger_prefix} 準備將數據載入到表格 '{target_table}' 使用選項: {load_options}")
-            local_db_manager.load_dataframe_to_table(cleaned_df, target_table, load_options)
-            logger.info(f"{worker_logger_prefix} 數據已成功載入到表格 '{target_table}'。")
+            if writer_queue is not None:
+                if processed_rows > 0:
+                    submit_dataframe(writer_queue, file_hash, cleaned_df, target_table,
+                                     load_options.get('if_exists', 'append'))
+                    logger.info(f"{worker_logger_prefix} 已將 {processed_rows} 行數據送交寫入者，目標表格 '{target_table}'。")
+            else:
+                if not hasattr(local_db_manager, 'load_dataframe_to_table'):
+                    raise NotImplementedError("DBManager 必須實作 load_dataframe_to_table 方法。")
+
+                logger.info(f"{worker_logger_prefix} 準備將數據載入到表格 '{target_table}' 使用選項: {load_options}")
+                local_db_manager.load_dataframe_to_table(cleaned_df, target_table, load_options)
+                logger.info(f"{worker_logger_prefix} 數據已成功載入到表格 '{target_table}'。")
 
             result_payload['status'] = status_success
 
@@ -0,0 +1,66 @@
+import pytest
+import pandas as pd
+
+from taifex_pipeline.database.db_manager import DBManager
+from taifex_pipeline.database.constants import FileStatus, TABLE_FILE_MANIFEST
+from taifex_pipeline.database.writer_service import (
+    DBWriterService, dataframe_to_ipc_bytes, ipc_bytes_to_table, submit_dataframe
+)
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def file_db_path(tmp_path) -> str:
+    """提供一個已建立核心表格的檔案型 DuckDB 路徑 (寫入者程序需要跨程序開啟)。"""
+    db_path = str(tmp_path / "writer_test.duckdb")
+    with DBManager(db_path) as manager:
+        manager.setup_tables()
+        manager.store_raw_file("hash_a", b"a")
+        manager.add_manifest_record("hash_a", "/tmp/a.csv")
+    return db_path
+
+@pytest.fixture
+def sample_dataframe() -> pd.DataFrame:
+    return pd.DataFrame({"trading_date": ["2023-01-01", "2023-01-02"], "close": [1.5, 2.5]})
+
+# --- Test Cases ---
+
+def test_ipc_round_trip(sample_dataframe: pd.DataFrame):
+    table = ipc_bytes_to_table(dataframe_to_ipc_bytes(sample_dataframe))
+    pd.testing.assert_frame_equal(table.to_pandas(), sample_dataframe)
+
+def test_rejects_memory_database():
+    with pytest.raises(ValueError):
+        DBWriterService(":memory:")
+
+def test_writer_loads_batches_and_updates_manifest(file_db_path: str, sample_dataframe: pd.DataFrame):
+    with DBWriterService(file_db_path, max_pending_messages=2) as writer:
+        submit_dataframe(writer.request_queue, "hash_a", sample_dataframe, "daily_prices")
+        submit_dataframe(writer.request_queue, "hash_a", sample_dataframe, "daily_prices")
+        outcome = writer.flush()
+        assert outcome["load_errors"] == {}
+        assert outcome["loaded_rows"] == {"hash_a": 4}
+
+        writer.update_manifest([{"file_hash": "hash_a",
+                                 "status": FileStatus.TRANSFORMED_SUCCESS.value,
+                                 "processed_rows": 4}])
+        assert writer.flush()["manifest_errors"] == {}
+
+    # 寫入者程序結束後，檔案鎖已釋放，可以重新開啟驗證
+    with DBManager(file_db_path) as manager:
+        assert manager.conn.execute("SELECT COUNT(*) FROM daily_prices").fetchone()[0] == 4
+        status = manager.conn.execute(
+            f"SELECT status FROM {TABLE_FILE_MANIFEST} WHERE file_hash = 'hash_a'"
+        ).fetchone()[0]
+        assert status == FileStatus.TRANSFORMED_SUCCESS.value
+
+def test_writer_reports_load_errors(file_db_path: str, sample_dataframe: pd.DataFrame):
+    with DBWriterService(file_db_path) as writer:
+        submit_dataframe(writer.request_queue, "hash_a", sample_dataframe, "daily_prices", if_exists="bogus")
+        outcome = writer.flush()
+    assert "hash_a" in outcome["load_errors"]
+
+def test_writer_serves_raw_content_reads(file_db_path: str):
+    with DBWriterService(file_db_path) as writer:
+        assert writer.read_raw_file_content("hash_a") == b"a"
+        assert writer.read_raw_file_content("missing_hash") is None
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import config
+import data_pipeline
+
+
+@pytest.fixture
+def curated_conn():
+    """提供已建立 curated mart 結構的記憶體內 DuckDB 連線。"""
+    conn = duckdb.connect(":memory:")
+    data_pipeline.init_curated_mart_db(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def pipeline_dirs(tmp_path, monkeypatch):
+    """將 config 中的資料庫、blob store 與輸入目錄指向暫存目錄並初始化資料庫。"""
+    monkeypatch.setattr(config, 'MANIFEST_DB_PATH', str(tmp_path / 'manifest.db'))
+    monkeypatch.setattr(config, 'RAW_LAKE_DB_PATH', str(tmp_path / 'raw_lake.db'))
+    monkeypatch.setattr(config, 'CURATED_MART_DB_PATH', str(tmp_path / 'curated_mart.db'))
+    monkeypatch.setattr(config, 'RAW_BLOB_STORE_DIR', str(tmp_path / 'raw_blobs'))
+    monkeypatch.setattr(config, 'INPUT_DATA_DIR', str(tmp_path / 'input'))
+    os.makedirs(config.INPUT_DATA_DIR)
+    assert data_pipeline.initialize_databases()
+    return tmp_path
+
+
+def _staged_files():
+    staging_dir = os.path.join(config.RAW_BLOB_STORE_DIR, '.staging')
+    return os.listdir(staging_dir) if os.path.isdir(staging_dir) else []
+
+
+def _manifest_rows(query, params=None):
+    with duckdb.connect(config.MANIFEST_DB_PATH) as conn:
+        return conn.execute(query, params or []).fetchall()
+
+
+def _column_types(conn, table_name):
+    return {row[0]: row[1] for row in conn.execute(f"DESCRIBE {table_name}").fetchall()}
+
+
+def test_infer_arrow_schema_types_text_columns():
+    df = pd.DataFrame({
+        'id': ['1', '2', '-3'],
+        'price': ['1.5', '2', ''],
+        'flag': ['true', 'False', None],
+        'day': ['2024/01/05', '2024/01/06', '2024/01/07'],
+        'at': ['2024-01-05 09:30:00', '2024-01-05 10:00:00', '2024-01-06 00:00:00'],
+        'name': ['a', 'b', 'c'],
+    })
+
+    schema = data_pipeline.infer_arrow_schema(df)
+
+    assert [field.type for field in schema] == [
+        pa.int64(), pa.float64(), pa.bool_(), pa.date32(), pa.timestamp('us'), pa.string()
+    ]
+
+
+def test_leading_zero_codes_stay_strings():
+    df = pd.DataFrame({'code': ['007', '123', '050'], 'qty': ['10', '0', '3']})
+
+    schema = data_pipeline.infer_arrow_schema(df)
+    table = data_pipeline.to_typed_arrow_table(df, schema, 'codes.csv')
+
+    assert schema.field('code').type == pa.string()
+    assert schema.field('qty').type == pa.int64()
+    assert table.column('code').to_pylist() == ['007', '123', '050']
+
+
+def test_leading_zeros_outside_sample_fall_back_to_string():
+    df = pd.DataFrame({'code': ['11', '12', '0042']})
+
+    schema = data_pipeline.infer_arrow_schema(df, sample_rows=2)
+    table = data_pipeline.to_typed_arrow_table(df, schema, 'codes.csv')
+
+    assert schema.field('code').type == pa.int64()
+    assert table.schema.field('code').type == pa.string()
+    assert table.column('code').to_pylist() == ['11', '12', '0042']
+
+
+def test_conflicting_types_across_files_widen_column(curated_conn):
+    first = b"id,amount,day\n1,10,2024-01-05\n2,20,2024-01-06\n"
+    second = b"id,amount,day\nX1,2.5,2024-01-07 13:45:00\n"
+
+    assert data_pipeline.process_csv_excel('a' * 64, first, 'first.csv', curated_conn) == (True, None)
+    assert _column_types(curated_conn, 'example_curated_data')['id'] == 'BIGINT'
+
+    assert data_pipeline.process_csv_excel('b' * 64, second, 'second.csv', curated_conn) == (True, None)
+
+    column_types = _column_types(curated_conn, 'example_curated_data')
+    assert column_types['id'] == 'VARCHAR'
+    assert column_types['amount'] == 'DOUBLE'
+    assert column_types['day'] == 'TIMESTAMP'
+    rows = curated_conn.execute(
+        "SELECT id, amount FROM example_curated_data ORDER BY original_source_identifier, amount"
+    ).fetchall()
+    assert rows == [('1', 10.0), ('2', 20.0), ('X1', 2.5)]
+
+
+def test_compatible_types_keep_existing_column(curated_conn):
+    data_pipeline.process_csv_excel('a' * 64, b"amount\n1.5\n", 'first.csv', curated_conn)
+    data_pipeline.process_csv_excel('b' * 64, b"amount\n2\n", 'second.csv', curated_conn)
+
+    assert _column_types(curated_conn, 'example_curated_data')['amount'] == 'DOUBLE'
+    assert curated_conn.execute("SELECT count(*) FROM example_curated_data").fetchone()[0] == 2
+
+
+def test_stage_raw_blob_then_commit(pipeline_dirs):
+    source = pipeline_dirs / 'input' / 'a.csv'
+    source.write_bytes(b"a,b\n1,2\n")
+
+    file_hash, staged_path = data_pipeline.stage_raw_blob(str(source))
+    assert file_hash == hashlib.sha256(b"a,b\n1,2\n").hexdigest()
+    assert os.path.dirname(staged_path) == os.path.join(config.RAW_BLOB_STORE_DIR, '.staging')
+
+    raw_storage_path = data_pipeline.commit_staged_blob(file_hash, staged_path)
+
+    assert raw_storage_path == data_pipeline.BLOB_STORAGE_PREFIX + data_pipeline.blob_relative_path(file_hash)
+    assert data_pipeline.read_raw_blob(raw_storage_path) == b"a,b\n1,2\n"
+    assert _staged_files() == []
+
+
+def _count_source_reads(monkeypatch, input_dir):
+    """Counts open() calls on files under input_dir made from data_pipeline."""
+    reads = []
+
+    def counting_open(path, *args, **kwargs):
+        if str(path).startswith(str(input_dir)):
+            reads.append(os.path.basename(path))
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(data_pipeline, 'open', counting_open, raising=False)
+    return reads
+
+
+def test_stage1_reads_each_new_file_once(pipeline_dirs, monkeypatch):
+    input_dir = pipeline_dirs / 'input'
+    (input_dir / 'a.csv').write_bytes(b"a,b\n1,2\n")
+    (input_dir / 'a_copy.csv').write_bytes(b"a,b\n1,2\n")
+    (input_dir / 'b.csv').write_bytes(b"a,b\n3,4\n")
+    reads = _count_source_reads(monkeypatch, input_dir)
+
+    data_pipeline.stage1_ingest_and_register()
+
+    assert sorted(reads) == ['a.csv', 'a_copy.csv', 'b.csv']
+    rows = _manifest_rows("SELECT raw_storage_path, status FROM files_master")
+    assert len(rows) == 2
+    assert {status for _, status in rows} == {'raw_stored'}
+    assert all(data_pipeline.read_raw_blob(path) is not None for path, _ in rows)
+    assert _staged_files() == []
+
+    # 第二次執行：大小與修改時間未變的已登記檔案完全不讀取，只有新檔案被讀取一次
+    registered = {os.path.basename(row[0]) for row in _manifest_rows("SELECT source_identifier FROM files_master")}
+    reads.clear()
+    (input_dir / 'c.csv').write_bytes(b"a,b\n5,6\n")
+
+    data_pipeline.stage1_ingest_and_register()
+
+    # 重複內容中未被登記的那個路徑不在 manifest 中，所以仍需重新讀取比對雜湊值
+    unregistered_duplicate = ({'a.csv', 'a_copy.csv'} - registered).pop()
+    assert sorted(reads) == sorted([unregistered_duplicate, 'c.csv'])
+    assert _manifest_rows("SELECT count(*) FROM files_master")[0][0] == 3
+    assert _staged_files() == []
+
+
+def test_stage1_rereads_registered_file_after_it_changes(pipeline_dirs, monkeypatch):
+    source = pipeline_dirs / 'input' / 'a.csv'
+    source.write_bytes(b"a,b\n1,2\n")
+    data_pipeline.stage1_ingest_and_register()
+    reads = _count_source_reads(monkeypatch, pipeline_dirs / 'input')
+
+    source.write_bytes(b"a,b\n1,2\n3,4\n")
+    data_pipeline.stage1_ingest_and_register()
+
+    assert reads == ['a.csv']
+    assert _manifest_rows("SELECT count(*) FROM files_master")[0][0] == 2
+
+
+def test_register_batch_skips_file_changed_while_copying(pipeline_dirs, monkeypatch):
+    source = pipeline_dirs / 'input' / 'a.csv'
+    source.write_bytes(b"a,b\n1,2\n")
+    original_stage_raw_blob = data_pipeline.stage_raw_blob
+
+    def stage_then_modify(path):
+        staged = original_stage_raw_blob(path)
+        source.write_bytes(b"a,b\n1,2\n3,4\n")
+        return staged
+
+    monkeypatch.setattr(data_pipeline, 'stage_raw_blob', stage_then_modify)
+
+    with duckdb.connect(config.MANIFEST_DB_PATH) as conn:
+        assert data_pipeline._register_batch(conn, [str(source)]) == (0, 1)
+
+    assert _manifest_rows("SELECT count(*) FROM files_master")[0][0] == 0
+    assert _staged_files() == []
+
+
+def test_register_batch_inserts_new_rows_in_one_statement(pipeline_dirs):
+    input_dir = pipeline_dirs / 'input'
+    pending = []
+    for name, content in [('a.csv', b"a\n1\n"), ('b.csv', b"a\n2\n"), ('dup.csv', b"a\n1\n")]:
+        (input_dir / name).write_bytes(content)
+        pending.append(str(input_dir / name))
+
+    with duckdb.connect(config.MANIFEST_DB_PATH) as conn:
+        assert data_pipeline._register_batch(conn, pending) == (2, 0)
+        # 未變更的已登記檔案整批略過
+        assert data_pipeline._register_batch(conn, pending[:2]) == (0, 0)
+
+    rows = _manifest_rows("SELECT source_identifier, status FROM files_master ORDER BY source_identifier")
+    assert rows == [(str(input_dir / 'a.csv'), 'raw_stored'), (str(input_dir / 'b.csv'), 'raw_stored')]
+
+
+def test_register_batch_falls_back_to_row_by_row(pipeline_dirs):
+    input_dir = pipeline_dirs / 'input'
+    pending = []
+    for name in ['a.csv', 'reject.csv', 'b.csv']:
+        content = name.encode()
+        (input_dir / name).write_bytes(content)
+        pending.append(str(input_dir / name))
+
+    with duckdb.connect(':memory:') as conn:
+        data_pipeline.init_manifest_db(conn)
+        conn.execute("DROP TABLE files_master")
+        # 以 CHECK 約束讓整批 INSERT 失敗，只有被拒絕的那一列在逐列重試時失敗
+        conn.execute("""
+            CREATE TABLE files_master (
+                file_hash TEXT PRIMARY KEY, source_identifier TEXT NOT NULL CHECK (source_identifier NOT LIKE '%reject%'),
+                entry_timestamp TIMESTAMP NOT NULL, derived_date DATE, raw_content_type TEXT, raw_storage_path TEXT,
+                metadata_json TEXT, status TEXT NOT NULL, error_message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        assert data_pipeline._register_batch(conn, pending) == (2, 1)
+        rows = conn.execute("SELECT source_identifier, status FROM files_master ORDER BY source_identifier").fetchall()
+
+    assert rows == [(str(input_dir / 'a.csv'), 'raw_stored'), (str(input_dir / 'b.csv'), 'raw_stored')]
+
+
+def test_stage3_curates_batches_on_worker_threads(pipeline_dirs, monkeypatch):
+    monkeypatch.setattr(config, 'CURATION_BATCH_SIZE', 2)
+    monkeypatch.setattr(config, 'CURATION_MAX_WORKERS', 3)
+    input_dir = pipeline_dirs / 'input'
+    for i in range(4):
+        (input_dir / f"data_{i}.csv").write_bytes(f"id,value\n{i},{i * 1.5}\n{i + 10},1\n".encode())
+    (input_dir / 'notes.bin').write_bytes(bytes(range(256)))
+    data_pipeline.stage1_ingest_and_register()
+
+    data_pipeline.stage3_curate_data()
+
+    statuses = dict(_manifest_rows("SELECT raw_content_type, count(*) FROM files_master GROUP BY ALL"))
+    assert statuses['text/csv'] == 4
+    assert sorted(_manifest_rows("SELECT status, count(*) FROM files_master GROUP BY status")) == [
+        ('curated', 4), ('unsupported_type', 1)
+    ]
+    with duckdb.connect(config.CURATED_MART_DB_PATH) as conn:
+        assert conn.execute("SELECT count(*), count(DISTINCT file_hash) FROM example_curated_data").fetchone() == (8, 4)
+
+
+def test_store_raw_blob_round_trip_and_rewrite(pipeline_dirs):
+    content = b"x,y\n1,2\n"
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    raw_storage_path = data_pipeline.store_raw_blob(file_hash, content)
+    blob_path = os.path.join(config.RAW_BLOB_STORE_DIR, data_pipeline.blob_relative_path(file_hash))
+    mtime_ns = os.stat(blob_path).st_mtime_ns
+
+    assert raw_storage_path == f"blob:{file_hash[:2]}/{file_hash}"
+    assert data_pipeline.read_raw_blob(raw_storage_path) == content
+    # 相同內容再次寫入 (含以路徑為來源) 不會重寫檔案
+    source = pipeline_dirs / 'input' / 'x.csv'
+    source.write_bytes(content)
+    assert data_pipeline.store_raw_blob(file_hash, str(source)) == raw_storage_path
+    assert os.stat(blob_path).st_mtime_ns == mtime_ns
+    assert os.listdir(os.path.dirname(blob_path)) == [file_hash]
+
+
+def test_read_raw_blob_handles_empty_and_missing(pipeline_dirs):
+    empty_hash = hashlib.sha256(b"").hexdigest()
+
+    assert data_pipeline.read_raw_blob(data_pipeline.store_raw_blob(empty_hash, b"")) == b""
+    assert data_pipeline.read_raw_blob(f"blob:ab/{'ab' * 32}") is None
+
+
+def test_migrate_raw_file_blobs_moves_legacy_rows(pipeline_dirs):
+    contents = [b"legacy one", b"legacy two", b"legacy three"]
+    with duckdb.connect(config.MANIFEST_DB_PATH) as manifest_conn, duckdb.connect(config.RAW_LAKE_DB_PATH) as raw_lake_conn:
+        for content in contents:
+            file_hash = hashlib.sha256(content).hexdigest()
+            raw_lake_conn.execute("INSERT INTO raw_file_blobs VALUES (?, ?)", [file_hash, content])
+            manifest_conn.execute(
+                "INSERT INTO files_master (file_hash, source_identifier, entry_timestamp, raw_storage_path, status) "
+                "VALUES (?, ?, now(), ?, 'raw_stored')",
+                [file_hash, f"{file_hash[:8]}.bin", data_pipeline.LEGACY_BLOB_TABLE_PREFIX]
+            )
+
+    assert data_pipeline.migrate_raw_file_blobs(batch_size=2) == 3
+    assert data_pipeline.migrate_raw_file_blobs(batch_size=2) == 0  # 可安全重複執行
+
+    with duckdb.connect(config.RAW_LAKE_DB_PATH) as raw_lake_conn:
+        assert raw_lake_conn.execute("SELECT count(*) FROM raw_file_blobs").fetchone()[0] == 0
+    paths = dict(_manifest_rows("SELECT file_hash, raw_storage_path FROM files_master"))
+    for content in contents:
+        file_hash = hashlib.sha256(content).hexdigest()
+        assert paths[file_hash] == f"blob:{file_hash[:2]}/{file_hash}"
+        assert data_pipeline.read_raw_blob(paths[file_hash]) == content
@@ -212,3 +212,39 @@ def test_multiple_rules_on_column(mock_logger):
     # conversion_failed_mask = numeric_series.isnull() & df[col_name].notnull() -> True for "abc"
     # So it should be caught by conversion_failed_mask.
     assert "Column 'value': failed numeric conversion for range check" in invalid_df_non_numeric.iloc[0]['quarantine_reason']
+
+
+def test_validate_to_parquet_matches_validate(mock_logger, tmp_path):
+    data = pd.DataFrame({
+        'col_A': [None, "x", "y", "z"],
+        'col_B': [-10, 5, "abc", 7],
+    })
+    rules_config = {
+        "test_schema": {
+            "col_A": {"non_null": True},
+            "col_B": {"min_value": 0}
+        }
+    }
+    validator = Validator(rules_config, mock_logger)
+    valid_path, invalid_path = tmp_path / "valid.parquet", tmp_path / "invalid.parquet"
+
+    counts = validator.validate_to_parquet(data, "test_source.csv", "test_schema", str(valid_path), str(invalid_path))
+    valid_df, invalid_df = validator.validate(data, "test_source.csv", "test_schema")
+
+    assert counts == (len(valid_df), len(invalid_df)) == (2, 2)
+    written_invalid = pd.read_parquet(invalid_path)
+    assert list(written_invalid.columns) == ['col_A', 'col_B', 'quarantine_reason', 'source_file']
+    assert written_invalid['quarantine_reason'].tolist() == invalid_df['quarantine_reason'].tolist()
+    assert written_invalid['source_file'].tolist() == ["test_source.csv", "test_source.csv"]
+    assert pd.read_parquet(valid_path)['col_A'].tolist() == ["x", "z"]
+
+
+def test_validate_to_parquet_skips_empty_side(mock_logger, basic_data, tmp_path):
+    validator = Validator({"test_schema": {"col_A": {"min_value": 0}}}, mock_logger)
+    valid_path, invalid_path = tmp_path / "valid.parquet", tmp_path / "invalid.parquet"
+
+    counts = validator.validate_to_parquet(basic_data, "test_source.csv", "test_schema", str(valid_path), str(invalid_path))
+
+    assert counts == (5, 0)
+    pd.testing.assert_frame_equal(pd.read_parquet(valid_path), basic_data)
+    assert not invalid_path.exists()
@@ -494,6 +494,18 @@ def test_parse_zip_corrupted(file_parser_instance, zip_corrupted_path, tmp_path)
     assert result[constants.KEY_FILE] == zip_corrupted_path.name
     assert "損壞的 ZIP 檔案" in result[constants.KEY_REASON] or "Error -3 while decompressing" in result[constants.KEY_REASON] # Message depends on pandas/zipfile version
 
+def test_parse_zip_stream_members_yields_lazily(file_parser_instance, zip_normal_multiple_path, tmp_path):
+    eager = file_parser_instance.parse_file(str(zip_normal_multiple_path), str(tmp_path))
+    streamed = file_parser_instance.parse_file(str(zip_normal_multiple_path), str(tmp_path), stream_members=True)
+
+    assert streamed[constants.KEY_STATUS] == constants.STATUS_GROUP_RESULT
+    members = streamed[constants.KEY_RESULTS]
+    assert not isinstance(members, list)
+    first = next(members)
+    assert first[constants.KEY_FILE] == eager[constants.KEY_RESULTS][0][constants.KEY_FILE]
+    rest = list(members)
+    assert [r[constants.KEY_FILE] for r in [first] + rest] == [r[constants.KEY_FILE] for r in eager[constants.KEY_RESULTS]]
+
 def test_parse_zip_with_big5_csv_matching_weekly_report(file_parser_instance, tmp_path, create_zip_in_memory, schemas_json_content): # Added schemas_json_content for verification
     # Content for a CSV file that matches the 'weekly_report' schema
     csv_content_str = """日期,商品名稱,身份別,多方交易口數,多方交易金額,空方交易口數,空方交易金額
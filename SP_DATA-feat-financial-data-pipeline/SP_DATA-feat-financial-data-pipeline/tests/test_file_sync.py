@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.data_pipeline_v15.utils.file_sync import FileSynchronizer
+
+
+@pytest.fixture
+def syncer():
+    return FileSynchronizer(MagicMock(), max_workers=3)
+
+
+@pytest.fixture
+def remote_and_local(tmp_path):
+    remote, local = tmp_path / "remote", tmp_path / "local"
+    remote.mkdir()
+    for i in range(5):
+        (remote / f"file_{i}.csv").write_text(f"row,{i}\n", encoding="utf-8")
+    (remote / "subdir").mkdir() # 非遞迴：子目錄不會被同步
+    return remote, local
+
+
+def test_sync_directory_copies_then_skips_unchanged(syncer, remote_and_local):
+    remote, local = remote_and_local
+
+    assert syncer.sync_directory(remote, local, "to_local") == {"copied": 5}
+    assert sorted(p.name for p in local.iterdir()) == [f"file_{i}.csv" for i in range(5)]
+    assert (local / "file_3.csv").read_text(encoding="utf-8") == "row,3\n"
+
+    assert syncer.sync_directory(remote, local, "to_local") == {"unchanged": 5}
+
+
+def test_changed_size_is_copied(syncer, remote_and_local):
+    remote, local = remote_and_local
+    syncer.sync_directory(remote, local, "to_local")
+
+    (remote / "file_1.csv").write_text("row,1\nrow,11\n", encoding="utf-8")
+
+    assert syncer.sync_directory(remote, local, "to_local") == {"copied": 1, "unchanged": 4}
+    assert (local / "file_1.csv").read_text(encoding="utf-8") == "row,1\nrow,11\n"
+    assert not [p for p in local.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_same_size_different_mtime_falls_back_to_hash(syncer, tmp_path):
+    source, dest = tmp_path / "a.csv", tmp_path / "b.csv"
+    source.write_text("abc", encoding="utf-8")
+    dest.write_text("abc", encoding="utf-8")
+    os.utime(dest, (1_000_000, 1_000_000))
+
+    # 內容相同：不複製，但對齊 mtime
+    assert syncer.sync_file(source, dest, "to_remote") == "unchanged"
+    assert int(dest.stat().st_mtime) == int(source.stat().st_mtime)
+
+    dest.write_text("xyz", encoding="utf-8")
+    os.utime(dest, (1_000_000, 1_000_000))
+    assert syncer.sync_file(source, dest, "to_remote") == "copied"
+    assert dest.read_text(encoding="utf-8") == "abc"
+
+
+def test_missing_source_is_reported(syncer, tmp_path):
+    assert syncer.sync_file(tmp_path / "nope.csv", tmp_path / "dest.csv", "to_local") == "missing"
+    assert not (tmp_path / "dest.csv").exists()
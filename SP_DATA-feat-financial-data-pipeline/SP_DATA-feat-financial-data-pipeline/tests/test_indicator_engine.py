@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.engine.indicator_engine import IndicatorEngine, rolling_percentile_rank
+
+
+def _reference_rank(series, window, min_periods):
+    return series.rolling(window=window, min_periods=min_periods).apply(
+        lambda x: pd.Series(x).rank(pct=True).iloc[-1] if pd.Series(x).notna().any() else np.nan, raw=False
+    )
+
+
+@pytest.mark.parametrize("window,min_periods", [(5, 3), (20, 10), (252, 126)])
+def test_rolling_percentile_rank_matches_pandas_rank(window, min_periods):
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=600).round(1)  # 四捨五入以產生同值
+    values[rng.choice(600, size=60, replace=False)] = np.nan
+    series = pd.Series(values, index=pd.date_range("2020-01-01", periods=600, freq="D"))
+
+    result = rolling_percentile_rank(series, window, min_periods)
+
+    pd.testing.assert_series_equal(result, _reference_rank(series, window, min_periods), check_names=False)
+
+
+ENGINE_PARAMS = {
+    'rolling_window_days': 60,
+    'min_periods_ratio_for_rolling': 0.5,
+    'stress_index_weights': {
+        'sofr_deviation': 0.20, 'spread_10y2y': 0.20, 'primary_dealer_position': 0.15,
+        'move_index': 0.25, 'vix_index': 0.15, 'pos_res_ratio': 0.05,
+    },
+}
+MACRO_METRICS = ['FRED/DGS10', 'FRED/DGS2', 'FRED/SOFR', 'FRED/VIXCLS', 'NYFED/PRIMARY_DEALER_NET_POSITION', 'FRED/WRESBAL']
+
+
+def _engine_inputs(dates, seed=1):
+    rng = np.random.default_rng(seed)
+    macro = pd.DataFrame([
+        {'metric_date': date, 'metric_name': name, 'metric_value': float(rng.normal(loc=10, scale=2))}
+        for date in dates for name in MACRO_METRICS
+        if not (name == 'FRED/VIXCLS' and date.dayofweek == 4)  # 週五缺值，測試 ffill
+    ])
+    move = pd.DataFrame({'price_date': dates, 'security_id': '^MOVE', 'close_price': rng.normal(loc=90, scale=5, size=len(dates))})
+    return macro, move
+
+
+def _split(frames, cutoff):
+    macro, move = frames
+    return ({'macro': macro[macro['metric_date'] < cutoff], 'move': move[move['price_date'] < cutoff]},
+            {'macro': macro[macro['metric_date'] >= cutoff], 'move': move[move['price_date'] >= cutoff]})
+
+
+def test_update_from_saved_state_matches_full_recompute(tmp_path):
+    dates = pd.date_range("2022-01-03", periods=300, freq="B")
+    frames = _engine_inputs(dates)
+    history, new_rows = _split(frames, dates[280])
+
+    engine = IndicatorEngine(history, params=ENGINE_PARAMS)
+    assert engine.calculate_dealer_stress_index() is not None
+    state_path = str(tmp_path / "stress_state.json")
+    assert engine.save_state(state_path)
+
+    # 新的執行只載入狀態，不需要歷史資料
+    resumed = IndicatorEngine({}, params=ENGINE_PARAMS)
+    assert resumed.load_state(state_path)
+    appended = resumed.update(new_rows)
+
+    expected = IndicatorEngine({'macro': frames[0], 'move': frames[1]}, params=ENGINE_PARAMS).calculate_dealer_stress_index()
+    assert len(appended) == 20
+    pd.testing.assert_frame_equal(appended, expected.loc[appended.index], check_freq=False, check_names=False, atol=1e-9)
+
+
+def test_update_from_saved_state_drops_overlapping_rows(tmp_path):
+    dates = pd.date_range("2022-01-03", periods=300, freq="B")
+    frames = _engine_inputs(dates)
+    history, _ = _split(frames, dates[280])
+    _, overlapping_rows = _split(frames, dates[275])  # 前 5 個日期已計入狀態
+
+    engine = IndicatorEngine(history, params=ENGINE_PARAMS)
+    engine.calculate_dealer_stress_index()
+    state_path = str(tmp_path / "stress_state.json")
+    engine.save_state(state_path)
+
+    resumed = IndicatorEngine({}, params=ENGINE_PARAMS)
+    assert resumed.load_state(state_path)
+    appended = resumed.update(overlapping_rows)
+
+    expected = IndicatorEngine({'macro': frames[0], 'move': frames[1]}, params=ENGINE_PARAMS).calculate_dealer_stress_index()
+    assert list(appended.index) == list(dates[280:])
+    pd.testing.assert_frame_equal(appended, expected.loc[appended.index], check_freq=False, check_names=False, atol=1e-9)
+    assert list(resumed.stress_index_df.index) == list(dates[280:])
+
+    # 只有狀態時無法以新欄位全量重算
+    extra_metric = pd.DataFrame({'metric_date': [dates[-1] + pd.offsets.BDay()], 'metric_name': ['FRED/NEW'], 'metric_value': [1.0]})
+    with pytest.raises(ValueError):
+        resumed.update({'macro': extra_metric})
+
+
+def test_update_recomputes_when_params_change(tmp_path):
+    dates = pd.date_range("2022-01-03", periods=200, freq="B")
+    history, new_rows = _split(_engine_inputs(dates), dates[190])
+    engine = IndicatorEngine(history, params=ENGINE_PARAMS)
+    engine.calculate_dealer_stress_index()
+    state_path = str(tmp_path / "stress_state.json")
+    engine.save_state(state_path)
+
+    changed_params = {**ENGINE_PARAMS, 'rolling_window_days': 40}
+    assert not IndicatorEngine({}, params=changed_params).load_state(state_path)
+
+    engine.params = changed_params
+    appended = engine.update(new_rows)
+    assert len(appended) == 10
+    assert engine.stress_index_df.index[-1] == dates[-1]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.data_pipeline_v15.manifest_manager import ManifestManager
+
+
+@pytest.fixture
+def mock_logger():
+    """Provides a MagicMock instance for logger."""
+    return MagicMock()
+
+
+def test_update_appends_to_log_and_close_compacts(tmp_path, mock_logger):
+    manifest_path = str(tmp_path / "manifest.json")
+    manager = ManifestManager(manifest_path=manifest_path, logger=mock_logger)
+    manager.load_or_create_manifest()
+    snapshot_before = (tmp_path / "manifest.json").read_text(encoding="utf-8")
+
+    manager.update_manifest("a.csv", "ERROR", "bad header", original_filename="a.csv")
+    manager.update_manifest("b.csv", "SKIPPED", "empty", original_filename="b.csv")
+
+    # 更新只寫入日誌，不會重寫快照
+    assert (tmp_path / "manifest.json").read_text(encoding="utf-8") == snapshot_before
+    log_lines = (tmp_path / "manifest.json.log").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["key"] for line in log_lines] == ["a.csv", "b.csv"]
+
+    manager.close()
+
+    assert not os.path.exists(manager.log_path)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    assert files["a.csv"]["status"] == "ERROR"
+    assert files["b.csv"]["message"] == "empty"
+
+
+def test_uncompacted_log_is_replayed_on_load(tmp_path, mock_logger):
+    manifest_path = str(tmp_path / "manifest.json")
+    manager = ManifestManager(manifest_path=manifest_path, logger=mock_logger)
+    manager.load_or_create_manifest()
+    manager.update_manifest("a.csv", "ERROR", "first", original_filename="a.csv")
+    manager.update_manifest("a.csv", "SUCCESS", "second", original_filename="a.csv")
+    manager._log_file.close()  # 模擬程序在 close() 前中斷
+
+    # 寫到一半的最後一行會被略過
+    with open(manager.log_path, "a", encoding="utf-8") as f:
+        f.write('{"key": "trunc')
+
+    reloaded = ManifestManager(manifest_path=manifest_path, logger=mock_logger)
+
+    assert reloaded.manifest_data["files"]["a.csv"]["message"] == "second"
+    assert reloaded.has_been_processed("a.csv")
+    assert set(reloaded.manifest_data["files"]) == {"a.csv"}
+
+
+def test_compact_keeps_log_when_snapshot_write_fails(tmp_path, mock_logger, monkeypatch):
+    manifest_path = str(tmp_path / "manifest.json")
+    manager = ManifestManager(manifest_path=manifest_path, logger=mock_logger)
+    manager.load_or_create_manifest()
+    snapshot_before = (tmp_path / "manifest.json").read_text(encoding="utf-8")
+    manager.update_manifest("a.csv", "ERROR", "bad header", original_filename="a.csv")
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("src.data_pipeline_v15.manifest_manager.json.dump", failing_dump)
+    assert manager._save() is False
+    manager.compact()
+
+    # 快照未被取代、暫存檔已清除，日誌保留供下次重播
+    assert os.path.exists(manager.log_path)
+    assert (tmp_path / "manifest.json").read_text(encoding="utf-8") == snapshot_before
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+    monkeypatch.undo()
+
+    reloaded = ManifestManager(manifest_path=manifest_path, logger=mock_logger)
+    assert reloaded.manifest_data["files"]["a.csv"]["message"] == "bad header"
+
+
+def test_success_uses_passed_hash_without_rehashing(tmp_path, mock_logger, monkeypatch):
+    manager = ManifestManager(manifest_path=str(tmp_path / "manifest.json"), logger=mock_logger)
+    monkeypatch.setattr(ManifestManager, "get_file_hash", staticmethod(lambda path: pytest.fail("should not rehash")))
+
+    # 原始檔案已被移走，仍以探索階段的雜湊值作為鍵
+    manager.update_manifest(str(tmp_path / "moved.csv"), "success", "ok", original_filename="moved.csv", file_hash="abc123")
+
+    assert manager.has_been_processed("abc123")
+    assert "moved.csv" not in manager.manifest_data["files"]
+
+
+def test_stat_fast_path_matches_recorded_success(tmp_path, mock_logger):
+    data_file = tmp_path / "data.csv"
+    data_file.write_text("a,b\n1,2\n", encoding="utf-8")
+    file_stat = ManifestManager.get_file_stat(str(data_file))
+    file_hash = ManifestManager.get_file_hash(str(data_file))
+
+    manager = ManifestManager(manifest_path=str(tmp_path / "manifest.json"), logger=mock_logger, use_stat_fast_path=True)
+    assert manager.find_unchanged_hash(file_stat) is None
+    manager.update_manifest(str(data_file), "success", "ok", original_filename="data.csv", file_hash=file_hash, file_stat=file_stat)
+
+    assert manager.find_unchanged_hash(ManifestManager.get_file_stat(str(data_file))) == file_hash
+
+    data_file.write_text("a,b\n1,2\n3,4\n", encoding="utf-8")
+    assert manager.find_unchanged_hash(ManifestManager.get_file_stat(str(data_file))) is None
+
+    disabled = ManifestManager(manifest_path=str(tmp_path / "other.json"), logger=mock_logger)
+    disabled.manifest_data = manager.manifest_data
+    assert disabled.find_unchanged_hash(file_stat) is None
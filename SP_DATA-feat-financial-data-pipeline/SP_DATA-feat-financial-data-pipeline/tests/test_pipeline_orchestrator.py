@@ -6,6 +6,7 @@ import os # For os.path spec in mock_os_tools
 import pathlib # For Path object
 
 # Third-party imports
+import pandas as pd
 import pytest
 from unittest import mock # Already imported but good to note
 
@@ -14,6 +15,7 @@ from src.data_pipeline_v15.pipeline_orchestrator import PipelineOrchestrator
 from src.data_pipeline_v15.file_parser import FileParser # Needed for spec
 from src.data_pipeline_v15.manifest_manager import ManifestManager # Needed for spec
 from src.data_pipeline_v15.database_loader import DatabaseLoader # Needed for spec
+from src.data_pipeline_v15.data_validator import Validator
 from src.data_pipeline_v15.core import constants
 
 # --- Base Test Configuration ---
@@ -283,3 +285,78 @@ def assert_makedirs_called_for_paths(globally_mocked_os_makedirs, orchestrator_i
 # test_run_zip_all_sub_items_fail
 # would need careful setup of mock_file_parser.parse_file to return KEY_GROUP_RESULT
 # and a list of sub-results, ensuring paths in sub-results are also correctly mocked/constructed.
+
+
+# --- Worker-side validation staging (_stage_validated_shards) ---
+
+
+@pytest.fixture
+def staging_orchestrator(tmp_path):
+    """只帶有 _process_single_file / _stage_validated_shards 所需屬性的 orchestrator (不執行 __init__)。"""
+    orchestrator = PipelineOrchestrator.__new__(PipelineOrchestrator)
+    orchestrator.logger = mock.MagicMock(spec=logging.Logger)
+    orchestrator.local_project_path = tmp_path / "project"
+    orchestrator.local_input_path = tmp_path / "input"
+    orchestrator.local_processed_path = tmp_path / "processed"
+    orchestrator.local_input_path.mkdir(parents=True)
+    orchestrator.validator = Validator({"prices": {"price": {"min_value": 0}}}, orchestrator.logger)
+    orchestrator.manifest_manager = mock.MagicMock()
+    orchestrator.manifest_manager.find_unchanged_hash.return_value = None
+    orchestrator.manifest_manager.has_been_processed.return_value = False
+    orchestrator.file_parser = mock.MagicMock(spec=FileParser)
+    return orchestrator
+
+
+def test_stage_validated_shards_single_file(staging_orchestrator):
+    (staging_orchestrator.local_input_path / "prices.csv").write_text("price\n1\n-1\n2\n")
+    staging_orchestrator.file_parser.parse_file.return_value = {
+        constants.KEY_STATUS: constants.STATUS_SUCCESS,
+        constants.KEY_TABLE: "prices",
+        constants.KEY_COUNT: 3,
+        constants.KEY_MATCHED_SCHEMA_NAME: "prices",
+        constants.KEY_DATAFRAME: pd.DataFrame({"price": [1, -1, 2]}),
+    }
+
+    result = staging_orchestrator._process_single_file("prices.csv")
+
+    assert result["status"] == constants.STATUS_SUCCESS
+    assert constants.KEY_DATAFRAME not in result
+    assert result[constants.KEY_VALID_COUNT] == 2
+    assert result[constants.KEY_INVALID_COUNT] == 1
+    assert pd.read_parquet(result[constants.KEY_VALID_PATH])["price"].tolist() == [1, 2]
+    invalid_df = pd.read_parquet(result[constants.KEY_INVALID_PATH])
+    assert invalid_df["price"].tolist() == [-1]
+    assert invalid_df["source_file"].tolist() == ["prices.csv"]
+
+
+def test_stage_validated_shards_zip_group(staging_orchestrator):
+    (staging_orchestrator.local_input_path / "bundle.zip").write_bytes(b"zip-bytes")
+    staging_orchestrator.file_parser.parse_file.return_value = {
+        constants.KEY_STATUS: constants.STATUS_GROUP_RESULT,
+        constants.KEY_RESULTS: [
+            {constants.KEY_STATUS: constants.STATUS_SUCCESS, constants.KEY_FILE: "a.csv",
+             constants.KEY_MATCHED_SCHEMA_NAME: "prices",
+             constants.KEY_DATAFRAME: pd.DataFrame({"price": [5, 6]})},
+            {constants.KEY_STATUS: constants.STATUS_SUCCESS, constants.KEY_FILE: "b.csv",
+             constants.KEY_MATCHED_SCHEMA_NAME: "prices",
+             constants.KEY_DATAFRAME: pd.DataFrame({"price": [-3]})},
+            {constants.KEY_STATUS: constants.STATUS_ERROR, constants.KEY_FILE: "c.csv",
+             constants.KEY_REASON: "unrecognised format"},
+        ],
+    }
+
+    result = staging_orchestrator._process_single_file("bundle.zip")
+
+    assert result["status"] == constants.STATUS_GROUP_RESULT
+    # 群組本身不帶分片，分片路徑與筆數都在各成員結果中
+    assert result[constants.KEY_VALID_PATH] is None and result[constants.KEY_VALID_COUNT] == 0
+    sub_a, sub_b, sub_c = result["sub_results"]
+    for sub_result in (sub_a, sub_b, sub_c):
+        assert constants.KEY_DATAFRAME not in sub_result
+
+    assert sub_a[constants.KEY_VALID_COUNT] == 2 and sub_a[constants.KEY_INVALID_PATH] is None
+    assert pd.read_parquet(sub_a[constants.KEY_VALID_PATH])["price"].tolist() == [5, 6]
+    assert sub_b[constants.KEY_VALID_PATH] is None and sub_b[constants.KEY_INVALID_COUNT] == 1
+    assert pd.read_parquet(sub_b[constants.KEY_INVALID_PATH])["source_file"].tolist() == ["b.csv"]
+    assert (sub_c[constants.KEY_VALID_PATH], sub_c[constants.KEY_VALID_COUNT],
+            sub_c[constants.KEY_INVALID_PATH], sub_c[constants.KEY_INVALID_COUNT]) == (None, 0, None, 0)
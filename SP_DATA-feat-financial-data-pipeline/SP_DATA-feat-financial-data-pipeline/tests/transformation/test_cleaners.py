@@ -5,7 +5,9 @@ import numpy as np
 from datetime import datetime
 
 # 被測模組
-from taifex_pipeline.transformation.cleaners import clean_daily_ohlc
+from taifex_pipeline.transformation.cleaners import (
+    clean_daily_ohlc, clean_institutional_investors, map_institution_types, parse_roc_dates
+)
 
 # --- Fixtures ---
 
@@ -438,3 +440,57 @@ class TestCleanInstitutionalInvestors:
 # - 測試更複雜的日期區間格式，例如週報的 "W1", "W2" (目前未特別處理週數)。
 # - 測試 DataFrame 結構調整 (如 unpivot/melt) 的需求 (如果目標表是長格式)。
 # - 測試當所有數值欄位都為 '-' 或空時，是否全部正確轉為 NaN。
+
+
+# --- Test Cases for parse_roc_dates / map_institution_types ---
+
+class TestParseRocDates:
+
+    @pytest.mark.parametrize("raw_value, expected", [
+        ('113/01/05', '2024-01-05'),          # 民國年
+        ('113年01月05日', '2024-01-05'),
+        ('2024/1/5', '2024-01-05'),
+        ('2024-01-05', '2024-01-05'),
+        ('1130105', '2024-01-05'),            # 民國年 compact
+        ('20240105', '2024-01-05'),           # 西元 compact
+        ('113/01/01~113/01/05', '2024-01-05'),  # 區間取結束日期
+        ('113/01/01 ~ 113/01/05', '2024-01-05'),
+        ('  2024/01/05  ', '2024-01-05'),
+        ('2024-01-05 00:00:00', '2024-01-05'),  # 日期與時間之間的空白不可被移除
+        ('2024-01-05 13:45:00', '2024-01-05 13:45:00'),
+    ])
+    def test_string_formats(self, raw_value, expected):
+        result = parse_roc_dates(pd.Series([raw_value]))
+        assert result.dtype == 'datetime64[ns]'
+        assert result.iloc[0] == pd.Timestamp(expected)
+
+    def test_missing_and_invalid_values_are_nat(self):
+        result = parse_roc_dates(pd.Series([None, np.nan, '', '-', '無效日期'], dtype=object))
+        assert result.isna().all()
+
+    def test_datetime_values_pass_through(self):
+        timestamp = pd.Timestamp('2024-01-05 10:30:00')
+        mixed = pd.Series([timestamp, datetime(2024, 1, 6), '113/01/07', None], index=[10, 11, 12, 13], dtype=object)
+
+        result = parse_roc_dates(mixed)
+
+        expected = pd.Series([timestamp, pd.Timestamp('2024-01-06'), pd.Timestamp('2024-01-07'), pd.NaT],
+                             index=[10, 11, 12, 13]).astype('datetime64[ns]')
+        assert_series_equal(result, expected)
+        already_parsed = pd.Series(pd.to_datetime(['2024-01-05', '2024-01-06']))
+        assert_series_equal(parse_roc_dates(already_parsed), already_parsed.astype('datetime64[ns]'))
+
+
+class TestMapInstitutionTypes:
+
+    def test_exact_keyword_and_missing_values(self):
+        values = pd.Series(['自營商(避險)', '投信', '外資及陸資(不含自營商)', '外資自營商', '自營商', None, np.nan, '其他'],
+                           name='institution_type')
+
+        result = map_institution_types(values)
+
+        assert result.name == 'institution_type'
+        assert result.iloc[:5].tolist() == ['Dealer', 'InvestmentTrust', 'ForeignAndMainlandInvestors',
+                                            'ForeignAndMainlandInvestors', 'Dealer']
+        assert result.iloc[5:7].isna().all()
+        assert result.iloc[7] == '其他'  # 無法對應的值保留原值
@@ -305,6 +305,39 @@ class TestFormatDetectorGetRecipe:
         assert recipe["_debug_metadata"]["detected_header_content"] == header_with_quoted_comma
         assert recipe["_debug_metadata"]["calculated_fingerprint"] == fp_problematic
 
+    def test_get_recipe_prefers_best_header_and_falls_back_to_utf8(self, default_detector: FormatDetector):
+        known_header = "契約,到期月份(W),買賣權,履約價,開盤價,最高價,最低價,最新價"
+        better_header = "交易日期,契約,到期月份(週別),履約價,買賣權,開盤價,最高價,最低價,收盤價,成交量,結算價,未沖銷契約數,最後最佳買價,最後最佳賣價,歷史最高價,歷史最低價,是否因訊息面暫停交易,交易時段,漲跌價,漲跌%"
+        assert default_detector.get_recipe(known_header.encode('ms950')) is not None
+
+        # 已識別過的標頭出現在前言中，但檔案中有分數更高的標頭：每個檔案都重新搜尋標頭
+        preamble_file = (known_header + "\n" + better_header + "\n2025/06/13,TXO,202506,20000,買權\n").encode('ms950')
+        preamble_recipe = default_detector.get_recipe(preamble_file)
+        assert preamble_recipe["id"] == "daily_ohlc_v2"
+        assert preamble_recipe["_debug_metadata"]["detected_header_row_index"] == 1
+
+        # 含無法以 ms950 解碼的位元組時須照常回退到 utf-8
+        fallback_file = (known_header + "\n😀 data,1,2,3\n").encode('utf-8')
+        assert default_detector.get_recipe(fallback_file)["_debug_metadata"]["detected_encoding"] == "utf-8"
+
+    def test_compiled_catalog_resolves_cleaners_once(self):
+        header = "交易日期,契約,成交量,收盤價"
+        fp = calculate_expected_fingerprint_new(header)
+        catalog = {
+            fp: {"id": "with_cleaner", "cleaner_function": "clean_daily_ohlc",
+                 "required_columns": ["交易日期", "契約"]},
+        }
+        detector = FormatDetector(format_catalog=catalog)
+        assert callable(detector.get_cleaner("clean_daily_ohlc"))
+        assert detector.get_cleaner("no_such_cleaner") is None
+
+        recipe = detector.get_recipe(header.encode('utf-8'))
+        assert recipe is not None
+        assert recipe["required_columns"] == ("交易日期", "契約")
+        # 呼叫者修改返回的配方不應影響目錄本身
+        recipe["id"] = "mutated"
+        assert detector.get_recipe(header.encode('utf-8'))["id"] == "with_cleaner"
+
 # --- Placeholder for direct execution (Phase 2 adjustment) ---
 # (Will be filled in the next step of the plan)
 # if __name__ == "__main__":
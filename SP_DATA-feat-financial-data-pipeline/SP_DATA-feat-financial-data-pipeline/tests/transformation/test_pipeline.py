@@ -74,6 +74,8 @@ def mock_cleaner_function():
     mock_func = MagicMock(return_value=pd.DataFrame({'A': [1, 2], 'B': [3, 4]}))
     return mock_func
 
+_REAL_PD_READ_CSV = pd.read_csv # autouse fixture 會 mock 掉 pd.read_csv，需要真實解碼行為的測試使用此參考
+
 # --- Helper: Mock pd.read_csv (或其他 parser) ---
 # 我們可能需要 mock pandas 的 read_csv 等，以避免實際的文件IO和解析邏輯
 # 或者讓 _static_parse_raw_content 返回一個固定的 DataFrame
@@ -285,7 +287,7 @@ class TestTransformationPipelineProcessFileWorker:
 class TestTransformationPipelineRun:
 
     @patch('taifex_pipeline.transformation.pipeline.DBManager')
-    @patch('concurrent.futures.ProcessPoolExecutor') # Mock ProcessPoolExecutor
+    @patch('taifex_pipeline.transformation.pipeline.ProcessPoolExecutor') # Mock ProcessPoolExecutor
     def test_run_no_files_to_process(self,
                                      mock_executor_cls,
                                      mock_db_manager_constructor,
@@ -304,7 +306,7 @@ class TestTransformationPipelineRun:
         mock_db_main_instance.close.assert_called_once() # 主DBM應被關閉
 
     @patch('taifex_pipeline.transformation.pipeline.DBManager')
-    @patch('concurrent.futures.ProcessPoolExecutor')
+    @patch('taifex_pipeline.transformation.pipeline.ProcessPoolExecutor')
     def test_run_processes_files_and_updates_manifest(self,
                                                        mock_executor_cls,
                                                        mock_db_manager_constructor,
@@ -325,8 +327,14 @@ class TestTransformationPipelineRun:
 
         # 模擬 _process_file_worker 的返回結果
         results_from_worker = [
-            {'file_hash': 'hash1', 'status': sample_statuses_dict['STATUS_TRANSFORMED_SUCCESS'], 'processed_rows': 100},
-            {'file_hash': 'hash2', 'status': sample_statuses_dict['STATUS_QUARANTINED'], 'error_message': 'No recipe'}
+            {'file_hash': 'hash1', 'status': sample_statuses_dict['STATUS_TRANSFORMED_SUCCESS'], 'processed_rows': 100,
+             'error_message': None,
+             'transformation_start_timestamp': '2025-01-01T00:00:00+00:00',
+             'transformation_end_timestamp': '2025-01-01T00:00:01+00:00'},
+            {'file_hash': 'hash2', 'status': sample_statuses_dict['STATUS_QUARANTINED'], 'error_message': 'No recipe',
+             'processed_rows': 0,
+             'transformation_start_timestamp': '2025-01-01T00:00:00+00:00',
+             'transformation_end_timestamp': '2025-01-01T00:00:01+00:00'}
         ]
 
         # 設定 submit 返回的 future 的 result()
@@ -344,7 +352,7 @@ class TestTransformationPipelineRun:
         # For now, let's assume we can control what `as_completed` yields.
         # A common pattern is to patch `as_completed` itself.
 
-        with patch('concurrent.futures.as_completed', return_value=mock_futures):
+        with patch('taifex_pipeline.transformation.pipeline.as_completed', return_value=mock_futures):
             pipeline = TransformationPipeline(":memory:", mock_format_detector_instance, sample_format_catalog, max_workers=2)
             pipeline.run()
 
@@ -366,22 +374,26 @@ class TestTransformationPipelineRun:
 
         # 驗證 manifest 更新
         assert mock_db_main_instance.update_manifest_transformation_status.call_count == len(results_from_worker)
+        # 值為 None 的參數 (例如成功時的 error_message) 不會傳給 DBManager
         mock_db_main_instance.update_manifest_transformation_status.assert_any_call(
             file_hash='hash1',
             status=sample_statuses_dict['STATUS_TRANSFORMED_SUCCESS'],
-            error_message=None,
-            processed_rows=100
+            processed_rows=100,
+            transformation_start_timestamp=ANY,
+            transformation_end_timestamp=ANY
         )
         mock_db_main_instance.update_manifest_transformation_status.assert_any_call(
             file_hash='hash2',
             status=sample_statuses_dict['STATUS_QUARANTINED'],
             error_message='No recipe',
-            processed_rows=None # 或者 worker 返回 0
+            processed_rows=0,
+            transformation_start_timestamp=ANY,
+            transformation_end_timestamp=ANY
         )
         mock_db_main_instance.close.assert_called_once()
 
     @patch('taifex_pipeline.transformation.pipeline.DBManager')
-    @patch('concurrent.futures.ProcessPoolExecutor')
+    @patch('taifex_pipeline.transformation.pipeline.ProcessPoolExecutor')
     def test_run_handles_worker_exception(self,
                                           mock_executor_cls,
                                           mock_db_manager_constructor,
@@ -400,7 +412,7 @@ class TestTransformationPipelineRun:
         mock_future_ex.result.side_effect = Exception("Worker crashed unexpectedly")
         mock_executor_instance.submit.return_value = mock_future_ex # 假設只有一個任務
 
-        with patch('concurrent.futures.as_completed', return_value=[mock_future_ex]):
+        with patch('taifex_pipeline.transformation.pipeline.as_completed', return_value=[mock_future_ex]):
             pipeline = TransformationPipeline(":memory:", mock_format_detector_instance, sample_format_catalog)
             pipeline.run()
 
@@ -408,14 +420,76 @@ class TestTransformationPipelineRun:
         mock_db_main_instance.update_manifest_transformation_status.assert_called_once_with(
             file_hash='hash_ex',
             status=sample_statuses_dict['STATUS_TRANSFORMATION_FAILED'],
-            error_message=ANY, # 錯誤訊息包含 "平行處理異常: Worker crashed unexpectedly"
-            processed_rows=0
+            error_message=ANY, # 錯誤訊息包含 "Critical error in worker or task submission: Worker crashed unexpectedly"
+            processed_rows=0,
+            transformation_start_timestamp=ANY,
+            transformation_end_timestamp=ANY
         )
         # 檢查 error_message 的內容
         args, kwargs = mock_db_main_instance.update_manifest_transformation_status.call_args
-        assert "平行處理異常: Worker crashed unexpectedly" in kwargs['error_message']
+        assert "Critical error in worker or task submission: Worker crashed unexpectedly" in kwargs['error_message']
         mock_db_main_instance.close.assert_called_once()
 
+    @patch('taifex_pipeline.transformation.pipeline.DBManager')
+    def test_run_with_writer_service_reads_raw_content_lazily(self,
+                                                               mock_db_manager_constructor,
+                                                               mock_format_detector_instance,
+                                                               sample_format_catalog,
+                                                               sample_statuses_dict):
+        """單一寫入者模式：原始內容在提交前才經由寫入者讀取，進行中的任務數不超過上限。"""
+        from concurrent.futures import Future
+        from taifex_pipeline.transformation import pipeline as pipeline_module
+        from taifex_pipeline.database.writer_service import DBWriterService
+
+        file_infos = [{'file_hash': f'hash{i}', 'original_path': f'p{i}'} for i in range(7)]
+        mock_db_snapshot = mock_db_manager_constructor.return_value.__enter__.return_value
+        mock_db_snapshot.get_manifest_records_by_status.return_value = file_infos
+        # 不啟動真正的寫入者程序，只替換其對外方法 (保留類別本身供 isinstance 判斷)
+        mock_writer = MagicMock()
+        mock_writer.read_raw_file_content.side_effect = lambda file_hash: file_hash.encode()
+        mock_writer.flush.return_value = {}
+
+        in_flight = []
+        max_observed = []
+
+        class TrackingFuture(Future):
+            def result(self, timeout=None):
+                in_flight.remove(self)
+                return super().result(timeout)
+
+        class SynchronousExecutor:
+            def __init__(self, max_workers=None):
+                pass
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc):
+                return False
+            def submit(self, fn, file_info, *args):
+                assert file_info['raw_content'] == file_info['file_hash'].encode()
+                future = TrackingFuture()
+                future.set_result({'file_hash': file_info['file_hash'],
+                                   'status': sample_statuses_dict['STATUS_TRANSFORMED_SUCCESS'],
+                                   'processed_rows': 1})
+                in_flight.append(future)
+                max_observed.append(len(in_flight))
+                return future
+
+        with patch.object(pipeline_module, 'ProcessPoolExecutor', SynchronousExecutor), \
+                patch.object(DBWriterService, 'start', lambda self: self), \
+                patch.object(DBWriterService, 'stop'), \
+                patch.object(DBWriterService, 'read_raw_file_content', mock_writer.read_raw_file_content), \
+                patch.object(DBWriterService, 'flush', mock_writer.flush), \
+                patch.object(DBWriterService, 'update_manifest', mock_writer.update_manifest):
+            pipeline = TransformationPipeline("/tmp/unused.duckdb", mock_format_detector_instance,
+                                              sample_format_catalog, max_workers=1, use_writer_service=True)
+            pipeline.run()
+
+        mock_db_snapshot.get_raw_file_content.assert_not_called() # 不再預先讀取所有原始內容
+        assert mock_writer.read_raw_file_content.call_count == len(file_infos)
+        assert max(max_observed) <= pipeline_module.MAX_IN_FLIGHT_TASKS_PER_WORKER
+        updates = mock_writer.update_manifest.call_args[0][0]
+        assert sorted(update['file_hash'] for update in updates) == [info['file_hash'] for info in file_infos]
+
     # TODO:
     # - 測試主 DBManager 操作 (get_manifest_records_by_status, update_manifest_transformation_status) 失敗的情況。
     # - 測試 DBManager(self.db_path) 在 run() 方法開始時創建失敗的情況。
@@ -425,7 +499,7 @@ class TestTransformationPipelineRun:
     # - 整合測試：一個更端到端的測試，可能不 mock ProcessPoolExecutor，而是用少量 worker 和真實的（但可能是 mock 的）_process_file_worker 邏輯。
     #   但這通常很複雜，且依賴於多進程環境的正確設定。
 
-    def test_static_parse_raw_content(self, mock_format_detector_instance): # 測試輔助的靜態 parser
+    def test_static_parse_raw_content(self, mock_format_detector_instance, mocker): # 測試輔助的靜態 parser
         """測試 _static_parse_raw_content 方法。"""
         recipe = {"parser_type": "csv", "parser_config": {"sep": ","}}
         raw_content = b"col1,col2\nval1,val2"
@@ -433,9 +507,14 @@ class TestTransformationPipelineRun:
         assert not df.empty
         assert list(df.columns) == ['col1', 'col2']
         assert len(df) == 1
+        # 原始位元組直接交給 pandas 並指定編碼，不先在 Python 中解碼成字串
+        read_csv_args, read_csv_kwargs = pd.read_csv.call_args
+        assert read_csv_args[0].getvalue() == raw_content
+        assert read_csv_kwargs["encoding"] == mock_format_detector_instance.try_encodings[0]
 
         with pytest.raises(ValueError, match="不支援的 parser_type: unknown"):
             TransformationPipeline._static_parse_raw_content(raw_content, {"parser_type": "unknown"}, [])
 
+        mocker.patch('pandas.read_csv', _REAL_PD_READ_CSV) # 解碼由 pandas 執行，需使用真實的 read_csv
         with pytest.raises(UnicodeDecodeError): # 如果用不正確的編碼
              TransformationPipeline._static_parse_raw_content(b'\xff\xfe', {"parser_type": "csv"}, ['ascii'])
@@ -185,3 +185,51 @@ def test_parse_fewer_columns_in_data_than_schema(data_parser):
 
     assert result_df is not None
     assert_frame_equal(result_df, expected_df)
+
+def test_parse_skips_preamble_rows_at_read_time(data_parser, mocker):
+    """
+    Tests that 'csv_skip_rows' is passed to the reader as skiprows, so preamble
+    lines are never tokenized into the DataFrame.
+    """
+    schema = {'encoding': 'utf-8', 'delimiter': ',', 'csv_skip_rows': 2, 'columns': ['A', 'B']}
+    raw_content = b"report title\ngenerated,at,noon,today\nval1,val2\nval3,val4"
+    spy_read_csv = mocker.spy(pd, 'read_csv')
+
+    result_df = data_parser.parse(raw_content, schema)
+
+    assert spy_read_csv.call_args.kwargs['skiprows'] == 2
+    expected_df = pd.DataFrame([['val1', 'val2'], ['val3', 'val4']], columns=['A', 'B'])
+    assert_frame_equal(result_df, expected_df)
+
+def test_parse_skip_rows_beyond_content_returns_empty_frame(data_parser):
+    """Tests that skipping every row yields an empty DataFrame with the schema columns."""
+    schema = {'encoding': 'utf-8', 'delimiter': ',', 'csv_skip_rows': 3, 'columns': ['A', 'B']}
+    result_df = data_parser.parse(b"keyword\nval1,val2", schema)
+
+    assert result_df is not None
+    assert result_df.empty
+    assert list(result_df.columns) == ['A', 'B']
+
+def test_parse_reads_only_schema_columns_as_strings(data_parser):
+    """
+    Tests that with a dict of column definitions every column is read as a string
+    (type conversion is left to DataValidator), and that 'source_columns' limits
+    the materialized columns to those defined in 'columns'.
+    """
+    schema = {
+        'encoding': 'utf-8',
+        'delimiter': ',',
+        'csv_skip_rows': 1,
+        'source_columns': ['id', 'unused', 'value', 'also_unused'],
+        'columns': {
+            'value': {'dtype': 'float'},
+            'id': {'dtype': 'integer'},
+        },
+    }
+    raw_content = b"keywords\n1,x,1.5,y\n2,x,not_a_float,y"
+
+    result_df = data_parser.parse(raw_content, schema)
+
+    assert list(result_df.columns) == ['value', 'id']
+    assert result_df['id'].tolist() == ['1', '2']
+    assert result_df['value'].tolist() == ['1.5', 'not_a_float']
@@ -1,4 +1,5 @@
 import pytest
+import logging
 import pandas as pd
 import duckdb
 import yaml
@@ -332,6 +333,41 @@ def test_pipeline_run_updates_statuses(transformation_pipeline_env):
         if p_conn_check:
             p_conn_check.close()
 
+def test_pipeline_run_with_process_pool(transformation_pipeline_env, caplog):
+    """
+    測試 transformation.max_workers > 1 時，process pool 模式的 manifest 狀態與序列模式一致；
+    同一資料表的已驗證檔案會成批寫入 (load_batch_files)。
+    """
+    config_path = transformation_pipeline_env["config_path"]
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config["transformation"] = {"max_workers": 2, "max_in_flight": 3, "load_batch_files": 4}
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.dump(config, f)
+
+    pipeline = TransformationPipeline(config_path=config_path)
+    assert pipeline.max_workers == 2
+    assert pipeline.max_in_flight == 3
+    with caplog.at_level(logging.INFO, logger="src.sp_data_v16.transformation.pipeline"):
+        pipeline.run()
+
+    m_conn = duckdb.connect(transformation_pipeline_env["manifest_db_path"], read_only=True)
+    try:
+        actual_statuses = dict(m_conn.execute("SELECT file_hash, status FROM file_manifest").fetchall())
+    finally:
+        m_conn.close()
+    assert actual_statuses == transformation_pipeline_env["expected_statuses"]
+
+    p_conn = duckdb.connect(transformation_pipeline_env["processed_db_path"], read_only=True)
+    try:
+        ids = [row[0] for row in p_conn.execute(
+            f"SELECT id FROM {transformation_pipeline_env['valid_data_table_name']} ORDER BY id"
+        ).fetchall()]
+    finally:
+        p_conn.close()
+    assert ids == [1, 2, 3]
+    assert "transformation_run_finished files=9 workers=2" in caplog.text
+
 # --- Unit Tests for TransformationPipeline ---
 from unittest.mock import MagicMock, patch # Added patch here
 
@@ -525,7 +561,7 @@ def test_pipeline_init_handles_dependency_errors(
     # the actual exception raised should be the one from the dependency.
     assert expected_error_message_part in str(excinfo.value)
 
-def test_run_handles_no_pending_files(monkeypatch, tmp_path, capsys):
+def test_run_handles_no_pending_files(monkeypatch, tmp_path, caplog):
     """測試 TransformationPipeline.run() 在沒有待處理檔案時的行為。"""
     mock_config_dict = {
         "database": {
@@ -558,16 +594,16 @@ def test_run_handles_no_pending_files(monkeypatch, tmp_path, capsys):
     pipeline.processed_loader.close = MagicMock()
 
 
-    pipeline.run()
+    with caplog.at_level(logging.INFO, logger="src.sp_data_v16.transformation.pipeline"):
+        pipeline.run()
 
-    captured = capsys.readouterr()
-    assert "目前沒有待處理的檔案。" in captured.out
+    assert "目前沒有待處理的檔案。" in caplog.text
     pipeline.manifest_con.close.assert_called_once()
     pipeline.raw_lake_reader.close.assert_called_once()
     pipeline.manifest_manager.close.assert_called_once()
     pipeline.processed_loader.close.assert_called_once()
 
-def test_run_handles_validation_failure(monkeypatch, tmp_path, capsys):
+def test_run_handles_validation_failure(monkeypatch, tmp_path, caplog):
     """測試 pipeline.run() 在 validator.validate() 返回 None (驗證失敗) 時的行為。"""
     mock_config_dict = {
         "database": {
@@ -628,7 +664,8 @@ def test_run_handles_validation_failure(monkeypatch, tmp_path, capsys):
     # Key mock: validator.validate returns None
     mock_dv_instance.validate.return_value = None
 
-    pipeline.run()
+    with caplog.at_level(logging.INFO, logger="src.sp_data_v16.transformation.pipeline"):
+        pipeline.run()
 
     # Assert that update_status was called with 'validation_error'
     mock_mm_instance.update_status.assert_called_once_with(test_file_hash, 'validation_error')
@@ -636,9 +673,8 @@ def test_run_handles_validation_failure(monkeypatch, tmp_path, capsys):
     # Assert that no attempt was made to load data
     mock_pdl_instance.load_dataframe.assert_not_called()
 
-    captured = capsys.readouterr()
-    # Updated log message to reflect the change in pipeline.py
-    assert f"[進度] 資料驗證失敗或無有效數據 {test_file_path} (Hash: {test_file_hash[:8]})" in captured.out
+    assert f"檔案 {test_file_path} (Hash: {test_file_hash[:8]}) 因數據驗證失敗或無有效數據" in caplog.text
+    assert f"file_transformed hash={test_file_hash[:8]} path={test_file_path} status=validation_error" in caplog.text
 
     # Verify all relevant close methods were called
     pipeline.manifest_con.close.assert_called_once()
@@ -660,7 +696,7 @@ def test_run_handles_validation_failure(monkeypatch, tmp_path, capsys):
     ]
 )
 def test_run_main_loop_exception_handling(
-    monkeypatch, tmp_path, capsys,
+    monkeypatch, tmp_path, caplog,
     exception_to_raise, expected_status, expected_log_message_part
 ):
     """測試 pipeline.run() 在處理檔案迴圈中，對不同類型的例外進行處理並更新 manifest 狀態。"""
@@ -708,12 +744,12 @@ def test_run_main_loop_exception_handling(
     # Configure the DataParser's parse method to raise the specified exception
     mock_dp_instance.parse.side_effect = exception_to_raise
 
-    pipeline.run()
+    with caplog.at_level(logging.INFO, logger="src.sp_data_v16.transformation.pipeline"):
+        pipeline.run()
 
     mock_mm_instance.update_status.assert_called_once_with(test_file_hash, expected_status)
 
-    captured = capsys.readouterr()
-    assert expected_log_message_part in captured.out
+    assert expected_log_message_part in caplog.text
 
     # Ensure no data loading attempt was made
     mock_pdl_instance.load_dataframe.assert_not_called()
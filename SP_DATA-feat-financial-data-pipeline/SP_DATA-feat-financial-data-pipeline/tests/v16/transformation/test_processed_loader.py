@@ -406,3 +406,61 @@ def test_load_dataframe_append_mode_no_unique_key_in_schema(processed_loader_ins
             if_exists='append',
             index=False
         )
+
+def test_load_dataframe_caches_ddl_per_schema_version(processed_loader_instance, mock_duckdb_connection, sample_dataframe):
+    """測試同一結構版本的第二次載入不再查詢目錄或執行 DDL，只執行 Upsert。"""
+    table_name = "test_table_ddl_cache"
+    schema_definition = {
+        "unique_key": ["id"],
+        "columns": {
+            "id": {"db_type": "INTEGER"},
+            "name": {"db_type": "VARCHAR"},
+            "value": {"db_type": "DOUBLE"}
+        }
+    }
+
+    processed_loader_instance.load_dataframe(sample_dataframe, table_name, schema_definition)
+    mock_duckdb_connection.execute.reset_mock()
+    processed_loader_instance.load_dataframe(sample_dataframe, table_name, schema_definition)
+
+    executed_sql = [call[0][0] for call in mock_duckdb_connection.execute.call_args_list]
+    assert len(executed_sql) == 1, f"Only the upsert should run on a cached schema. Calls: {executed_sql}"
+    assert 'INSERT INTO "test_table_ddl_cache"' in executed_sql[0]
+
+    # 結構版本改變 (新增欄位) 時重新檢查資料表
+    mock_duckdb_connection.execute.reset_mock()
+    changed_schema = {**schema_definition, "version": 2}
+    processed_loader_instance.load_dataframe(sample_dataframe, table_name, changed_schema)
+    executed_sql = [call[0][0] for call in mock_duckdb_connection.execute.call_args_list]
+    assert any("sqlite_master" in sql for sql in executed_sql)
+
+def test_load_dataframes_batches_files_in_one_upsert(tmp_path):
+    """測試多個同結構 DataFrame 以單一交易寫入，重複唯一鍵以最後一筆為準；版本改變時補上新欄位。"""
+    loader = ProcessedDBLoader(db_path=str(tmp_path / "batch_processed.db"))
+    schema_definition = {
+        "unique_key": ["id"],
+        "columns": {"id": {"db_type": "INTEGER"}, "name": {"db_type": "VARCHAR"}}
+    }
+    try:
+        loader.load_dataframes(
+            [
+                pd.DataFrame({"id": [1, 2], "name": ["a", "b"]}),
+                pd.DataFrame(),
+                pd.DataFrame({"id": [2, 3], "name": ["b2", "c"]}),
+            ],
+            "batched_table",
+            schema_definition,
+        )
+        rows = loader.con.execute("SELECT id, name FROM batched_table ORDER BY id").fetchall()
+        assert rows == [(1, "a"), (2, "b2"), (3, "c")]
+
+        schema_v2 = {
+            "version": 2,
+            "unique_key": ["id"],
+            "columns": {**schema_definition["columns"], "score": {"db_type": "DOUBLE"}}
+        }
+        loader.load_dataframe(pd.DataFrame({"id": [3], "name": ["c2"], "score": [1.5]}), "batched_table", schema_v2)
+        rows = loader.con.execute("SELECT id, name, score FROM batched_table ORDER BY id").fetchall()
+        assert rows == [(1, "a", None), (2, "b2", None), (3, "c2", 1.5)]
+    finally:
+        loader.close()
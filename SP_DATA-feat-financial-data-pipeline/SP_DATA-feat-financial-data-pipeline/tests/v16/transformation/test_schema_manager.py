@@ -242,3 +242,40 @@ def test_identify_schema_multiple_matches_priority(tmp_path: pathlib.Path):
     # 內容只包含 "KeywordA"，仍然匹配 schema_A。
     content_a_only = "This content has KeywordA only.".encode('utf-8')
     assert manager_order2.identify_schema_from_content(content_a_only) == "schema_A"
+
+def test_identify_schema_prefers_highest_keyword_score(tmp_path: pathlib.Path):
+    """測試多個 schema 都匹配時，選擇匹配關鍵字最多者，而非最先定義者。"""
+    schemas_data = {
+        "schema_generic": {"keywords": ["成交量"]},
+        "schema_specific": {"keywords": ["成交量", "未平倉", "Institutional"]},
+        "schema_nested": {"keywords": ["keyword", "key"]}
+    }
+    schema_file = tmp_path / "score_schemas.json"
+    with open(schema_file, 'w', encoding='utf-8') as f:
+        json.dump(schemas_data, f)
+    manager = SchemaManager(str(schema_file))
+
+    content = "日期,institutional,成交量,未平倉\n".encode('utf-8')
+    assert manager.identify_schema_from_content(content) == "schema_specific"
+
+    # "key" 包含在 "keyword" 中，兩者都應計分 (schema_nested 得 2 分，高於 schema_generic 的 1 分)
+    content_nested = "成交量 keyword".encode('utf-8')
+    assert manager.identify_schema_from_content(content_nested) == "schema_nested"
+
+def test_identify_schema_only_scans_bounded_prefix(tmp_path: pathlib.Path):
+    """測試只掃描檔頭前 prefix_bytes 位元組；截斷在多位元組字元中間時不應視為解碼失敗。"""
+    schemas_data = {
+        "schema_header": {"keywords": ["測試BIG5"]},
+        "schema_tail": {"keywords": ["TailKeyword"]}
+    }
+    schema_file = tmp_path / "prefix_schemas.json"
+    with open(schema_file, 'w', encoding='utf-8') as f:
+        json.dump(schemas_data, f)
+    manager = SchemaManager(str(schema_file), prefix_bytes=16)
+
+    # BIG5 內容：前綴在第 16 個位元組處切斷中文字
+    content = ("測試BIG5," + "資料" * 20 + "TailKeyword").encode('big5')
+    assert manager.identify_schema_from_content(content) == "schema_header"
+
+    tail_only = ("x" * 32 + "TailKeyword").encode('utf-8')
+    assert manager.identify_schema_from_content(tail_only) is None
@@ -273,5 +273,49 @@ class TestDataValidator: # 移除 unittest.TestCase 的繼承
         validated_df_missing_key = self.validator.validate(df.copy(), schema_missing_cols_key)
         assert_frame_equal(validated_df_missing_key, original_df_copy, check_dtype=True)
 
+    def test_split_returns_valid_and_invalid_rows_with_reason_codes(self):
+        """測試 split() 一次評估所有規則，並為無效列附上原因代碼。"""
+        df = pd.DataFrame({
+            'id': ['1', '2', None, '4', '5'],
+            'price': ['10.5', '-1', '3', '2000', '7'],
+            'side': ['B', 'S', 'B', 'X', 'S'],
+            'code': ['TX', 'MTX', 'TX', 'TX', 'tx1'],
+        })
+        schema = {
+            'columns': {
+                'id': {'dtype': 'integer', 'nullable': False},
+                'price': {'dtype': 'float', 'min': 0, 'max': 1000},
+                'side': {'dtype': 'string', 'enum': ['B', 'S']},
+                'code': {'dtype': 'string', 'pattern': '[A-Z]+'},
+            }
+        }
+
+        with patch('builtins.print'):
+            valid_df, invalid_df = self.validator.split(df, schema)
+
+        assert valid_df.index.tolist() == [0]
+        assert valid_df['id'].dtype == 'Int64'
+        assert invalid_df.index.tolist() == [1, 2, 3, 4]
+        assert invalid_df['_errors'].tolist() == [
+            'range:price',
+            'not_null:id',
+            'range:price;enum:side',
+            'pattern:code',
+        ]
+
+    def test_validate_returns_none_on_rule_violation(self):
+        """測試 validate() 在任何規則 (範圍、枚舉、格式) 被違反時返回 None。"""
+        df = pd.DataFrame({'side': ['B', 'X', None]})
+        schema = {'columns': {'side': {'dtype': 'string', 'enum': ['B', 'S']}}}
+
+        with patch('builtins.print') as mocked_print:
+            assert self.validator.validate(df, schema) is None
+        assert any("Critical" in call.args[0] and "'side'" in call.args[0] and "[1]" in call.args[0]
+                   for call in mocked_print.call_args_list)
+
+        # 空值不算違反枚舉規則
+        with patch('builtins.print'):
+            assert self.validator.validate(pd.DataFrame({'side': ['B', None]}), schema) is not None
+
 # if __name__ == '__main__':
 #     unittest.main() # 註解掉或移除 unittest.main()